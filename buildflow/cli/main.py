@@ -56,9 +56,22 @@ def run_flow(
     serve_port: int,
     flow_state: Optional[FlowState] = None,
     event_subscriber: Optional[Callable] = None,
+    hot_reload: bool = False,
 ):
     if isinstance(flow, buildflow.Flow):
-        if reload:
+        if hot_reload:
+            flow.run(
+                start_runtime_server=start_runtime_server,
+                runtime_server_host=runtime_server_host,
+                runtime_server_port=runtime_server_port,
+                run_id=run_id,
+                debug_run=True,
+                serve_host=serve_host,
+                serve_port=serve_port,
+                event_subscriber=event_subscriber,
+                hot_reload=True,
+            )
+        elif reload:
             ray.init()
             watcher = RunTimeWatcher(
                 app=buildflow_config.entry_point,
@@ -107,6 +120,13 @@ def run(
     ),
     run_id: Optional[str] = typer.Option(None, help="The run id to use for this run."),
     reload: bool = typer.Option(False, help="Whether to reload the app on change."),
+    hot_reload: bool = typer.Option(
+        False,
+        help=(
+            "Whether to hot reload changed processors on change, without "
+            "restarting the runtime."
+        ),
+    ),
     from_build: str = typer.Option(
         "", help="The build to run from, only one of app and --from-build can be used."
     ),
@@ -138,9 +158,10 @@ def run(
             serve_host,
             serve_port,
             event_subscriber=event_subscriber_import,
+            hot_reload=hot_reload,
         )
     else:
-        if reload:
+        if reload or hot_reload:
             typer.echo("reload cannot be used with --from-build")
             raise typer.Exit(1)
         if not os.path.exists(from_build):
@@ -1,11 +1,12 @@
 import dataclasses
 import os
-from typing import List, Mapping
-
-from pulumi import automation as auto
+from typing import TYPE_CHECKING, List, Mapping
 
 from buildflow.config._config import Config
 
+if TYPE_CHECKING:
+    from pulumi import automation as auto
+
 
 def removeprefix(text: str, prefix: str) -> str:
     if text.startswith(prefix):
@@ -88,7 +89,9 @@ class PulumiConfig:
             raise ValueError(f"Stack {stack} is not defined in the PulumiConfig")
         return f"{self.project_name}:{stack}"
 
-    def stack_settings(self) -> auto.StackSettings:
+    def stack_settings(self) -> "auto.StackSettings":
+        from pulumi import automation as auto
+
         return auto.StackSettings(
             secrets_provider=None,
             encrypted_key=None,
@@ -96,7 +99,9 @@ class PulumiConfig:
             config=None,
         )
 
-    def project_settings(self, stack: PulumiStack) -> auto.ProjectSettings:
+    def project_settings(self, stack: PulumiStack) -> "auto.ProjectSettings":
+        from pulumi import automation as auto
+
         return auto.ProjectSettings(
             name=self.project_name,
             runtime="python",
@@ -110,7 +115,9 @@ class PulumiConfig:
             backend=auto.ProjectBackend(stack.full_backend_url),
         )
 
-    def workspace_options(self, stack: str) -> auto.LocalWorkspaceOptions:
+    def workspace_options(self, stack: str) -> "auto.LocalWorkspaceOptions":
+        from pulumi import automation as auto
+
         selected_stack = self.get_stack(stack)
         pulumi_passphrase = os.getenv("BUIDFLOW_PULUMI_PASSPHRASE", "buildflow")
         return auto.LocalWorkspaceOptions(
@@ -29,6 +29,12 @@ def consumer(
     autoscale_frequency_secs: int = 60,
     consumer_backlog_burn_threshold: int = 60,
     consumer_cpu_percent_target: int = 25,
+    health_check_frequency_secs: int = 5,
+    heartbeat_timeout_secs: int = 60,
+    max_missed_heartbeats: int = 3,
+    replica_progress_timeout_secs: int = 600,
+    ordered_processing: bool = False,
+    max_concurrent_ordering_keys: int = 100,
     log_level: str = "INFO",
 ):
     autoscale_options = AutoscalerOptions(
@@ -50,6 +56,12 @@ def consumer(
                 num_concurrency=num_concurrency,
                 log_level=log_level,
                 autoscaler_options=autoscale_options,
+                health_check_frequency_secs=health_check_frequency_secs,
+                heartbeat_timeout_secs=heartbeat_timeout_secs,
+                max_missed_heartbeats=max_missed_heartbeats,
+                replica_progress_timeout_secs=replica_progress_timeout_secs,
+                ordered_processing=ordered_processing,
+                max_concurrent_ordering_keys=max_concurrent_ordering_keys,
             ),
             original_process_fn_or_class=original_fn_or_class,
         )
@@ -5,9 +5,8 @@ import logging
 import os
 import signal
 import sys
-from typing import Any, Callable, Dict, List, Optional, Tuple
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
 
-import pulumi
 import ray
 from rich.progress import Progress
 from rich.prompt import Prompt
@@ -30,9 +29,10 @@ from buildflow.core.app.flow_state import (
     ProcessorState,
     ServiceState,
 )
-from buildflow.core.app.infra.actors.infra import InfraActor
+from buildflow.core.app.hot_reload import HotReloader, processor_group_fingerprints
 from buildflow.core.app.runtime._runtime import RunID
 from buildflow.core.app.runtime.actors.runtime import RuntimeActor
+from buildflow.core.app.runtime.local.runtime import LocalRuntime, LocalRuntimeHandle
 from buildflow.core.app.runtime.server import RuntimeServer
 from buildflow.core.app.service import Service
 from buildflow.core.background_tasks.background_task import BackgroundTask
@@ -40,7 +40,6 @@ from buildflow.core.credentials._credentials import CredentialType
 from buildflow.core.credentials.aws_credentials import AWSCredentials
 from buildflow.core.credentials.empty_credentials import EmptyCredentials
 from buildflow.core.credentials.gcp_credentials import GCPCredentials
-from buildflow.core.infra.buildflow_resource import BuildFlowResource
 from buildflow.core.options.flow_options import FlowOptions
 from buildflow.core.options.runtime_options import AutoscalerOptions, ProcessorOptions
 from buildflow.core.processor.patterns.collector import (
@@ -67,11 +66,19 @@ from buildflow.io.primitive import (
 )
 from buildflow.io.strategies._strategy import StategyType
 
+if TYPE_CHECKING:
+    # NOTE: pulumi is slow to import so it is only imported when the flow
+    # manages infrastructure.
+    import pulumi
+
+    from buildflow.core.app.infra.actors.infra import InfraActor
+    from buildflow.core.infra.buildflow_resource import BuildFlowResource
+
 
 @dataclasses.dataclass
 class _PrimitiveCacheEntry:
     primitive: Primitive
-    buildflow_resource: BuildFlowResource
+    buildflow_resource: "BuildFlowResource"
 
 
 @dataclasses.dataclass
@@ -152,9 +159,13 @@ FlowID = str
 def _traverse_primitive_for_pulumi(
     primitive: Primitive,
     credentials: CredentialType,
-    initial_opts: pulumi.ResourceOptions,
+    initial_opts: "pulumi.ResourceOptions",
     visited_primitives: _PrimitiveCache,
-) -> pulumi.Resource:
+) -> "pulumi.Resource":
+    import pulumi
+
+    from buildflow.core.infra.buildflow_resource import BuildFlowResource
+
     fields = dataclasses.fields(primitive)
     parent_resources = []
     for field in fields:
@@ -416,16 +427,22 @@ class Flow:
         # Runtime configuration
         self._runtime_actor_ref: Optional[RuntimeActor] = None
         # Infra configuration
-        self._infra_actor_ref: Optional[InfraActor] = None
+        self._infra_actor_ref: Optional["InfraActor"] = None
         self._managed_primitives: Dict[str, Primitive] = {}
         self._services: List[Service] = []
+        # Hot reload state, see: _hot_reload
+        self._group_fingerprints: Dict[str, str] = {}
+        self._serve_host: Optional[str] = None
+        self._serve_port: Optional[int] = None
         self.credentials = FlowCredentials(
             gcp_credentials=GCPCredentials(self.options.credentials_options),
             aws_credentials=AWSCredentials(self.options.credentials_options),
         )
         self.flow_dependencies = {FlowCredentials: self.credentials}
 
-    def _pulumi_program(self) -> List[pulumi.Resource]:
+    def _pulumi_program(self) -> List["pulumi.Resource"]:
+        import pulumi
+
         visited_primitives = _PrimitiveCache()
         start_primitives = _find_primitives_with_no_parents(
             list(self._managed_primitives.values())
@@ -458,7 +475,9 @@ class Flow:
                 _find_all_managed_parent_primitives(primitive)
             )
 
-    def _get_infra_actor(self) -> InfraActor:
+    def _get_infra_actor(self) -> "InfraActor":
+        from buildflow.core.app.infra.actors.infra import InfraActor
+
         if self.config is None:
             raise RuntimeError(
                 "Unable to create InfraActor. "
@@ -521,6 +540,12 @@ class Flow:
         autoscale_frequency_secs: int = 60,
         consumer_backlog_burn_threshold: int = 60,
         consumer_cpu_percent_target: int = 25,
+        health_check_frequency_secs: int = 5,
+        heartbeat_timeout_secs: int = 60,
+        max_missed_heartbeats: int = 3,
+        replica_progress_timeout_secs: int = 600,
+        ordered_processing: bool = False,
+        max_concurrent_ordering_keys: int = 100,
         log_level: str = "INFO",
     ):
         autoscale_options = AutoscalerOptions(
@@ -559,6 +584,12 @@ class Flow:
                 num_concurrency=num_concurrency,
                 log_level=log_level,
                 autoscaler_options=autoscale_options,
+                health_check_frequency_secs=health_check_frequency_secs,
+                heartbeat_timeout_secs=heartbeat_timeout_secs,
+                max_missed_heartbeats=max_missed_heartbeats,
+                replica_progress_timeout_secs=replica_progress_timeout_secs,
+                ordered_processing=ordered_processing,
+                max_concurrent_ordering_keys=max_concurrent_ordering_keys,
             ),
             source_credentials=source_credentials,
             sink_credentials=sink_credentials,
@@ -758,19 +789,41 @@ class Flow:
         # Options for testing
         block: bool = True,
         event_subscriber: Optional[Callable] = None,
+        # The runtime to run the flow on. "ray" runs on a (local or remote) ray
+        # cluster, "local" runs everything in the current process.
+        runtime: str = "ray",
+        # local runtime-only options
+        local_process_pool: bool = False,
+        # Watch the working directory and hot reload changed processors into
+        # the running runtime.
+        hot_reload: bool = False,
     ):
+        if runtime not in ("ray", "local"):
+            raise ValueError(f"runtime must be one of: ray, local. Got: {runtime}")
         self._add_service_groups()
         if not self._processor_groups:
             logging.warning("Flow contains no processors. Exiting.")
             return
-        if flow_state is None:
+        if flow_state is None and start_runtime_server:
+            # NOTE: The flow state is only needed by the runtime server, and
+            # requires a buildflow config which tests may not have.
             flow_state = self._flowstate()
-        try:
-            # There's an issue on ray where if we don't do this ray will
-            # start two clusters on mac
-            ray.init(address="auto", ignore_reinit_error=True)
-        except ConnectionError:
-            ray.init(ignore_reinit_error=True)
+        if runtime == "local":
+            self._runtime_actor_ref = LocalRuntimeHandle(
+                LocalRuntime(
+                    run_id=run_id or utils.uuid(),
+                    runtime_options=self.options.runtime_options,
+                    flow_dependencies=self.flow_dependencies,
+                    use_process_pool=local_process_pool,
+                )
+            )
+        else:
+            try:
+                # There's an issue on ray where if we don't do this ray will
+                # start two clusters on mac
+                ray.init(address="auto", ignore_reinit_error=True)
+            except ConnectionError:
+                ray.init(ignore_reinit_error=True)
         # Setup services
         # Start the Flow Runtime
         runtime_coroutine = self._run(
@@ -778,6 +831,7 @@ class Flow:
             serve_host=serve_host,
             serve_port=serve_port,
             event_subscriber=event_subscriber,
+            hot_reload=hot_reload,
         )
 
         if debug_run:
@@ -822,7 +876,10 @@ class Flow:
         serve_port: int,
         debug_run: bool = False,
         event_subscriber: Optional[Callable] = None,
+        hot_reload: bool = False,
     ):
+        self._serve_host = serve_host
+        self._serve_port = serve_port
         # Add a signal handler to drain the runtime when the process is killed
         loop = asyncio.get_event_loop()
         for sig in (signal.SIGINT, signal.SIGTERM):
@@ -838,7 +895,52 @@ class Flow:
             serve_port=serve_port,
             event_subscriber=event_subscriber,
         )
+        hot_reload_task = None
+        if hot_reload:
+            self._group_fingerprints = processor_group_fingerprints(self)
+            hot_reload_task = asyncio.create_task(HotReloader(self).run())
         await self._get_runtime_actor().run_until_complete.remote()
+        if hot_reload_task is not None:
+            hot_reload_task.cancel()
+
+    async def _hot_reload(self, new_flow: "Flow", reloaded_modules: List[str]) -> bool:
+        """Swaps the processor groups of `new_flow` that have changed into the
+        running runtime.
+
+        `new_flow` is the same flow re-imported after its code changed.
+        """
+        new_flow._add_service_groups()
+        new_processor_options = new_flow.options.runtime_options.processor_options
+        new_fingerprints = processor_group_fingerprints(new_flow, reloaded_modules)
+        changed_groups = [
+            group
+            for group in new_flow._processor_groups
+            if self._group_fingerprints.get(group.group_id)
+            != new_fingerprints[group.group_id]
+        ]
+        removed_group_ids = [
+            group_id
+            for group_id in self._group_fingerprints
+            if group_id not in new_fingerprints
+        ]
+        if not changed_groups and not removed_group_ids:
+            logging.warning("No processors changed, nothing to reload.")
+            return False
+        await self._get_runtime_actor().reload.remote(
+            processor_groups=changed_groups,
+            removed_group_ids=removed_group_ids,
+            processor_options={
+                group.group_id: new_processor_options[group.group_id]
+                for group in changed_groups
+            },
+            serve_host=self._serve_host,
+            serve_port=self._serve_port,
+            reloaded_modules=reloaded_modules,
+        )
+        self._processor_groups = new_flow._processor_groups
+        self.options.runtime_options.processor_options.update(new_processor_options)
+        self._group_fingerprints = new_fingerprints
+        return True
 
     async def _drain(self, as_reload: bool = False):
         logging.debug(f"Draining Flow({self.flow_id})...")
@@ -0,0 +1,332 @@
+"""Hot reloading of processor code into a running flow.
+
+Instead of restarting the whole flow (and ray cluster) when a file changes,
+only the changed user modules are re-imported. The processor groups of the
+re-imported flow are then compared with the running ones and only the groups
+that changed are swapped into the running runtime.
+"""
+import functools
+import hashlib
+import importlib
+import inspect
+import logging
+import os
+import site
+import sys
+import sysconfig
+import types
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from ray import cloudpickle
+
+from buildflow.core.options.runtime_options import ProcessorOptions
+from buildflow.core.processor.processor import ProcessorGroup
+
+if TYPE_CHECKING:
+    from buildflow.core.app.flow import Flow
+
+# How deep we follow references from a processor to other user functions and
+# classes when fingerprinting it.
+_MAX_FINGERPRINT_DEPTH = 3
+_SIMPLE_TYPES = (int, float, complex, str, bytes, bool, type(None))
+
+
+@functools.lru_cache(maxsize=None)
+def _library_paths() -> Tuple[str, ...]:
+    paths = set(site.getsitepackages() + [site.getusersitepackages()])
+    for key in ("stdlib", "platstdlib", "purelib", "platlib"):
+        paths.add(sysconfig.get_path(key))
+    return tuple(os.path.abspath(path) for path in paths if path)
+
+
+def _module_file(module: types.ModuleType) -> Optional[str]:
+    module_file = getattr(module, "__file__", None)
+    if module_file is None or not module_file.endswith(".py"):
+        return None
+    return os.path.abspath(module_file)
+
+
+def is_user_module(module: types.ModuleType, root_dir: str) -> bool:
+    """Returns true if the module is part of the user's code in `root_dir`."""
+    module_file = _module_file(module)
+    if module_file is None or module.__name__ == "__main__":
+        return False
+    root_dir = os.path.abspath(root_dir)
+    if os.path.commonpath([module_file, root_dir]) != root_dir:
+        return False
+    # Virtual environments are commonly created inside of the project.
+    for library_path in _library_paths():
+        if os.path.commonpath([module_file, library_path]) == library_path:
+            return False
+    return not module.__name__.startswith("buildflow.")
+
+
+def _references_modules(module: types.ModuleType, module_names: Set[str]) -> bool:
+    for value in list(vars(module).values()):
+        if isinstance(value, types.ModuleType):
+            if value.__name__ in module_names:
+                return True
+        elif getattr(value, "__module__", None) in module_names and (
+            inspect.isfunction(value) or inspect.isclass(value)
+        ):
+            return True
+    return False
+
+
+def modules_to_reload(
+    changed_paths: Iterable[str], root_dir: str
+) -> List[types.ModuleType]:
+    """Returns the user modules that need to be reloaded for the changed files.
+
+    This includes the modules of the changed files and any user modules that
+    (transitively) import from them, since they would otherwise keep
+    references to the old code. Modules are ordered so a module is always
+    reloaded after the modules it imports from.
+    """
+    changed_paths = {os.path.abspath(path) for path in changed_paths}
+    user_modules = [
+        module
+        for module in list(sys.modules.values())
+        if isinstance(module, types.ModuleType) and is_user_module(module, root_dir)
+    ]
+    to_reload = [
+        module for module in user_modules if _module_file(module) in changed_paths
+    ]
+    reloaded_names = {module.__name__ for module in to_reload}
+    added = True
+    while added:
+        added = False
+        for module in user_modules:
+            if module.__name__ in reloaded_names:
+                continue
+            if _references_modules(module, reloaded_names):
+                to_reload.append(module)
+                reloaded_names.add(module.__name__)
+                added = True
+    return to_reload
+
+
+def reload_modules(modules: Iterable[types.ModuleType]) -> List[types.ModuleType]:
+    reloaded = []
+    for module in modules:
+        reloaded.append(importlib.reload(module))
+        # NOTE: By default cloudpickle pickles functions and classes of
+        # importable modules by reference. Processes that already imported the
+        # module (e.g. the runtime actor) would keep using the old code, so we
+        # pickle reloaded modules by value instead.
+        cloudpickle.register_pickle_by_value(module)
+    return reloaded
+
+
+def _update_digest(
+    hasher: "hashlib._Hash",
+    obj: Any,
+    reloaded_modules: Set[str],
+    seen: Set[int],
+    depth: int,
+):
+    if id(obj) in seen:
+        return
+    seen.add(id(obj))
+    if isinstance(obj, (staticmethod, classmethod)):
+        obj = obj.__func__
+    if isinstance(obj, property):
+        for accessor in (obj.fget, obj.fset, obj.fdel):
+            if accessor is not None:
+                _update_digest(hasher, accessor, reloaded_modules, seen, depth)
+        return
+    if isinstance(obj, types.CodeType):
+        hasher.update(obj.co_code)
+        hasher.update(repr((obj.co_names, obj.co_varnames)).encode())
+        for const in obj.co_consts:
+            if isinstance(const, types.CodeType):
+                _update_digest(hasher, const, reloaded_modules, seen, depth)
+            else:
+                hasher.update(repr(const).encode())
+        return
+    if inspect.isfunction(obj):
+        hasher.update(obj.__qualname__.encode())
+        hasher.update(repr(obj.__defaults__).encode())
+        _update_digest(hasher, obj.__code__, reloaded_modules, seen, depth)
+        if depth >= _MAX_FINGERPRINT_DEPTH:
+            return
+        for name in _global_names(obj.__code__):
+            value = obj.__globals__.get(name)
+            if isinstance(value, types.ModuleType):
+                if value.__name__ in reloaded_modules:
+                    # We can't tell what is used from the module, so any
+                    # change to it counts as a change to the function.
+                    hasher.update(f"reloaded:{value.__name__}".encode())
+            elif _is_user_definition(value):
+                _update_digest(hasher, value, reloaded_modules, seen, depth + 1)
+        return
+    if inspect.isclass(obj):
+        hasher.update(obj.__qualname__.encode())
+        for base in obj.__bases__:
+            hasher.update(f"{base.__module__}.{base.__qualname__}".encode())
+        for name, value in sorted(vars(obj).items()):
+            if name in ("__dict__", "__weakref__", "__doc__", "__module__"):
+                continue
+            hasher.update(name.encode())
+            if isinstance(value, _SIMPLE_TYPES):
+                hasher.update(repr(value).encode())
+            else:
+                _update_digest(hasher, value, reloaded_modules, seen, depth)
+        return
+    if isinstance(obj, _SIMPLE_TYPES):
+        hasher.update(repr(obj).encode())
+
+
+def _global_names(code: types.CodeType) -> Set[str]:
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            names.update(_global_names(const))
+    return names
+
+
+def _is_user_definition(value: Any) -> bool:
+    if not (inspect.isfunction(value) or inspect.isclass(value)):
+        return False
+    module = sys.modules.get(getattr(value, "__module__", None) or "")
+    return module is not None and is_user_module(module, os.getcwd())
+
+
+def processor_group_fingerprint(
+    group: ProcessorGroup,
+    options: ProcessorOptions,
+    reloaded_modules: Iterable[str] = (),
+) -> str:
+    """Returns a fingerprint of the definition of a processor group.
+
+    The fingerprint covers the processor code (and any user functions and
+    classes it references), the processor's primitives and the group's
+    options. If it has not changed the group does not need to be reloaded.
+    """
+    reloaded_modules = set(reloaded_modules)
+    hasher = hashlib.sha256()
+    hasher.update(f"{group.group_id}:{group.group_type.name}".encode())
+    hasher.update(repr(options).encode())
+    for processor in group.processors:
+        processor_class = type(processor)
+        hasher.update(processor.processor_id.encode())
+        hasher.update(repr(getattr(processor_class, "__meta__", {})).encode())
+        if hasattr(processor, "route_info"):
+            hasher.update(repr(processor.route_info()).encode())
+        _update_digest(
+            hasher, processor_class.__call__, reloaded_modules, seen=set(), depth=0
+        )
+        for dependency in processor.dependencies():
+            hasher.update(dependency.arg_name.encode())
+            _update_digest(
+                hasher,
+                dependency.dependency.dependency_fn,
+                reloaded_modules,
+                seen=set(),
+                depth=0,
+            )
+    return hasher.hexdigest()
+
+
+def processor_group_fingerprints(
+    flow: "Flow", reloaded_modules: Iterable[str] = ()
+) -> Dict[str, str]:
+    processor_options = flow.options.runtime_options.processor_options
+    return {
+        group.group_id: processor_group_fingerprint(
+            group, processor_options[group.group_id], reloaded_modules
+        )
+        for group in flow._processor_groups
+    }
+
+
+class HotReloader:
+    """Watches a directory and hot reloads changed processors into a flow.
+
+    The flow must be defined in an importable module (i.e. not `__main__`),
+    this is the case when running with `buildflow run`.
+    """
+
+    def __init__(self, flow: "Flow", watch_dir: str = ".") -> None:
+        self.flow = flow
+        self.watch_dir = os.path.abspath(watch_dir)
+        self.flow_module_name = self._find_flow_module_name()
+
+    def _find_flow_module_name(self) -> Optional[str]:
+        for module in list(sys.modules.values()):
+            if not isinstance(module, types.ModuleType) or not is_user_module(
+                module, self.watch_dir
+            ):
+                continue
+            if any(value is self.flow for value in list(vars(module).values())):
+                return module.__name__
+        return None
+
+    def _find_reloaded_flow(self, module: types.ModuleType) -> Optional["Flow"]:
+        from buildflow.core.app.flow import Flow
+
+        flows = [
+            value
+            for value in vars(module).values()
+            if isinstance(value, Flow) and value.flow_id == self.flow.flow_id
+        ]
+        if len(flows) != 1:
+            return None
+        return flows[0]
+
+    async def reload(self, changed_paths: Iterable[str]) -> bool:
+        """Reloads the changed files into the running flow.
+
+        Returns true if any processor groups were reloaded.
+        """
+        to_reload = modules_to_reload(changed_paths, self.watch_dir)
+        if not to_reload:
+            return False
+        flow_module = sys.modules[self.flow_module_name]
+        if flow_module not in to_reload:
+            # The flow module must always be reloaded last, so it picks up the
+            # changes of the other modules.
+            to_reload.append(flow_module)
+        else:
+            to_reload.remove(flow_module)
+            to_reload.append(flow_module)
+        logging.warning(
+            "Hot reloading modules: %s", [module.__name__ for module in to_reload]
+        )
+        try:
+            reloaded = reload_modules(to_reload)
+        except Exception:
+            logging.exception("failed to reload modules, keeping the current code.")
+            return False
+        new_flow = self._find_reloaded_flow(reloaded[-1])
+        if new_flow is None:
+            logging.error(
+                "could not find Flow(%s) in %s, keeping the current code.",
+                self.flow.flow_id,
+                self.flow_module_name,
+            )
+            return False
+        return await self.flow._hot_reload(
+            new_flow, reloaded_modules=[module.__name__ for module in reloaded]
+        )
+
+    async def run(self):
+        # NOTE: watchfiles is only needed when hot reloading.
+        from watchfiles import awatch
+
+        if self.flow_module_name is None or self.flow_module_name == "__main__":
+            logging.error(
+                "hot reload requires the flow to be defined in an importable "
+                "module (i.e. run with `buildflow run --hot-reload`). "
+                "Hot reload is disabled."
+            )
+            return
+        logging.info("Watching %s for changes to hot reload...", self.watch_dir)
+        async for changes in awatch(self.watch_dir):
+            changed_paths = [path for _, path in changes if path.endswith(".py")]
+            if not changed_paths:
+                continue
+            try:
+                await self.reload(changed_paths)
+            except Exception:
+                logging.exception("hot reload failed")
@@ -0,0 +1,150 @@
+import importlib
+import os
+import shutil
+import sys
+import tempfile
+import textwrap
+import unittest
+
+from buildflow.core.app.hot_reload import (
+    HotReloader,
+    modules_to_reload,
+    processor_group_fingerprints,
+)
+
+_HELPERS = """
+def transform(payload):
+    return {{"field": payload["field"] + {increment}}}
+"""
+
+_APP = """
+from buildflow import Flow
+from buildflow.io.local import File, Pulse
+from buildflow.types.portable import FileFormat
+
+from hot_reload_helpers import transform
+
+app = Flow()
+
+
+@app.consumer(
+    source=Pulse([{{"field": 1}}], pulse_interval_seconds=1),
+    sink=File(file_path="output.csv", file_format=FileFormat.CSV),
+)
+def uses_helper(payload):
+    return transform(payload)
+
+
+@app.consumer(
+    source=Pulse([{{"field": 1}}], pulse_interval_seconds=1),
+    sink=File(file_path="output.csv", file_format=FileFormat.CSV),
+)
+def standalone(payload):
+    return {{"field": payload["field"] + {increment}}}
+"""
+
+
+class _FakeReloadMethod:
+    def __init__(self) -> None:
+        self.calls = []
+
+    async def _reload(self, **kwargs):
+        self.calls.append(kwargs)
+        return True
+
+    def remote(self, **kwargs):
+        return self._reload(**kwargs)
+
+
+class _FakeRuntime:
+    def __init__(self) -> None:
+        self.reload = _FakeReloadMethod()
+
+
+class HotReloadTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.app_dir = tempfile.mkdtemp()
+        self.original_cwd = os.getcwd()
+        self.original_dont_write_bytecode = sys.dont_write_bytecode
+        # Reloading compares file mtimes to decide if it can use the cached
+        # bytecode, which is too coarse for files written by the tests.
+        sys.dont_write_bytecode = True
+        os.chdir(self.app_dir)
+        sys.path.insert(0, self.app_dir)
+        self.write_helpers(increment=1)
+        self.write_app(increment=1)
+        self.app_module = importlib.import_module("hot_reload_app")
+
+    def tearDown(self) -> None:
+        sys.path.remove(self.app_dir)
+        sys.modules.pop("hot_reload_app", None)
+        sys.modules.pop("hot_reload_helpers", None)
+        sys.dont_write_bytecode = self.original_dont_write_bytecode
+        os.chdir(self.original_cwd)
+        shutil.rmtree(self.app_dir)
+
+    def write_helpers(self, increment: int):
+        with open(os.path.join(self.app_dir, "hot_reload_helpers.py"), "w") as f:
+            f.write(textwrap.dedent(_HELPERS.format(increment=increment)))
+
+    def write_app(self, increment: int):
+        with open(os.path.join(self.app_dir, "hot_reload_app.py"), "w") as f:
+            f.write(textwrap.dedent(_APP.format(increment=increment)))
+
+    def start_flow(self):
+        flow = self.app_module.app
+        flow._runtime_actor_ref = _FakeRuntime()
+        flow._group_fingerprints = processor_group_fingerprints(flow)
+        return flow
+
+    def test_modules_to_reload_includes_importers(self):
+        helpers_path = os.path.join(self.app_dir, "hot_reload_helpers.py")
+        modules = modules_to_reload([helpers_path], self.app_dir)
+        self.assertEqual(
+            ["hot_reload_helpers", "hot_reload_app"], [m.__name__ for m in modules]
+        )
+
+    def test_modules_to_reload_ignores_unknown_files(self):
+        other_path = os.path.join(self.app_dir, "not_imported.py")
+        self.assertEqual([], modules_to_reload([other_path], self.app_dir))
+
+    async def test_reload_only_changed_group(self):
+        flow = self.start_flow()
+        self.write_app(increment=2)
+        app_path = os.path.join(self.app_dir, "hot_reload_app.py")
+
+        reloaded = await HotReloader(flow, self.app_dir).reload([app_path])
+
+        self.assertTrue(reloaded)
+        calls = flow._runtime_actor_ref.reload.calls
+        self.assertEqual(1, len(calls))
+        self.assertEqual(
+            ["standalone"], [g.group_id for g in calls[0]["processor_groups"]]
+        )
+        self.assertEqual([], calls[0]["removed_group_ids"])
+
+    async def test_reload_changed_helper(self):
+        flow = self.start_flow()
+        self.write_helpers(increment=2)
+        helpers_path = os.path.join(self.app_dir, "hot_reload_helpers.py")
+
+        reloaded = await HotReloader(flow, self.app_dir).reload([helpers_path])
+
+        self.assertTrue(reloaded)
+        calls = flow._runtime_actor_ref.reload.calls
+        self.assertEqual(
+            ["uses_helper"], [g.group_id for g in calls[0]["processor_groups"]]
+        )
+
+    async def test_reload_no_changes(self):
+        flow = self.start_flow()
+        app_path = os.path.join(self.app_dir, "hot_reload_app.py")
+
+        reloaded = await HotReloader(flow, self.app_dir).reload([app_path])
+
+        self.assertFalse(reloaded)
+        self.assertEqual([], flow._runtime_actor_ref.reload.calls)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -78,6 +78,16 @@ class CollectorProcessorPoolActor(ProcessorGroupReplicaPoolActor):
         # Collector processors are automatically scaled by ray server.
         return
 
+    async def reload_replicas(self):
+        # NOTE: The processors are run by the ray serve deployment, so instead
+        # of replacing our replica we have it update the deployment in place.
+        if not self.replicas:
+            await self.add_replicas(1)
+            return
+        await self.replicas[0].ray_actor_handle.reload.remote(
+            self.processor_group, self.options
+        )
+
     async def create_replica(self):
         replica_id = "1"
         replica_actor_handle = ReceiveProcessPushAck.remote(
@@ -1,6 +1,7 @@
+import asyncio
+import enum
 import logging
-from collections import deque
-from typing import Any, Dict, List, Type
+from typing import Any, Dict, List, Optional, Type, Union
 
 import ray
 from ray.exceptions import OutOfMemoryError, RayActorError
@@ -9,10 +10,11 @@ from buildflow.core import utils
 from buildflow.core.app.runtime._runtime import RunID, RuntimeStatus
 from buildflow.core.app.runtime.actors.consumer_pattern.consumer_pool_snapshot import (
     ConsumerProcessorGroupSnapshot,
-    ConsumerProcessorSnapshot,
+    merge_replica_snapshots,
 )
 from buildflow.core.app.runtime.actors.consumer_pattern.pull_process_push import (
     PullProcessPushActor,
+    PullProcessPushHeartbeat,
     PullProcessPushSnapshot,
 )
 from buildflow.core.app.runtime.actors.process_pool import (
@@ -21,12 +23,17 @@ from buildflow.core.app.runtime.actors.process_pool import (
     ReplicaReference,
 )
 from buildflow.core.app.runtime.autoscaler import calculate_target_num_replicas
-from buildflow.core.app.runtime.metrics import RateCalculation, SimpleGaugeMetric
+from buildflow.core.app.runtime.metrics import SimpleGaugeMetric
 from buildflow.core.options.runtime_options import ProcessorOptions
 from buildflow.core.processor.patterns.consumer import ConsumerProcessor
 from buildflow.core.processor.processor import ProcessorGroup
 
 
+class _MissedHeartbeat(enum.Enum):
+    DEAD = "dead"
+    TIMEOUT = "timeout"
+
+
 @ray.remote
 class ConsumerProcessorReplicaPoolActor(ProcessorGroupReplicaPoolActor):
     """
@@ -63,6 +70,130 @@ class ConsumerProcessorReplicaPoolActor(ProcessorGroupReplicaPoolActor):
             },
         )
         self.prev_snapshot: ProcessorGroupSnapshot = None
+        self._health_check_task: Optional[asyncio.Task] = None
+        # The number of heartbeats in a row each replica has missed.
+        self._missed_heartbeats: Dict[str, int] = {}
+
+    async def run(self):
+        await super().run()
+        self._health_check_task = asyncio.create_task(self._health_check_loop())
+
+    async def drain(self):
+        if self._health_check_task is not None:
+            self._health_check_task.cancel()
+        return await super().drain()
+
+    async def _health_check_loop(self):
+        # NOTE: This is intentionally seperate from the snapshot / autoscale loop.
+        # Snapshots are expensive (they fetch the source backlog) and only run
+        # every `autoscale_frequency_secs`, where as the heartbeat is cheap and
+        # lets us replace dead replicas within seconds.
+        while self._status == RuntimeStatus.RUNNING:
+            await asyncio.sleep(self.options.health_check_frequency_secs)
+            try:
+                await self.check_replica_health()
+            except Exception:
+                logging.exception("replica health check failed")
+
+    async def _replica_heartbeat(
+        self, replica: ReplicaReference
+    ) -> Union[PullProcessPushHeartbeat, _MissedHeartbeat]:
+        """Returns the replica's heartbeat, or why we didn't get one."""
+        try:
+            return await asyncio.wait_for(
+                replica.ray_actor_handle.heartbeat.remote(),
+                timeout=self.options.heartbeat_timeout_secs,
+            )
+        except (RayActorError, OutOfMemoryError):
+            logging.exception("replica actor unexpectedly died. will restart.")
+            return _MissedHeartbeat.DEAD
+        except asyncio.TimeoutError:
+            return _MissedHeartbeat.TIMEOUT
+
+    def _is_unresponsive(self, replica: ReplicaReference) -> bool:
+        """Records a missed heartbeat, returns True if the replica should go."""
+        num_missed = self._missed_heartbeats.get(replica.replica_id, 0) + 1
+        self._missed_heartbeats[replica.replica_id] = num_missed
+        # NOTE: Sync processors run on the replica's event loop, so a slow batch
+        # can make a healthy replica miss a heartbeat. We only replace replicas
+        # that miss several in a row.
+        logging.warning(
+            "replica %s did not respond to heartbeat within %s seconds (%s/%s).",
+            replica.replica_id,
+            self.options.heartbeat_timeout_secs,
+            num_missed,
+            self.options.max_missed_heartbeats,
+        )
+        if num_missed < self.options.max_missed_heartbeats:
+            return False
+        # If the replica can't respond to a heartbeat its event loop is
+        # blocked, there is no way for us to nack its in flight batches.
+        logging.error("replica %s is unresponsive. will restart.", replica.replica_id)
+        return True
+
+    async def check_replica_health(self):
+        """Replaces any replicas that are dead or have stopped making progress."""
+        replicas = list(self.replicas)
+        heartbeats = await asyncio.gather(
+            *[self._replica_heartbeat(replica) for replica in replicas]
+        )
+        unhealthy_replicas = []
+        for replica, heartbeat in zip(replicas, heartbeats):
+            if heartbeat == _MissedHeartbeat.DEAD:
+                unhealthy_replicas.append(replica)
+                continue
+            if heartbeat == _MissedHeartbeat.TIMEOUT:
+                if self._is_unresponsive(replica):
+                    unhealthy_replicas.append(replica)
+                continue
+            self._missed_heartbeats.pop(replica.replica_id, None)
+            if (
+                heartbeat.status == RuntimeStatus.RUNNING
+                and heartbeat.secs_since_last_progress
+                > self.options.replica_progress_timeout_secs
+            ):
+                logging.error(
+                    "replica %s has not made progress in %s seconds. will restart.",
+                    replica.replica_id,
+                    int(heartbeat.secs_since_last_progress),
+                )
+                if heartbeat.num_in_flight_batches > 0:
+                    try:
+                        num_nacked = await asyncio.wait_for(
+                            replica.ray_actor_handle.nack_in_flight_batches.remote(),
+                            timeout=self.options.heartbeat_timeout_secs,
+                        )
+                        logging.warning(
+                            "nacked %s in flight batches for replica %s",
+                            num_nacked,
+                            replica.replica_id,
+                        )
+                    except Exception:
+                        logging.exception("failed to nack in flight batches")
+                unhealthy_replicas.append(replica)
+        if unhealthy_replicas:
+            await self._replace_replicas(unhealthy_replicas)
+
+    async def _replace_replicas(self, replicas: List[ReplicaReference]):
+        # Only replace replicas that are still in the pool, a replica might have
+        # been removed by a scale down while we were checking its health.
+        replicas = [replica for replica in replicas if replica in self.replicas]
+        if not replicas:
+            return
+        self.replicas = [
+            replica for replica in self.replicas if replica not in replicas
+        ]
+        for replica in replicas:
+            self._missed_heartbeats.pop(replica.replica_id, None)
+            try:
+                ray.kill(replica.ray_actor_handle, no_restart=True)
+            except Exception:
+                # This can happen if the actor is already dead.
+                logging.debug("failed to kill replica %s", replica.replica_id)
+        self.num_replicas_gauge.set(len(self.replicas))
+        logging.error("replacing %s unhealthy replicas", len(replicas))
+        if self._status == RuntimeStatus.RUNNING:
+            await self.add_replicas(len(replicas))
 
     async def scale(self):
         if self._status != RuntimeStatus.RUNNING:
@@ -103,6 +234,8 @@ class ConsumerProcessorReplicaPoolActor(ProcessorGroupReplicaPoolActor):
             replica_id=replica_id,
             log_level=self.options.log_level,
             flow_dependencies=self.flow_dependencies,
+            ordered_processing=self.options.ordered_processing,
+            max_concurrent_ordering_keys=self.options.max_concurrent_ordering_keys,
         )
         await replica_actor_handle.initialize.remote()
 
@@ -115,8 +248,8 @@ class ConsumerProcessorReplicaPoolActor(ProcessorGroupReplicaPoolActor):
         replica_snapshots: List[PullProcessPushSnapshot] = []
         # TODO: Dont access self.replicas directly. It should be accessed via a method
         # interface
-        dead_replica_indices = deque()
-        for i, replica in enumerate(self.replicas):
+        dead_replicas = []
+        for replica in list(self.replicas):
             try:
                 snapshot: PullProcessPushSnapshot = (
                     await replica.ray_actor_handle.snapshot.remote()
@@ -124,125 +257,27 @@ class ConsumerProcessorReplicaPoolActor(ProcessorGroupReplicaPoolActor):
                 replica_snapshots.append(snapshot)
             except (RayActorError, OutOfMemoryError):
                 logging.exception("replica actor unexpectedly died. will restart.")
-                # We keep this list reverse sorted so we can iterate and remove
-                dead_replica_indices.appendleft(i)
-        for idx in dead_replica_indices:
-            replica = self.replicas.pop(idx)
-        if dead_replica_indices:
-            logging.error("removed %s dead replicas", len(dead_replica_indices))
+                dead_replicas.append(replica)
+        if dead_replicas:
+            # NOTE: We remove by reference instead of index since the health check
+            # loop may have modified the replica list while we were awaiting.
+            self.replicas = [
+                replica for replica in self.replicas if replica not in dead_replicas
+            ]
+            logging.error("removed %s dead replicas", len(dead_replicas))
             # update our gauge if had to remove some replicas.
             self.num_replicas_gauge.set(len(self.replicas))
         # NOTE: we grab the parrent snapshot after we've updated the replica list
         # this ensure we don't include dead replicas
         parent_snapshot: ProcessorGroupSnapshot = await super().snapshot()
-        processor_snapshots: Dict[str, ConsumerProcessorSnapshot] = {}
-        for processor in self.processor_group.processors:
-            processor_id = processor.processor_id
-            # TODO: this causes the source to get instantiated which we probably
-            # don't want. Ideally we would have some abstraction for
-            # fetching the backlog.
-            source_backlog = await processor.source().backlog()
+        group_snapshot = await merge_replica_snapshots(
+            self.processor_group, parent_snapshot, replica_snapshots
+        )
+        for (
+            processor_id,
+            processor_snapshot,
+        ) in group_snapshot.processor_snapshots.items():
             self.current_backlog_gauge.set(
-                source_backlog, tags={"processor_id": processor_id}
+                processor_snapshot.source_backlog, tags={"processor_id": processor_id}
             )
-            # below metric(s) derived from the `events_processed_per_sec` composite
-            # counter
-            total_events_processed_per_sec = RateCalculation.merge(
-                [
-                    replica_snapshot.processor_snapshots[
-                        processor_id
-                    ].events_processed_per_sec
-                    for replica_snapshot in replica_snapshots
-                ]
-            ).total_value_rate()
-            avg_num_elements_per_batch = RateCalculation.merge(
-                [
-                    replica_snapshot.processor_snapshots[
-                        processor_id
-                    ].events_processed_per_sec
-                    for replica_snapshot in replica_snapshots
-                ]
-            ).average_value_rate()
-            # below metric(s) derived from the `pull_percentage` composite counter
-            total_pulls_per_sec = RateCalculation.merge(
-                [
-                    replica_snapshot.processor_snapshots[processor_id].pull_percentage
-                    for replica_snapshot in replica_snapshots
-                ]
-            ).total_count_rate()
-            avg_pull_percentage_per_replica = RateCalculation.merge(
-                [
-                    replica_snapshot.processor_snapshots[processor_id].pull_percentage
-                    for replica_snapshot in replica_snapshots
-                ]
-            ).average_value_rate()
-            # below metric(s) derived from the `process_time_millis` composite counter
-            avg_process_time_millis_per_element = RateCalculation.merge(
-                [
-                    replica_snapshot.processor_snapshots[
-                        processor_id
-                    ].process_time_millis
-                    for replica_snapshot in replica_snapshots
-                ]
-            ).average_value_rate()
-            # below metric(s) derived from the `process_batch_time_millis` composite
-            # counter
-            avg_process_time_millis_per_batch = RateCalculation.merge(
-                [
-                    replica_snapshot.processor_snapshots[
-                        processor_id
-                    ].process_batch_time_millis
-                    for replica_snapshot in replica_snapshots
-                ]
-            ).average_value_rate()
-            # below metric(s) derived from the `pull_to_ack_time_millis` composite
-            # counter
-            avg_pull_to_ack_time_millis_per_batch = RateCalculation.merge(
-                [
-                    replica_snapshot.processor_snapshots[
-                        processor_id
-                    ].pull_to_ack_time_millis
-                    for replica_snapshot in replica_snapshots
-                ]
-            ).average_value_rate()
-
-            # below metrics(s) derived from the `cpu_percentage` composite counter
-            avg_cpu_percentage = RateCalculation.merge(
-                [
-                    replica_snapshot.processor_snapshots[processor_id].cpu_percentage
-                    for replica_snapshot in replica_snapshots
-                ]
-            ).average_value_rate()
-
-            # derived metric(s)
-            if total_events_processed_per_sec == 0:
-                eta_secs = -1
-            else:
-                eta_secs = source_backlog / total_events_processed_per_sec
-            processor_snapshots[processor_id] = ConsumerProcessorSnapshot(
-                # pipeline-specific snapshot fields
-                processor_id=processor_id,
-                processor_type=processor.processor_type,
-                source_backlog=source_backlog,
-                total_events_processed_per_sec=total_events_processed_per_sec,
-                eta_secs=eta_secs,
-                avg_num_elements_per_batch=avg_num_elements_per_batch,
-                total_pulls_per_sec=total_pulls_per_sec,
-                avg_pull_percentage_per_replica=avg_pull_percentage_per_replica,
-                avg_process_time_millis_per_element=avg_process_time_millis_per_element,
-                avg_process_time_millis_per_batch=avg_process_time_millis_per_batch,
-                avg_pull_to_ack_time_millis_per_batch=avg_pull_to_ack_time_millis_per_batch,
-                avg_cpu_percentage_per_replica=avg_cpu_percentage,
-            )
-        return ConsumerProcessorGroupSnapshot(
-            # parent snapshot fields
-            status=parent_snapshot.status,
-            timestamp_millis=utils.timestamp_millis(),
-            group_id=parent_snapshot.group_id,
-            group_type=parent_snapshot.group_type,
-            num_replicas=parent_snapshot.num_replicas,
-            num_cpu_per_replica=parent_snapshot.num_cpu_per_replica,
-            num_concurrency_per_replica=parent_snapshot.num_concurrency_per_replica,
-            # pipeline-specific snapshot fields
-            processor_snapshots=processor_snapshots,
-        )
+        return group_snapshot
@@ -1,11 +1,21 @@
 import dataclasses
-from typing import Dict
+from typing import Dict, List
 
+from buildflow.core import utils
+from buildflow.core.app.runtime.actors.consumer_pattern.pull_process_push import (
+    PullProcessPushSnapshot,
+)
 from buildflow.core.app.runtime.actors.process_pool import (
     ProcessorGroupSnapshot,
     IndividualProcessorSnapshot,
 )
-from buildflow.core.processor.processor import ProcessorID, ProcessorType
+from buildflow.core.app.runtime.metrics import RateCalculation
+from buildflow.core.processor.patterns.consumer import ConsumerProcessor
+from buildflow.core.processor.processor import (
+    ProcessorGroup,
+    ProcessorID,
+    ProcessorType,
+)
 
 
 @dataclasses.dataclass
@@ -53,3 +63,120 @@ class ConsumerProcessorGroupSnapshot(ProcessorGroupSnapshot):
             }
         }
         return {**parent_dict, **consumer_dict}
+
+
+async def merge_replica_snapshots(
+    processor_group: ProcessorGroup[ConsumerProcessor],
+    parent_snapshot: ProcessorGroupSnapshot,
+    replica_snapshots: List[PullProcessPushSnapshot],
+) -> ConsumerProcessorGroupSnapshot:
+    """Merges the snapshots of all replicas in a consumer group.
+
+    This is shared by the ray replica pool and the local runtime.
+    """
+    processor_snapshots: Dict[str, ConsumerProcessorSnapshot] = {}
+    for processor in processor_group.processors:
+        processor_id = processor.processor_id
+        # TODO: this causes the source to get instantiated which we probably
+        # don't want. Ideally we would have some abstraction for
+        # fetching the backlog.
+        source_backlog = await processor.source().backlog()
+        # below metric(s) derived from the `events_processed_per_sec` composite
+        # counter
+        total_events_processed_per_sec = RateCalculation.merge(
+            [
+                replica_snapshot.processor_snapshots[
+                    processor_id
+                ].events_processed_per_sec
+                for replica_snapshot in replica_snapshots
+            ]
+        ).total_value_rate()
+        avg_num_elements_per_batch = RateCalculation.merge(
+            [
+                replica_snapshot.processor_snapshots[
+                    processor_id
+                ].events_processed_per_sec
+                for replica_snapshot in replica_snapshots
+            ]
+        ).average_value_rate()
+        # below metric(s) derived from the `pull_percentage` composite counter
+        total_pulls_per_sec = RateCalculation.merge(
+            [
+                replica_snapshot.processor_snapshots[processor_id].pull_percentage
+                for replica_snapshot in replica_snapshots
+            ]
+        ).total_count_rate()
+        avg_pull_percentage_per_replica = RateCalculation.merge(
+            [
+                replica_snapshot.processor_snapshots[processor_id].pull_percentage
+                for replica_snapshot in replica_snapshots
+            ]
+        ).average_value_rate()
+        # below metric(s) derived from the `process_time_millis` composite counter
+        avg_process_time_millis_per_element = RateCalculation.merge(
+            [
+                replica_snapshot.processor_snapshots[processor_id].process_time_millis
+                for replica_snapshot in replica_snapshots
+            ]
+        ).average_value_rate()
+        # below metric(s) derived from the `process_batch_time_millis` composite
+        # counter
+        avg_process_time_millis_per_batch = RateCalculation.merge(
+            [
+                replica_snapshot.processor_snapshots[
+                    processor_id
+                ].process_batch_time_millis
+                for replica_snapshot in replica_snapshots
+            ]
+        ).average_value_rate()
+        # below metric(s) derived from the `pull_to_ack_time_millis` composite
+        # counter
+        avg_pull_to_ack_time_millis_per_batch = RateCalculation.merge(
+            [
+                replica_snapshot.processor_snapshots[
+                    processor_id
+                ].pull_to_ack_time_millis
+                for replica_snapshot in replica_snapshots
+            ]
+        ).average_value_rate()
+
+        # below metrics(s) derived from the `cpu_percentage` composite counter
+        avg_cpu_percentage = RateCalculation.merge(
+            [
+                replica_snapshot.processor_snapshots[processor_id].cpu_percentage
+                for replica_snapshot in replica_snapshots
+            ]
+        ).average_value_rate()
+
+        # derived metric(s)
+        if total_events_processed_per_sec == 0:
+            eta_secs = -1
+        else:
+            eta_secs = source_backlog / total_events_processed_per_sec
+        processor_snapshots[processor_id] = ConsumerProcessorSnapshot(
+            # pipeline-specific snapshot fields
+            processor_id=processor_id,
+            processor_type=processor.processor_type,
+            source_backlog=source_backlog,
+            total_events_processed_per_sec=total_events_processed_per_sec,
+            eta_secs=eta_secs,
+            avg_num_elements_per_batch=avg_num_elements_per_batch,
+            total_pulls_per_sec=total_pulls_per_sec,
+            avg_pull_percentage_per_replica=avg_pull_percentage_per_replica,
+            avg_process_time_millis_per_element=avg_process_time_millis_per_element,
+            avg_process_time_millis_per_batch=avg_process_time_millis_per_batch,
+            avg_pull_to_ack_time_millis_per_batch=avg_pull_to_ack_time_millis_per_batch,
+            avg_cpu_percentage_per_replica=avg_cpu_percentage,
+        )
+    return ConsumerProcessorGroupSnapshot(
+        # parent snapshot fields
+        status=parent_snapshot.status,
+        timestamp_millis=utils.timestamp_millis(),
+        group_id=parent_snapshot.group_id,
+        group_type=parent_snapshot.group_type,
+        num_replicas=parent_snapshot.num_replicas,
+        num_cpu_per_replica=parent_snapshot.num_cpu_per_replica,
+        num_concurrency_per_replica=parent_snapshot.num_concurrency_per_replica,
+        # pipeline-specific snapshot fields
+        processor_snapshots=processor_snapshots,
+    )
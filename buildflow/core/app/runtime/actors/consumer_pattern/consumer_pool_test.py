@@ -0,0 +1,161 @@
+import asyncio
+import unittest
+from unittest import mock
+
+import pytest
+from ray.exceptions import RayActorError
+
+from buildflow.core.app.runtime._runtime import RuntimeStatus
+from buildflow.core.app.runtime.actors.consumer_pattern.consumer_pool import (
+    ConsumerProcessorReplicaPoolActor,
+)
+from buildflow.core.app.runtime.actors.consumer_pattern.pull_process_push import (
+    PullProcessPushHeartbeat,
+)
+from buildflow.core.app.runtime.actors.process_pool import ReplicaReference
+from buildflow.core.options.runtime_options import ProcessorOptions
+from buildflow.core.processor.patterns.consumer import ConsumerGroup
+
+# The pool class without the ray actor wrapper, so we can call it directly.
+_ConsumerPool = ConsumerProcessorReplicaPoolActor.__ray_metadata__.modified_class
+
+
+class _FakeReplica:
+    """A replica actor handle whose heartbeat is set by the test."""
+
+    def __init__(self, heartbeat=None, error=None, hang=False):
+        self.heartbeat_value = heartbeat
+        self.error = error
+        self.hang = hang
+        self.heartbeat = mock.Mock()
+        self.heartbeat.remote = self._heartbeat
+        self.nack_in_flight_batches = mock.Mock()
+        self.nack_in_flight_batches.remote = mock.AsyncMock(return_value=1)
+        self.run = mock.Mock()
+
+    async def _heartbeat(self):
+        if self.hang:
+            await asyncio.sleep(10)
+        if self.error is not None:
+            raise self.error
+        return self.heartbeat_value
+
+
+def _healthy_heartbeat() -> PullProcessPushHeartbeat:
+    return PullProcessPushHeartbeat(
+        status=RuntimeStatus.RUNNING,
+        secs_since_last_progress=1,
+        num_in_flight_batches=1,
+    )
+
+
+@pytest.mark.usefixtures("ray")
+class ConsumerPoolHealthCheckTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        options = ProcessorOptions.default()
+        options.heartbeat_timeout_secs = 0.1
+        options.max_missed_heartbeats = 2
+        options.replica_progress_timeout_secs = 60
+        self.pool = _ConsumerPool(
+            run_id="run",
+            processor_group=ConsumerGroup(group_id="g", processors=[]),
+            processor_options=options,
+            flow_dependencies={},
+        )
+        self.pool._status = RuntimeStatus.RUNNING
+        self.new_replicas = []
+
+        async def create_replica():
+            replica = ReplicaReference(
+                replica_id=f"new-{len(self.new_replicas)}",
+                ray_actor_handle=_FakeReplica(heartbeat=_healthy_heartbeat()),
+            )
+            self.new_replicas.append(replica)
+            return replica
+
+        self.pool.create_replica = create_replica
+        kill_patcher = mock.patch("ray.kill")
+        self.ray_kill = kill_patcher.start()
+        self.addCleanup(kill_patcher.stop)
+
+    def add_replica(self, replica_id: str, handle: _FakeReplica) -> ReplicaReference:
+        replica = ReplicaReference(replica_id=replica_id, ray_actor_handle=handle)
+        self.pool.replicas.append(replica)
+        return replica
+
+    async def test_healthy_replicas_are_kept(self):
+        replica = self.add_replica("1", _FakeReplica(heartbeat=_healthy_heartbeat()))
+
+        await self.pool.check_replica_health()
+
+        self.assertEqual(self.pool.replicas, [replica])
+        self.ray_kill.assert_not_called()
+
+    async def test_dead_replica_is_replaced(self):
+        healthy = self.add_replica("1", _FakeReplica(heartbeat=_healthy_heartbeat()))
+        dead = self.add_replica("2", _FakeReplica(error=RayActorError()))
+
+        await self.pool.check_replica_health()
+
+        self.assertEqual(self.pool.replicas, [healthy] + self.new_replicas)
+        self.assertEqual(len(self.new_replicas), 1)
+        self.ray_kill.assert_called_once_with(dead.ray_actor_handle, no_restart=True)
+
+    async def test_slow_replica_replaced_after_missed_heartbeats(self):
+        handle = _FakeReplica(heartbeat=_healthy_heartbeat(), hang=True)
+        replica = self.add_replica("1", handle)
+
+        # One missed heartbeat (e.g. a slow sync batch) doesn't replace it.
+        await self.pool.check_replica_health()
+        self.assertEqual(self.pool.replicas, [replica])
+
+        # A heartbeat in between resets the count.
+        handle.hang = False
+        await self.pool.check_replica_health()
+        handle.hang = True
+        await self.pool.check_replica_health()
+        self.assertEqual(self.pool.replicas, [replica])
+
+        await self.pool.check_replica_health()
+        self.assertEqual(self.pool.replicas, self.new_replicas)
+        self.ray_kill.assert_called_once_with(handle, no_restart=True)
+
+    async def test_stalled_replica_is_nacked_and_replaced(self):
+        handle = _FakeReplica(
+            heartbeat=PullProcessPushHeartbeat(
+                status=RuntimeStatus.RUNNING,
+                secs_since_last_progress=120,
+                num_in_flight_batches=2,
+            )
+        )
+        self.add_replica("1", handle)
+
+        await self.pool.check_replica_health()
+
+        handle.nack_in_flight_batches.remote.assert_awaited_once()
+        self.assertEqual(self.pool.replicas, self.new_replicas)
+
+    async def test_replace_skips_removed_replicas(self):
+        replica = ReplicaReference(
+            replica_id="1", ray_actor_handle=_FakeReplica(error=RayActorError())
+        )
+
+        # The replica was removed (e.g. by a scale down) before it was replaced.
+        await self.pool._replace_replicas([replica])
+
+        self.assertEqual(self.pool.replicas, [])
+        self.assertEqual(self.new_replicas, [])
+        self.ray_kill.assert_not_called()
+
+    async def test_replace_while_draining_does_not_add_replicas(self):
+        replica = self.add_replica("1", _FakeReplica(error=RayActorError()))
+        self.pool._status = RuntimeStatus.DRAINING
+
+        await self.pool._replace_replicas([replica])
+
+        self.assertEqual(self.pool.replicas, [])
+        self.assertEqual(self.new_replicas, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
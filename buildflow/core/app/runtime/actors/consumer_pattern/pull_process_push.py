@@ -3,7 +3,7 @@ import dataclasses
 import logging
 import os
 import time
-from typing import Any, Dict, Type
+from typing import Any, Callable, Dict, List, Set, Tuple, Type
 
 import psutil
 import ray
@@ -14,6 +14,7 @@ from buildflow.core.app.runtime.actors.process_pool import ReplicaID
 from buildflow.core.app.runtime.metrics import (
     CompositeRateCounterMetric,
     RateCalculation,
+    current_job_id,
     num_events_processed,
     process_time_counter,
 )
@@ -25,6 +26,7 @@ from buildflow.dependencies.base import (
     initialize_dependencies,
     resolve_dependencies,
 )
+from buildflow.io.strategies.source import AckInfo, PullResponse, SourceStrategy
 
 # TODO: Explore the idea of letting this class autoscale the number of threads
 # it runs dynamically. Related: What if every implementation of RuntimeAPI
@@ -76,8 +78,21 @@ class PullProcessPushSnapshot(Snapshot):
         return snapshot_dict
 
 
-@ray.remote
-class PullProcessPushActor(Runtime):
+@dataclasses.dataclass
+class PullProcessPushHeartbeat:
+    status: RuntimeStatus
+    # The number of seconds since the slowest running loop last made progress.
+    secs_since_last_progress: float
+    num_in_flight_batches: int
+
+
+class PullProcessPush(Runtime):
+    """Pulls batches from a source, processes them, and pushes them to a sink.
+
+    NOTE: This class does not depend on ray so it can be run in process by the
+    local runtime. The ray actor version is `PullProcessPushActor`.
+    """
+
     def __init__(
         self,
         run_id: RunID,
@@ -86,6 +101,8 @@ class PullProcessPushActor(Runtime):
         replica_id: ReplicaID,
         flow_dependencies: Dict[Type, Any],
         log_level: str = "INFO",
+        ordered_processing: bool = False,
+        max_concurrent_ordering_keys: int = 100,
     ) -> None:
         # NOTE: Ray actors run in their own process, so we need to configure
         # logging per actor / remote task.
@@ -95,6 +112,8 @@ class PullProcessPushActor(Runtime):
         self.run_id = run_id
         self.processor_group = processor_group
         self.flow_dependencies = flow_dependencies
+        self.ordered_processing = ordered_processing
+        self.max_concurrent_ordering_keys = max_concurrent_ordering_keys
 
         # validation
         # TODO: Validate that the schemas & types are all compatible
@@ -104,8 +123,14 @@ class PullProcessPushActor(Runtime):
         self._num_running_threads = 0
         self._replica_id = replica_id
         self._last_snapshot_time = time.monotonic()
+        # Used by the replica pool's health check to detect wedged replicas.
+        # Maps a loop ID to the last time that loop made progress.
+        self._next_loop_id = 0
+        self._last_progress_time: Dict[int, float] = {}
+        # Maps a loop ID to the batch that loop has pulled but not yet acked.
+        self._in_flight_batches: Dict[int, Tuple[SourceStrategy, AckInfo]] = {}
         # metrics
-        job_id = ray.get_runtime_context().get_job_id()
+        job_id = current_job_id()
         self.num_events_processed = {}
         self.process_time_counter = {}
         self.pull_percentage_counter = {}
@@ -220,7 +245,11 @@ class PullProcessPushActor(Runtime):
                 return push_converter(results)
 
         max_batch_size = source.max_batch_size()
+        # Register this loop so the health check can track its progress.
+        loop_id = self._next_loop_id
+        self._next_loop_id += 1
         while self._status == RuntimeStatus.RUNNING:
+            self._last_progress_time[loop_id] = time.monotonic()
             # Add a small sleep here so none async sources can yield
             # otherwise drain signals never get received.
             # TODO: figure out away to remove this sleep
@@ -242,6 +271,7 @@ class PullProcessPushActor(Runtime):
                     self.cpu_percentage[processor_id].empty_inc()
                 continue
             # PROCESS
+            self._in_flight_batches[loop_id] = (source, response.ack_info)
             process_success = True
             process_start_time = time.monotonic()
 
@@ -249,14 +279,22 @@ class PullProcessPushActor(Runtime):
                 self.pull_percentage_counter[processor_id].inc(
                     len(response.payload) / source.max_batch_size()
                 )
+            # The indices of elements that failed when processing in order, the
+            # rest of the batch can still be acked.
+            failed_indices: Set[int] = set()
             try:
-                coros = []
-                for element in response.payload:
-                    dependency_args = dependency_args = await resolve_dependencies(
-                        processor.dependencies(), self.flow_dependencies
+                if self.ordered_processing:
+                    flattened_results, failed_indices = await self._process_in_order(
+                        processor, source, response, process_element
                     )
-                    coros.append(process_element(element, **dependency_args))
-                flattened_results = await asyncio.gather(*coros)
+                else:
+                    coros = []
+                    for element in response.payload:
+                        dependency_args = await resolve_dependencies(
+                            processor.dependencies(), self.flow_dependencies
+                        )
+                        coros.append(process_element(element, **dependency_args))
+                    flattened_results = await asyncio.gather(*coros)
                 batch_results = []
                 for results in flattened_results:
                     if results is None:
@@ -288,8 +326,15 @@ class PullProcessPushActor(Runtime):
                 process_success = False
             finally:
                 # ACK
+                if self._in_flight_batches.pop(loop_id, None) is None:
+                    # The batch was already nacked by the health check, this
+                    # replica is about to be replaced.
+                    continue
                 try:
-                    await source.ack(response.ack_info, process_success)
+                    if process_success and failed_indices:
+                        await self._ack_partial(source, response, failed_indices)
+                    else:
+                        await source.ack(response.ack_info, process_success)
                 except Exception:
                     # This can happen if there is network failures for w/e reason
                     # we want to try and catch here so our runtime loop
@@ -307,6 +352,85 @@ class PullProcessPushActor(Runtime):
                 self.cpu_percentage[processor_id].inc(cpu_percent)
             else:
                 self.cpu_percentage[processor_id].empty_inc()
+        self._last_progress_time.pop(loop_id, None)
+        # The source and sink are created per loop, so we tear them down once
+        # the loop exits (i.e. to close any open streams or files).
+        try:
+            await asyncio.gather(source.teardown(), sink.teardown())
+        except Exception:
+            logging.exception("failed to teardown source / sink")
+
+    async def _process_in_order(
+        self,
+        processor: ConsumerProcessor,
+        source: SourceStrategy,
+        response: PullResponse,
+        process_element: Callable,
+    ) -> Tuple[List[Any], Set[int]]:
+        """Processes a batch, keeping the order of elements with the same key.
+
+        Elements with the same ordering key are processed sequentially, different
+        keys are processed concurrently. If an element fails the elements after
+        it with the same key are skipped, so they can be redelivered in order.
+
+        Returns the results of each element and the indices that failed.
+        """
+        payload = list(response.payload)
+        ordering_keys = source.ordering_keys(response)
+        if ordering_keys is None:
+            groups = [list(range(len(payload)))]
+        else:
+            groups = []
+            groups_by_key: Dict[Any, List[int]] = {}
+            for index, key in enumerate(ordering_keys):
+                if key is None:
+                    groups.append([index])
+                else:
+                    groups_by_key.setdefault(key, []).append(index)
+            groups.extend(groups_by_key.values())
+
+        results = [None] * len(payload)
+        failed_indices: Set[int] = set()
+        semaphore = asyncio.Semaphore(self.max_concurrent_ordering_keys)
+
+        async def process_group(indices: List[int]):
+            async with semaphore:
+                for position, index in enumerate(indices):
+                    try:
+                        dependency_args = await resolve_dependencies(
+                            processor.dependencies(), self.flow_dependencies
+                        )
+                        results[index] = await process_element(
+                            payload[index], **dependency_args
+                        )
+                    except Exception:
+                        logging.exception(
+                            "failed to process element, it and the following "
+                            "elements with the same ordering key will not be "
+                            "acknowledged"
+                        )
+                        failed_indices.update(indices[position:])
+                        return
+
+        await asyncio.gather(*[process_group(indices) for indices in groups])
+        return results, failed_indices
+
+    async def _ack_partial(
+        self, source: SourceStrategy, response: PullResponse, failed_indices: Set[int]
+    ):
+        succeeded = [i for i in range(len(response.payload)) if i not in failed_indices]
+        if not succeeded:
+            await source.ack(response.ack_info, False)
+            return
+        try:
+            to_ack = source.split_ack_info(response.ack_info, succeeded)
+            to_nack = source.split_ack_info(response.ack_info, sorted(failed_indices))
+        except NotImplementedError:
+            # The source can't ack part of a batch so we redeliver all of it.
+            await source.ack(response.ack_info, False)
+            return
+        await source.ack(to_ack, True)
+        await source.ack(to_nack, False)
 
     async def status(self):
         # TODO: Have this method count the number of active threads
@@ -323,6 +447,33 @@ class PullProcessPushActor(Runtime):
     async def num_active_threads(self):
         return self._num_running_threads
 
+    async def heartbeat(self) -> PullProcessPushHeartbeat:
+        """Lightweight liveness check used by the replica pool's health loop."""
+        now = time.monotonic()
+        secs_since_last_progress = 0.0
+        if self._last_progress_time:
+            secs_since_last_progress = now - min(self._last_progress_time.values())
+        return PullProcessPushHeartbeat(
+            status=self._status,
+            secs_since_last_progress=secs_since_last_progress,
+            num_in_flight_batches=len(self._in_flight_batches),
+        )
+
+    async def nack_in_flight_batches(self) -> int:
+        """Nacks all batches that have been pulled but not acked yet.
+
+        This is called on wedged replicas right before they are replaced so the
+        messages they leased can be redelivered immediately.
+        """
+        in_flight = list(self._in_flight_batches.values())
+        self._in_flight_batches.clear()
+        for source, ack_info in in_flight:
+            try:
+                await source.ack(ack_info, False)
+            except Exception:
+                logging.exception("failed to nack in flight batch")
+        return len(in_flight)
+
     async def snapshot(self):
         individual_metrics = {}
         for processor in self.processor_group.processors:
@@ -353,3 +504,8 @@ class PullProcessPushActor(Runtime):
         # reset the counters
         self._last_snapshot_time = time.monotonic()
         return snapshot
+
+
+@ray.remote
+class PullProcessPushActor(PullProcessPush):
+    pass
@@ -4,7 +4,7 @@ import shutil
 import tempfile
 import unittest
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, Tuple
 
 import pyarrow.csv as pcsv
 import pytest
@@ -12,11 +12,17 @@ import pytest
 from buildflow.core.app.flow import Flow
 from buildflow.core.app.runtime._runtime import RuntimeStatus
 from buildflow.core.app.runtime.actors.consumer_pattern.pull_process_push import (
+    PullProcessPush,
     PullProcessPushActor,
 )
-from buildflow.core.processor.patterns.consumer import ConsumerGroup
+from buildflow.core.processor.patterns.consumer import (
+    ConsumerGroup,
+    ConsumerProcessor,
+)
 from buildflow.io.local.file import File
 from buildflow.io.local.pulse import Pulse
+from buildflow.io.strategies.sink import SinkStrategy
+from buildflow.io.strategies.source import AckInfo, PullResponse, SourceStrategy
 from buildflow.types.portable import FileFormat
 
 
@@ -252,6 +258,167 @@ class PullProcessPushTest(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(RuntimeStatus.DRAINED, status)
         await self.run_with_timeout(actor.drain.remote())
 
+    async def test_heartbeat_reports_wedged_replica(self):
+        app = Flow()
+
+        @app.consumer(
+            source=Pulse([{"field": 1}, {"field": 2}], pulse_interval_seconds=0.1),
+            sink=File(file_path=self.output_path, file_format=FileFormat.CSV),
+        )
+        async def process(payload: Dict[str, int]) -> Dict[str, int]:
+            # Never finish processing the first batch.
+            await asyncio.sleep(10000)
+            return payload
+
+        actor = PullProcessPushActor.remote(
+            run_id="test-run",
+            processor_group=ConsumerGroup(group_id="g", processors=[process]),
+            replica_id="1",
+            flow_dependencies={},
+        )
+        await actor.initialize.remote()
+
+        run_coro = await self.run_for_time(
+            asyncio.ensure_future(actor.run.remote()), time=3
+        )
+        heartbeat = await actor.heartbeat.remote()
+        self.assertEqual(RuntimeStatus.RUNNING, heartbeat.status)
+        self.assertEqual(1, heartbeat.num_in_flight_batches)
+        self.assertGreaterEqual(heartbeat.secs_since_last_progress, 2)
+
+        num_nacked = await actor.nack_in_flight_batches.remote()
+        self.assertEqual(1, num_nacked)
+        heartbeat = await actor.heartbeat.remote()
+        self.assertEqual(0, heartbeat.num_in_flight_batches)
+
+        await self.run_for_time(asyncio.ensure_future(actor.drain.remote()), time=1)
+        run_coro.cancel()
+
+
+class _KeyedAckInfo(AckInfo):
+    def __init__(self, indices: List[int]) -> None:
+        self.indices = indices
+
+
+class _KeyedSource(SourceStrategy):
+    """Returns a single batch of (key, value) elements."""
+
+    def __init__(self, batch: List[Tuple[str, int]]) -> None:
+        super().__init__(credentials=None, strategy_id="keyed-source")
+        self.batch = batch
+        self.acks = []
+        self.pulled = False
+
+    async def pull(self) -> PullResponse:
+        if self.pulled:
+            await asyncio.sleep(0.01)
+            return PullResponse([], _KeyedAckInfo([]))
+        self.pulled = True
+        return PullResponse(self.batch, _KeyedAckInfo(list(range(len(self.batch)))))
+
+    async def ack(self, to_ack: _KeyedAckInfo, success: bool):
+        self.acks.append((to_ack.indices, success))
+
+    def max_batch_size(self) -> int:
+        return len(self.batch)
+
+    def pull_converter(self, user_defined_type):
+        return lambda element: element
+
+    def ordering_keys(self, response: PullResponse):
+        return [key for key, _ in response.payload]
+
+    def split_ack_info(self, ack_info: _KeyedAckInfo, indices: List[int]):
+        return _KeyedAckInfo([ack_info.indices[i] for i in indices])
+
+
+class _ListSink(SinkStrategy):
+    def __init__(self) -> None:
+        super().__init__(credentials=None, strategy_id="list-sink")
+        self.pushed = []
+
+    async def push(self, batch):
+        self.pushed.extend(batch)
+
+    def push_converter(self, user_defined_type):
+        return lambda element: element
+
+
+class _KeyedProcessor(ConsumerProcessor):
+    def __init__(self, source: _KeyedSource, sink: _ListSink) -> None:
+        super().__init__(processor_id="keyed")
+        self._source = source
+        self._sink = sink
+        self.processed = []
+
+    def source(self):
+        return self._source
+
+    def sink(self):
+        return self._sink
+
+    def setup(self):
+        pass
+
+    def dependencies(self):
+        return []
+
+    def background_tasks(self):
+        return []
+
+    async def process(self, element):
+        key, value = element
+        # Later elements finish first if they are not processed in order.
+        await asyncio.sleep(0.01 * (3 - value))
+        if value < 0:
+            raise ValueError("failed to process")
+        self.processed.append(element)
+        return f"{key}{value}"
+
+
+class PullProcessPushOrderedProcessingTest(unittest.IsolatedAsyncioTestCase):
+    async def run_batch(self, batch):
+        source = _KeyedSource(batch)
+        sink = _ListSink()
+        processor = _KeyedProcessor(source, sink)
+        replica = PullProcessPush(
+            run_id="test-run",
+            processor_group=ConsumerGroup(group_id="g", processors=[processor]),
+            replica_id="1",
+            flow_dependencies={},
+            ordered_processing=True,
+            max_concurrent_ordering_keys=2,
+        )
+        await replica.initialize()
+        run_task = asyncio.create_task(replica.run())
+        while not source.acks:
+            await asyncio.sleep(0.01)
+        await replica.drain()
+        await run_task
+        return processor, source, sink
+
+    async def test_same_key_processed_in_order(self):
+        processor, source, _ = await self.run_batch(
+            [("a", 1), ("b", 1), ("a", 2), ("b", 2)]
+        )
+
+        self.assertEqual(
+            [("a", 1), ("a", 2)], [e for e in processor.processed if e[0] == "a"]
+        )
+        self.assertEqual(
+            [("b", 1), ("b", 2)], [e for e in processor.processed if e[0] == "b"]
+        )
+        self.assertEqual([([0, 1, 2, 3], True)], source.acks)
+
+    async def test_failed_element_nacks_rest_of_key(self):
+        processor, source, sink = await self.run_batch(
+            [("a", 1), ("b", -1), ("a", 2), ("b", 2)]
+        )
+
+        self.assertCountEqual([("a", 1), ("a", 2)], processor.processed)
+        self.assertCountEqual(["a1", "a2"], sink.pushed)
+        self.assertEqual([([0, 2], True), ([1, 3], False)], source.acks)
+
 
 if __name__ == "__main__":
     unittest.main()
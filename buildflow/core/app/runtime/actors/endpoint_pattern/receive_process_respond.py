@@ -4,11 +4,10 @@ import logging
 from typing import Any, Dict, Type
 
 import ray
-from ray import serve
 
 from buildflow.core import utils
 from buildflow.core.app.runtime._runtime import RunID, Runtime, RuntimeStatus, Snapshot
-from buildflow.core.app.runtime.fastapi import create_app
+from buildflow.core.app.runtime.fastapi import create_app, process_and_respond
 from buildflow.core.options.runtime_options import ProcessorOptions
 from buildflow.core.processor.patterns.endpoint import EndpointGroup
 
@@ -76,15 +75,16 @@ class ReceiveProcessRespond(Runtime):
         self.serve_host = serve_host
         self.serve_port = serve_port
 
-    async def run(self) -> bool:
-        async def process_fn(processor, *args, **kwargs):
-            return await processor.process(*args, **kwargs)
+    async def _deploy(self):
+        # NOTE: ray serve is slow to import and only needed inside of this actor
+        # so we import it here instead of at the module level.
+        from ray import serve
 
         app = create_app(
             self.processor_group,
             self.flow_dependencies,
             self.run_id,
-            process_fn,
+            process_and_respond,
         )
 
         @serve.deployment(
@@ -123,12 +123,30 @@ class ReceiveProcessRespond(Runtime):
                 # different processors at the same time
                 logging.exception("error starting serve, retrying in 1s")
                 await asyncio.sleep(1)
+
+    async def run(self) -> bool:
+        await self._deploy()
         self._status = RuntimeStatus.RUNNING
         while self._status == RuntimeStatus.RUNNING:
             await asyncio.sleep(1)
         return True
 
+    async def reload(
+        self, processor_group: EndpointGroup, processor_options: ProcessorOptions
+    ) -> bool:
+        """Redeploys the serve application with the given processor group.
+
+        The application keeps the same name so serve updates it in place, the
+        serve proxy (and any replicas that don't change) keep running.
+        """
+        self.processor_group = processor_group
+        self.processor_options = processor_options
+        await self._deploy()
+        return True
+
     async def drain(self) -> bool:
+        from ray import serve
+
         self._status = RuntimeStatus.DRAINING
         serve.delete(self.processor_group.group_id)
         self._status = RuntimeStatus.DRAINED
@@ -138,6 +156,8 @@ class ReceiveProcessRespond(Runtime):
         return self._status
 
     async def snapshot(self) -> Snapshot:
+        from ray import serve
+
         processor_snapshots = {}
         # TODO: need to figure out local metrics
         for processor in self.processor_group.processors:
@@ -1,7 +1,7 @@
 import asyncio
 import dataclasses
 import logging
-from typing import Any, Dict, List, Type
+from typing import Any, Dict, List, Optional, Type
 
 import ray
 from ray.actor import ActorHandle
@@ -98,6 +98,8 @@ class ProcessorGroupReplicaPoolActor(Runtime):
         for p in self.processor_group.processors:
             self.background_tasks.extend(p.background_tasks())
         self._status = RuntimeStatus.PENDING
+        # The runtime actor that status changes are pushed to.
+        self._status_subscriber: Optional[ActorHandle] = None
         # metrics
         job_id = ray.get_runtime_context().get_job_id()
         self.num_replicas_gauge = SimpleGaugeMetric(
@@ -120,6 +122,24 @@ class ProcessorGroupReplicaPoolActor(Runtime):
         )
         self.concurrency_gauge.set(self.options.num_concurrency)
 
+    def _set_status(self, status: RuntimeStatus):
+        if status == self._status:
+            return
+        self._status = status
+        if self._status_subscriber is not None:
+            # NOTE: We don't await this so a slow runtime actor never blocks the
+            # processor pool.
+            self._status_subscriber.report_status.remote(
+                self.processor_group.group_id, status
+            )
+
+    async def set_status_subscriber(self, subscriber: ActorHandle):
+        """Registers an actor that will be pushed status changes of this pool.
+
+        The subscriber must implement: `report_status(group_id, status)`
+        """
+        self._status_subscriber = subscriber
+
     async def scale(self):
         raise NotImplementedError("scale must be implemented by subclasses.")
 
@@ -128,7 +148,7 @@ class ProcessorGroupReplicaPoolActor(Runtime):
         raise NotImplementedError("create_replica must be implemented by subclasses.")
 
     async def add_replicas(self, num_replicas: int):
-        if self.status == RuntimeStatus.DRAINING:
+        if self._status == RuntimeStatus.DRAINING:
             logging.info(
                 "cannot add replicas to a darining processor pool."
                 "this can happen if a drain occurs at the same time as a scale up."
@@ -152,24 +172,63 @@ class ProcessorGroupReplicaPoolActor(Runtime):
                 "exist."
             )
 
-        actors_to_kill = []
-        actor_drain_tasks = []
+        replicas_to_remove = []
         for _ in range(num_replicas):
-            replica = self.replicas.pop(-1)
-            actors_to_kill.append(replica.ray_actor_handle)
-            actor_drain_tasks.append(replica.ray_actor_handle.drain.remote())
+            replicas_to_remove.append(self.replicas.pop(-1))
+        await self._drain_and_kill_replicas(replicas_to_remove)
 
+        self.num_replicas_gauge.set(len(self.replicas))
+
+    async def _drain_and_kill_replicas(self, replicas: List[ReplicaReference]):
+        actor_drain_tasks = [
+            replica.ray_actor_handle.drain.remote() for replica in replicas
+        ]
         if actor_drain_tasks:
             await asyncio.wait(actor_drain_tasks)
 
-        for actor in actors_to_kill:
-            ray.kill(actor, no_restart=True)
+        for replica in replicas:
+            ray.kill(replica.ray_actor_handle, no_restart=True)
 
-        self.num_replicas_gauge.set(len(self.replicas))
+    async def reload_replicas(self):
+        """Replaces the replicas of the pool with replicas of the current
+        processor group.
+
+        New replicas are started before the old ones are drained so the pool
+        keeps processing while it reloads. Subclasses that don't run the
+        processors in their replicas (i.e. ray serve) should override this.
+        """
+        old_replicas = self.replicas
+        self.replicas = []
+        await self.add_replicas(max(len(old_replicas), 1))
+        await self._drain_and_kill_replicas(old_replicas)
+
+    async def reload(
+        self, processor_group: ProcessorGroup, processor_options: ProcessorOptions
+    ):
+        """Hot reloads the pool with a new definition of its processor group."""
+        if self._status != RuntimeStatus.RUNNING:
+            logging.warning(
+                "cannot reload ProcessorPool(%s) it is not running.",
+                processor_group.group_id,
+            )
+            return False
+        logging.info(f"Reloading ProcessorPool({processor_group.group_id})...")
+        old_background_tasks = self.background_tasks
+        self.processor_group = processor_group
+        self.options = processor_options
+        self.background_tasks = []
+        for p in self.processor_group.processors:
+            self.background_tasks.extend(p.background_tasks())
+        await asyncio.gather(*[task.start() for task in self.background_tasks])
+        await self.reload_replicas()
+        await asyncio.gather(*[task.shutdown() for task in old_background_tasks])
+        self.concurrency_gauge.set(self.options.num_concurrency)
+        logging.info(f"Reload ProcessorPool({processor_group.group_id}) complete.")
+        return True
 
     async def run(self):
         logging.info(f"Starting ProcessorPool({self.processor_group.group_id})...")
-        self._status = RuntimeStatus.RUNNING
+        self._set_status(RuntimeStatus.RUNNING)
         await self.add_replicas(self.initial_replicas)
 
         coros = []
@@ -179,13 +238,13 @@ class ProcessorGroupReplicaPoolActor(Runtime):
 
     async def drain(self):
         logging.info(f"Draining ProcessorPool({self.processor_group.group_id})...")
-        self._status = RuntimeStatus.DRAINING
+        self._set_status(RuntimeStatus.DRAINING)
         await self.remove_replicas(len(self.replicas))
         coros = []
         for task in self.background_tasks:
             coros.append(task.shutdown())
         await asyncio.gather(*coros)
-        self._status = RuntimeStatus.DRAINED
+        self._set_status(RuntimeStatus.DRAINED)
         logging.info(f"Drain ProcessorPool({self.processor_group.group_id}) complete.")
         return True
 
@@ -4,7 +4,7 @@ import asyncio
 import dataclasses
 import logging
 import time
-from datetime import datetime, timedelta
+from datetime import datetime
 from typing import Any, Callable, Dict, Iterable, List, Optional, Type
 
 import ray
@@ -30,9 +30,15 @@ from buildflow.core.app.runtime.actors.endpoint_pattern.endpoint_pool import (
     EndpointProcessorGroupPoolActor,
 )
 from buildflow.core.app.runtime.actors.process_pool import ProcessorGroupSnapshot
-from buildflow.core.options.runtime_options import RuntimeOptions
+from buildflow.core.options.runtime_options import ProcessorOptions, RuntimeOptions
 from buildflow.core.processor.processor import ProcessorGroup, ProcessorGroupType
-from buildflow.dependencies.base import Scope, initialize_dependencies
+from buildflow.dependencies.base import (
+    GlobalScoped,
+    Scope,
+    global_dependencies,
+    initialize_dependencies,
+    reuse_global_dependencies,
+)
 
 
 @dataclasses.dataclass
@@ -55,6 +61,12 @@ class RuntimeSnapshot(Snapshot):
 class ProcessorGroupPoolReference:
     actor_handle: ActorHandle
     processor_group: ProcessorGroup
+    # The last status pushed by, or polled from, the processor pool.
+    status: RuntimeStatus = RuntimeStatus.PENDING
+    # Autoscaling is tracked per pool so every pool gets scaled on its own
+    # schedule.
+    last_autoscale_time: float = dataclasses.field(default_factory=time.monotonic)
+    scale_task: Optional[asyncio.Task] = None
 
 
 @ray.remote
@@ -79,6 +91,13 @@ class RuntimeActor(Runtime):
         self._runtime_loop_future = None
         self.flow_dependencies = flow_dependencies
         self._event_subscriber = None
+        self._previous_status_report: Optional[RuntimeStatusReport] = None
+        # Set when a processor pool pushes a status change, this wakes up the
+        # checkin loop early.
+        self._status_changed: Optional[asyncio.Event] = None
+        # The initialized global dependencies keyed by their type, these are
+        # kept across reloads unless their module is reloaded.
+        self._global_dependencies: Dict[str, GlobalScoped] = {}
 
     def _set_status(self, status: RuntimeStatus):
         self._status = status
@@ -120,17 +139,27 @@ class RuntimeActor(Runtime):
             )
         else:
             raise ValueError(f"Unknown group type: {group.group_type}")
+        # NOTE: Ray preserves the order of calls from the same caller, so the
+        # subscriber is always registered before the pool starts running.
+        processor_pool_group_ref.actor_handle.set_status_subscriber.remote(
+            ray.get_runtime_context().current_actor
+        )
         processor_pool_group_ref.actor_handle.run.remote()
         return processor_pool_group_ref
 
     async def initialize_global_dependencies(
-        self, processor_groups: Iterable[ProcessorGroup]
+        self,
+        processor_groups: Iterable[ProcessorGroup],
+        reloaded_modules: Iterable[str] = (),
     ):
         for group in processor_groups:
             deps = []
             for processor in group.processors:
                 deps.extend(processor.dependencies())
+            reuse_global_dependencies(deps, self._global_dependencies, reloaded_modules)
             await initialize_dependencies(deps, self.flow_dependencies, [Scope.GLOBAL])
+            for dependency in global_dependencies(deps):
+                self._global_dependencies[dependency.type_key] = dependency
 
     async def run(
         self,
@@ -142,6 +171,7 @@ class RuntimeActor(Runtime):
     ):
         logging.info("Starting Runtime...")
         self._event_subscriber = event_subscriber
+        self._status_changed = asyncio.Event()
         self._set_status(RuntimeStatus.RUNNING)
         self._processor_group_pool_refs = []
         await self.initialize_global_dependencies(processor_groups)
@@ -153,6 +183,76 @@ class RuntimeActor(Runtime):
 
         self._runtime_loop_future = self._runtime_checkin_loop(serve_host, serve_port)
 
+    async def _reload_processor_group(
+        self, group: ProcessorGroup, serve_host: str, serve_port: int
+    ):
+        for processor_pool in self._processor_group_pool_refs:
+            if (
+                processor_pool.processor_group.group_id == group.group_id
+                and processor_pool.processor_group.group_type == group.group_type
+            ):
+                await processor_pool.actor_handle.reload.remote(
+                    group, self.options.processor_options[group.group_id]
+                )
+                processor_pool.processor_group = group
+                return
+        await self._remove_processor_group(group.group_id)
+        self._processor_group_pool_refs.append(
+            self._start_processor_group(group, serve_host, serve_port)
+        )
+
+    async def _remove_processor_group(self, group_id: str):
+        for processor_pool in list(self._processor_group_pool_refs):
+            if processor_pool.processor_group.group_id != group_id:
+                continue
+            self._processor_group_pool_refs.remove(processor_pool)
+            try:
+                await processor_pool.actor_handle.drain.remote()
+            except (RayActorError, OutOfMemoryError):
+                logging.exception("failed to drain processor pool %s", group_id)
+            ray.kill(processor_pool.actor_handle, no_restart=True)
+
+    async def reload(
+        self,
+        *,
+        processor_groups: Iterable[ProcessorGroup],
+        removed_group_ids: Iterable[str],
+        processor_options: Dict[str, ProcessorOptions],
+        serve_host: str,
+        serve_port: int,
+        reloaded_modules: Iterable[str] = (),
+    ) -> bool:
+        """Hot reloads the given processor groups without restarting the runtime.
+
+        Pools of groups that already exist drain and replace their replicas,
+        groups that don't exist yet get a new pool, and the pools of removed
+        groups are drained. Any other pools are left running as is. Global
+        dependencies are only re-initialized if their type comes from one of
+        `reloaded_modules`, otherwise the reloaded groups keep the existing
+        instances.
+        """
+        if self._status != RuntimeStatus.RUNNING:
+            logging.warning("cannot reload a runtime that is not running.")
+            return False
+        processor_groups = list(processor_groups)
+        logging.warning(
+            "Reloading processor groups: %s",
+            [group.group_id for group in processor_groups],
+        )
+        self.options.processor_options.update(processor_options)
+        await self.initialize_global_dependencies(processor_groups, reloaded_modules)
+        await asyncio.gather(
+            *[self._remove_processor_group(group_id) for group_id in removed_group_ids]
+        )
+        await asyncio.gather(
+            *[
+                self._reload_processor_group(group, serve_host, serve_port)
+                for group in processor_groups
+            ]
+        )
+        self._publish_status_report()
+        return True
+
     async def drain(self, as_reload: bool = False) -> bool:
         if (
             self._status == RuntimeStatus.DRAINING
@@ -184,6 +284,7 @@ class RuntimeActor(Runtime):
                     "-- Attempting to drain again will force stop the runtime."
                 )
                 self._set_status(RuntimeStatus.DRAINING)
+            await self._cancel_autoscale()
             drain_tasks = [
                 processor_pool.actor_handle.drain.remote()
                 for processor_pool in self._processor_group_pool_refs
@@ -197,6 +298,32 @@ class RuntimeActor(Runtime):
     async def status(self):
         return self._status
 
+    async def report_status(self, group_id: str, status: RuntimeStatus):
+        """Called by processor pools to push their status changes."""
+        for processor_pool in self._processor_group_pool_refs:
+            if processor_pool.processor_group.group_id == group_id:
+                processor_pool.status = status
+        self._publish_status_report()
+        if self._status_changed is not None:
+            self._status_changed.set()
+
+    def _publish_status_report(self, force: bool = False):
+        if self._event_subscriber is None:
+            return
+        status_report = RuntimeStatusReport(
+            status=self._status,
+            processor_group_statuses={
+                processor_pool.processor_group.group_id: processor_pool.status
+                for processor_pool in self._processor_group_pool_refs
+            },
+        )
+        if force or status_report != self._previous_status_report:
+            try:
+                self._event_subscriber(RuntimeEvent(self.run_id, status_report))
+            except Exception:
+                logging.exception("event subscriber failed")
+        self._previous_status_report = status_report
+
     async def snapshot(self):
         snapshot_tasks = [
             processor_pool.actor_handle.snapshot.remote()
@@ -213,103 +340,115 @@ class RuntimeActor(Runtime):
         if self._runtime_loop_future is not None:
             await self._runtime_loop_future
 
+    async def _poll_processor_pool_status(
+        self, processor_pool: ProcessorGroupPoolReference
+    ) -> RuntimeStatus:
+        try:
+            return await processor_pool.actor_handle.status.remote()
+        except (RayActorError, OutOfMemoryError):
+            return RuntimeStatus.DIED
+
+    async def _check_processor_pools(self, serve_host: str, serve_port: int):
+        processor_pools = list(self._processor_group_pool_refs)
+        statuses = await asyncio.gather(
+            *[self._poll_processor_pool_status(pool) for pool in processor_pools]
+        )
+        for processor_pool, status in zip(processor_pools, statuses):
+            processor_pool.status = status
+            if status != RuntimeStatus.DIED:
+                continue
+            logging.error("process actor unexpectedly died. will restart.")
+            if self._status == RuntimeStatus.RUNNING:
+                # Only restart if we are running, otherwise we are draining
+                new_processor_ref = self._start_processor_group(
+                    processor_pool.processor_group,
+                    serve_host=serve_host,
+                    serve_port=serve_port,
+                )
+                processor_pool.actor_handle = new_processor_ref.actor_handle
+                processor_pool.scale_task = None
+
+    async def _scale_processor_pool(self, processor_pool: ProcessorGroupPoolReference):
+        logging.debug(
+            "Starting autoscale check for %s at: %s",
+            processor_pool.processor_group.group_id,
+            datetime.utcnow(),
+        )
+        try:
+            await processor_pool.actor_handle.scale.remote()
+        except Exception:
+            logging.exception("autoscale failed")
+        logging.debug(
+            "autoscale check for %s ended at: %s",
+            processor_pool.processor_group.group_id,
+            datetime.utcnow(),
+        )
+
+    def _schedule_autoscale(self):
+        now = time.monotonic()
+        for processor_pool in self._processor_group_pool_refs:
+            if (
+                processor_pool.scale_task is not None
+                and not processor_pool.scale_task.done()
+            ):
+                # Don't stack scale requests for pools that are slow to scale.
+                continue
+            processor_options = self.options.processor_options[
+                processor_pool.processor_group.group_id
+            ]
+            autoscale_frequency_secs = (
+                processor_options.autoscaler_options.autoscale_frequency_secs
+            )
+            if now - processor_pool.last_autoscale_time >= autoscale_frequency_secs:
+                processor_pool.last_autoscale_time = now
+                processor_pool.scale_task = asyncio.create_task(
+                    self._scale_processor_pool(processor_pool)
+                )
+
+    async def _cancel_autoscale(self):
+        scale_tasks = []
+        for processor_pool in self._processor_group_pool_refs:
+            if processor_pool.scale_task is not None:
+                processor_pool.scale_task.cancel()
+                scale_tasks.append(processor_pool.scale_task)
+                processor_pool.scale_task = None
+        # NOTE: We wait for the cancelled checks to stop so no scale request is
+        # sent to a pool after it was asked to drain.
+        await asyncio.gather(*scale_tasks, return_exceptions=True)
+
+    async def _wait_for_next_checkin(self):
+        try:
+            await asyncio.wait_for(
+                self._status_changed.wait(),
+                timeout=self.options.checkin_frequency_loop_secs,
+            )
+        except asyncio.TimeoutError:
+            pass
+        self._status_changed.clear()
+
     async def _runtime_checkin_loop(
         self,
         serve_host: str,
         serve_port: int,
     ):
         logging.info("Runtime checkin loop started...")
-        last_autoscale_event = time.monotonic()
         # We keep running the loop while the job is running or draining to ensure
         # we don't exit the main process before the drain is complete.
-        # TODO: consider splitting these into two loops, this might be nice as not all
-        # processor types need scaling (e.g. only consumer).
-        #   - one for checking the status (i.e. is it still running)
-        #   - one for autoscaling
-        previous_status_report = None
+        # NOTE: Processor pools push their status changes to the runtime (see:
+        # report_status), polling here is only needed to detect pools that have
+        # died and can no longer report.
         while (
             self._status == RuntimeStatus.RUNNING
             or self._status == RuntimeStatus.DRAINING
         ):
-            scaling_coros = []
-            processor_group_statuses = {}
-            for processor_pool in self._processor_group_pool_refs:
-                try:
-                    # Check to see if our processpool actor needs to be restarted.
-                    status = await processor_pool.actor_handle.status.remote()
-                    processor_group_statuses[
-                        processor_pool.processor_group.group_id
-                    ] = status
-                except (RayActorError, OutOfMemoryError):
-                    processor_group_statuses[
-                        processor_pool.processor_group.group_id
-                    ] = RuntimeStatus.DIED
-                    logging.exception("process actor unexpectedly died. will restart.")
-                    if self._status == RuntimeStatus.RUNNING:
-                        # Only restart if we are running, otherwise we are draining
-                        new_processor_ref = self._start_processor_group(
-                            processor_pool.processor_group,
-                            serve_host=serve_host,
-                            serve_port=serve_port,
-                        )
-                        processor_pool.actor_handle = new_processor_ref.actor_handle
-                if self._event_subscriber is not None:
-                    status_report = RuntimeStatusReport(
-                        status=self._status,
-                        processor_group_statuses=processor_group_statuses,
-                    )
-
-                    try:
-                        if previous_status_report != status_report:
-                            event = RuntimeEvent(self.run_id, status_report)
-                            self._event_subscriber(event)
-                    except Exception:
-                        logging.exception("event subscriber failed")
-                    previous_status_report = status_report
-
-                processor_options = self.options.processor_options[
-                    processor_pool.processor_group.group_id
-                ]
-                autoscale_frequency = timedelta(
-                    seconds=processor_options.autoscaler_options.autoscale_frequency_secs
-                )
-                # Only run the autoscale loop when the runtime is running, this prevents
-                # us from scaling while we are draining.
-                if self._status == RuntimeStatus.RUNNING and (
-                    time.monotonic() - last_autoscale_event
-                    >= autoscale_frequency.total_seconds()
-                ):
-                    logging.debug("Starting autoscale check at: %s", datetime.utcnow())
-                    scaling_coros.append(processor_pool.actor_handle.scale.remote())
-                    last_autoscale_event = time.monotonic()
-            if scaling_coros:
-                try:
-                    await asyncio.gather(*scaling_coros)
-                except Exception:
-                    logging.exception("autoscale failed")
-                logging.debug("autoscale check ended at: %s", datetime.utcnow())
-
-            await asyncio.sleep(self.options.checkin_frequency_loop_secs)
-        processor_group_statuses = {}
-        for processor_pool in self._processor_group_pool_refs:
-            try:
-                # Check to see if our processpool actor needs to be restarted.
-                status = await processor_pool.actor_handle.status.remote()
-                processor_group_statuses[
-                    processor_pool.processor_group.group_id
-                ] = status
-            except (RayActorError, OutOfMemoryError):
-                processor_group_statuses[
-                    processor_pool.processor_group.group_id
-                ] = RuntimeStatus.DIED
-            if self._event_subscriber is not None:
-                status_report = RuntimeStatusReport(
-                    status=self._status,
-                    processor_group_statuses=processor_group_statuses,
-                )
+            await self._check_processor_pools(serve_host, serve_port)
+            self._publish_status_report()
+
+            # Only run the autoscale loop when the runtime is running, this prevents
+            # us from scaling while we are draining.
+            if self._status == RuntimeStatus.RUNNING:
+                self._schedule_autoscale()
 
-                try:
-                    event = RuntimeEvent(self.run_id, status_report)
-                    self._event_subscriber(event)
-                except Exception:
-                    logging.exception("event subscriber failed")
+            await self._wait_for_next_checkin()
+        await self._check_processor_pools(serve_host, serve_port)
+        self._publish_status_report(force=True)
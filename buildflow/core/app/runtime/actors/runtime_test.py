@@ -1,24 +1,36 @@
 import asyncio
+import copy
 import os
 import shutil
 import signal
 import tempfile
 import unittest
 from pathlib import Path
+from typing import List
+from unittest import mock
 
 import pyarrow.csv as pcsv
 import pytest
 from ray.util.state import list_actors
 
 from buildflow.core.app.flow import Flow
-from buildflow.core.app.runtime.actors.runtime import RuntimeActor
+from buildflow.core.app.runtime._runtime import RuntimeStatus
+from buildflow.core.app.runtime.actors.runtime import (
+    ProcessorGroupPoolReference,
+    RuntimeActor,
+)
 from buildflow.core.options import ProcessorOptions, RuntimeOptions
 from buildflow.core.processor.patterns.consumer import ConsumerGroup
+from buildflow.core.utils import uuid
+from buildflow.dependencies.base import DependencyWrapper, Scope, dependency
 from buildflow.io.local.file import File
 from buildflow.io.local.pulse import Pulse
 from buildflow.io.local.testing.pulse_with_backlog import PulseWithBacklog
 from buildflow.types.portable import FileFormat
 
+# The runtime class without the ray actor wrapper, so we can call it directly.
+_Runtime = RuntimeActor.__ray_metadata__.modified_class
+
 
 @pytest.mark.usefixtures("ray")
 class RunTimeTest(unittest.IsolatedAsyncioTestCase):
@@ -104,6 +116,67 @@ class RunTimeTest(unittest.IsolatedAsyncioTestCase):
         self.assertGreaterEqual(len(table_list), 2)
         self.assertCountEqual([{"field": 1}, {"field": 2}], table_list[0:2])
 
+    async def test_runtime_reload(self):
+        app = Flow()
+
+        @app.consumer(
+            source=Pulse([{"field": 1}, {"field": 2}], pulse_interval_seconds=0.1),
+            sink=File(file_path=self.output_path, file_format=FileFormat.CSV),
+        )
+        def process(payload):
+            return payload
+
+        reloaded_app = Flow()
+
+        @reloaded_app.consumer(
+            source=Pulse([{"field": 1}, {"field": 2}], pulse_interval_seconds=0.1),
+            sink=File(file_path=self.output_path, file_format=FileFormat.CSV),
+        )
+        def process(payload):  # noqa: F811
+            return {"field": payload["field"] + 10}
+
+        runtime_options = RuntimeOptions.default()
+        runtime_options.processor_options["process"] = ProcessorOptions.default()
+        runtime_options.processor_options["process"].num_cpus = 0.5
+        reloaded_options = reloaded_app.options.runtime_options.processor_options
+        reloaded_options["process"].num_cpus = 0.5
+        actor = RuntimeActor.remote(
+            run_id="test-run",
+            runtime_options=runtime_options,
+            flow_dependencies={},
+        )
+
+        await actor.run.remote(
+            processor_groups=app._processor_groups,
+            serve_port=0,
+            serve_host="unused",
+            event_subscriber=None,
+        )
+        await asyncio.sleep(10)
+
+        reloaded = await actor.reload.remote(
+            processor_groups=reloaded_app._processor_groups,
+            removed_group_ids=[],
+            processor_options=reloaded_options,
+            serve_port=0,
+            serve_host="unused",
+        )
+        self.assertTrue(reloaded)
+        await asyncio.sleep(5)
+        self.assertEqual(RuntimeStatus.RUNNING, await actor.status.remote())
+
+        await self.run_with_timeout(actor.drain.remote(), fail=True)
+
+        # The original and the reloaded replica each write their own file.
+        files = os.listdir(self.output_dir)
+        self.assertEqual(len(files), 2)
+        fields = set()
+        for file in files:
+            table = pcsv.read_csv(Path(os.path.join(self.output_dir, file)))
+            fields.update(row["field"] for row in table.to_pylist())
+        self.assertIn(1, fields)
+        self.assertIn(11, fields)
+
     async def test_runtime_kill_processor_pool(self):
         app = Flow()
 
@@ -339,6 +412,146 @@ class RunTimeTest(unittest.IsolatedAsyncioTestCase):
 
         await self.run_with_timeout(actor.drain.remote())
 
+    async def test_runtime_scales_up_multiple_groups(self):
+        app = Flow()
+
+        @app.consumer(
+            source=PulseWithBacklog(
+                [{"field": 1}, {"field": 2}],
+                pulse_interval_seconds=1,
+                # Set an artificial backlog size to force the consumer to scale up.
+                backlog_size=1000,
+            ),
+            sink=File(file_path=self.output_path, file_format=FileFormat.CSV),
+        )
+        def process1(payload):
+            return payload
+
+        @app.consumer(
+            source=PulseWithBacklog(
+                [{"field": 1}, {"field": 2}],
+                pulse_interval_seconds=1,
+                # Set an artificial backlog size to force the consumer to scale up.
+                backlog_size=1000,
+            ),
+            sink=File(file_path=self.output_path, file_format=FileFormat.CSV),
+        )
+        def process2(payload):
+            return payload
+
+        runtime_options = RuntimeOptions.default()
+        runtime_options.checkin_frequency_loop_secs = 1
+        for group_id in ["process1", "process2"]:
+            runtime_options.processor_options[group_id] = ProcessorOptions.default()
+            runtime_options.processor_options[group_id].num_cpus = 0.1
+            runtime_options.processor_options[
+                group_id
+            ].autoscaler_options.autoscale_frequency_secs = 5
+        actor = RuntimeActor.remote(
+            run_id="test-run",
+            runtime_options=runtime_options,
+            flow_dependencies={},
+        )
+
+        await self.run_with_timeout(
+            actor.run.remote(
+                processor_groups=[
+                    ConsumerGroup(processors=[process1], group_id="process1"),
+                    ConsumerGroup(processors=[process2], group_id="process2"),
+                ],
+                serve_port=0,
+                serve_host="unused",
+                event_subscriber=None,
+            )
+        )
+
+        await self.run_for_time(actor.run_until_complete.remote(), 15)
+
+        # Both groups should have been scaled, not just the first one that was due.
+        snapshot = await self.run_with_timeout(actor.snapshot.remote())
+        self.assertGreaterEqual(snapshot.processor_groups[0].num_replicas, 2)
+        self.assertGreaterEqual(snapshot.processor_groups[1].num_replicas, 2)
+
+        await self.run_with_timeout(actor.drain.remote())
+
+
+class RuntimeDrainTest(unittest.IsolatedAsyncioTestCase):
+    async def test_drain_cancels_pending_autoscale(self):
+        runtime = _Runtime(
+            "run", runtime_options=RuntimeOptions.default(), flow_dependencies={}
+        )
+        runtime._status = RuntimeStatus.RUNNING
+        actor_handle = mock.Mock()
+        actor_handle.drain.remote = mock.AsyncMock(return_value=True)
+        scale_task = asyncio.create_task(asyncio.sleep(60))
+        runtime._processor_group_pool_refs = [
+            ProcessorGroupPoolReference(
+                actor_handle=actor_handle,
+                processor_group=ConsumerGroup(group_id="g", processors=[]),
+                scale_task=scale_task,
+            )
+        ]
+
+        await runtime.drain()
+
+        self.assertTrue(scale_task.cancelled())
+        self.assertIsNone(runtime._processor_group_pool_refs[0].scale_task)
+        actor_handle.drain.remote.assert_awaited_once()
+        self.assertEqual(runtime._status, RuntimeStatus.DRAINED)
+
+
+@dependency(scope=Scope.GLOBAL)
+class _GlobalDep:
+    def __init__(self):
+        self.value = uuid()
+
+
+class _DependentProcessor:
+    def __init__(self):
+        # Processors sent to the runtime carry their own copy of the
+        # dependency, like ray does when it pickles processor groups.
+        self.dep = copy.deepcopy(_GlobalDep)
+
+    def dependencies(self):
+        return [DependencyWrapper("dep", self.dep)]
+
+
+@mock.patch("ray.put")
+class RuntimeReloadTest(unittest.IsolatedAsyncioTestCase):
+    async def reload(self, runtime: _Runtime, reloaded_modules: List[str]):
+        processor = _DependentProcessor()
+        await runtime.reload(
+            processor_groups=[ConsumerGroup(group_id="g", processors=[processor])],
+            removed_group_ids=[],
+            processor_options={"g": ProcessorOptions.default()},
+            serve_host="unused",
+            serve_port=0,
+            reloaded_modules=reloaded_modules,
+        )
+        return await processor.dep.resolve({}, {})
+
+    async def test_reload_keeps_global_dependencies(self, mock_put: mock.MagicMock):
+        runtime = _Runtime(
+            "run", runtime_options=RuntimeOptions.default(), flow_dependencies={}
+        )
+        processor = _DependentProcessor()
+        group = ConsumerGroup(group_id="g", processors=[processor])
+        await runtime.initialize_global_dependencies([group])
+        instance = await processor.dep.resolve({}, {})
+        runtime._status = RuntimeStatus.RUNNING
+        actor_handle = mock.Mock()
+        actor_handle.reload.remote = mock.AsyncMock(return_value=True)
+        runtime._processor_group_pool_refs = [
+            ProcessorGroupPoolReference(
+                actor_handle=actor_handle, processor_group=group
+            )
+        ]
+
+        self.assertIs(instance, await self.reload(runtime, ["other_module"]))
+        self.assertIsNot(
+            instance, await self.reload(runtime, [_GlobalDep.dependency_fn.__module__])
+        )
+
 
 if __name__ == "__main__":
     unittest.main()
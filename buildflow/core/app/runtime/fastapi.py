@@ -3,7 +3,6 @@ import time
 from typing import Any, Callable, Dict, Type, Union
 
 import fastapi
-import ray
 from fastapi.openapi.docs import (
     get_swagger_ui_html,
     get_swagger_ui_oauth2_redirect_html,
@@ -16,6 +15,7 @@ from starlette.websockets import WebSocket
 
 from buildflow.core.app.runtime._runtime import RunID
 from buildflow.core.app.runtime.metrics.common import (
+    current_job_id,
     num_events_processed,
     process_time_counter,
 )
@@ -31,6 +31,30 @@ from buildflow.dependencies.headers import security_dependencies
 from buildflow.io.endpoint import Method
 
 
+async def process_and_respond(processor, *args, **kwargs):
+    """Process function for endpoints, the output is returned to the caller."""
+    return await processor.process(*args, **kwargs)
+
+
+async def process_and_push(processor, *args, **kwargs):
+    """Process function for collectors, the output is pushed to the sink."""
+    output = await processor.process(*args, **kwargs)
+    if output is None:
+        # Exclude none results
+        return {"success": True}
+    sink = processor.sink()
+    if isinstance(output, (list, tuple)):
+        if not output:
+            return {"success": True}
+        push_converter = sink.push_converter(type(output[0]))
+        to_send = [push_converter(result) for result in output]
+    else:
+        push_converter = sink.push_converter(type(output))
+        to_send = [push_converter(output)]
+    await sink.push(to_send)
+    return {"success": True}
+
+
 def create_app(
     processor_group: Union[EndpointGroup, CollectorGroup],
     flow_dependencies: Dict[Type, Any],
@@ -89,7 +113,7 @@ def create_app(
 
         class EndpointFastAPIWrapper:
             def __init__(self, processor_id, run_id, flow_dependencies):
-                self.job_id = ray.get_runtime_context().get_job_id()
+                self.job_id = current_job_id()
                 self.run_id = run_id
                 self.num_events_processed_counter = num_events_processed(
                     processor_id=processor_id,
@@ -0,0 +1,290 @@
+import asyncio
+import logging
+import multiprocessing
+from multiprocessing.connection import Connection
+from typing import Any, Dict, List, Optional, Type
+
+from ray import cloudpickle
+
+from buildflow.core import utils
+from buildflow.core.app.runtime._runtime import RunID, Runtime, RuntimeStatus
+from buildflow.core.app.runtime.actors.consumer_pattern.consumer_pool_snapshot import (
+    ConsumerProcessorGroupSnapshot,
+    merge_replica_snapshots,
+)
+from buildflow.core.app.runtime.actors.consumer_pattern.pull_process_push import (
+    PullProcessPush,
+    PullProcessPushSnapshot,
+)
+from buildflow.core.app.runtime.actors.process_pool import (
+    ProcessorGroupSnapshot,
+    ReplicaID,
+)
+from buildflow.core.background_tasks.background_task import BackgroundTask
+from buildflow.core.options.runtime_options import ProcessorOptions
+from buildflow.core.processor.patterns.consumer import ConsumerProcessor
+from buildflow.core.processor.processor import ProcessorGroup
+
+_SNAPSHOT_COMMAND = "snapshot"
+_DRAIN_COMMAND = "drain"
+
+
+class _InProcessReplica:
+    """Runs a PullProcessPush replica as asyncio tasks on the current loop."""
+
+    def __init__(self, replica_id: ReplicaID, replica: PullProcessPush) -> None:
+        self.replica_id = replica_id
+        self.replica = replica
+        self._run_tasks: List[asyncio.Task] = []
+
+    async def start(self, num_concurrency: int):
+        await self.replica.initialize()
+        self._run_tasks = [
+            asyncio.create_task(self.replica.run()) for _ in range(num_concurrency)
+        ]
+
+    async def snapshot(self) -> PullProcessPushSnapshot:
+        return await self.replica.snapshot()
+
+    async def drain(self):
+        # NOTE: PullProcessPush.drain waits for its run loops to exit, if they
+        # have already exited (e.g. they raised) there is nothing to drain.
+        if not all(task.done() for task in self._run_tasks):
+            await self.replica.drain()
+        await asyncio.gather(*self._run_tasks, return_exceptions=True)
+
+    def kill(self):
+        for task in self._run_tasks:
+            task.cancel()
+
+
+async def _serve_replica_process(
+    conn: Connection, serialized_replica: bytes, num_concurrency: int, log_level: str
+):
+    (
+        run_id,
+        processor_group,
+        replica_id,
+        flow_dependencies,
+        processor_options,
+    ) = cloudpickle.loads(serialized_replica)
+    replica = _InProcessReplica(
+        replica_id,
+        PullProcessPush(
+            run_id,
+            processor_group,
+            replica_id=replica_id,
+            flow_dependencies=flow_dependencies,
+            log_level=log_level,
+            ordered_processing=processor_options.ordered_processing,
+            max_concurrent_ordering_keys=processor_options.max_concurrent_ordering_keys,
+        ),
+    )
+    await replica.start(num_concurrency)
+    conn.send(True)
+    loop = asyncio.get_running_loop()
+    while True:
+        command = await loop.run_in_executor(None, conn.recv)
+        if command == _SNAPSHOT_COMMAND:
+            conn.send(await replica.snapshot())
+        elif command == _DRAIN_COMMAND:
+            await replica.drain()
+            conn.send(True)
+            return
+
+
+def _run_replica_process(
+    conn: Connection, serialized_replica: bytes, num_concurrency: int, log_level: str
+):
+    asyncio.run(
+        _serve_replica_process(conn, serialized_replica, num_concurrency, log_level)
+    )
+
+
+class _SubprocessReplica:
+    """Runs a PullProcessPush replica in a child process.
+
+    The child process serves snapshot and drain commands sent over a pipe.
+    """
+
+    def __init__(
+        self,
+        replica_id: ReplicaID,
+        serialized_replica: bytes,
+        log_level: str,
+    ) -> None:
+        self.replica_id = replica_id
+        self._serialized_replica = serialized_replica
+        self._log_level = log_level
+        self._conn: Optional[Connection] = None
+        self._process: Optional[multiprocessing.Process] = None
+        # Only one command can be in flight on the pipe at a time.
+        self._lock = asyncio.Lock()
+
+    async def _call(self, command: Optional[str]) -> Any:
+        loop = asyncio.get_running_loop()
+        async with self._lock:
+            if command is not None:
+                self._conn.send(command)
+            return await loop.run_in_executor(None, self._conn.recv)
+
+    async def start(self, num_concurrency: int):
+        # NOTE: We always spawn so the child doesn't inherit the parent's event
+        # loop or any open client connections.
+        context = multiprocessing.get_context("spawn")
+        self._conn, child_conn = context.Pipe()
+        self._process = context.Process(
+            target=_run_replica_process,
+            args=(
+                child_conn,
+                self._serialized_replica,
+                num_concurrency,
+                self._log_level,
+            ),
+            daemon=True,
+        )
+        self._process.start()
+        # Wait for the replica to be initialized.
+        await self._call(None)
+
+    async def snapshot(self) -> PullProcessPushSnapshot:
+        return await self._call(_SNAPSHOT_COMMAND)
+
+    async def drain(self):
+        await self._call(_DRAIN_COMMAND)
+        await asyncio.get_running_loop().run_in_executor(None, self._process.join)
+
+    def kill(self):
+        if self._process is not None:
+            self._process.kill()
+
+
+class LocalConsumerPool(Runtime):
+    """Runs the replicas of a consumer group in the current process.
+
+    Replicas run as asyncio tasks on the current event loop, or in their own
+    child process if `use_process_pool` is set. The number of replicas is
+    fixed to the `num_replicas` the group was configured with.
+    """
+
+    def __init__(
+        self,
+        run_id: RunID,
+        processor_group: ProcessorGroup[ConsumerProcessor],
+        processor_options: ProcessorOptions,
+        flow_dependencies: Dict[Type, Any],
+        *,
+        use_process_pool: bool = False,
+    ) -> None:
+        self.run_id = run_id
+        self.processor_group = processor_group
+        self.options = processor_options
+        self.flow_dependencies = flow_dependencies
+        self.use_process_pool = use_process_pool
+        # initial runtime state
+        self.replicas: List[Any] = []
+        self.background_tasks: List[BackgroundTask] = []
+        for p in self.processor_group.processors:
+            self.background_tasks.extend(p.background_tasks())
+        self._status = RuntimeStatus.PENDING
+
+    def create_replica(self):
+        replica_id = utils.uuid()
+        if self.use_process_pool:
+            serialized_replica = cloudpickle.dumps(
+                (
+                    self.run_id,
+                    self.processor_group,
+                    replica_id,
+                    self.flow_dependencies,
+                    self.options,
+                )
+            )
+            return _SubprocessReplica(
+                replica_id, serialized_replica, self.options.log_level
+            )
+        return _InProcessReplica(
+            replica_id,
+            PullProcessPush(
+                self.run_id,
+                self.processor_group,
+                replica_id=replica_id,
+                flow_dependencies=self.flow_dependencies,
+                log_level=self.options.log_level,
+                ordered_processing=self.options.ordered_processing,
+                max_concurrent_ordering_keys=self.options.max_concurrent_ordering_keys,
+            ),
+        )
+
+    async def _start_replicas(self, num_replicas: int):
+        for _ in range(num_replicas):
+            replica = self.create_replica()
+            await replica.start(self.options.num_concurrency)
+            self.replicas.append(replica)
+
+    async def run(self):
+        logging.info(f"Starting LocalConsumerPool({self.processor_group.group_id})...")
+        self._status = RuntimeStatus.RUNNING
+        await self._start_replicas(self.options.autoscaler_options.num_replicas)
+        await asyncio.gather(*[task.start() for task in self.background_tasks])
+
+    async def reload(
+        self,
+        processor_group: ProcessorGroup[ConsumerProcessor],
+        processor_options: ProcessorOptions,
+    ):
+        """Replaces the replicas with replicas of the new processor group.
+
+        New replicas are started before the old ones are drained so the pool
+        keeps processing while it reloads.
+        """
+        logging.info(f"Reloading LocalConsumerPool({processor_group.group_id})...")
+        old_replicas = self.replicas
+        old_background_tasks = self.background_tasks
+        self.processor_group = processor_group
+        self.options = processor_options
+        self.background_tasks = []
+        for p in self.processor_group.processors:
+            self.background_tasks.extend(p.background_tasks())
+        await asyncio.gather(*[task.start() for task in self.background_tasks])
+        self.replicas = []
+        await self._start_replicas(self.options.autoscaler_options.num_replicas)
+        await asyncio.gather(*[replica.drain() for replica in old_replicas])
+        await asyncio.gather(*[task.shutdown() for task in old_background_tasks])
+        return True
+
+    async def drain(self):
+        logging.info(f"Draining LocalConsumerPool({self.processor_group.group_id})...")
+        self._status = RuntimeStatus.DRAINING
+        await asyncio.gather(*[replica.drain() for replica in self.replicas])
+        self.replicas = []
+        await asyncio.gather(*[task.shutdown() for task in self.background_tasks])
+        self._status = RuntimeStatus.DRAINED
+        return True
+
+    def kill(self):
+        for replica in self.replicas:
+            replica.kill()
+        self.replicas = []
+        self._status = RuntimeStatus.DRAINED
+
+    async def status(self) -> RuntimeStatus:
+        return self._status
+
+    async def snapshot(self) -> ConsumerProcessorGroupSnapshot:
+        replica_snapshots = await asyncio.gather(
+            *[replica.snapshot() for replica in self.replicas]
+        )
+        parent_snapshot = ProcessorGroupSnapshot(
+            status=self._status,
+            timestamp_millis=utils.timestamp_millis(),
+            group_id=self.processor_group.group_id,
+            group_type=self.processor_group.group_type,
+            num_replicas=len(self.replicas),
+            num_cpu_per_replica=self.options.num_cpus,
+            num_concurrency_per_replica=self.options.num_concurrency,
+            processor_snapshots={},
+        )
+        return await merge_replica_snapshots(
+            self.processor_group, parent_snapshot, list(replica_snapshots)
+        )
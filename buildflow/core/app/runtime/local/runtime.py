@@ -0,0 +1,338 @@
+import asyncio
+import logging
+from typing import Any, Callable, Dict, Iterable, List, Optional, Type
+
+from buildflow.core import utils
+from buildflow.core.app.runtime._runtime import (
+    RunID,
+    Runtime,
+    RuntimeEvent,
+    RuntimeStatus,
+    RuntimeStatusReport,
+)
+from buildflow.core.app.runtime.actors.runtime import RuntimeSnapshot
+from buildflow.core.app.runtime.local.consumer_pool import LocalConsumerPool
+from buildflow.core.app.runtime.local.server_pool import LocalServerPool
+from buildflow.core.options.runtime_options import ProcessorOptions, RuntimeOptions
+from buildflow.core.processor.processor import ProcessorGroup, ProcessorGroupType
+from buildflow.dependencies.base import (
+    GlobalScoped,
+    Scope,
+    global_dependencies,
+    initialize_dependencies,
+    reuse_global_dependencies,
+)
+
+
+class LocalRuntime(Runtime):
+    """Runs a flow in the current process without ray.
+
+    Consumers run as asyncio tasks (or child processes if `use_process_pool`
+    is set), and collectors and endpoints are served by a single uvicorn
+    server. This is intended for small deployments and tests, it does not
+    autoscale.
+    """
+
+    def __init__(
+        self,
+        run_id: RunID,
+        *,
+        runtime_options: RuntimeOptions,
+        flow_dependencies: Dict[Type, Any],
+        use_process_pool: bool = False,
+    ) -> None:
+        logging.getLogger().setLevel(runtime_options.log_level)
+
+        # configuration
+        self.run_id = run_id
+        self.options = runtime_options
+        self.flow_dependencies = flow_dependencies
+        self.use_process_pool = use_process_pool
+        # initial runtime state
+        self._status = RuntimeStatus.PENDING
+        self._processor_groups: List[ProcessorGroup] = []
+        self._consumer_pools: Dict[str, LocalConsumerPool] = {}
+        self._server_pool: Optional[LocalServerPool] = None
+        self._runtime_loop_future = None
+        self._event_subscriber = None
+        self._previous_status_report: Optional[RuntimeStatusReport] = None
+        self._status_changed: Optional[asyncio.Event] = None
+        # The initialized global dependencies keyed by their type, these are
+        # kept across reloads unless their module is reloaded.
+        self._global_dependencies: Dict[str, GlobalScoped] = {}
+
+    def _set_status(self, status: RuntimeStatus):
+        self._status = status
+        if self._status_changed is not None:
+            self._status_changed.set()
+
+    async def initialize_global_dependencies(
+        self,
+        processor_groups: Iterable[ProcessorGroup],
+        reloaded_modules: Iterable[str] = (),
+    ):
+        for group in processor_groups:
+            deps = []
+            for processor in group.processors:
+                deps.extend(processor.dependencies())
+            reuse_global_dependencies(deps, self._global_dependencies, reloaded_modules)
+            await initialize_dependencies(deps, self.flow_dependencies, [Scope.GLOBAL])
+            for dependency in global_dependencies(deps):
+                self._global_dependencies[dependency.type_key] = dependency
+
+    async def run(
+        self,
+        *,
+        processor_groups: Iterable[ProcessorGroup],
+        serve_host: str,
+        serve_port: int,
+        event_subscriber: Optional[Callable],
+    ):
+        logging.info("Starting LocalRuntime...")
+        self._event_subscriber = event_subscriber
+        self._status_changed = asyncio.Event()
+        self._set_status(RuntimeStatus.RUNNING)
+        self._processor_groups = list(processor_groups)
+        await self.initialize_global_dependencies(self._processor_groups)
+        server_groups = []
+        for group in self._processor_groups:
+            if group.group_type == ProcessorGroupType.CONSUMER:
+                pool = LocalConsumerPool(
+                    self.run_id,
+                    group,
+                    self.options.processor_options[group.group_id],
+                    self.flow_dependencies,
+                    use_process_pool=self.use_process_pool,
+                )
+                self._consumer_pools[group.group_id] = pool
+                await pool.run()
+            elif group.group_type in (
+                ProcessorGroupType.COLLECTOR,
+                ProcessorGroupType.SERVICE,
+            ):
+                server_groups.append(group)
+            else:
+                raise ValueError(f"Unknown group type: {group.group_type}")
+        if server_groups:
+            self._server_pool = LocalServerPool(
+                self.run_id,
+                server_groups,
+                self.options.processor_options,
+                self.flow_dependencies,
+                serve_host,
+                serve_port,
+                log_level=self.options.log_level,
+            )
+            await self._server_pool.run()
+
+        self._runtime_loop_future = asyncio.create_task(self._runtime_checkin_loop())
+
+    async def reload(
+        self,
+        *,
+        processor_groups: Iterable[ProcessorGroup],
+        removed_group_ids: Iterable[str],
+        processor_options: Dict[str, ProcessorOptions],
+        serve_host: str,
+        serve_port: int,
+        reloaded_modules: Iterable[str] = (),
+    ) -> bool:
+        """Hot reloads the given processor groups without restarting the runtime.
+
+        See: RuntimeActor.reload
+        """
+        if self._status != RuntimeStatus.RUNNING:
+            logging.warning("cannot reload a runtime that is not running.")
+            return False
+        processor_groups = list(processor_groups)
+        removed_group_ids = list(removed_group_ids)
+        logging.warning(
+            "Reloading processor groups: %s",
+            [group.group_id for group in processor_groups],
+        )
+        self.options.processor_options.update(processor_options)
+        await self.initialize_global_dependencies(processor_groups, reloaded_modules)
+        reloaded_ids = set(removed_group_ids)
+        reloaded_ids.update(group.group_id for group in processor_groups)
+        server_groups = []
+        for group_id in removed_group_ids:
+            if group_id in self._consumer_pools:
+                await self._consumer_pools.pop(group_id).drain()
+        for group in processor_groups:
+            if group.group_type == ProcessorGroupType.CONSUMER:
+                if group.group_id in self._consumer_pools:
+                    await self._consumer_pools[group.group_id].reload(
+                        group, self.options.processor_options[group.group_id]
+                    )
+                else:
+                    pool = LocalConsumerPool(
+                        self.run_id,
+                        group,
+                        self.options.processor_options[group.group_id],
+                        self.flow_dependencies,
+                        use_process_pool=self.use_process_pool,
+                    )
+                    self._consumer_pools[group.group_id] = pool
+                    await pool.run()
+            else:
+                server_groups.append(group)
+        if self._server_pool is not None:
+            server_group_ids = {
+                group.group_id for group in self._server_pool.processor_groups
+            }
+            await self._server_pool.reload(
+                server_groups,
+                self.options.processor_options,
+                [gid for gid in removed_group_ids if gid in server_group_ids],
+            )
+        elif server_groups:
+            self._server_pool = LocalServerPool(
+                self.run_id,
+                server_groups,
+                self.options.processor_options,
+                self.flow_dependencies,
+                serve_host,
+                serve_port,
+                log_level=self.options.log_level,
+            )
+            await self._server_pool.run()
+        self._processor_groups = [
+            group
+            for group in self._processor_groups
+            if group.group_id not in reloaded_ids
+        ] + processor_groups
+        await self._publish_status_report()
+        return True
+
+    def _pools(self) -> List[Runtime]:
+        pools = list(self._consumer_pools.values())
+        if self._server_pool is not None:
+            pools.append(self._server_pool)
+        return pools
+
+    async def drain(self, as_reload: bool = False) -> bool:
+        if (
+            self._status == RuntimeStatus.DRAINING
+            or self._status == RuntimeStatus.RELOADING
+        ):
+            logging.warning("Received drain single twice. Killing remaining tasks.")
+            for pool in self._pools():
+                pool.kill()
+            if self._event_subscriber is not None:
+                event = RuntimeEvent(
+                    self.run_id,
+                    RuntimeStatusReport(
+                        status=RuntimeStatus.STOPPED,
+                        processor_group_statuses={},
+                    ),
+                )
+                self._event_subscriber(event)
+            self._set_status(RuntimeStatus.DRAINED)
+        else:
+            if as_reload:
+                logging.warning("Draining Runtime for reload...")
+                self._set_status(RuntimeStatus.RELOADING)
+            else:
+                logging.warning("Draining Runtime...")
+                logging.warning(
+                    "-- Attempting to drain again will force stop the runtime."
+                )
+                self._set_status(RuntimeStatus.DRAINING)
+            await asyncio.gather(*[pool.drain() for pool in self._pools()])
+            if not as_reload:
+                logging.info("Drain Runtime complete.")
+            self._set_status(RuntimeStatus.DRAINED)
+        return True
+
+    async def status(self):
+        return self._status
+
+    async def _publish_status_report(self, force: bool = False):
+        if self._event_subscriber is None:
+            return
+        group_statuses = {}
+        for group in self._processor_groups:
+            if group.group_id in self._consumer_pools:
+                pool = self._consumer_pools[group.group_id]
+            else:
+                pool = self._server_pool
+            group_statuses[group.group_id] = await pool.status()
+        status_report = RuntimeStatusReport(
+            status=self._status, processor_group_statuses=group_statuses
+        )
+        if force or status_report != self._previous_status_report:
+            try:
+                self._event_subscriber(RuntimeEvent(self.run_id, status_report))
+            except Exception:
+                logging.exception("event subscriber failed")
+        self._previous_status_report = status_report
+
+    async def snapshot(self):
+        group_snapshots = {}
+        consumer_snapshots = await asyncio.gather(
+            *[pool.snapshot() for pool in self._consumer_pools.values()]
+        )
+        for snapshot in consumer_snapshots:
+            group_snapshots[snapshot.group_id] = snapshot
+        if self._server_pool is not None:
+            for snapshot in await self._server_pool.snapshot():
+                group_snapshots[snapshot.group_id] = snapshot
+        return RuntimeSnapshot(
+            status=self._status,
+            timestamp_millis=utils.timestamp_millis(),
+            processor_groups=[
+                group_snapshots[group.group_id]
+                for group in self._processor_groups
+                if group.group_id in group_snapshots
+            ],
+        )
+
+    async def run_until_complete(self):
+        if self._runtime_loop_future is not None:
+            await self._runtime_loop_future
+
+    async def _runtime_checkin_loop(self):
+        logging.info("Runtime checkin loop started...")
+        while (
+            self._status == RuntimeStatus.RUNNING
+            or self._status == RuntimeStatus.DRAINING
+        ):
+            await self._publish_status_report()
+            try:
+                await asyncio.wait_for(
+                    self._status_changed.wait(),
+                    timeout=self.options.checkin_frequency_loop_secs,
+                )
+            except asyncio.TimeoutError:
+                pass
+            self._status_changed.clear()
+        await self._publish_status_report(force=True)
+
+
+class _LocalMethod:
+    def __init__(self, method: Callable, loop: asyncio.AbstractEventLoop) -> None:
+        self._method = method
+        self._loop = loop
+
+    def remote(self, *args, **kwargs) -> asyncio.Future:
+        # NOTE: We schedule the call on the runtime's loop so this can be called
+        # from other threads (i.e. the runtime server).
+        future = asyncio.run_coroutine_threadsafe(
+            self._method(*args, **kwargs), self._loop
+        )
+        return asyncio.wrap_future(future)
+
+
+class LocalRuntimeHandle:
+    """Exposes a LocalRuntime with the same `.remote()` calling convention as
+    a ray actor handle, so callers don't need to know which runtime is used.
+    """
+
+    def __init__(
+        self, runtime: LocalRuntime, loop: Optional[asyncio.AbstractEventLoop] = None
+    ) -> None:
+        self._runtime = runtime
+        self._loop = loop or asyncio.get_event_loop()
+
+    def __getattr__(self, name: str) -> _LocalMethod:
+        return _LocalMethod(getattr(self._runtime, name), self._loop)
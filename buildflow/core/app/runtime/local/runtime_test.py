@@ -0,0 +1,170 @@
+import asyncio
+import os
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+import pyarrow.csv as pcsv
+import ray
+
+from buildflow.core.app.flow import Flow
+from buildflow.core.app.runtime._runtime import RuntimeStatus
+from buildflow.core.app.runtime.local.runtime import LocalRuntime
+from buildflow.core.options import ProcessorOptions, RuntimeOptions
+from buildflow.core.processor.patterns.consumer import ConsumerGroup
+from buildflow.io.local.file import File
+from buildflow.io.local.pulse import Pulse
+from buildflow.types.portable import FileFormat
+
+
+class LocalRuntimeTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.output_dir = tempfile.mkdtemp()
+        self.output_path = os.path.join(self.output_dir, "test.csv")
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.output_dir)
+
+    def assertOutput(self):
+        files = os.listdir(self.output_dir)
+        self.assertEqual(len(files), 1)
+        csv_path = os.path.join(self.output_dir, files[0])
+
+        table = pcsv.read_csv(Path(csv_path))
+        table_list = table.to_pylist()
+        self.assertGreaterEqual(len(table_list), 2)
+        self.assertCountEqual([{"field": 1}, {"field": 2}], table_list[0:2])
+
+    async def test_local_runtime_end_to_end(self):
+        app = Flow()
+
+        @app.consumer(
+            source=Pulse([{"field": 1}, {"field": 2}], pulse_interval_seconds=0.1),
+            sink=File(file_path=self.output_path, file_format=FileFormat.CSV),
+        )
+        def process(payload):
+            return payload
+
+        runtime_options = RuntimeOptions.default()
+        runtime_options.processor_options["process"] = ProcessorOptions.default()
+        runtime = LocalRuntime(
+            run_id="test-run",
+            runtime_options=runtime_options,
+            flow_dependencies={},
+        )
+
+        await runtime.run(
+            processor_groups=[ConsumerGroup(processors=[process], group_id="process")],
+            serve_port=0,
+            serve_host="unused",
+            event_subscriber=None,
+        )
+        await asyncio.sleep(1)
+
+        snapshot = await runtime.snapshot()
+        self.assertEqual(RuntimeStatus.RUNNING, snapshot.status)
+        self.assertEqual(1, len(snapshot.processor_groups))
+        group_snapshot = snapshot.processor_groups[0]
+        self.assertEqual(1, group_snapshot.num_replicas)
+        self.assertEqual(1, group_snapshot.num_concurrency_per_replica)
+        self.assertIn("process", group_snapshot.processor_snapshots)
+
+        await asyncio.wait_for(runtime.drain(), timeout=5)
+        await asyncio.wait_for(runtime.run_until_complete(), timeout=5)
+        self.assertEqual(RuntimeStatus.DRAINED, await runtime.status())
+        # The local runtime should never start a ray cluster.
+        self.assertFalse(ray.is_initialized())
+        self.assertOutput()
+
+    async def test_local_runtime_reload(self):
+        app = Flow()
+
+        @app.consumer(
+            source=Pulse([{"field": 1}, {"field": 2}], pulse_interval_seconds=0.1),
+            sink=File(file_path=self.output_path, file_format=FileFormat.CSV),
+        )
+        def process(payload):
+            return payload
+
+        reloaded_app = Flow()
+
+        @reloaded_app.consumer(
+            source=Pulse([{"field": 1}, {"field": 2}], pulse_interval_seconds=0.1),
+            sink=File(file_path=self.output_path, file_format=FileFormat.CSV),
+        )
+        def process(payload):  # noqa: F811
+            return {"field": payload["field"] + 10}
+
+        runtime_options = RuntimeOptions.default()
+        runtime_options.processor_options["process"] = ProcessorOptions.default()
+        runtime = LocalRuntime(
+            run_id="test-run",
+            runtime_options=runtime_options,
+            flow_dependencies={},
+        )
+        await runtime.run(
+            processor_groups=app._processor_groups,
+            serve_port=0,
+            serve_host="unused",
+            event_subscriber=None,
+        )
+        await asyncio.sleep(1)
+
+        reloaded = await runtime.reload(
+            processor_groups=reloaded_app._processor_groups,
+            removed_group_ids=[],
+            processor_options=reloaded_app.options.runtime_options.processor_options,
+            serve_port=0,
+            serve_host="unused",
+        )
+        self.assertTrue(reloaded)
+        self.assertEqual(RuntimeStatus.RUNNING, await runtime.status())
+        await asyncio.sleep(1)
+
+        await asyncio.wait_for(runtime.drain(), timeout=5)
+        await asyncio.wait_for(runtime.run_until_complete(), timeout=5)
+
+        # The original and the reloaded replica each write their own file.
+        files = sorted(
+            os.listdir(self.output_dir),
+            key=lambda f: os.path.getmtime(os.path.join(self.output_dir, f)),
+        )
+        self.assertEqual(2, len(files))
+        fields = set()
+        for file in files:
+            table = pcsv.read_csv(Path(os.path.join(self.output_dir, file)))
+            fields.update(row["field"] for row in table.to_pylist())
+        self.assertIn(1, fields)
+        self.assertIn(11, fields)
+
+    async def test_flow_run_local(self):
+        app = Flow()
+
+        @app.consumer(
+            source=Pulse([{"field": 1}, {"field": 2}], pulse_interval_seconds=0.1),
+            sink=File(file_path=self.output_path, file_format=FileFormat.CSV),
+        )
+        def process(payload):
+            return payload
+
+        events = []
+        run_coro = app.run(runtime="local", block=False, event_subscriber=events.append)
+        run_task = asyncio.create_task(run_coro)
+        await asyncio.sleep(1)
+
+        await asyncio.wait_for(app._drain(), timeout=5)
+        await asyncio.wait_for(run_task, timeout=5)
+        self.assertFalse(ray.is_initialized())
+        self.assertEqual(RuntimeStatus.DRAINED, events[-1].status_change.status)
+        self.assertOutput()
+
+    async def test_flow_run_invalid_runtime(self):
+        app = Flow()
+
+        with self.assertRaises(ValueError):
+            app.run(runtime="unknown")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,272 @@
+import asyncio
+import contextlib
+import logging
+from typing import Any, Dict, List, Optional, Type
+
+import fastapi
+import uvicorn
+from starlette.responses import PlainTextResponse
+
+from buildflow.core import utils
+from buildflow.core.app.runtime._runtime import RunID, Runtime, RuntimeStatus
+from buildflow.core.app.runtime.actors.collector_pattern.collector_pool import (
+    CollectorProcessorMetrics,
+    CollectorProcessorSnapshot,
+)
+from buildflow.core.app.runtime.actors.endpoint_pattern.endpoint_pool import (
+    EndpointProcessorSnapshot,
+    IndividualProcessorMetrics,
+)
+from buildflow.core.app.runtime.actors.process_pool import ProcessorGroupSnapshot
+from buildflow.core.app.runtime.fastapi import (
+    create_app,
+    process_and_push,
+    process_and_respond,
+)
+from buildflow.core.background_tasks.background_task import BackgroundTask
+from buildflow.core.options.runtime_options import ProcessorOptions
+from buildflow.core.processor.processor import ProcessorGroup, ProcessorGroupType
+
+
+class _Server(uvicorn.Server):
+    # NOTE: The flow installs its own signal handlers to drain the runtime, so
+    # we don't want uvicorn to capture them.
+    def install_signal_handlers(self) -> None:
+        pass
+
+    @contextlib.contextmanager
+    def capture_signals(self):
+        yield
+
+
+class _RoutePrefixApp:
+    """Routes each request to the app with the longest matching route prefix.
+
+    This mirrors how the ray serve proxy routes requests to deployments.
+    """
+
+    def __init__(self, apps: Dict[str, fastapi.FastAPI]) -> None:
+        self.set_apps(apps)
+
+    def set_apps(self, apps: Dict[str, fastapi.FastAPI]):
+        self.apps = sorted(
+            [(prefix.rstrip("/"), app) for prefix, app in apps.items()],
+            key=lambda prefix_and_app: len(prefix_and_app[0]),
+            reverse=True,
+        )
+
+    async def _lifespan(self, receive, send):
+        # NOTE: We run the startup handlers of each app ourselves, this is
+        # where the processors are setup.
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                try:
+                    for _, app in self.apps:
+                        await app.router.startup()
+                except Exception as e:
+                    logging.exception("failed to start server")
+                    await send({"type": "lifespan.startup.failed", "message": str(e)})
+                    return
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                for _, app in self.apps:
+                    await app.router.shutdown()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        path = scope["path"]
+        for prefix, app in self.apps:
+            if path == prefix or path.startswith(prefix + "/"):
+                scope = dict(scope)
+                scope["root_path"] = scope.get("root_path", "") + prefix
+                scope["path"] = path[len(prefix) :] or "/"
+                await app(scope, receive, send)
+                return
+        await PlainTextResponse("Not Found", status_code=404)(scope, receive, send)
+
+
+class LocalServerPool(Runtime):
+    """Serves all collector and endpoint groups from a single uvicorn server.
+
+    Each group's app is served under the group's base route, the same as
+    the route prefix ray serve uses for each deployment.
+    """
+
+    def __init__(
+        self,
+        run_id: RunID,
+        processor_groups: List[ProcessorGroup],
+        processor_options: Dict[str, ProcessorOptions],
+        flow_dependencies: Dict[Type, Any],
+        serve_host: str,
+        serve_port: int,
+        log_level: str = "INFO",
+    ) -> None:
+        self.run_id = run_id
+        self.processor_groups = processor_groups
+        self.processor_options = processor_options
+        self.flow_dependencies = flow_dependencies
+        self.serve_host = serve_host
+        self.serve_port = serve_port
+        self.log_level = log_level
+        # initial runtime state
+        self.background_tasks: Dict[str, List[BackgroundTask]] = {
+            group.group_id: self._group_background_tasks(group)
+            for group in self.processor_groups
+        }
+        self._group_apps: Dict[str, fastapi.FastAPI] = {}
+        self._app: Optional[_RoutePrefixApp] = None
+        self._status = RuntimeStatus.PENDING
+        self._server: Optional[_Server] = None
+        self._serve_task: Optional[asyncio.Task] = None
+
+    def _group_background_tasks(self, group: ProcessorGroup) -> List[BackgroundTask]:
+        tasks = []
+        for p in group.processors:
+            tasks.extend(p.background_tasks())
+        return tasks
+
+    def _all_background_tasks(self) -> List[BackgroundTask]:
+        return [task for tasks in self.background_tasks.values() for task in tasks]
+
+    def _create_group_app(self, group: ProcessorGroup) -> fastapi.FastAPI:
+        if group.group_type == ProcessorGroupType.COLLECTOR:
+            return create_app(
+                processor_group=group,
+                flow_dependencies=self.flow_dependencies,
+                run_id=self.run_id,
+                process_fn=process_and_push,
+                include_output_type=False,
+            )
+        return create_app(
+            group, self.flow_dependencies, self.run_id, process_and_respond
+        )
+
+    def _routes(self) -> Dict[str, fastapi.FastAPI]:
+        return {
+            group.base_route: self._group_apps[group.group_id]
+            for group in self.processor_groups
+        }
+
+    async def run(self):
+        logging.info("Starting LocalServerPool...")
+        self._group_apps = {
+            group.group_id: self._create_group_app(group)
+            for group in self.processor_groups
+        }
+        self._app = _RoutePrefixApp(self._routes())
+        self._server = _Server(
+            uvicorn.Config(
+                self._app,
+                host=self.serve_host,
+                port=self.serve_port,
+                log_level=self.log_level.lower(),
+            )
+        )
+        self._serve_task = asyncio.create_task(self._server.serve())
+        self._status = RuntimeStatus.RUNNING
+        await asyncio.gather(*[task.start() for task in self._all_background_tasks()])
+
+    async def reload(
+        self,
+        processor_groups: List[ProcessorGroup],
+        processor_options: Dict[str, ProcessorOptions],
+        removed_group_ids: List[str],
+    ):
+        """Swaps in new apps for the given groups without restarting the server.
+
+        Requests to groups that are not reloaded keep being served by their
+        current app.
+        """
+        logging.info("Reloading LocalServerPool...")
+        self.processor_options.update(processor_options)
+        reloaded_ids = set(removed_group_ids)
+        reloaded_ids.update(group.group_id for group in processor_groups)
+        old_apps = [app for gid, app in self._group_apps.items() if gid in reloaded_ids]
+        old_background_tasks = [
+            task
+            for gid, tasks in self.background_tasks.items()
+            if gid in reloaded_ids
+            for task in tasks
+        ]
+        new_apps = {
+            group.group_id: self._create_group_app(group) for group in processor_groups
+        }
+        # NOTE: The server only runs the startup handlers of the apps it was
+        # started with, so we have to run them for any new apps ourselves.
+        for app in new_apps.values():
+            await app.router.startup()
+        self.processor_groups = [
+            group
+            for group in self.processor_groups
+            if group.group_id not in reloaded_ids
+        ] + list(processor_groups)
+        for group_id in removed_group_ids:
+            self._group_apps.pop(group_id, None)
+            self.background_tasks.pop(group_id, None)
+        self._group_apps.update(new_apps)
+        for group in processor_groups:
+            self.background_tasks[group.group_id] = self._group_background_tasks(group)
+            await asyncio.gather(
+                *[task.start() for task in self.background_tasks[group.group_id]]
+            )
+        self._app.set_apps(self._routes())
+        for app in old_apps:
+            await app.router.shutdown()
+        await asyncio.gather(*[task.shutdown() for task in old_background_tasks])
+        return True
+
+    async def drain(self):
+        logging.info("Draining LocalServerPool...")
+        self._status = RuntimeStatus.DRAINING
+        if self._server is not None:
+            self._server.should_exit = True
+            await asyncio.gather(self._serve_task, return_exceptions=True)
+        await asyncio.gather(
+            *[task.shutdown() for task in self._all_background_tasks()]
+        )
+        self._status = RuntimeStatus.DRAINED
+        return True
+
+    def kill(self):
+        if self._server is not None:
+            self._server.force_exit = True
+            self._server.should_exit = True
+        self._status = RuntimeStatus.DRAINED
+
+    async def status(self) -> RuntimeStatus:
+        return self._status
+
+    def group_snapshot(self, group: ProcessorGroup) -> ProcessorGroupSnapshot:
+        options = self.processor_options[group.group_id]
+        # NOTE: Like the ray serve runtime we don't track per processor metrics
+        # for collectors and endpoints yet.
+        if group.group_type == ProcessorGroupType.COLLECTOR:
+            snapshot_type = CollectorProcessorSnapshot
+            metrics_type = CollectorProcessorMetrics
+        else:
+            snapshot_type = EndpointProcessorSnapshot
+            metrics_type = IndividualProcessorMetrics
+        return snapshot_type(
+            status=self._status,
+            timestamp_millis=utils.timestamp_millis(),
+            group_id=group.group_id,
+            group_type=group.group_type,
+            num_replicas=1 if self._status == RuntimeStatus.RUNNING else 0,
+            num_concurrency_per_replica=options.num_concurrency,
+            num_cpu_per_replica=options.num_cpus,
+            processor_snapshots={
+                processor.processor_id: metrics_type(
+                    processor.processor_id, processor.processor_type, 0, 0
+                )
+                for processor in group.processors
+            },
+        )
+
+    async def snapshot(self) -> List[ProcessorGroupSnapshot]:
+        return [self.group_snapshot(group) for group in self.processor_groups]
@@ -1,3 +1,3 @@
 # ruff: noqa
-from .common import num_events_processed, process_time_counter
+from .common import current_job_id, num_events_processed, process_time_counter
 from .metrics import CompositeRateCounterMetric, RateCalculation, SimpleGaugeMetric
@@ -1,9 +1,22 @@
 """Common metrics used across BuildFlow"""
 from typing import Optional
 
+import ray
+
 from .metrics import CompositeRateCounterMetric
 
 
+def current_job_id() -> str:
+    """Returns the ray job ID used to tag metrics.
+
+    Returns "local" when ray has not been initialized (i.e. the local runtime),
+    this avoids implicitly starting a ray cluster just to fetch the job ID.
+    """
+    if not ray.is_initialized():
+        return "local"
+    return ray.get_runtime_context().get_job_id()
+
+
 def num_events_processed(
     processor_id, job_id, run_id, status_code: Optional[str] = None
 ) -> CompositeRateCounterMetric:
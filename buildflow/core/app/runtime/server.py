@@ -2,16 +2,18 @@ import contextlib
 import logging
 import threading
 import time
-from typing import Optional
+from typing import TYPE_CHECKING, Optional
 
 import uvicorn
 from fastapi import APIRouter, FastAPI
 from fastapi.responses import HTMLResponse, JSONResponse
 
 from buildflow.core.app.flow_state import FlowState
-from buildflow.core.app.infra.actors.infra import InfraActor
 from buildflow.core.app.runtime.actors.runtime import RuntimeActor, RuntimeSnapshot
 
+if TYPE_CHECKING:
+    from buildflow.core.app.infra.actors.infra import InfraActor
+
 app = FastAPI(
     docs_url=None,
     redoc_url=None,
@@ -58,7 +60,7 @@ class RuntimeServer(uvicorn.Server):
         host: str,
         port: int,
         flow_state: FlowState,
-        infra_actor: Optional[InfraActor] = None,
+        infra_actor: Optional["InfraActor"] = None,
         *,
         log_level: str = "WARNING",
     ) -> None:
@@ -66,11 +66,50 @@ class AutoscalerOptions(Options):
 # TODO: Add options for other pattern types, or merge into a single options object
 @dataclasses.dataclass
 class ProcessorOptions(Options):
+    """Options for a processor group.
+    health_check_frequency_secs (int): How often the replica pool checks that
+        its replicas are alive. Defaults to 5.
+    heartbeat_timeout_secs (int): How long a replica has to respond to a
+        heartbeat. Sync processors run on the replica's event loop, so this
+        should be longer than the slowest batch. Defaults to 60.
+    max_missed_heartbeats (int): How many heartbeats in a row a replica can
+        miss before it is replaced. Defaults to 3.
+    replica_progress_timeout_secs (int): How long a replica can go without
+        making progress in its processing loop before it is considered wedged
+        and replaced. Defaults to 600.
+    ordered_processing (bool): Whether elements of a batch with the same
+        ordering key (as reported by the source) are processed one after
+        another in order. Defaults to False.
+    max_concurrent_ordering_keys (int): How many ordering keys of a batch are
+        processed in parallel when ordered processing is enabled. Defaults to
+        100.
+    """
+
     num_cpus: float
     num_concurrency: int
     log_level: str
     # the configuration of the autoscaler for this processor
     autoscaler_options: AutoscalerOptions
+    # Options for configuring the replica health check
+    health_check_frequency_secs: int = 5
+    heartbeat_timeout_secs: int = 60
+    max_missed_heartbeats: int = 3
+    replica_progress_timeout_secs: int = 600
+    # Options for configuring ordered processing
+    ordered_processing: bool = False
+    max_concurrent_ordering_keys: int = 100
+
+    def __post_init__(self):
+        if self.max_concurrent_ordering_keys <= 0:
+            raise ValueError("max_concurrent_ordering_keys must be greater than 0")
+        if self.health_check_frequency_secs <= 0:
+            raise ValueError("health_check_frequency_secs must be greater than 0")
+        if self.heartbeat_timeout_secs <= 0:
+            raise ValueError("heartbeat_timeout_secs must be greater than 0")
+        if self.max_missed_heartbeats <= 0:
+            raise ValueError("max_missed_heartbeats must be greater than 0")
+        if self.replica_progress_timeout_secs <= 0:
+            raise ValueError("replica_progress_timeout_secs must be greater than 0")
 
     @classmethod
     def default(cls) -> "ProcessorOptions":
@@ -1,11 +1,13 @@
 import hashlib
+import importlib
 import inspect
 import json
 import logging
 import os
+import sys
 import time
 from functools import wraps
-from typing import Any, Dict, Optional, TypeVar
+from typing import Any, Callable, Dict, Optional, TypeVar
 from uuid import uuid4
 
 import yaml
@@ -114,3 +116,23 @@ def attach_wrapped_method_to_class(cls, method_name, original_func):
     params = sig.parameters.values()
     wrapper.__signature__ = sig.replace(parameters=params)
     setattr(cls, method_name, wrapper)
+
+
+# Returns a module level `__getattr__` (PEP 562) that imports attributes the
+# first time they are accessed. This lets packages re-export their modules
+# without paying the import cost (i.e. cloud SDKs) for ones that aren't used.
+# `lazy_attributes` maps an attribute name to the (relative) module defining it.
+def lazy_module_getattr(
+    module_name: str, lazy_attributes: Dict[str, str]
+) -> Callable[[str], Any]:
+    def __getattr__(name: str) -> Any:
+        if name not in lazy_attributes:
+            raise AttributeError(f"module {module_name!r} has no attribute {name!r}")
+        value = getattr(
+            importlib.import_module(lazy_attributes[name], module_name), name
+        )
+        # Cache the attribute on the module so we only go through here once.
+        setattr(sys.modules[module_name], name, value)
+        return value
+
+    return __getattr__
@@ -106,6 +106,44 @@ async def initialize_dependencies(
     await asyncio.gather(*dependency_coros)
 
 
+def global_dependencies(
+    dependencies: Iterable[DependencyWrapper],
+) -> List["GlobalScoped"]:
+    """Returns the global scoped dependencies, including sub dependencies."""
+    found: List[GlobalScoped] = []
+    to_visit = [wrapper.dependency for wrapper in dependencies]
+    while to_visit:
+        dependency = to_visit.pop()
+        if isinstance(dependency, GlobalScoped):
+            if any(dependency is other for other in found):
+                continue
+            found.append(dependency)
+        to_visit.extend(wrapper.dependency for wrapper in dependency.sub_dependencies)
+    return found
+
+
+def reuse_global_dependencies(
+    dependencies: Iterable[DependencyWrapper],
+    initialized: Dict[str, "GlobalScoped"],
+    reloaded_modules: Iterable[str] = (),
+):
+    """Gives dependencies the instances of already initialized ones.
+
+    Processor groups sent to a runtime carry their own copies of their
+    dependencies. A copy of a dependency in `initialized` (keyed by
+    `GlobalScoped.type_key`) reuses its instance, unless its type comes from
+    one of `reloaded_modules` and so its code may have changed.
+    """
+    reloaded_modules = set(reloaded_modules)
+    for dependency in global_dependencies(dependencies):
+        if dependency.dependency_fn.__module__ in reloaded_modules:
+            continue
+        existing = initialized.get(dependency.type_key)
+        if existing is not None and existing is not dependency:
+            dependency._instance = existing._instance
+            dependency._object_ref = existing._object_ref
+
+
 class Dependency:
     _instance: Any
 
@@ -249,6 +287,11 @@ class GlobalScoped(Dependency):
         self._object_ref = None
         self.global_scoped_id = uuid()
 
+    @property
+    def type_key(self) -> str:
+        """Identifies the dependency's type across copies and processes."""
+        return f"{self.dependency_fn.__module__}.{self.dependency_fn.__qualname__}"
+
     async def initialize(
         self,
         flow_dependencies: List[Any],
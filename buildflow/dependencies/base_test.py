@@ -1,3 +1,4 @@
+import copy
 import unittest
 from unittest import mock
 
@@ -166,6 +167,40 @@ class BaseDependenciesTest(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(resolved["a"], resolved["b"])
         self.assertEqual(resolved["a"].class_val, 1)
 
+    async def test_reuse_global_dependencies(
+        self, mock_get: mock.MagicMock, mock_put: mock.MagicMock
+    ):
+        self.setup_ray_mocks(mock_get, mock_put)
+        num_created = []
+
+        @base.dependency(scope=base.Scope.GLOBAL)
+        class GlobalDep2:
+            def __init__(self):
+                num_created.append(1)
+
+        # Processor groups sent to a runtime carry their own copies of their
+        # dependencies.
+        copied = copy.deepcopy(GlobalDep2)
+        reloaded = copy.deepcopy(GlobalDep2)
+        await GlobalDep2.initialize({}, {}, scopes=[base.Scope.GLOBAL])
+        initialized = {GlobalDep2.type_key: GlobalDep2}
+
+        base.reuse_global_dependencies(
+            [base.DependencyWrapper("a", copied)], initialized
+        )
+        await copied.initialize({}, {}, scopes=[base.Scope.GLOBAL])
+        self.assertIs(GlobalDep2._instance, await copied.resolve({}, {}))
+        self.assertEqual(1, len(num_created))
+
+        base.reuse_global_dependencies(
+            [base.DependencyWrapper("a", reloaded)],
+            initialized,
+            reloaded_modules=[GlobalDep2.dependency_fn.__module__],
+        )
+        await reloaded.initialize({}, {}, scopes=[base.Scope.GLOBAL])
+        self.assertIsNot(GlobalDep2._instance, await reloaded.resolve({}, {}))
+        self.assertEqual(2, len(num_created))
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,53 @@
+import json
+import subprocess
+import sys
+import unittest
+
+# Provider SDKs that should only be imported once a primitive that needs them
+# is used.
+_LAZY_MODULES = [
+    "google.cloud.bigquery",
+    "google.cloud.monitoring_v3",
+    "google.cloud.pubsub_v1",
+    "google.cloud.storage",
+    "pulumi",
+    "pulumi_aws",
+    "pulumi_gcp",
+    "snowflake.ingest",
+    "gcsfs",
+    "s3fs",
+    "pandas",
+    "ray.serve",
+]
+
+_IMPORT_SCRIPT = """
+import json
+import sys
+import time
+
+start = time.perf_counter()
+import buildflow
+from buildflow.io.local import File, Pulse
+elapsed = time.perf_counter() - start
+print(json.dumps({"elapsed": elapsed, "modules": list(sys.modules)}))
+"""
+
+
+class ImportTimeTest(unittest.TestCase):
+    def test_import_does_not_load_provider_sdks(self):
+        # NOTE: We import in a fresh interpreter since other tests will have
+        # already imported most of these modules.
+        output = subprocess.run(
+            [sys.executable, "-c", _IMPORT_SCRIPT],
+            check=True,
+            capture_output=True,
+            text=True,
+        )
+        result = json.loads(output.stdout.strip().splitlines()[-1])
+        print(f"import buildflow took: {result['elapsed']:.3f}s")
+        loaded = set(result["modules"])
+        self.assertEqual([], [m for m in _LAZY_MODULES if m in loaded])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,4 +1,19 @@
 # ruff: noqa
-from .s3 import S3Bucket
-from .s3_file_change_stream import S3FileChangeStream
-from .sqs import SQSQueue
+from typing import TYPE_CHECKING
+
+from buildflow.core.utils import lazy_module_getattr
+
+_LAZY_ATTRIBUTES = {
+    "S3Bucket": ".s3",
+    "S3FileChangeStream": ".s3_file_change_stream",
+    "SQSQueue": ".sqs",
+}
+__all__ = list(_LAZY_ATTRIBUTES)
+# NOTE: Modules are imported on first use so importing one primitive doesn't
+# import the SDKs of every other primitive.
+__getattr__ = lazy_module_getattr(__name__, _LAZY_ATTRIBUTES)
+
+if TYPE_CHECKING:
+    from .s3 import S3Bucket
+    from .s3_file_change_stream import S3FileChangeStream
+    from .sqs import SQSQueue
@@ -1,16 +1,19 @@
-from typing import Optional
-
-import pulumi_aws
+from typing import TYPE_CHECKING, Optional
 
 from buildflow.core.types.aws_types import AWSAccountID, AWSRegion
 
+if TYPE_CHECKING:
+    import pulumi_aws
+
 
 def aws_provider(
     provider_id: str,
     *,
     aws_account_id: Optional[AWSAccountID],
     aws_region: Optional[AWSRegion],
-) -> Optional[pulumi_aws.Provider]:
+) -> Optional["pulumi_aws.Provider"]:
+    import pulumi_aws
+
     if aws_account_id is None and aws_region is None:
         return None
     allowed_account_ids = None
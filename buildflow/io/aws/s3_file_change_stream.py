@@ -2,7 +2,6 @@ import dataclasses
 from typing import Iterable, List
 
 import pulumi
-import pulumi_aws
 
 from buildflow.config.cloud_provider_config import AWSOptions
 from buildflow.core.credentials.aws_credentials import AWSCredentials
@@ -60,6 +59,8 @@ class S3FileChangeStream(AWSPrimtive):
     def pulumi_resources(
         self, credentials: AWSCredentials, opts: pulumi.ResourceOptions
     ) -> List[pulumi.Resource]:
+        import pulumi_aws
+
         queue_resource: pulumi_aws.sqs.Queue = None
         for depends in opts.depends_on:
             if (
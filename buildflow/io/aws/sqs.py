@@ -2,7 +2,6 @@ import dataclasses
 from typing import Optional
 
 import pulumi
-import pulumi_aws
 
 from buildflow.config.cloud_provider_config import AWSOptions
 from buildflow.core.credentials.aws_credentials import AWSCredentials
@@ -12,6 +11,15 @@ from buildflow.io.aws.strategies.sqs_strategies import SQSSink, SQSSource
 from buildflow.io.primitive import AWSPrimtive
 from buildflow.io.strategies.sink import SinkStrategy
 from buildflow.io.strategies.source import SourceStrategy
+from buildflow.io.utils.clients.aws_clients import DEFAULT_MAX_POOL_CONNECTIONS
+
+_DEFAULT_WAIT_TIME_SECONDS = 20
+_DEFAULT_NUM_CONCURRENT_RECEIVES = 1
+_DEFAULT_MAX_LEASE_DURATION_SECONDS = 60 * 60
+_DEFAULT_NACK_DELAY_SECONDS = 0
+_DEFAULT_MAX_NACK_DELAY_SECONDS = 15 * 60
+_DEFAULT_MAX_SEND_ATTEMPTS = 5
+_DEFAULT_MESSAGE_GROUP_ID = "default"
 
 
 @dataclasses.dataclass
@@ -19,6 +27,69 @@ class SQSQueue(AWSPrimtive):
     queue_name: SQSQueueName
     aws_account_id: Optional[AWSAccountID] = None
     aws_region: Optional[AWSRegion] = None
+    # source options
+    wait_time_seconds: int = dataclasses.field(
+        default=_DEFAULT_WAIT_TIME_SECONDS, init=False
+    )
+    num_concurrent_receives: int = dataclasses.field(
+        default=_DEFAULT_NUM_CONCURRENT_RECEIVES, init=False
+    )
+    max_lease_duration_seconds: int = dataclasses.field(
+        default=_DEFAULT_MAX_LEASE_DURATION_SECONDS, init=False
+    )
+    nack_delay_seconds: int = dataclasses.field(
+        default=_DEFAULT_NACK_DELAY_SECONDS, init=False
+    )
+    max_nack_delay_seconds: int = dataclasses.field(
+        default=_DEFAULT_MAX_NACK_DELAY_SECONDS, init=False
+    )
+    # sink options
+    max_send_attempts: int = dataclasses.field(
+        default=_DEFAULT_MAX_SEND_ATTEMPTS, init=False
+    )
+    message_group_id: str = dataclasses.field(
+        default=_DEFAULT_MESSAGE_GROUP_ID, init=False
+    )
+    # shared options
+    max_pool_connections: int = dataclasses.field(
+        default=DEFAULT_MAX_POOL_CONNECTIONS, init=False
+    )
+
+    def options(
+        self,
+        # Source options
+        # How long a receive waits for messages to arrive (long polling).
+        wait_time_seconds: int = _DEFAULT_WAIT_TIME_SECONDS,
+        # How many receives are sent at once when there is a backlog, each
+        # receive returns at most 10 messages.
+        num_concurrent_receives: int = _DEFAULT_NUM_CONCURRENT_RECEIVES,
+        # The max amount of time a received message has its visibility timeout
+        # extended for while it is being processed.
+        max_lease_duration_seconds: int = _DEFAULT_MAX_LEASE_DURATION_SECONDS,
+        # How long a message that failed processing waits before it is
+        # redelivered. The delay doubles every time the message is received, up
+        # to max_nack_delay_seconds. 0 redelivers failed messages immediately.
+        nack_delay_seconds: int = _DEFAULT_NACK_DELAY_SECONDS,
+        max_nack_delay_seconds: int = _DEFAULT_MAX_NACK_DELAY_SECONDS,
+        # Sink options
+        # How many times a message that failed to send is attempted.
+        max_send_attempts: int = _DEFAULT_MAX_SEND_ATTEMPTS,
+        # The message group of messages sent to a FIFO queue, unless the
+        # message is a `SQSMessage` with its own group.
+        message_group_id: str = _DEFAULT_MESSAGE_GROUP_ID,
+        # Shared options
+        # The max number of connections the async SQS client keeps open.
+        max_pool_connections: int = DEFAULT_MAX_POOL_CONNECTIONS,
+    ) -> "SQSQueue":
+        self.wait_time_seconds = wait_time_seconds
+        self.num_concurrent_receives = num_concurrent_receives
+        self.max_lease_duration_seconds = max_lease_duration_seconds
+        self.nack_delay_seconds = nack_delay_seconds
+        self.max_nack_delay_seconds = max_nack_delay_seconds
+        self.max_send_attempts = max_send_attempts
+        self.message_group_id = message_group_id
+        self.max_pool_connections = max_pool_connections
+        return self
 
     def primitive_id(self):
         queue_id_components = []
@@ -40,6 +111,12 @@ class SQSQueue(AWSPrimtive):
             queue_name=self.queue_name,
             aws_account_id=self.aws_account_id,
             aws_region=self.aws_region,
+            wait_time_seconds=self.wait_time_seconds,
+            num_concurrent_receives=self.num_concurrent_receives,
+            max_lease_duration_seconds=self.max_lease_duration_seconds,
+            max_pool_connections=self.max_pool_connections,
+            nack_delay_seconds=self.nack_delay_seconds,
+            max_nack_delay_seconds=self.max_nack_delay_seconds,
         )
 
     def sink(self, credentials: AWSCredentials) -> SinkStrategy:
@@ -48,11 +125,16 @@ class SQSQueue(AWSPrimtive):
             queue_name=self.queue_name,
             aws_account_id=self.aws_account_id,
             aws_region=self.aws_region,
+            max_pool_connections=self.max_pool_connections,
+            max_send_attempts=self.max_send_attempts,
+            message_group_id=self.message_group_id,
         )
 
     def pulumi_resources(
         self, credentials: AWSCredentials, opts: pulumi.ResourceOptions
     ):
+        import pulumi_aws
+
         provider = aws_provider(
             self.primitive_id(),
             aws_account_id=self.aws_account_id,
@@ -63,6 +145,10 @@ class SQSQueue(AWSPrimtive):
         )
         return [
             pulumi_aws.sqs.Queue(
-                resource_name=self.primitive_id(), name=self.queue_name, opts=opts
+                resource_name=self.primitive_id(),
+                name=self.queue_name,
+                # NOTE: SQS requires FIFO queue names to end with .fifo
+                fifo_queue=self.queue_name.endswith(".fifo"),
+                opts=opts,
             )
         ]
@@ -4,7 +4,7 @@ from typing import Any, Callable, Coroutine, Type
 from buildflow.core.credentials.aws_credentials import AWSCredentials
 from buildflow.io.aws.strategies.sqs_strategies import SQSSource
 from buildflow.io.strategies.source import AckInfo, PullResponse, SourceStrategy
-from buildflow.io.utils.clients.aws_clients import AWSClients
+from buildflow.io.utils.clients.aws_clients import AsyncClientRef, AWSClients
 from buildflow.io.utils.schemas import converters
 from buildflow.types.aws import S3ChangeStreamEventType, S3FileChangeEvent
 
@@ -24,10 +24,12 @@ class S3FileChangeStreamSource(SourceStrategy):
         self.sqs_queue_source = sqs_source
         aws_clients = AWSClients(credentials=credentials, region=aws_region)
         self._s3_client = aws_clients.s3_client()
+        self._async_s3_client = AsyncClientRef(aws_clients, "s3")
         self._filter_test_events = filter_test_events
 
     async def pull(self) -> PullResponse:
         sqs_response = await self.sqs_queue_source.pull()
+        async_s3_client = await self._async_s3_client.get()
         parsed_payloads = []
         for payload in sqs_response.payload:
             metadata = json.loads(payload)
@@ -40,6 +42,7 @@ class S3FileChangeStreamSource(SourceStrategy):
                         S3FileChangeEvent(
                             bucket_name=bucket_name,
                             s3_client=self._s3_client,
+                            async_s3_client=async_s3_client,
                             file_path=file_path,
                             event_type=s3_event_type,
                             metadata=record,
@@ -56,6 +59,7 @@ class S3FileChangeStreamSource(SourceStrategy):
                 parsed_payloads.append(
                     S3FileChangeEvent(
                         s3_client=self._s3_client,
+                        async_s3_client=async_s3_client,
                         bucket_name=metadata.get("Bucket"),
                         metadata=metadata,
                         file_path=None,
@@ -75,3 +79,7 @@ class S3FileChangeStreamSource(SourceStrategy):
 
     def max_batch_size(self) -> int:
         return self.sqs_queue_source.max_batch_size()
+
+    async def teardown(self):
+        await self.sqs_queue_source.teardown()
+        await self._async_s3_client.close()
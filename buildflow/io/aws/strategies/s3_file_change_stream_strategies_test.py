@@ -3,6 +3,7 @@ import os
 import unittest
 
 import boto3
+import pytest
 from moto import mock_sqs, mock_sts
 
 from buildflow.core.credentials.aws_credentials import AWSCredentials
@@ -217,5 +218,52 @@ class S3FileChangeStreamTest(unittest.IsolatedAsyncioTestCase):
                 self.assertEqual(backlog, 0)
 
 
+@pytest.mark.usefixtures("moto_server")
+class S3FileChangeStreamReadBlobTest(unittest.IsolatedAsyncioTestCase):
+    async def test_s3_file_change_stream_read_blob(self):
+        region = "us-east-1"
+        queue_name = "test_queue"
+        bucket_name = "test-bucket"
+        creds = AWSCredentials(CredentialsOptions.default())
+        boto3.client("sqs", region_name=region).create_queue(QueueName=queue_name)
+        s3_client = boto3.client("s3", region_name=region)
+        s3_client.create_bucket(Bucket=bucket_name)
+        s3_client.put_object(Bucket=bucket_name, Key="newfile.txt", Body=b"hello")
+
+        sink = SQSSink(
+            credentials=creds,
+            queue_name=queue_name,
+            aws_region=region,
+            aws_account_id=None,
+        )
+        record = {
+            "s3": {
+                "object": {"key": "newfile.txt"},
+                "bucket": {"name": bucket_name},
+            },
+            "eventName": "ObjectCreated:Put",
+        }
+        await sink.push([json.dumps({"Records": [record]})])
+        await sink.teardown()
+
+        source = SQSSource(
+            credentials=creds,
+            queue_name=queue_name,
+            aws_region=region,
+            aws_account_id=None,
+            wait_time_seconds=0,
+        )
+        s3_stream = S3FileChangeStreamSource(
+            sqs_source=source, aws_region=region, credentials=creds
+        )
+        pull_response = await s3_stream.pull()
+        self.assertEqual(len(pull_response.payload), 1)
+
+        self.assertEqual(b"hello", await pull_response.payload[0].read_blob())
+
+        await s3_stream.ack(pull_response.ack_info, True)
+        await s3_stream.teardown()
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -31,6 +31,7 @@ class S3StrategiesTest(unittest.IsolatedAsyncioTestCase):
                 file_format=FileFormat.PARQUET,
             )
             await self.sink.push([{"a": 1}])
+            await self.sink.teardown()
             objects = list(self.s3_bucket.objects.all())
             self.assertEqual(1, len(objects))
             object = objects[0]
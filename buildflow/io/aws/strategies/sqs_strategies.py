@@ -1,22 +1,39 @@
 import asyncio
 import dataclasses
-from typing import Any, Callable, Iterable, List, Optional, Type
+import hashlib
+import logging
+from typing import Any, Callable, Dict, Iterable, List, Optional, Type
 
 from buildflow.core.credentials.aws_credentials import AWSCredentials
 from buildflow.core.types.aws_types import AWSAccountID, AWSRegion, SQSQueueName
-from buildflow.core.utils import uuid
 from buildflow.io.strategies.sink import Batch, SinkStrategy
 from buildflow.io.strategies.source import AckInfo, PullResponse, SourceStrategy
-from buildflow.io.utils.clients.aws_clients import AWSClients
+from buildflow.io.utils.clients.aws_clients import (
+    DEFAULT_MAX_POOL_CONNECTIONS,
+    AsyncClientRef,
+    AWSClients,
+)
+from buildflow.io.utils.lease_manager import LeaseManager
 from buildflow.io.utils.schemas import converters
+from buildflow.types.aws import SQSMessage
 
 _MAX_BATCH_SIZE = 10
+# The max size of a message, and of all messages sent in one batch (256 KiB).
+_MAX_BATCH_BYTES = 256 * 1024
+# The longest SQS allows a receive to wait for messages.
+_MAX_WAIT_TIME_SECONDS = 20
+# The least we extend a visibility timeout by.
+_MIN_VISIBILITY_EXTENSION_SECONDS = 10
+# The max visibility timeout SQS allows (12 hours).
+_MAX_VISIBILITY_TIMEOUT_SECONDS = 12 * 60 * 60
 
 
 @dataclasses.dataclass(frozen=True)
 class _MessageInfo:
     message_id: str
     receipt_handle: str
+    # How many times the message has been received, including this time.
+    receive_count: int = 1
 
 
 @dataclasses.dataclass
@@ -36,46 +53,146 @@ def _get_queue_url(
     return response["QueueUrl"]
 
 
+def _entry_size(entry: Dict[str, Any]) -> int:
+    return len(entry["MessageBody"].encode("utf-8"))
+
+
+def _send_batches(
+    entries: List[Dict[str, Any]],
+    max_messages: int = _MAX_BATCH_SIZE,
+    max_bytes: int = _MAX_BATCH_BYTES,
+) -> List[List[Dict[str, Any]]]:
+    """Splits entries into batches that fit in a single send request."""
+    batches = []
+    batch = []
+    batch_bytes = 0
+    for entry in entries:
+        entry_bytes = _entry_size(entry)
+        if batch and (
+            len(batch) >= max_messages or batch_bytes + entry_bytes > max_bytes
+        ):
+            batches.append(batch)
+            batch = []
+            batch_bytes = 0
+        batch.append(entry)
+        batch_bytes += entry_bytes
+    if batch:
+        batches.append(batch)
+    return batches
+
+
 class SQSSink(SinkStrategy):
+    """Sends batches to a queue.
+
+    Batches are packed into send requests by both message count and size.
+    Entries that fail are retried with exponential backoff, without resending
+    the entries that succeeded. Entries rejected because of the message itself
+    (sender faults) are not retried.
+
+    For FIFO queues every message needs a message group id and deduplication
+    id, elements that are `SQSMessage`s can set these, otherwise they default
+    to `message_group_id` and a hash of the message body. Send requests are
+    sent one after another so messages keep their order, but a retried entry
+    can land after later messages of its group.
+    """
+
     def __init__(
         self,
         credentials: AWSCredentials,
         queue_name: SQSQueueName,
         aws_account_id: Optional[AWSAccountID],
         aws_region: Optional[AWSRegion],
+        max_pool_connections: int = DEFAULT_MAX_POOL_CONNECTIONS,
+        max_send_attempts: int = 5,
+        initial_retry_delay_seconds: float = 0.1,
+        max_retry_delay_seconds: float = 10,
+        message_group_id: str = "default",
     ):
         super().__init__(credentials, "aws-sqs-sink")
         self.queue_name = queue_name
         self.aws_account_id = aws_account_id
         self.aws_region = aws_region
+        self.max_send_attempts = max_send_attempts
+        self.initial_retry_delay_seconds = initial_retry_delay_seconds
+        self.max_retry_delay_seconds = max_retry_delay_seconds
+        self.message_group_id = message_group_id
+        self.fifo = queue_name.endswith(".fifo")
         aws_clients = AWSClients(credentials=credentials, region=self.aws_region)
         self.sqs_client = aws_clients.sqs_client()
         self.queue_url = _get_queue_url(
             self.sqs_client, self.queue_name, self.aws_account_id
         )
-
-    def _send_messages(self, messages: List[str]):
-        to_send = []
-        for message in messages:
-            to_send.append({"Id": uuid(80), "MessageBody": message})
-        response = self.sqs_client.send_message_batch(
-            QueueUrl=self.queue_url, Entries=to_send
+        self._async_sqs_client = AsyncClientRef(
+            aws_clients, "sqs", max_pool_connections
         )
-        if "Failed" in response:
-            raise ValueError(f"failed to write messages to SQS: {response['Failed']}")
 
-    async def push(self, batch: Batch):
-        coros = []
-        loop = asyncio.get_event_loop()
-        for i in range(0, len(batch), _MAX_BATCH_SIZE):
-            batch_to_write = batch[i : i + _MAX_BATCH_SIZE]
-            coros.append(
-                loop.run_in_executor(None, self._send_messages, batch_to_write)
+    def _to_entry(self, entry_id: int, elem: Any) -> Dict[str, Any]:
+        message = elem if isinstance(elem, SQSMessage) else SQSMessage(body=elem)
+        entry = {"Id": str(entry_id), "MessageBody": message.body}
+        if _entry_size(entry) > _MAX_BATCH_BYTES:
+            raise ValueError(
+                f"SQS messages can be at most {_MAX_BATCH_BYTES} bytes, got a "
+                f"message of {_entry_size(entry)} bytes."
+            )
+        if self.fifo:
+            entry["MessageGroupId"] = message.message_group_id or self.message_group_id
+            entry["MessageDeduplicationId"] = (
+                message.deduplication_id
+                or hashlib.sha256(message.body.encode("utf-8")).hexdigest()
             )
+        return entry
 
-        return await asyncio.gather(*coros)
+    async def _send_messages(self, entries: List[Dict[str, Any]]):
+        delay = self.initial_retry_delay_seconds
+        for attempt in range(1, self.max_send_attempts + 1):
+            sqs_client = await self._async_sqs_client.get()
+            response = await sqs_client.send_message_batch(
+                QueueUrl=self.queue_url, Entries=entries
+            )
+            failed = response.get("Failed")
+            if not failed:
+                return
+            if attempt == self.max_send_attempts or any(
+                f.get("SenderFault") for f in failed
+            ):
+                raise ValueError(f"failed to write messages to SQS: {failed}")
+            failed_ids = {f["Id"] for f in failed}
+            entries = [entry for entry in entries if entry["Id"] in failed_ids]
+            logging.warning(
+                "sending %s messages to %s failed with: %s, retrying in %.1f "
+                "seconds.",
+                len(entries),
+                self.queue_name,
+                failed,
+                delay,
+            )
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_retry_delay_seconds)
+
+    async def _send_in_order(self, batches: List[List[Dict[str, Any]]]):
+        for batch in batches:
+            await self._send_messages(batch)
+
+    async def push(self, batch: Batch):
+        entries = [self._to_entry(i, elem) for i, elem in enumerate(batch)]
+        batches = _send_batches(entries)
+        if self.fifo:
+            return await self._send_in_order(batches)
+        # NOTE: We wait for all sends to finish before raising so a failed
+        # send doesn't cancel sends that are still in flight.
+        results = await asyncio.gather(
+            *[self._send_messages(b) for b in batches], return_exceptions=True
+        )
+        errors = [result for result in results if isinstance(result, Exception)]
+        if errors:
+            raise errors[0]
+
+    async def teardown(self):
+        await self._async_sqs_client.close()
 
     def push_converter(self, user_defined_type: Optional[Type]) -> Callable[[Any], str]:
+        if user_defined_type is SQSMessage:
+            return converters.identity()
         return converters.str_push_converter(user_defined_type)
 
 
@@ -86,61 +203,208 @@ class SQSSource(SourceStrategy):
         queue_name: SQSQueueName,
         aws_account_id: Optional[AWSAccountID],
         aws_region: Optional[AWSRegion],
+        wait_time_seconds: int = 20,
+        num_concurrent_receives: int = 1,
+        max_lease_duration_seconds: int = 60 * 60,
+        max_pool_connections: int = DEFAULT_MAX_POOL_CONNECTIONS,
+        nack_delay_seconds: int = 0,
+        max_nack_delay_seconds: int = 15 * 60,
     ):
         super().__init__(credentials, "aws-sqs-source")
+        if not 0 <= wait_time_seconds <= _MAX_WAIT_TIME_SECONDS:
+            raise ValueError(
+                f"wait_time_seconds must be between 0 and {_MAX_WAIT_TIME_SECONDS}"
+            )
+        if num_concurrent_receives < 1:
+            raise ValueError("num_concurrent_receives must be at least 1")
+        if not 0 <= nack_delay_seconds <= max_nack_delay_seconds:
+            raise ValueError(
+                "nack_delay_seconds must be between 0 and max_nack_delay_seconds"
+            )
+        if max_nack_delay_seconds > _MAX_VISIBILITY_TIMEOUT_SECONDS:
+            raise ValueError(
+                "max_nack_delay_seconds can be at most "
+                f"{_MAX_VISIBILITY_TIMEOUT_SECONDS}"
+            )
         self.queue_name = queue_name
         self.aws_account_id = aws_account_id
         self.aws_region = aws_region
+        self.wait_time_seconds = wait_time_seconds
+        self.num_concurrent_receives = num_concurrent_receives
+        self.max_lease_duration_seconds = max_lease_duration_seconds
+        self.nack_delay_seconds = nack_delay_seconds
+        self.max_nack_delay_seconds = max_nack_delay_seconds
         aws_clients = AWSClients(credentials=credentials, region=self.aws_region)
         self.sqs_client = aws_clients.sqs_client()
         self.queue_url = _get_queue_url(
             self.sqs_client, self.queue_name, self.aws_account_id
         )
+        # NOTE: The queue's visibility timeout is fetched on the first pull.
+        self.visibility_timeout_seconds: Optional[int] = None
+        # NOTE: The sync client is only used for setup and fetching the
+        # backlog, pulling and acking use a pooled async client.
+        self._async_sqs_client = AsyncClientRef(
+            aws_clients, "sqs", max_pool_connections
+        )
+        self._lease_manager: Optional[LeaseManager] = None
 
-    def _pull(self) -> PullResponse:
-        response = self.sqs_client.receive_message(
+    async def _get_lease_manager(self) -> LeaseManager:
+        if self._lease_manager is None:
+            sqs_client = await self._async_sqs_client.get()
+            response = await sqs_client.get_queue_attributes(
+                QueueUrl=self.queue_url, AttributeNames=["VisibilityTimeout"]
+            )
+            visibility_timeout_seconds = int(
+                response["Attributes"]["VisibilityTimeout"]
+            )
+            if self._lease_manager is not None:
+                # Another pull created it while we were waiting.
+                return self._lease_manager
+            self.visibility_timeout_seconds = visibility_timeout_seconds
+            # NOTE: Received messages have their visibility timeout extended in
+            # the background until they are acked, so slow batches are not
+            # redelivered while they are still being processed.
+            self._lease_manager = LeaseManager(
+                self._extend_visibility_timeouts,
+                initial_deadline_seconds=visibility_timeout_seconds,
+                min_deadline_seconds=max(
+                    visibility_timeout_seconds, _MIN_VISIBILITY_EXTENSION_SECONDS
+                ),
+                max_deadline_seconds=_MAX_VISIBILITY_TIMEOUT_SECONDS,
+                max_lease_duration_seconds=self.max_lease_duration_seconds,
+            )
+        return self._lease_manager
+
+    async def _receive(self, wait_time_seconds: int) -> List[Dict[str, Any]]:
+        sqs_client = await self._async_sqs_client.get()
+        response = await sqs_client.receive_message(
             QueueUrl=self.queue_url,
             AttributeNames=["All"],
             MaxNumberOfMessages=_MAX_BATCH_SIZE,
+            WaitTimeSeconds=wait_time_seconds,
         )
+        return response.get("Messages", [])
+
+    async def pull(self) -> PullResponse:
+        lease_manager = await self._get_lease_manager()
+        # The first receive long polls, so we don't spin on an empty queue.
+        messages = await self._receive(self.wait_time_seconds)
+        if len(messages) == _MAX_BATCH_SIZE and self.num_concurrent_receives > 1:
+            # NOTE: A full receive means there is likely more available, so
+            # we fill the rest of the batch with concurrent receives. These
+            # don't wait so a small backlog doesn't delay the batch.
+            responses = await asyncio.gather(
+                *[self._receive(0) for _ in range(self.num_concurrent_receives - 1)]
+            )
+            for response in responses:
+                messages.extend(response)
         payload = []
         message_infos = []
-        for message in response.get("Messages", []):
+        for message in messages:
             message_info = _MessageInfo(
-                message_id=message["MessageId"], receipt_handle=message["ReceiptHandle"]
+                message_id=message["MessageId"],
+                receipt_handle=message["ReceiptHandle"],
+                receive_count=int(
+                    message.get("Attributes", {}).get("ApproximateReceiveCount", 1)
+                ),
             )
             message_infos.append(message_info)
             payload.append(message["Body"])
+        lease_manager.add(message_infos)
         return PullResponse(
             payload=payload, ack_info=_SQSAckInfo(message_infos=message_infos)
         )
 
-    async def pull(self) -> PullResponse:
-        loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(None, self._pull)
+    async def _change_visibility_timeouts(
+        self, message_infos: Iterable[_MessageInfo], visibility_timeout_seconds: int
+    ):
+        entries = []
+        for info in message_infos:
+            entries.append(
+                {
+                    "Id": info.message_id,
+                    "ReceiptHandle": info.receipt_handle,
+                    "VisibilityTimeout": visibility_timeout_seconds,
+                }
+            )
+        sqs_client = await self._async_sqs_client.get()
+        response = await sqs_client.change_message_visibility_batch(
+            QueueUrl=self.queue_url, Entries=entries
+        )
+        if response.get("Failed"):
+            raise ValueError(f"change message visibility failed: {response['Failed']}")
 
-    def _delete_messages(self, batch_to_delete: Iterable[_MessageInfo]):
+    async def _extend_visibility_timeouts(
+        self, message_infos: List[_MessageInfo], visibility_timeout_seconds: int
+    ):
+        await asyncio.gather(
+            *[
+                self._change_visibility_timeouts(
+                    message_infos[i : i + _MAX_BATCH_SIZE], visibility_timeout_seconds
+                )
+                for i in range(0, len(message_infos), _MAX_BATCH_SIZE)
+            ]
+        )
+
+    async def _delete_messages(self, batch_to_delete: Iterable[_MessageInfo]):
         to_delete = []
         for info in batch_to_delete:
             to_delete.append(
                 {"Id": info.message_id, "ReceiptHandle": info.receipt_handle}
             )
-        response = self.sqs_client.delete_message_batch(
+        sqs_client = await self._async_sqs_client.get()
+        response = await sqs_client.delete_message_batch(
             QueueUrl=self.queue_url, Entries=to_delete
         )
-        if "Failed" in response:
+        if response.get("Failed"):
             raise ValueError(f"message delete failed: {response['Failed']}")
 
+    def nack_delay(self, receive_count: int) -> int:
+        """Returns how long a nacked message stays invisible before redelivery.
+
+        The delay doubles every time the message is received, starting at
+        `nack_delay_seconds` and capped at `max_nack_delay_seconds`.
+        """
+        if self.nack_delay_seconds == 0:
+            return 0
+        # NOTE: We cap the exponent so large receive counts don't overflow.
+        exponent = min(max(receive_count - 1, 0), 32)
+        return min(self.nack_delay_seconds * 2**exponent, self.max_nack_delay_seconds)
+
+    async def _nack(self, message_infos: Iterable[_MessageInfo]):
+        by_delay: Dict[int, List[_MessageInfo]] = {}
+        for info in message_infos:
+            by_delay.setdefault(self.nack_delay(info.receive_count), []).append(info)
+        # This makes the messages visible again once the delay passes, instead
+        # of once the visibility timeout expires.
+        await asyncio.gather(
+            *[
+                self._extend_visibility_timeouts(infos, delay)
+                for delay, infos in by_delay.items()
+            ]
+        )
+
     async def ack(self, to_ack: _SQSAckInfo, success: bool):
+        # Stop extending the visibility timeouts first so we don't extend the
+        # timeout of a message after it has been nacked.
+        self._lease_manager.remove(to_ack.message_infos)
         if success:
             coros = []
-            loop = asyncio.get_event_loop()
             for i in range(0, len(to_ack.message_infos), _MAX_BATCH_SIZE):
                 batch_to_delete = to_ack.message_infos[i : i + _MAX_BATCH_SIZE]
-                coros.append(
-                    loop.run_in_executor(None, self._delete_messages, batch_to_delete)
-                )
+                coros.append(self._delete_messages(batch_to_delete))
             await asyncio.gather(*coros)
+        elif to_ack.message_infos:
+            await self._nack(to_ack.message_infos)
+
+    def split_ack_info(self, ack_info: _SQSAckInfo, indices: List[int]) -> AckInfo:
+        message_infos = list(ack_info.message_infos)
+        return _SQSAckInfo(message_infos=[message_infos[i] for i in indices])
+
+    async def teardown(self):
+        if self._lease_manager is not None:
+            await self._lease_manager.stop()
+        await self._async_sqs_client.close()
 
     def _get_backlog(self):
         queue_atts = self.sqs_client.get_queue_attributes(
@@ -155,7 +419,7 @@ class SQSSource(SourceStrategy):
         return await loop.run_in_executor(None, self._get_backlog)
 
     def max_batch_size(self) -> int:
-        return _MAX_BATCH_SIZE
+        return _MAX_BATCH_SIZE * self.num_concurrent_receives
 
     def pull_converter(self, type_: Type) -> Callable[[str], Any]:
         return converters.str_pull_converter(type_)
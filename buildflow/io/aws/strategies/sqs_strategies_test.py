@@ -1,94 +1,313 @@
 import json
-import os
 import unittest
+from unittest import mock
 
 import boto3
-from moto import mock_sqs, mock_sts
+import pytest
 
 from buildflow.core.credentials.aws_credentials import AWSCredentials
 from buildflow.core.options.credentials_options import CredentialsOptions
-from buildflow.core.types.aws_types import AWSRegion, SQSQueueName
+from buildflow.core.types.aws_types import SQSQueueName
 from buildflow.io.aws.strategies.sqs_strategies import SQSSink, SQSSource
+from buildflow.types.aws import SQSMessage
 
 
+@pytest.mark.usefixtures("moto_server")
 class SqsStrategiesTest(unittest.IsolatedAsyncioTestCase):
-    def _create_queue(self, queue_name: SQSQueueName, region: AWSRegion):
-        self.sqs_client.create_queue(QueueName=queue_name)
+    def _create_queue(self, queue_name: SQSQueueName, **attributes):
+        self.sqs_client.create_queue(QueueName=queue_name, Attributes=attributes)
         return self.sqs_client.get_queue_url(QueueName=queue_name)["QueueUrl"]
 
     async def asyncSetUp(self) -> None:
-        os.environ["AWS_ACCESS_KEY_ID"] = "dummy"
-        os.environ["AWS_SECRET_ACCESS_KEY"] = "dummy"
         self.region = "us-east-1"
         self.queue_name = "test_queue"
         self.sqs_client = boto3.client("sqs", region_name=self.region)
         self.creds = AWSCredentials(CredentialsOptions.default())
 
-    @mock_sqs
-    @mock_sts
+    def _sink(self, **kwargs) -> SQSSink:
+        return SQSSink(
+            credentials=self.creds,
+            queue_name=self.queue_name,
+            aws_region=self.region,
+            aws_account_id=None,
+            **kwargs,
+        )
+
+    def _receive_all(self):
+        messages = []
+        while True:
+            response = self.sqs_client.receive_message(
+                QueueUrl=self.queue_url,
+                AttributeNames=["All"],
+                MaxNumberOfMessages=10,
+            )
+            if not response.get("Messages"):
+                return messages
+            messages.extend(response["Messages"])
+
+    def _source(self, **kwargs) -> SQSSource:
+        return SQSSource(
+            credentials=self.creds,
+            queue_name=self.queue_name,
+            aws_region=self.region,
+            aws_account_id=None,
+            **kwargs,
+        )
+
     async def test_sqs_sink_push(self):
-        with mock_sqs():
-            with mock_sts():
-                self.queue_url = self._create_queue(self.queue_name, self.region)
-                sink = SQSSink(
-                    credentials=self.creds,
-                    queue_name=self.queue_name,
-                    aws_region=self.region,
-                    aws_account_id=None,
-                )
-                # Add more than ten elements to ensure we chunk if up properly
-                await sink.push([json.dumps({"a": 1})] * 12)
+        self.queue_url = self._create_queue(self.queue_name)
+        sink = self._sink()
+        # Add more than ten elements to ensure we chunk if up properly
+        await sink.push([json.dumps({"a": 1})] * 12)
+        await sink.teardown()
 
-                response1 = self.sqs_client.receive_message(
-                    QueueUrl=self.queue_url,
-                    AttributeNames=["All"],
-                    MaxNumberOfMessages=10,
-                )
-                response2 = self.sqs_client.receive_message(
-                    QueueUrl=self.queue_url,
-                    AttributeNames=["All"],
-                    MaxNumberOfMessages=10,
+        response1 = self.sqs_client.receive_message(
+            QueueUrl=self.queue_url,
+            AttributeNames=["All"],
+            MaxNumberOfMessages=10,
+        )
+        response2 = self.sqs_client.receive_message(
+            QueueUrl=self.queue_url,
+            AttributeNames=["All"],
+            MaxNumberOfMessages=10,
+        )
+        messages = response1["Messages"] + response2["Messages"]
+        self.assertEqual(len(messages), 12)
+
+    async def test_sqs_sink_push_packs_by_size(self):
+        self.queue_url = self._create_queue(self.queue_name)
+        sink = self._sink()
+        sqs_client = await sink._async_sqs_client.get()
+        big_message = "a" * 100 * 1024
+
+        with mock.patch.object(
+            sqs_client, "send_message_batch", wraps=sqs_client.send_message_batch
+        ) as send:
+            await sink.push([big_message] * 5)
+
+        # At most two 100KiB messages fit in a 256KiB request.
+        self.assertEqual(
+            [2, 2, 1], [len(c.kwargs["Entries"]) for c in send.call_args_list]
+        )
+        self.assertEqual(5, len(self._receive_all()))
+        await sink.teardown()
+
+    async def test_sqs_sink_retries_failed_entries(self):
+        self.queue_url = self._create_queue(self.queue_name)
+        sink = self._sink(initial_retry_delay_seconds=0)
+        sqs_client = await sink._async_sqs_client.get()
+        send_message_batch = sqs_client.send_message_batch
+        sent_ids = []
+
+        async def fail_first_entry_once(QueueUrl, Entries):
+            sent_ids.append([entry["Id"] for entry in Entries])
+            if len(sent_ids) == 1:
+                response = await send_message_batch(
+                    QueueUrl=QueueUrl, Entries=Entries[1:]
                 )
-                messages = response1["Messages"] + response2["Messages"]
-                self.assertEqual(len(messages), 12)
+                response["Failed"] = [
+                    {"Id": Entries[0]["Id"], "SenderFault": False, "Code": "Error"}
+                ]
+                return response
+            return await send_message_batch(QueueUrl=QueueUrl, Entries=Entries)
+
+        with mock.patch.object(
+            sqs_client, "send_message_batch", side_effect=fail_first_entry_once
+        ):
+            with self.assertLogs(level="WARNING"):
+                await sink.push(["a", "b", "c"])
+
+        self.assertEqual([["0", "1", "2"], ["0"]], sent_ids)
+        self.assertEqual(
+            ["a", "b", "c"], sorted(m["Body"] for m in self._receive_all())
+        )
+        await sink.teardown()
+
+    async def test_sqs_sink_does_not_retry_sender_faults(self):
+        self.queue_url = self._create_queue(self.queue_name)
+        sink = self._sink(initial_retry_delay_seconds=0)
+        sqs_client = await sink._async_sqs_client.get()
+
+        with mock.patch.object(
+            sqs_client,
+            "send_message_batch",
+            new_callable=mock.AsyncMock,
+            return_value={
+                "Successful": [],
+                "Failed": [{"Id": "0", "SenderFault": True, "Code": "Invalid"}],
+            },
+        ) as send:
+            with self.assertRaises(ValueError):
+                await sink.push(["a"])
+
+        self.assertEqual(1, send.await_count)
+        await sink.teardown()
+
+    async def test_sqs_sink_push_fifo(self):
+        self.queue_name = "test_queue.fifo"
+        self.queue_url = self._create_queue(self.queue_name, FifoQueue="true")
+        sink = self._sink(message_group_id="my-group")
+
+        await sink.push(
+            [
+                SQSMessage(body="a", message_group_id="other-group"),
+                SQSMessage(body="b", deduplication_id="b-id"),
+            ]
+        )
+        # Duplicate bodies are deduplicated by default.
+        await sink.push([SQSMessage(body="a", message_group_id="other-group")])
+
+        messages = self._receive_all()
+        self.assertEqual(
+            [("a", "other-group"), ("b", "my-group")],
+            sorted((m["Body"], m["Attributes"]["MessageGroupId"]) for m in messages),
+        )
+        await sink.teardown()
 
-    @mock_sqs
-    @mock_sts
     async def test_sqs_source_pull(self):
-        with mock_sts():
-            with mock_sqs():
-                self.queue_url = self._create_queue(self.queue_name, self.region)
-                sink = SQSSink(
-                    credentials=self.creds,
-                    queue_name=self.queue_name,
-                    aws_region=self.region,
-                    aws_account_id=None,
-                )
-                # push a bunch of elements to the queue
-                await sink.push([json.dumps({"a": 1})] * 12)
-
-                source = SQSSource(
-                    credentials=self.creds,
-                    queue_name=self.queue_name,
-                    aws_region=self.region,
-                    aws_account_id=None,
-                )
+        self.queue_url = self._create_queue(self.queue_name)
+        sink = self._sink()
+        # push a bunch of elements to the queue
+        await sink.push([json.dumps({"a": 1})] * 12)
+
+        source = self._source()
+
+        backlog = await source.backlog()
+        self.assertEqual(backlog, 12)
+
+        pull_response1 = await source.pull()
+        self.assertEqual(len(pull_response1.payload), 10)
+
+        await source.ack(pull_response1.ack_info, True)
+        backlog = await source.backlog()
+        self.assertEqual(backlog, 2)
+
+        pull_response2 = await source.pull()
+        self.assertEqual(len(pull_response2.payload), 2)
+        await source.ack(pull_response2.ack_info, True)
+        backlog = await source.backlog()
+        self.assertEqual(backlog, 0)
+        await source.teardown()
+        await sink.teardown()
+
+    async def test_sqs_source_long_polls_empty_queue(self):
+        self._create_queue(self.queue_name)
+        source = self._source(wait_time_seconds=1)
+
+        pull_response = await source.pull()
+
+        self.assertEqual([], pull_response.payload)
+        await source.teardown()
+
+    async def test_sqs_source_concurrent_receives(self):
+        self.queue_url = self._create_queue(self.queue_name)
+        sink = self._sink()
+        await sink.push([json.dumps({"a": 1})] * 25)
+
+        source = self._source(wait_time_seconds=0, num_concurrent_receives=3)
+        self.assertEqual(30, source.max_batch_size())
+
+        pull_response = await source.pull()
+        self.assertEqual(len(pull_response.payload), 25)
+        await source.ack(pull_response.ack_info, True)
+        self.assertEqual(await source.backlog(), 0)
+        await source.teardown()
+        await sink.teardown()
+
+    async def test_sqs_source_extends_visibility_timeout(self):
+        self.queue_url = self._create_queue(self.queue_name, VisibilityTimeout="30")
+        self.sqs_client.send_message(
+            QueueUrl=self.queue_url, MessageBody=json.dumps({"a": 1})
+        )
+        source = self._source()
+        # The visibility timeout is fetched on the first pull.
+        self.assertIsNone(source.visibility_timeout_seconds)
+
+        pull_response = await source.pull()
+        self.assertEqual(30, source.visibility_timeout_seconds)
+        self.assertEqual(1, len(source._lease_manager))
+
+        sqs_client = await source._async_sqs_client.get()
+        with mock.patch.object(
+            sqs_client,
+            "change_message_visibility_batch",
+            wraps=sqs_client.change_message_visibility_batch,
+        ) as change_visibility:
+            await source._extend_visibility_timeouts(
+                list(pull_response.ack_info.message_infos), 60
+            )
+        entries = change_visibility.call_args.kwargs["Entries"]
+        self.assertEqual(1, len(entries))
+        self.assertEqual(60, entries[0]["VisibilityTimeout"])
+
+        await source.ack(pull_response.ack_info, True)
+        self.assertEqual(0, len(source._lease_manager))
+        await source.teardown()
+
+    async def test_sqs_source_nack_redelivers_immediately(self):
+        self.queue_url = self._create_queue(self.queue_name, VisibilityTimeout="300")
+        self.sqs_client.send_message(QueueUrl=self.queue_url, MessageBody="a")
+        source = self._source(wait_time_seconds=0)
+
+        pull_response = await source.pull()
+        await source.ack(pull_response.ack_info, False)
+        self.assertEqual(0, len(source._lease_manager))
+
+        redelivered = await source.pull()
+        self.assertEqual(["a"], redelivered.payload)
+        self.assertEqual(2, list(redelivered.ack_info.message_infos)[0].receive_count)
+        await source.ack(redelivered.ack_info, True)
+        await source.teardown()
+
+    async def test_sqs_source_nack_backoff(self):
+        self.queue_url = self._create_queue(self.queue_name)
+        self.sqs_client.send_message(QueueUrl=self.queue_url, MessageBody="a")
+        source = self._source(
+            wait_time_seconds=0, nack_delay_seconds=10, max_nack_delay_seconds=60
+        )
+        self.assertEqual(
+            [10, 20, 40, 60, 60], [source.nack_delay(c) for c in range(1, 6)]
+        )
+
+        pull_response = await source.pull()
+        with mock.patch.object(
+            source, "_extend_visibility_timeouts", new_callable=mock.AsyncMock
+        ) as change_visibility:
+            await source.ack(pull_response.ack_info, False)
+
+        change_visibility.assert_awaited_once_with(
+            list(pull_response.ack_info.message_infos), 10
+        )
+        await source.teardown()
+
+    async def test_sqs_source_split_ack_info(self):
+        self.queue_url = self._create_queue(self.queue_name)
+        await self._sink().push(["a", "b", "c"])
+        source = self._source(wait_time_seconds=0)
+
+        pull_response = await source.pull()
+        self.assertEqual(3, len(pull_response.payload))
+        await source.ack(source.split_ack_info(pull_response.ack_info, [0, 2]), True)
+        await source.ack(source.split_ack_info(pull_response.ack_info, [1]), False)
 
-                backlog = await source.backlog()
-                self.assertEqual(backlog, 12)
+        redelivered = await source.pull()
+        self.assertEqual([pull_response.payload[1]], redelivered.payload)
+        await source.ack(redelivered.ack_info, True)
+        await source.teardown()
 
-                pull_response1 = await source.pull()
-                self.assertEqual(len(pull_response1.payload), 10)
+    async def test_strategies_share_async_client(self):
+        self._create_queue(self.queue_name)
+        source = self._source(wait_time_seconds=0)
+        sink = self._sink()
 
-                await source.ack(pull_response1.ack_info, True)
-                backlog = await source.backlog()
-                self.assertEqual(backlog, 2)
+        source_client = await source._async_sqs_client.get()
+        sink_client = await sink._async_sqs_client.get()
+        self.assertIs(source_client, sink_client)
 
-                pull_response2 = await source.pull()
-                self.assertEqual(len(pull_response2.payload), 2)
-                await source.ack(pull_response1.ack_info, True)
-                backlog = await source.backlog()
-                self.assertEqual(backlog, 0)
+        await source.teardown()
+        # The sink still holds a reference so the client stays open.
+        await sink.push([json.dumps({"a": 1})])
+        await sink.teardown()
 
 
 if __name__ == "__main__":
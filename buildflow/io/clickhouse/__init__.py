@@ -1,2 +1,15 @@
 # ruff: noqa
-from .clickhouse import ClickhouseTable
+from typing import TYPE_CHECKING
+
+from buildflow.core.utils import lazy_module_getattr
+
+_LAZY_ATTRIBUTES = {
+    "ClickhouseTable": ".clickhouse",
+}
+__all__ = list(_LAZY_ATTRIBUTES)
+# NOTE: Modules are imported on first use so importing one primitive doesn't
+# import the SDKs of every other primitive.
+__getattr__ = lazy_module_getattr(__name__, _LAZY_ATTRIBUTES)
+
+if TYPE_CHECKING:
+    from .clickhouse import ClickhouseTable
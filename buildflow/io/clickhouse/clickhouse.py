@@ -10,11 +10,14 @@ from buildflow.core.types.clickhouse_types import (
     ClickhouseTableID,
     ClickhouseUsername,
 )
-from buildflow.io.clickhouse.strategies.clickhouse_strategies import ClickhouseSink
+from buildflow.io.clickhouse.strategies.clickhouse_strategies import (
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_MAX_CONCURRENT_INSERTS,
+    ClickhouseSink,
+)
 from buildflow.io.primitive import LocalPrimtive, Primitive
 
 _DEFAULT_DESTROY_PROTECTION = False
-_DEFAULT_BATCH_SIZE = 10_000
 
 
 @dataclasses.dataclass
@@ -27,16 +30,38 @@ class ClickhouseTable(LocalPrimtive):
     username: ClickhouseUsername
     password: ClickhousePassword
 
+    # pulumi management options
+    destroy_protection: bool = dataclasses.field(
+        default=_DEFAULT_DESTROY_PROTECTION, init=False
+    )
+    # sink optional args
+    batch_size: int = dataclasses.field(default=DEFAULT_BATCH_SIZE, init=False)
+    max_concurrent_inserts: int = dataclasses.field(
+        default=DEFAULT_MAX_CONCURRENT_INSERTS, init=False
+    )
+    async_insert: bool = dataclasses.field(default=False, init=False)
+    wait_for_async_insert: bool = dataclasses.field(default=True, init=False)
+
     def options(
         self,
         # Pulumi management options
         destroy_protection: bool = _DEFAULT_DESTROY_PROTECTION,
         schema: Optional[Type] = None,
         # Sink options
-        batch_size: int = _DEFAULT_BATCH_SIZE,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        # The max number of inserts each replica process runs at once, shared
+        # by all of its concurrent loops.
+        max_concurrent_inserts: int = DEFAULT_MAX_CONCURRENT_INSERTS,
+        # Let ClickHouse buffer inserts server side, recommended when batches
+        # are much smaller than batch_size.
+        async_insert: bool = False,
+        wait_for_async_insert: bool = True,
     ) -> Primitive:
         self.destroy_protection = destroy_protection
         self.batch_size = batch_size
+        self.max_concurrent_inserts = max_concurrent_inserts
+        self.async_insert = async_insert
+        self.wait_for_async_insert = wait_for_async_insert
         self.schema = schema
         return self
 
@@ -62,4 +87,9 @@ class ClickhouseTable(LocalPrimtive):
             password=self.password,
             database=self.database,
             table=self.table,
+            schema=self.schema,
+            batch_size=self.batch_size,
+            max_concurrent_inserts=self.max_concurrent_inserts,
+            async_insert=self.async_insert,
+            wait_for_async_insert=self.wait_for_async_insert,
         )
@@ -1,9 +1,13 @@
 import asyncio
+import concurrent.futures
+import dataclasses
 import logging
-from typing import Any, Callable, Dict, Iterable, Type
+import threading
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple, Type
 
 import clickhouse_connect
-import pandas as pd
+import pyarrow as pa
+from clickhouse_connect.driver import httputil
 
 from buildflow.core.credentials import EmptyCredentials
 from buildflow.core.types.clickhouse_types import (
@@ -14,12 +18,82 @@ from buildflow.core.types.clickhouse_types import (
     ClickhouseUsername,
 )
 from buildflow.io.strategies.sink import SinkStrategy
-from buildflow.io.utils.schemas import converters
+from buildflow.io.utils.schemas import arrow_schemas, converters
 
 _MAX_CONNECT_TRIES = 25
+# ClickHouse recommends inserting at least 10k-100k rows at a time, smaller
+# batches are better served by async inserts.
+DEFAULT_BATCH_SIZE = 100_000
+DEFAULT_MAX_CONCURRENT_INSERTS = 4
+
+_ClientKey = Tuple[str, str, str, str, int]
+
+
+class _SharedClient:
+    """A client and the thread pool its inserts run on, shared in a process."""
+
+    def __init__(self, max_concurrent_inserts: int):
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_concurrent_inserts,
+            thread_name_prefix="clickhouse-insert",
+        )
+        self.client = None
+        self.num_users = 0
+        self._lock = threading.Lock()
+
+    def get_client(self, create_client: Callable[[], Any]):
+        with self._lock:
+            if self.client is None:
+                self.client = create_client()
+            return self.client
+
+    def close(self):
+        # NOTE: pushes wait for their inserts so nothing is in flight here.
+        self.executor.shutdown(wait=False)
+        if self.client is not None:
+            self.client.close()
+
+
+# The clients shared by the sinks in this process.
+_shared_clients: Dict[_ClientKey, _SharedClient] = {}
+_shared_clients_lock = threading.Lock()
+
+
+def _acquire_shared_client(key: _ClientKey) -> _SharedClient:
+    with _shared_clients_lock:
+        shared = _shared_clients.get(key)
+        if shared is None:
+            shared = _SharedClient(max_concurrent_inserts=key[-1])
+            _shared_clients[key] = shared
+        shared.num_users += 1
+        return shared
+
+
+def _release_shared_client(key: _ClientKey):
+    with _shared_clients_lock:
+        shared = _shared_clients[key]
+        shared.num_users -= 1
+        if shared.num_users > 0:
+            return
+        del _shared_clients[key]
+    shared.close()
 
 
 class ClickhouseSink(SinkStrategy):
+    """Inserts batches as arrow tables.
+
+    Inserts block, so they run on a thread pool with a pooled client. The
+    pool and client are shared by every sink in the process that writes to the
+    same database (e.g. the concurrent loops of a replica), so a process runs
+    at most `max_concurrent_inserts` inserts at a time. Batches larger than
+    `batch_size` rows are split into several inserts.
+
+    With `async_insert` ClickHouse buffers the inserts server side and writes
+    them in larger parts, which is recommended when batches are small. If
+    `wait_for_async_insert` is set (the default) an insert only returns once
+    its rows were written, so failed rows fail the push.
+    """
+
     def __init__(
         self,
         *,
@@ -29,6 +103,11 @@ class ClickhouseSink(SinkStrategy):
         password: ClickhousePassword,
         database: ClickhouseDatabase,
         table: ClickhouseTableID,
+        schema: Optional[Type] = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        max_concurrent_inserts: int = DEFAULT_MAX_CONCURRENT_INSERTS,
+        async_insert: bool = False,
+        wait_for_async_insert: bool = True,
     ):
         super().__init__(credentials=credentials, strategy_id="clickhouse-sink")
         self.client = None
@@ -37,47 +116,109 @@ class ClickhouseSink(SinkStrategy):
         self.host = host
         self.username = username
         self.password = password
+        self.batch_size = batch_size
+        self.max_concurrent_inserts = max_concurrent_inserts
+        self.insert_settings: Dict[str, Any] = {}
+        if async_insert:
+            self.insert_settings = {
+                "async_insert": 1,
+                "wait_for_async_insert": int(wait_for_async_insert),
+            }
+        self._table_builder = arrow_schemas.ArrowTableBuilder()
+        if schema is not None:
+            self._table_builder.set_dataclass(schema)
+        self._shared: Optional[_SharedClient] = None
+
+    @property
+    def _client_key(self) -> _ClientKey:
+        return (
+            self.host,
+            self.username,
+            self.password,
+            self.database,
+            self.max_concurrent_inserts,
+        )
+
+    def _create_client(self):
+        client = clickhouse_connect.get_client(
+            host=self.host,
+            username=self.username,
+            password=self.password,
+            # NOTE: A session can only run one query at a time, we don't need
+            # one since every insert names its database.
+            autogenerate_session_id=False,
+            pool_mgr=httputil.get_pool_manager(maxsize=self.max_concurrent_inserts),
+        )
+        client.command(f'CREATE DATABASE IF NOT EXISTS "{self.database}"')
+        return client
 
     async def connect(self):
+        if self._shared is None:
+            self._shared = _acquire_shared_client(self._client_key)
+        loop = asyncio.get_event_loop()
         connect_tries = 0
         while connect_tries < _MAX_CONNECT_TRIES:
             try:
-                self.client = clickhouse_connect.get_client(
-                    host=self.host,
-                    username=self.username,
-                    password=self.password,
+                self.client = await loop.run_in_executor(
+                    self._shared.executor,
+                    self._shared.get_client,
+                    self._create_client,
                 )
-                self.client.command(
-                    f"CREATE DATABASE IF NOT EXISTS {self.database} ENGINE = Memory"
-                )
-                self.client.command(f'USE "{self.database}"')
                 break
             except clickhouse_connect.driver.exceptions.Error:
                 logging.exception("failed to connect to clickhouse database")
                 connect_tries += 1
                 if connect_tries == _MAX_CONNECT_TRIES:
-                    raise ValueError(
-                        "failed to connect to clickhouse database. did you leave a "
-                        "connection open?"
-                    )
+                    raise ValueError("failed to connect to clickhouse database.")
                 else:
                     logging.warning(
-                        "can't concurrently write to Clickhouse "
-                        "waiting 2 seconds then will "
+                        "can't connect to Clickhouse waiting 2 seconds then will "
                         "try again"
                     )
                     await asyncio.sleep(2)
 
-    def push_converter(
-        self, user_defined_type: Type
-    ) -> Callable[[Any], Dict[str, Any]]:
+    def push_converter(self, user_defined_type: Optional[Type]) -> Callable[[Any], Any]:
+        # NOTE: Rows are converted straight from the dataclasses to arrow.
+        if user_defined_type is not None and dataclasses.is_dataclass(
+            user_defined_type
+        ):
+            self._table_builder.set_dataclass(user_defined_type)
+            return converters.identity()
         return converters.json_push_converter(user_defined_type)
 
-    async def push(self, batch: Iterable[Dict[str, Any]]):
+    def _insert(self, data: pa.Table):
+        self.client.insert_arrow(
+            self.table,
+            data,
+            database=self.database,
+            settings=self.insert_settings,
+        )
+
+    async def push(self, batch: Iterable[Any]):
         if self.client is None:
             await self.connect()
-        df = pd.DataFrame(batch)
-        try:
-            self.client.insert_df(self.table, df)
-        except clickhouse_connect.driver.exceptions.DataError:
-            logging.exception("failed to connect to clickhouse database")
+        data = self._table_builder.build(batch)
+        loop = asyncio.get_event_loop()
+        # NOTE: We wait for all inserts to finish before raising so the push
+        # only fails once nothing is in flight.
+        results = await asyncio.gather(
+            *[
+                loop.run_in_executor(
+                    self._shared.executor,
+                    self._insert,
+                    data.slice(offset, self.batch_size),
+                )
+                for offset in range(0, data.num_rows, self.batch_size)
+            ],
+            return_exceptions=True,
+        )
+        errors = [result for result in results if isinstance(result, Exception)]
+        if errors:
+            raise errors[0]
+
+    async def teardown(self):
+        if self._shared is None:
+            return
+        self._shared = None
+        self.client = None
+        _release_shared_client(self._client_key)
@@ -1,14 +1,26 @@
+import dataclasses
 import os
 import unittest
+from typing import Optional
 from unittest.mock import Mock, patch
 
 import clickhouse_connect
 import pandas as pd
+import pyarrow as pa
 
 from buildflow.io.clickhouse.strategies import clickhouse_strategies
 
 
+@dataclasses.dataclass
+class Row:
+    a: int
+    b: Optional[str]
+
+
 class ClickhouseStrategiesTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncTearDown(self) -> None:
+        await self.sink.teardown()
+
     def tearDown(self) -> None:
         try:
             os.remove(self.db)
@@ -51,6 +63,102 @@ class ClickhouseStrategiesTest(unittest.IsolatedAsyncioTestCase):
             # Verify that self.sink.push was called with the expected data
             mock_push.assert_called_with(data)
 
+    @patch("clickhouse_connect.get_client")
+    async def test_clickhouse_push_arrow(self, mock_get_client):
+        mock_client = Mock()
+        mock_get_client.return_value = mock_client
+        push_converter = self.sink.push_converter(Row)
+
+        await self.sink.push(
+            [push_converter(Row(1, "b")), push_converter(Row(2, None))]
+        )
+
+        mock_client.insert_arrow.assert_called_once()
+        table_name, table = mock_client.insert_arrow.call_args.args
+        self.assertEqual(table_name, self.table)
+        self.assertEqual(
+            table.schema,
+            pa.schema(
+                [
+                    pa.field("a", pa.int64(), nullable=False),
+                    pa.field("b", pa.string()),
+                ]
+            ),
+        )
+        self.assertEqual(table.to_pylist(), [{"a": 1, "b": "b"}, {"a": 2, "b": None}])
+        self.assertEqual(
+            mock_client.insert_arrow.call_args.kwargs,
+            {"database": self.db, "settings": {}},
+        )
+        mock_client.command.assert_called_once_with(
+            f'CREATE DATABASE IF NOT EXISTS "{self.db}"'
+        )
+
+    @patch("clickhouse_connect.get_client")
+    async def test_clickhouse_push_splits_batches(self, mock_get_client):
+        mock_client = Mock()
+        mock_get_client.return_value = mock_client
+        sink = clickhouse_strategies.ClickhouseSink(
+            credentials=None,
+            host=self.host,
+            username=self.username,
+            password=self.password,
+            database=self.db,
+            table=self.table,
+            batch_size=2,
+            async_insert=True,
+        )
+
+        await sink.push([{"a": i} for i in range(5)])
+
+        inserted = [c.args[1] for c in mock_client.insert_arrow.call_args_list]
+        self.assertEqual([t.num_rows for t in inserted], [2, 2, 1])
+        self.assertCountEqual(
+            [row["a"] for t in inserted for row in t.to_pylist()], range(5)
+        )
+        self.assertEqual(
+            mock_client.insert_arrow.call_args.kwargs["settings"],
+            {"async_insert": 1, "wait_for_async_insert": 1},
+        )
+        await sink.teardown()
+
+    @patch("clickhouse_connect.get_client")
+    async def test_clickhouse_sinks_share_client(self, mock_get_client):
+        mock_get_client.side_effect = lambda **kwargs: Mock()
+        other_sink = clickhouse_strategies.ClickhouseSink(
+            credentials=None,
+            host=self.host,
+            username=self.username,
+            password=self.password,
+            database=self.db,
+            table=self.table,
+        )
+
+        await self.sink.push([{"a": 1}])
+        await other_sink.push([{"a": 2}])
+
+        mock_get_client.assert_called_once()
+        self.assertIs(self.sink.client, other_sink.client)
+        self.assertIs(self.sink._shared, other_sink._shared)
+        client = self.sink.client
+
+        await other_sink.teardown()
+        client.close.assert_not_called()
+        await self.sink.teardown()
+        client.close.assert_called_once()
+        self.assertEqual(clickhouse_strategies._shared_clients, {})
+
+    @patch("clickhouse_connect.get_client")
+    async def test_clickhouse_push_failure(self, mock_get_client):
+        mock_client = Mock()
+        mock_client.insert_arrow.side_effect = (
+            clickhouse_connect.driver.exceptions.DataError("bad data")
+        )
+        mock_get_client.return_value = mock_client
+
+        with self.assertRaises(clickhouse_connect.driver.exceptions.DataError):
+            await self.sink.push([{"a": 1}])
+
 
 if __name__ == "__main__":
     unittest.main()
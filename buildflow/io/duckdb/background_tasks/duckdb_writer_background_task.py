@@ -0,0 +1,35 @@
+import logging
+
+import ray
+
+from buildflow.core.background_tasks.background_task import BackgroundTask
+from buildflow.core.types.duckdb_types import DuckDBDatabase
+from buildflow.io.duckdb.strategies.duckdb_writer import writer_actor
+
+
+class DuckDBWriterBackgroundTask(BackgroundTask):
+    """Keeps the writer actor of a single writer `DuckDBSink` running.
+
+    The writer actor is detached so it outlives the replicas that write to it,
+    this task holds a reference to it for the lifetime of the processor pool
+    and stops it once no pool needs it anymore. Locally the sinks share a
+    thread instead so there is nothing to do.
+    """
+
+    def __init__(self, database: DuckDBDatabase):
+        self.database = database
+        self.writer_actor = None
+
+    async def start(self):
+        if not ray.is_initialized():
+            return
+        self.writer_actor = writer_actor(self.database)
+        await self.writer_actor.acquire.remote()
+
+    async def shutdown(self):
+        if self.writer_actor is None:
+            return
+        if await self.writer_actor.release.remote():
+            logging.info("Stopping DuckDBWriter for %s", self.database)
+            ray.kill(self.writer_actor)
+        self.writer_actor = None
@@ -0,0 +1,74 @@
+import os
+import tempfile
+import unittest
+import uuid
+
+import duckdb
+import pytest
+import ray
+
+from buildflow.io.duckdb.background_tasks.duckdb_writer_background_task import (
+    DuckDBWriterBackgroundTask,
+)
+from buildflow.io.duckdb.strategies.duckdb_strategies import DuckDBSink
+
+
+@ray.remote
+class _Replica:
+    def __init__(self, database: str, table: str):
+        self.sink = DuckDBSink(
+            credentials=None, database=database, table=table, single_writer=True
+        )
+
+    async def push(self, batch):
+        await self.sink.push(batch)
+
+
+@pytest.mark.usefixtures("ray")
+class DuckDBWriterBackgroundTaskTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.db = os.path.join(tempfile.gettempdir(), f"{str(uuid.uuid4())}.duck-db")
+        self.table = "test_table"
+
+    def tearDown(self) -> None:
+        try:
+            os.remove(self.db)
+        except FileNotFoundError:
+            pass
+
+    async def test_writer_outlives_replica_that_started_it(self):
+        first_replica = _Replica.remote(self.db, self.table)
+        second_replica = _Replica.remote(self.db, self.table)
+        # The first replica starts the writer.
+        await first_replica.push.remote([{"a": 1}])
+
+        task = DuckDBWriterBackgroundTask(self.db)
+        await task.start()
+        ray.kill(first_replica)
+        await second_replica.push.remote([{"a": 2}])
+        await second_replica.push.remote([{"a": 3}])
+        await task.shutdown()
+
+        with duckdb.connect(self.db, read_only=True) as conn:
+            got = conn.execute(f"SELECT a FROM {self.table} ORDER BY a").fetchall()
+        self.assertEqual(got, [(1,), (2,), (3,)])
+
+    async def test_writer_kept_while_another_task_owns_it(self):
+        replica = _Replica.remote(self.db, self.table)
+        old_task = DuckDBWriterBackgroundTask(self.db)
+        await old_task.start()
+        # A reload starts the new tasks before shutting down the old ones.
+        new_task = DuckDBWriterBackgroundTask(self.db)
+        await new_task.start()
+        await old_task.shutdown()
+
+        await replica.push.remote([{"a": 1}])
+        await new_task.shutdown()
+
+        with duckdb.connect(self.db, read_only=True) as conn:
+            got = conn.execute(f"SELECT a FROM {self.table}").fetchall()
+        self.assertEqual(got, [(1,)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,10 +1,15 @@
 import dataclasses
 import logging
 import os
+from typing import List
 
 from buildflow.config.cloud_provider_config import LocalOptions
+from buildflow.core.background_tasks.background_task import BackgroundTask
 from buildflow.core.credentials.empty_credentials import EmptyCredentials
 from buildflow.core.types.duckdb_types import DuckDBDatabase, DuckDBTableID
+from buildflow.io.duckdb.background_tasks.duckdb_writer_background_task import (
+    DuckDBWriterBackgroundTask,
+)
 from buildflow.io.duckdb.strategies.duckdb_strategies import DuckDBSink
 from buildflow.io.primitive import LocalPrimtive
 
@@ -14,6 +19,9 @@ class DuckDBTable(LocalPrimtive):
     database: DuckDBDatabase
     table: DuckDBTableID
 
+    # sink optional args
+    single_writer: bool = dataclasses.field(default=False, init=False)
+
     def __post_init__(self):
         if not self.database.startswith("md:") and not self.database.startswith("/"):
             self.database = os.path.join(os.getcwd(), self.database)
@@ -29,6 +37,17 @@ class DuckDBTable(LocalPrimtive):
             db = self.database.split("?")[0]
         return f"{db}:{self.table}"
 
+    def options(
+        self,
+        *,
+        # Send batches to one writer that keeps the database open and appends
+        # them in larger transactions, instead of connecting on every push.
+        # NOTE: The database is locked for as long as the writer is running.
+        single_writer: bool = False,
+    ) -> "DuckDBTable":
+        self.single_writer = single_writer
+        return self
+
     @classmethod
     def from_local_options(
         cls,
@@ -45,4 +64,10 @@ class DuckDBTable(LocalPrimtive):
             credentials=credentials,
             database=self.database,
             table=self.table,
+            single_writer=self.single_writer,
         )
+
+    def background_tasks(self, credentials: EmptyCredentials) -> List[BackgroundTask]:
+        if not self.single_writer:
+            return []
+        return [DuckDBWriterBackgroundTask(self.database)]
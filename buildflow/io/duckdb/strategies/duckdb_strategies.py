@@ -1,45 +1,89 @@
 import asyncio
+import dataclasses
 import logging
-from typing import Any, Callable, Dict, Iterable, Type
+from typing import Any, Callable, Iterable, Optional, Type
 
 import duckdb
-import pandas as pd
+import pyarrow as pa
+import ray
 
 from buildflow.core.credentials import EmptyCredentials
 from buildflow.core.types.duckdb_types import DuckDBDatabase, DuckDBTableID
+from buildflow.io.duckdb.strategies import duckdb_writer
 from buildflow.io.strategies.sink import SinkStrategy
-from buildflow.io.utils.schemas import converters
+from buildflow.io.utils.schemas import arrow_schemas, converters
 
 _MAX_CONNECT_TRIES = 25
 
 
 class DuckDBSink(SinkStrategy):
+    """Appends batches to a DuckDB table.
+
+    By default each push connects to the database, so concurrent replicas wait
+    on DuckDB's write lock. With `single_writer` the batches are instead sent to
+    one writer that keeps the database open (an actor shared by the replicas on
+    ray, a thread locally) and appends them in larger transactions. The database
+    stays locked while the writer is running.
+    """
+
     def __init__(
         self,
         *,
         credentials: EmptyCredentials,
         database: DuckDBDatabase,
         table: DuckDBTableID,
+        single_writer: bool = False,
     ):
         super().__init__(credentials=credentials, strategy_id="duckdb-sink")
         self.database = database
         self.table = table
+        self.single_writer = single_writer
+        self._writer_actor = None
+        self._local_writer = None
+        self._table_builder = arrow_schemas.ArrowTableBuilder()
 
-    def push_converter(
-        self, user_defined_type: Type
-    ) -> Callable[[Any], Dict[str, Any]]:
+    def push_converter(self, user_defined_type: Optional[Type]) -> Callable[[Any], Any]:
+        # NOTE: Rows are converted straight from the dataclasses to arrow.
+        if user_defined_type is not None and dataclasses.is_dataclass(
+            user_defined_type
+        ):
+            self._table_builder.set_dataclass(user_defined_type)
+            return converters.identity()
         return converters.json_push_converter(user_defined_type)
 
-    async def push(self, batch: Iterable[Dict[str, Any]]):
-        df = pd.DataFrame(batch)
+    async def _push_to_writer(self, data: pa.Table):
+        if ray.is_initialized():
+            if self._writer_actor is None:
+                self._writer_actor = duckdb_writer.writer_actor(self.database)
+            try:
+                await self._writer_actor.write.remote(self.table, data)
+            except ray.exceptions.RayActorError:
+                # The writer died or was stopped, we fail the batch (it may or
+                # may not have been written) and look the writer up again on
+                # the next push.
+                self._writer_actor = None
+                raise
+        else:
+            if self._local_writer is None:
+                self._local_writer = duckdb_writer.acquire_local_writer(self.database)
+            await asyncio.wrap_future(self._local_writer.write(self.table, data))
+
+    async def push(self, batch: Iterable[Any]):
+        data = self._table_builder.build(batch)
+        if self.single_writer:
+            await self._push_to_writer(data)
+            return
         connect_tries = 0
         while connect_tries < _MAX_CONNECT_TRIES:
             try:
                 with duckdb.connect(self.database, read_only=False) as con:
+                    con.register("batch", data)
                     try:
-                        con.append(self.table, df)
+                        con.execute(f'INSERT INTO "{self.table}" SELECT * FROM batch')
                     except duckdb.CatalogException:
-                        con.execute(f'CREATE TABLE "{self.table}" AS SELECT * FROM df')
+                        con.execute(
+                            f'CREATE TABLE "{self.table}" AS SELECT * FROM batch'
+                        )
                     break
             except duckdb.IOException:
                 logging.exception("failed to connect to duckdb database")
@@ -55,3 +99,12 @@ class DuckDBSink(SinkStrategy):
                         " try again"
                     )
                     await asyncio.sleep(2)
+
+    async def teardown(self):
+        if self._local_writer is not None:
+            self._local_writer = None
+            loop = asyncio.get_event_loop()
+            # NOTE: Closing waits for the queued writes to be committed.
+            await loop.run_in_executor(
+                None, duckdb_writer.release_local_writer, self.database
+            )
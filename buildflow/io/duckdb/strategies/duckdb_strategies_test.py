@@ -1,3 +1,6 @@
+import asyncio
+import dataclasses
+import datetime
 import os
 import tempfile
 import time
@@ -11,6 +14,12 @@ import pytest
 from buildflow.io.duckdb.strategies import duckdb_strategies
 
 
+@dataclasses.dataclass
+class Row:
+    a: int
+    timestamp: datetime.datetime
+
+
 def open_connection(db):
     conn = duckdb.connect(db, read_only=False)
     time.sleep(5)
@@ -55,6 +64,42 @@ class DuckDBStrategiesTest(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(got_data.to_dict("records"), data + more_data)
         conn.close()
 
+    async def test_duckdb_push_dataclass(self):
+        push_converter = self.sink.push_converter(Row)
+        timestamp = datetime.datetime(2023, 1, 1, tzinfo=datetime.timezone.utc)
+        data = [Row(a=1, timestamp=timestamp), Row(a=2, timestamp=timestamp)]
+
+        await self.sink.push([push_converter(row) for row in data])
+
+        conn = duckdb.connect(self.db, read_only=False)
+        got_data = conn.execute(
+            f"SELECT a, epoch(timestamp) FROM {self.table}"
+        ).fetchall()
+        self.assertEqual(
+            got_data, [(1, timestamp.timestamp()), (2, timestamp.timestamp())]
+        )
+        conn.close()
+
+    async def test_duckdb_push_single_writer(self):
+        sinks = [
+            duckdb_strategies.DuckDBSink(
+                credentials=None, database=self.db, table=self.table, single_writer=True
+            )
+            for _ in range(3)
+        ]
+        batches = [[{"a": i, "b": i + 1}] for i in range(30)]
+        await asyncio.gather(
+            *[sinks[i % 3].push(batch) for i, batch in enumerate(batches)]
+        )
+        await asyncio.gather(*[sink.teardown() for sink in sinks])
+
+        conn = duckdb.connect(self.db, read_only=False)
+        got_data = conn.execute(f"SELECT * FROM {self.table}").fetchdf()
+        self.assertCountEqual(
+            got_data.to_dict("records"), [row for batch in batches for row in batch]
+        )
+        conn.close()
+
     async def test_duckdb_connection_failure(self):
         duckdb_strategies._MAX_CONNECT_TRIES = 2
 
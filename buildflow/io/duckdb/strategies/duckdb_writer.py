@@ -0,0 +1,232 @@
+"""A single writer that owns a persistent DuckDB connection.
+
+DuckDB only lets one process open a database for writing. Instead of every
+sink replica connecting (and waiting on the lock) the replicas send their
+batches to one writer, which appends whatever has queued up in a single
+transaction.
+
+When running on ray the writer lives in an actor shared by all replicas,
+locally it is a thread shared by the sinks in the process.
+"""
+
+import asyncio
+import concurrent.futures
+import logging
+import queue
+import threading
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+import duckdb
+import pyarrow as pa
+import ray
+
+from buildflow.core.types.duckdb_types import DuckDBDatabase, DuckDBTableID
+
+_MAX_CONNECT_TRIES = 25
+_CONNECT_RETRY_SECS = 2
+# Queued batches are appended in one transaction up to this many rows.
+_DEFAULT_MAX_TRANSACTION_ROWS = 1_000_000
+# The name the batch is registered under while it is appended.
+_BATCH_VIEW = "_buildflow_batch"
+
+
+class _Write:
+    def __init__(self, table: DuckDBTableID, data: pa.Table):
+        self.table = table
+        self.data = data
+        self.future: concurrent.futures.Future = concurrent.futures.Future()
+
+
+class DuckDBWriter:
+    """Appends arrow tables to a DuckDB database from a dedicated thread."""
+
+    def __init__(
+        self,
+        database: DuckDBDatabase,
+        max_transaction_rows: int = _DEFAULT_MAX_TRANSACTION_ROWS,
+    ):
+        self.database = database
+        self.max_transaction_rows = max_transaction_rows
+        self._queue: "queue.Queue[Optional[_Write]]" = queue.Queue()
+        self._created_tables: Set[DuckDBTableID] = set()
+        self._thread = threading.Thread(
+            target=self._run, name=f"DuckDBWriter-{database}", daemon=True
+        )
+        self._thread.start()
+
+    def write(self, table: DuckDBTableID, data: pa.Table) -> concurrent.futures.Future:
+        """Queues `data` to be appended to `table`.
+
+        Returns a future that is done once the data is committed.
+        """
+        write = _Write(table, data)
+        self._queue.put(write)
+        return write.future
+
+    def close(self):
+        """Commits the queued writes and closes the connection."""
+        self._queue.put(None)
+        self._thread.join()
+
+    def _connect(self) -> duckdb.DuckDBPyConnection:
+        connect_tries = 0
+        while True:
+            try:
+                return duckdb.connect(self.database, read_only=False)
+            except duckdb.IOException:
+                connect_tries += 1
+                if connect_tries == _MAX_CONNECT_TRIES:
+                    raise ValueError(
+                        "failed to connect to duckdb database. did you leave a "
+                        "connection open?"
+                    )
+                logging.warning(
+                    "can't open DuckDB database for writing waiting %s seconds then "
+                    "will try again",
+                    _CONNECT_RETRY_SECS,
+                )
+                time.sleep(_CONNECT_RETRY_SECS)
+
+    def _next_writes(self) -> Tuple[List[_Write], bool]:
+        """Blocks for the next write and takes the writes queued behind it.
+
+        Returns the writes and whether the writer was closed.
+        """
+        write = self._queue.get()
+        if write is None:
+            return [], True
+        writes = [write]
+        num_rows = write.data.num_rows
+        while num_rows < self.max_transaction_rows:
+            try:
+                write = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if write is None:
+                return writes, True
+            writes.append(write)
+            num_rows += write.data.num_rows
+        return writes, False
+
+    def _append(self, con: duckdb.DuckDBPyConnection, write: _Write):
+        con.register(_BATCH_VIEW, write.data)
+        try:
+            if write.table not in self._created_tables:
+                con.execute(
+                    f'CREATE TABLE IF NOT EXISTS "{write.table}" AS '
+                    f"SELECT * FROM {_BATCH_VIEW} LIMIT 0"
+                )
+                self._created_tables.add(write.table)
+            con.execute(f'INSERT INTO "{write.table}" SELECT * FROM {_BATCH_VIEW}')
+        finally:
+            con.unregister(_BATCH_VIEW)
+
+    def _commit(self, con: duckdb.DuckDBPyConnection, writes: List[_Write]):
+        try:
+            con.begin()
+            for write in writes:
+                self._append(con, write)
+            con.commit()
+        except Exception as e:
+            con.rollback()
+            # A table created in the failed transaction was rolled back too.
+            self._created_tables.clear()
+            if len(writes) == 1:
+                writes[0].future.set_exception(e)
+                return
+            # Commit the writes one by one so only the bad ones fail.
+            for write in writes:
+                self._commit(con, [write])
+            return
+        for write in writes:
+            write.future.set_result(None)
+
+    def _run(self):
+        con = None
+        closed = False
+        while not closed:
+            writes, closed = self._next_writes()
+            if not writes:
+                continue
+            try:
+                if con is None:
+                    con = self._connect()
+                self._commit(con, writes)
+            except Exception as e:
+                logging.exception("failed to write to duckdb database")
+                for write in writes:
+                    if not write.future.done():
+                        write.future.set_exception(e)
+        if con is not None:
+            con.close()
+
+
+# The writers shared by the sinks in this process, with how many sinks use them.
+_local_writers: Dict[DuckDBDatabase, Tuple[DuckDBWriter, int]] = {}
+_local_writers_lock = threading.Lock()
+
+
+def acquire_local_writer(database: DuckDBDatabase) -> DuckDBWriter:
+    """Returns the writer for `database` in this process, starting it if needed.
+
+    Each call must be matched by a call to `release_local_writer`.
+    """
+    with _local_writers_lock:
+        writer, num_users = _local_writers.get(database, (None, 0))
+        if writer is None:
+            writer = DuckDBWriter(database)
+        _local_writers[database] = (writer, num_users + 1)
+        return writer
+
+
+def release_local_writer(database: DuckDBDatabase):
+    """Closes the writer for `database` once no sink is using it."""
+    with _local_writers_lock:
+        writer, num_users = _local_writers.pop(database)
+        if num_users > 1:
+            _local_writers[database] = (writer, num_users - 1)
+            return
+    writer.close()
+
+
+@ray.remote(max_restarts=-1, num_cpus=0.1)
+class _DuckDBWriterActor:
+    def __init__(self, database: DuckDBDatabase):
+        self.writer = DuckDBWriter(database)
+        # The number of background tasks keeping the writer alive.
+        self.num_owners = 0
+
+    async def write(self, table: DuckDBTableID, data: pa.Table):
+        # NOTE: Replicas call this concurrently, the writes that queue up while
+        # a transaction is committing are appended in the next one.
+        await asyncio.wrap_future(self.writer.write(table, data))
+
+    async def acquire(self):
+        self.num_owners += 1
+
+    async def release(self) -> bool:
+        """Releases an owner, returns True if the writer was closed.
+
+        The last owner closes the writer (committing the queued writes) and is
+        then expected to kill the actor.
+        """
+        self.num_owners -= 1
+        # NOTE: The count starts at zero again if the actor was restarted.
+        if self.num_owners > 0:
+            return False
+        loop = asyncio.get_event_loop()
+        await loop.run_in_executor(None, self.writer.close)
+        return True
+
+
+def writer_actor(database: DuckDBDatabase) -> ray.actor.ActorHandle:
+    """Returns the actor that writes to `database`, starting it if needed.
+
+    The actor is detached so it isn't tied to the replica that happened to
+    start it, `DuckDBWriterBackgroundTask` stops it when the runtime shuts
+    down.
+    """
+    return _DuckDBWriterActor.options(
+        name=f"DuckDBWriter-{database}", get_if_exists=True, lifetime="detached"
+    ).remote(database)
@@ -0,0 +1,64 @@
+import os
+import tempfile
+import unittest
+import uuid
+
+import duckdb
+import pyarrow as pa
+
+from buildflow.io.duckdb.strategies import duckdb_writer
+
+
+class DuckDBWriterTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.db = os.path.join(tempfile.gettempdir(), f"{str(uuid.uuid4())}.duck-db")
+        self.writer = duckdb_writer.DuckDBWriter(self.db)
+
+    def tearDown(self) -> None:
+        try:
+            os.remove(self.db)
+        except FileNotFoundError:
+            pass
+
+    def read_table(self, table: str):
+        with duckdb.connect(self.db, read_only=True) as conn:
+            return conn.execute(f"SELECT * FROM {table}").fetchdf().to_dict("records")
+
+    def test_write(self):
+        futures = [
+            self.writer.write("t", pa.Table.from_pylist([{"a": i, "b": str(i)}]))
+            for i in range(10)
+        ]
+        for future in futures:
+            future.result(timeout=10)
+        self.writer.close()
+
+        self.assertCountEqual(
+            self.read_table("t"), [{"a": i, "b": str(i)} for i in range(10)]
+        )
+
+    def test_write_failure_only_fails_bad_batch(self):
+        self.writer.write("t", pa.Table.from_pylist([{"a": 1}])).result(timeout=10)
+
+        good = self.writer.write("t", pa.Table.from_pylist([{"a": 2}]))
+        bad = self.writer.write("t", pa.Table.from_pylist([{"a": "not an int"}]))
+        good.result(timeout=10)
+        with self.assertRaises(duckdb.Error):
+            bad.result(timeout=10)
+        self.writer.close()
+
+        self.assertCountEqual(self.read_table("t"), [{"a": 1}, {"a": 2}])
+
+    def test_local_writer_is_shared(self):
+        self.writer.close()
+        writer = duckdb_writer.acquire_local_writer(self.db)
+        self.assertIs(duckdb_writer.acquire_local_writer(self.db), writer)
+
+        duckdb_writer.release_local_writer(self.db)
+        self.assertIn(self.db, duckdb_writer._local_writers)
+        duckdb_writer.release_local_writer(self.db)
+        self.assertNotIn(self.db, duckdb_writer._local_writers)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,10 +1,31 @@
 # ruff: noqa
-from .bigquery_dataset import BigQueryDataset
-from .bigquery_table import BigQueryTable
-from .cloud_sql_database import CloudSQLDatabase
-from .cloud_sql_instance import CloudSQLInstance
-from .cloud_sql_user import CloudSQLUser
-from .gcs_file_change_stream import GCSFileChangeStream
-from .pubsub_subscription import GCPPubSubSubscription
-from .pubsub_topic import GCPPubSubTopic
-from .storage import GCSBucket
+from typing import TYPE_CHECKING
+
+from buildflow.core.utils import lazy_module_getattr
+
+_LAZY_ATTRIBUTES = {
+    "BigQueryDataset": ".bigquery_dataset",
+    "BigQueryTable": ".bigquery_table",
+    "CloudSQLDatabase": ".cloud_sql_database",
+    "CloudSQLInstance": ".cloud_sql_instance",
+    "CloudSQLUser": ".cloud_sql_user",
+    "GCSFileChangeStream": ".gcs_file_change_stream",
+    "GCPPubSubSubscription": ".pubsub_subscription",
+    "GCPPubSubTopic": ".pubsub_topic",
+    "GCSBucket": ".storage",
+}
+__all__ = list(_LAZY_ATTRIBUTES)
+# NOTE: Modules are imported on first use so importing one primitive doesn't
+# import the SDKs of every other primitive.
+__getattr__ = lazy_module_getattr(__name__, _LAZY_ATTRIBUTES)
+
+if TYPE_CHECKING:
+    from .bigquery_dataset import BigQueryDataset
+    from .bigquery_table import BigQueryTable
+    from .cloud_sql_database import CloudSQLDatabase
+    from .cloud_sql_instance import CloudSQLInstance
+    from .cloud_sql_user import CloudSQLUser
+    from .gcs_file_change_stream import GCSFileChangeStream
+    from .pubsub_subscription import GCPPubSubSubscription
+    from .pubsub_topic import GCPPubSubTopic
+    from .storage import GCSBucket
@@ -0,0 +1,271 @@
+import asyncio
+import itertools
+import logging
+import tempfile
+from typing import Any, Dict, List, Optional
+
+import ray
+from fsspec.implementations.local import LocalFileSystem
+
+from buildflow.core.background_tasks.background_task import BackgroundTask
+from buildflow.core.credentials.gcp_credentials import GCPCredentials
+from buildflow.core.types.gcp_types import BigQueryTableID, GCPProjectID
+from buildflow.core.utils import stable_hash
+from buildflow.io.gcp.strategies.bigquery_strategies import (
+    load_staging_dir,
+    load_staging_file_system,
+)
+from buildflow.io.utils.clients.gcp_clients import GCPClients
+
+# The max number of source URIs a single load job accepts.
+_MAX_FILES_PER_LOAD_JOB = 10_000
+# Local files are combined into one file that is uploaded with the load job,
+# of at most this many bytes.
+_MAX_LOCAL_LOAD_BYTES = 1024 * 1024 * 1024
+
+
+class BigQueryLoadBackgroundTask(BackgroundTask):
+    """Periodically loads the files staged by `BatchLoadBigQueryTableSink`."""
+
+    def __init__(
+        self,
+        credentials: GCPCredentials,
+        project_id: GCPProjectID,
+        table_id: BigQueryTableID,
+        staging_location: str,
+        flush_time_secs: int,
+        load_timeout_secs: int = 30 * 60,
+        test_bigquery_client: Optional[Any] = None,
+    ):
+        self.credentials = credentials
+        self.project_id = project_id
+        self.table_id = table_id
+        self.staging_location = staging_location
+        self.flush_time_secs = flush_time_secs
+        self.load_timeout_secs = load_timeout_secs
+        self.test_bigquery_client = test_bigquery_client
+        self.load_actor = None
+        self.flush_loop = None
+
+    async def start(self):
+        self.load_actor = _BigQueryLoadActor.options(
+            name=f"BigQueryLoadActor-{self.table_id}"
+        ).remote(
+            credentials=self.credentials,
+            project_id=self.project_id,
+            table_id=self.table_id,
+            staging_location=self.staging_location,
+            flush_time_secs=self.flush_time_secs,
+            load_timeout_secs=self.load_timeout_secs,
+            test_bigquery_client=self.test_bigquery_client,
+        )
+        self.flush_loop = self.load_actor.flush.remote()
+
+    async def shutdown(self):
+        if self.load_actor is not None:
+            logging.info("Shutting down BigQueryLoadActor will stop after next flush")
+            await self.load_actor.shutdown.remote()
+            await self.flush_loop
+
+
+def _load_job_id(files: List[str]) -> str:
+    return f"buildflow_load_{stable_hash(files)}"
+
+
+@ray.remote(max_restarts=-1, num_cpus=0.1)
+class _BigQueryLoadActor:
+    def __init__(
+        self,
+        credentials: GCPCredentials,
+        project_id: GCPProjectID,
+        table_id: BigQueryTableID,
+        staging_location: str,
+        flush_time_secs: int,
+        load_timeout_secs: int,
+        test_bigquery_client: Optional[Any] = None,
+    ):
+        self.table_id = table_id
+        self.file_system = load_staging_file_system(credentials, staging_location)
+        self.staging_dir = load_staging_dir(staging_location, table_id)
+        if test_bigquery_client is not None:
+            self.bq_client = test_bigquery_client
+        else:
+            self.bq_client = GCPClients(
+                credentials=credentials, quota_project_id=project_id
+            ).get_bigquery_client(project_id)
+        self.flush_time_secs = flush_time_secs
+        self.load_timeout_secs = load_timeout_secs
+        self.running = True
+        # Files that were loaded but could not be deleted, so we don't load
+        # them again.
+        self.loaded_files = set()
+        # The attempt the next load job of a group of files starts at, keyed by
+        # the id of the group's first job.
+        self.load_attempts: Dict[str, int] = {}
+
+    def staged_files(self) -> List[str]:
+        try:
+            # NOTE: We include refresh=True here to ensure we are always
+            # getting the latest files from the bucket.
+            files = self.file_system.ls(self.staging_dir, detail=False, refresh=True)
+        except FileNotFoundError:
+            # This happens when nothing has been staged yet.
+            return []
+        return sorted(
+            f for f in files if f.endswith(".parquet") and f not in self.loaded_files
+        )
+
+    def _job_config(self):
+        from google.cloud import bigquery
+
+        parquet_options = bigquery.ParquetOptions()
+        parquet_options.enable_list_inference = True
+        return bigquery.LoadJobConfig(
+            source_format=bigquery.SourceFormat.PARQUET,
+            write_disposition=bigquery.WriteDisposition.WRITE_APPEND,
+            parquet_options=parquet_options,
+        )
+
+    def _combine_local_files(self, files: List[str], combined_file):
+        import pyarrow.parquet as pq
+
+        writer = None
+        for file in files:
+            table = pq.read_table(file)
+            if writer is None:
+                writer = pq.ParquetWriter(combined_file, table.schema)
+            writer.write_table(table)
+        writer.close()
+        combined_file.seek(0)
+
+    def _submit_load_job(self, files: List[str], job_id: str):
+        if isinstance(self.file_system, LocalFileSystem):
+            if len(files) == 1:
+                with self.file_system.open(files[0], "rb") as f:
+                    return self.bq_client.load_table_from_file(
+                        f, self.table_id, job_id=job_id, job_config=self._job_config()
+                    )
+            # NOTE: A load job only uploads one file, so we combine the files.
+            with tempfile.TemporaryFile() as f:
+                self._combine_local_files(files, f)
+                return self.bq_client.load_table_from_file(
+                    f, self.table_id, job_id=job_id, job_config=self._job_config()
+                )
+        return self.bq_client.load_table_from_uri(
+            [f"gs://{f}" for f in files],
+            self.table_id,
+            job_id=job_id,
+            job_config=self._job_config(),
+        )
+
+    def _start_load_job(self, files: List[str]):
+        from google.api_core import exceptions
+
+        # NOTE: The job id is derived from the files it loads, so if we are
+        # restarted after submitting a job we wait for that job instead of
+        # loading the files twice. A job that failed is not reused, the files
+        # are loaded again by a job with the next attempt's id.
+        base_job_id = _load_job_id(files)
+        for attempt in itertools.count(self.load_attempts.get(base_job_id, 0)):
+            job_id = base_job_id if attempt == 0 else f"{base_job_id}_{attempt}"
+            self.load_attempts[base_job_id] = attempt
+            try:
+                return self._submit_load_job(files, job_id)
+            except exceptions.Conflict:
+                job = self.bq_client.get_job(job_id)
+                if job.state != "DONE" or job.error_result is None:
+                    # The job is still running or succeeded.
+                    return job
+                logging.warning(
+                    "load job %s failed: %s, starting a new job.",
+                    job_id,
+                    job.error_result,
+                )
+
+    def load_files(self, files: List[str]):
+        job = self._start_load_job(files)
+        # This raises if the job failed.
+        job.result(timeout=self.load_timeout_secs)
+        self.load_attempts.pop(_load_job_id(files), None)
+        logging.info(
+            "loaded %s files into %s with job %s", len(files), self.table_id, job.job_id
+        )
+
+    def _local_load_groups(self, files: List[str]) -> List[List[str]]:
+        import pyarrow.parquet as pq
+
+        groups: List[List[str]] = []
+        group_bytes = 0
+        group_schema = None
+        for file in files:
+            num_bytes = self.file_system.size(file)
+            try:
+                schema = pq.read_schema(file)
+            except Exception:
+                # The file is loaded on its own so it can't fail other files.
+                logging.warning("failed to read the schema of %s", file)
+                schema = None
+            # NOTE: Files can only be combined if their schemas match, e.g.
+            # the dataclass may have changed between deployments.
+            if (
+                groups
+                and schema is not None
+                and group_schema is not None
+                and schema.equals(group_schema)
+                and group_bytes + num_bytes <= _MAX_LOCAL_LOAD_BYTES
+            ):
+                groups[-1].append(file)
+                group_bytes += num_bytes
+            else:
+                groups.append([file])
+                group_bytes = num_bytes
+                group_schema = schema
+        return groups
+
+    def _load_groups(self, files: List[str]) -> List[List[str]]:
+        if isinstance(self.file_system, LocalFileSystem):
+            return self._local_load_groups(files)
+        return [
+            files[i : i + _MAX_FILES_PER_LOAD_JOB]
+            for i in range(0, len(files), _MAX_FILES_PER_LOAD_JOB)
+        ]
+
+    async def load_staged_files(self):
+        loop = asyncio.get_event_loop()
+        try:
+            files = await loop.run_in_executor(None, self.staged_files)
+        except Exception:
+            logging.exception("Failed to list files in staging dir")
+            return
+        try:
+            groups = await loop.run_in_executor(None, self._load_groups, files)
+        except Exception:
+            logging.exception("Failed to group staged files")
+            return
+        for group in groups:
+            try:
+                await loop.run_in_executor(None, self.load_files, group)
+            except Exception:
+                logging.exception(
+                    "Failed to load files into %s will keep them staged and retry "
+                    "on next flush.",
+                    self.table_id,
+                )
+                continue
+            self.loaded_files.update(group)
+            try:
+                await loop.run_in_executor(None, self.file_system.rm, group)
+                self.loaded_files.difference_update(group)
+            except Exception:
+                logging.exception("Failed to delete loaded files")
+
+    async def flush(self):
+        while self.running:
+            await asyncio.sleep(self.flush_time_secs)
+            try:
+                await self.load_staged_files()
+            except Exception:
+                logging.exception("Failed to load files into BigQuery")
+
+    async def shutdown(self):
+        self.running = False
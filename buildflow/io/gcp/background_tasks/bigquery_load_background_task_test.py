@@ -0,0 +1,204 @@
+import asyncio
+import os
+import shutil
+import tempfile
+import unittest
+from typing import Dict, List, Optional
+from unittest import mock
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+from google.api_core import exceptions
+
+from buildflow.core.credentials.empty_credentials import EmptyCredentials
+from buildflow.io.gcp.background_tasks import bigquery_load_background_task
+from buildflow.io.gcp.background_tasks.bigquery_load_background_task import (
+    BigQueryLoadBackgroundTask,
+    _BigQueryLoadActor,
+    _load_job_id,
+)
+from buildflow.io.gcp.strategies.bigquery_strategies import load_staging_dir
+
+_LoadActor = _BigQueryLoadActor.__ray_metadata__.modified_class
+
+
+class _FakeLoadJob:
+    def __init__(self, job_id: str, error: Optional[str]):
+        self.job_id = job_id
+        self.state = "DONE"
+        self.error_result = None if error is None else {"message": error}
+
+    def result(self, timeout=None):
+        if self.error_result is not None:
+            raise exceptions.BadRequest(self.error_result["message"])
+        return self
+
+
+class _FakeBigQueryClient:
+    """Runs load jobs instantly, the first `num_failed_jobs` jobs fail."""
+
+    def __init__(self, num_failed_jobs: int = 0):
+        self.num_failed_jobs = num_failed_jobs
+        self.jobs: Dict[str, _FakeLoadJob] = {}
+        # The values uploaded with each job.
+        self.loaded_values: List[List[int]] = []
+
+    def load_table_from_file(self, file, table_id, job_id, job_config):
+        if job_id in self.jobs:
+            raise exceptions.Conflict(f"job {job_id} already exists")
+        self.loaded_values.append(pq.read_table(file).column("value").to_pylist())
+        error = "load failed" if len(self.jobs) < self.num_failed_jobs else None
+        self.jobs[job_id] = _FakeLoadJob(job_id, error)
+        return self.jobs[job_id]
+
+    def get_job(self, job_id):
+        return self.jobs[job_id]
+
+
+@pytest.mark.usefixtures("ray")
+class BigQueryLoadBackgroundTaskTest(unittest.IsolatedAsyncioTestCase):
+    async def run_for_time(self, coro, time: int = 5):
+        completed, pending = await asyncio.wait(
+            [coro], timeout=time, return_when="FIRST_EXCEPTION"
+        )
+        if completed:
+            # This general should only happen when there was an exception so
+            # we want to raise it to make the test failure more obvious.
+            completed.pop().result()
+        if pending:
+            return pending.pop()
+
+    def setUp(self) -> None:
+        self.staging_location = tempfile.mkdtemp()
+        self.table_id = "project.dataset.table"
+        self.staging_dir = load_staging_dir(self.staging_location, self.table_id)
+        os.makedirs(self.staging_dir)
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.staging_location)
+
+    def background_task(self, bigquery_client) -> BigQueryLoadBackgroundTask:
+        return BigQueryLoadBackgroundTask(
+            # We use empty credentials so we use the local file system
+            credentials=EmptyCredentials(),
+            project_id="project",
+            table_id=self.table_id,
+            staging_location=self.staging_location,
+            flush_time_secs=1,
+            test_bigquery_client=bigquery_client,
+        )
+
+    def stage_file(self, name: str):
+        with open(os.path.join(self.staging_dir, name), "wb") as f:
+            f.write(b"data")
+
+    async def test_load_staged_files(self):
+        self.stage_file("file1.parquet")
+        # Files that are still being written are not loaded.
+        self.stage_file("file2.parquet.tmp")
+        background_task = self.background_task(mock.MagicMock())
+
+        await background_task.start()
+        await self.run_for_time(background_task.flush_loop, time=10)
+
+        # Loaded files are removed from the staging dir.
+        self.assertEqual(["file2.parquet.tmp"], os.listdir(self.staging_dir))
+
+    async def test_failed_load_keeps_files_staged(self):
+        self.stage_file("file1.parquet")
+        bigquery_client = mock.MagicMock()
+        bigquery_client.load_table_from_file.side_effect = ValueError("load failed")
+        background_task = self.background_task(bigquery_client)
+
+        await background_task.start()
+        await self.run_for_time(background_task.flush_loop, time=10)
+
+        self.assertEqual(["file1.parquet"], os.listdir(self.staging_dir))
+
+
+class BigQueryLoadActorTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.staging_location = tempfile.mkdtemp()
+        self.table_id = "project.dataset.table"
+        self.staging_dir = load_staging_dir(self.staging_location, self.table_id)
+        os.makedirs(self.staging_dir)
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.staging_location)
+
+    def stage_file(self, name: str, values: List[int], value_type=pa.int64()):
+        table = pa.table({"value": pa.array(values, type=value_type)})
+        pq.write_table(table, os.path.join(self.staging_dir, name))
+
+    def load_actor(self, bigquery_client) -> _LoadActor:
+        return _LoadActor(
+            credentials=EmptyCredentials(),
+            project_id="project",
+            table_id=self.table_id,
+            staging_location=self.staging_location,
+            flush_time_secs=1,
+            load_timeout_secs=1,
+            test_bigquery_client=bigquery_client,
+        )
+
+    async def test_failed_load_job_is_not_reused(self):
+        self.stage_file("file1.parquet", [1])
+        bigquery_client = _FakeBigQueryClient(num_failed_jobs=1)
+        load_actor = self.load_actor(bigquery_client)
+
+        await load_actor.load_staged_files()
+        self.assertEqual(["file1.parquet"], os.listdir(self.staging_dir))
+
+        # The next flush sees the failed job and loads the files with a new job.
+        await load_actor.load_staged_files()
+        self.assertEqual([], os.listdir(self.staging_dir))
+        first_job_id, second_job_id = bigquery_client.jobs
+        self.assertEqual(f"{first_job_id}_1", second_job_id)
+        self.assertEqual({}, load_actor.load_attempts)
+
+    async def test_local_files_are_loaded_together(self):
+        self.stage_file("file1.parquet", [1, 2])
+        self.stage_file("file2.parquet", [3])
+        # Files with a different schema are loaded by their own job.
+        self.stage_file("file3.parquet", [4], value_type=pa.int32())
+        self.stage_file("file4.parquet", [5])
+        bigquery_client = _FakeBigQueryClient()
+        load_actor = self.load_actor(bigquery_client)
+
+        await load_actor.load_staged_files()
+
+        self.assertEqual([], os.listdir(self.staging_dir))
+        self.assertEqual([[1, 2, 3], [4], [5]], bigquery_client.loaded_values)
+
+    async def test_local_load_size_is_limited(self):
+        for i in range(3):
+            self.stage_file(f"file{i}.parquet", [i])
+        file_bytes = os.path.getsize(os.path.join(self.staging_dir, "file0.parquet"))
+        bigquery_client = _FakeBigQueryClient()
+        load_actor = self.load_actor(bigquery_client)
+
+        with mock.patch.object(
+            bigquery_load_background_task, "_MAX_LOCAL_LOAD_BYTES", 2 * file_bytes
+        ):
+            await load_actor.load_staged_files()
+
+        self.assertEqual([[0, 1], [2]], bigquery_client.loaded_values)
+
+    async def test_running_load_job_is_reused(self):
+        self.stage_file("file1.parquet", [1])
+        bigquery_client = _FakeBigQueryClient()
+        load_actor = self.load_actor(bigquery_client)
+        # A job for the files was submitted before the actor restarted.
+        job_id = _load_job_id(load_actor.staged_files())
+        bigquery_client.jobs[job_id] = _FakeLoadJob(job_id, error=None)
+        bigquery_client.jobs[job_id].state = "RUNNING"
+
+        await load_actor.load_staged_files()
+
+        self.assertEqual([], os.listdir(self.staging_dir))
+        self.assertEqual([job_id], list(bigquery_client.jobs))
+
+
+if __name__ == "__main__":
+    unittest.main()
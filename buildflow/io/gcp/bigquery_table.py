@@ -1,22 +1,43 @@
 import dataclasses
+import json
 from typing import List, Optional, Type
 
 import pulumi
-import pulumi_gcp
 
 from buildflow.config.cloud_provider_config import GCPOptions
 from buildflow.core import utils
+from buildflow.core.background_tasks.background_task import BackgroundTask
 from buildflow.core.credentials.gcp_credentials import GCPCredentials
 from buildflow.core.types.gcp_types import BigQueryTableID, BigQueryTableName
 from buildflow.core.types.portable_types import TableName
 from buildflow.io.gcp.bigquery_dataset import BigQueryDataset
-from buildflow.io.gcp.strategies.bigquery_strategies import StreamingBigQueryTableSink
+from buildflow.io.gcp.strategies.bigquery_strategies import (
+    BatchLoadBigQueryTableSink,
+    StorageWriteBigQueryTableSink,
+    StreamingBigQueryTableSink,
+)
 from buildflow.io.primitive import GCPPrimtive, Primitive
 from buildflow.io.strategies.sink import SinkStrategy
 from buildflow.io.utils.schemas import bigquery_schemas
+from buildflow.types.gcp import BigQueryWriteMethod
 
 _DEFAULT_DESTROY_PROTECTION = False
 _DEFAULT_BATCH_SIZE = 10_000
+_DEFAULT_MAX_CONCURRENT_INSERTS = 10
+_DEFAULT_WRITE_METHOD = BigQueryWriteMethod.STREAMING_INSERTS
+_DEFAULT_USE_COMMITTED_STREAM = False
+_DEFAULT_FLUSH_TIME_LIMIT_SECS = 5 * 60
+_DEFAULT_MAX_STAGED_FILE_BYTES = 256 * 1024 * 1024
+_DEFAULT_MAX_STAGED_FILE_AGE_SECS = 60
+# The schema of the rows written by `StreamingBigQueryTableSink` to the dead
+# letter table.
+_DEAD_LETTER_SCHEMA = json.dumps(
+    [
+        {"name": "row", "type": "STRING", "mode": "REQUIRED"},
+        {"name": "errors", "type": "STRING", "mode": "REQUIRED"},
+        {"name": "failed_at", "type": "TIMESTAMP", "mode": "REQUIRED"},
+    ]
+)
 
 
 @dataclasses.dataclass
@@ -24,6 +45,29 @@ class BigQueryTable(GCPPrimtive):
     dataset: BigQueryDataset
     table_name: BigQueryTableName
     batch_size: int = dataclasses.field(default=_DEFAULT_BATCH_SIZE, init=False)
+    max_concurrent_inserts: int = dataclasses.field(
+        default=_DEFAULT_MAX_CONCURRENT_INSERTS, init=False
+    )
+    dead_letter_table_name: Optional[BigQueryTableName] = dataclasses.field(
+        default=None, init=False
+    )
+    write_method: BigQueryWriteMethod = dataclasses.field(
+        default=_DEFAULT_WRITE_METHOD, init=False
+    )
+    use_committed_stream: bool = dataclasses.field(
+        default=_DEFAULT_USE_COMMITTED_STREAM, init=False
+    )
+    load_staging_location: Optional[str] = dataclasses.field(default=None, init=False)
+    flush_time_limit_secs: int = dataclasses.field(
+        default=_DEFAULT_FLUSH_TIME_LIMIT_SECS, init=False
+    )
+    max_staged_file_bytes: int = dataclasses.field(
+        default=_DEFAULT_MAX_STAGED_FILE_BYTES, init=False
+    )
+    max_staged_file_rows: Optional[int] = dataclasses.field(default=None, init=False)
+    max_staged_file_age_secs: float = dataclasses.field(
+        default=_DEFAULT_MAX_STAGED_FILE_AGE_SECS, init=False
+    )
     destroy_protection: bool = dataclasses.field(
         default=_DEFAULT_DESTROY_PROTECTION, init=False
     )
@@ -45,9 +89,41 @@ class BigQueryTable(GCPPrimtive):
         schema: Optional[Type] = None,
         # Sink options
         batch_size: int = _DEFAULT_BATCH_SIZE,
+        # Only used by STREAMING_INSERTS. The max number of insert requests in
+        # flight at once, and a table in the same dataset that rows which can't
+        # be inserted are written to (instead of failing the batch).
+        max_concurrent_inserts: int = _DEFAULT_MAX_CONCURRENT_INSERTS,
+        dead_letter_table_name: Optional[BigQueryTableName] = None,
+        # How rows are written to the table. STORAGE_WRITE_API requires a
+        # schema.
+        write_method: BigQueryWriteMethod = _DEFAULT_WRITE_METHOD,
+        # Only used by STORAGE_WRITE_API. Write to a committed stream per
+        # replica (exactly once appends) instead of the default stream.
+        use_committed_stream: bool = _DEFAULT_USE_COMMITTED_STREAM,
+        # Only used by BATCH_LOAD. Where rows are staged before they are
+        # loaded, either a GCS path (gs://bucket/path) or a local directory.
+        load_staging_location: Optional[str] = None,
+        # Only used by BATCH_LOAD. The max number of seconds to wait before
+        # loading staged rows. Rows are buffered in a file per replica that is
+        # staged once it reaches the max size or rows, or after the max age.
+        # NOTE: Rows in a file that isn't staged yet are lost if the replica
+        # dies (at-most-once delivery).
+        flush_time_limit_secs: int = _DEFAULT_FLUSH_TIME_LIMIT_SECS,
+        max_staged_file_bytes: int = _DEFAULT_MAX_STAGED_FILE_BYTES,
+        max_staged_file_rows: Optional[int] = None,
+        max_staged_file_age_secs: float = _DEFAULT_MAX_STAGED_FILE_AGE_SECS,
     ) -> Primitive:
         self.schema = schema
         self.batch_size = batch_size
+        self.max_concurrent_inserts = max_concurrent_inserts
+        self.dead_letter_table_name = dead_letter_table_name
+        self.write_method = write_method
+        self.use_committed_stream = use_committed_stream
+        self.load_staging_location = load_staging_location
+        self.flush_time_limit_secs = flush_time_limit_secs
+        self.max_staged_file_bytes = max_staged_file_bytes
+        self.max_staged_file_rows = max_staged_file_rows
+        self.max_staged_file_age_secs = max_staged_file_age_secs
         self.destroy_protection = destroy_protection
         return self
 
@@ -74,17 +150,78 @@ class BigQueryTable(GCPPrimtive):
             table_name=table_name,
         )
 
+    def _schema_dataclass(self) -> Type:
+        if self.schema is None:
+            raise ValueError(
+                f"A schema is required to write with {self.write_method}. "
+                "Pass one in with: `BigQueryTable(...).options(schema=MyDataClass)`"
+            )
+        schema = self.schema
+        if hasattr(schema, "__args__"):
+            # Using a composite type hint like List or Optional
+            schema = schema.__args__[0]
+        return schema
+
+    def _load_staging_location(self) -> str:
+        if self.load_staging_location is None:
+            raise ValueError(
+                "A staging location is required to batch load rows. Pass one in "
+                "with: `BigQueryTable(...).options(load_staging_location=...)`"
+            )
+        return self.load_staging_location
+
     def sink(self, credentials: GCPCredentials) -> SinkStrategy:
+        if self.write_method == BigQueryWriteMethod.STORAGE_WRITE_API:
+            return StorageWriteBigQueryTableSink(
+                credentials=credentials,
+                dataset=self.dataset,
+                table_name=self.table_name,
+                schema=self._schema_dataclass(),
+                use_committed_stream=self.use_committed_stream,
+            )
+        if self.write_method == BigQueryWriteMethod.BATCH_LOAD:
+            return BatchLoadBigQueryTableSink(
+                credentials=credentials,
+                dataset=self.dataset,
+                table_name=self.table_name,
+                schema=self._schema_dataclass(),
+                staging_location=self._load_staging_location(),
+                max_file_bytes=self.max_staged_file_bytes,
+                max_file_rows=self.max_staged_file_rows,
+                max_file_age_secs=self.max_staged_file_age_secs,
+            )
         return StreamingBigQueryTableSink(
             credentials=credentials,
             dataset=self.dataset,
             table_name=self.table_name,
             batch_size=self.batch_size,
+            max_concurrent_inserts=self.max_concurrent_inserts,
+            dead_letter_table_name=self.dead_letter_table_name,
         )
 
+    def background_tasks(self, credentials: GCPCredentials) -> List[BackgroundTask]:
+        if self.write_method != BigQueryWriteMethod.BATCH_LOAD:
+            return []
+        # NOTE: ray is only needed when batch loading.
+        from buildflow.io.gcp.background_tasks.bigquery_load_background_task import (
+            BigQueryLoadBackgroundTask,
+        )
+
+        return [
+            BigQueryLoadBackgroundTask(
+                credentials=credentials,
+                project_id=self.dataset.project_id,
+                table_id=self.table_id,
+                staging_location=self._load_staging_location(),
+                flush_time_secs=self.flush_time_limit_secs,
+            )
+        ]
+
     def pulumi_resources(
         self, credentials: GCPCredentials, opts: pulumi.ResourceOptions
     ) -> List[pulumi.Resource]:
+        import pulumi_gcp
+
         schema = None
         if self.schema is None:
             raise ValueError(
@@ -102,7 +239,7 @@ class BigQueryTable(GCPPrimtive):
                 "Could not determine schema for BigQuery table. "
                 "Was the schema you passed in a dataclass?"
             )
-        return [
+        resources = [
             pulumi_gcp.bigquery.Table(
                 f"buildflow-{self.table_name}",
                 project=self.dataset.project_id,
@@ -113,6 +250,19 @@ class BigQueryTable(GCPPrimtive):
                 opts=opts,
             )
         ]
+        if self.dead_letter_table_name is not None:
+            resources.append(
+                pulumi_gcp.bigquery.Table(
+                    f"buildflow-{self.dead_letter_table_name}",
+                    project=self.dataset.project_id,
+                    dataset_id=self.dataset.dataset_name,
+                    table_id=self.dead_letter_table_name,
+                    schema=_DEAD_LETTER_SCHEMA,
+                    deletion_protection=self.destroy_protection,
+                    opts=opts,
+                )
+            )
+        return resources
 
     def cloud_console_url(self) -> str:
         return f"https://console.cloud.google.com/bigquery?ws=!1m5!1m4!4m3!1s{self.dataset.project_id}!2s{self.dataset.dataset_name}!3s{self.table_name}"
@@ -2,7 +2,6 @@ import dataclasses
 from typing import List
 
 import pulumi
-import pulumi_gcp
 
 from buildflow.core.credentials.gcp_credentials import GCPCredentials
 from buildflow.core.types.gcp_types import CloudSQLDatabaseName
@@ -24,6 +23,8 @@ class CloudSQLDatabase(GCPPrimtive):
     def pulumi_resources(
         self, credentials: GCPCredentials, opts: pulumi.ResourceOptions
     ) -> List[pulumi.Resource]:
+        import pulumi_gcp
+
         return [
             pulumi_gcp.sql.Database(
                 resource_name=self.primitive_id(),
@@ -2,7 +2,6 @@ import dataclasses
 from typing import List
 
 import pulumi
-import pulumi_gcp
 
 from buildflow.core.options.credentials_options import GCPCredentialsOptions
 from buildflow.core.types.gcp_types import CloudSQLInstanceName, GCPProjectID, GCPRegion
@@ -25,6 +24,8 @@ class CloudSQLInstance(GCPPrimtive):
     def pulumi_resources(
         self, credentials: GCPCredentialsOptions, opts: pulumi.ResourceOptions
     ) -> List[pulumi.Resource]:
+        import pulumi_gcp
+
         return [
             pulumi_gcp.sql.DatabaseInstance(
                 resource_name=self.primitive_id(),
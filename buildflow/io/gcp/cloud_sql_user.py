@@ -2,7 +2,6 @@ import dataclasses
 from typing import List
 
 import pulumi
-import pulumi_gcp
 
 from buildflow.core.credentials.gcp_credentials import GCPCredentials
 from buildflow.core.types.gcp_types import CloudSQLPassword, CloudSQLUserName
@@ -25,6 +24,8 @@ class CloudSQLUser(GCPPrimtive):
     def pulumi_resources(
         self, credentials: GCPCredentials, opts: pulumi.ResourceOptions
     ) -> List[pulumi.Resource]:
+        import pulumi_gcp
+
         return [
             pulumi_gcp.sql.User(
                 resource_name=self.primitive_id(),
@@ -2,7 +2,6 @@ import dataclasses
 from typing import Iterable, List
 
 import pulumi
-import pulumi_gcp
 
 from buildflow.config.cloud_provider_config import GCPOptions
 from buildflow.core.credentials.gcp_credentials import GCPCredentials
@@ -68,6 +67,8 @@ class GCSFileChangeStream(GCPPrimtive):
     def pulumi_resources(
         self, credentials: GCPCredentials, opts: pulumi.ResourceOptions
     ) -> List[pulumi.Resource]:
+        import pulumi_gcp
+
         gcs_account = pulumi_gcp.storage.get_project_service_account(
             project=self.gcs_bucket.project_id,
             user_project=self.gcs_bucket.project_id,
@@ -2,7 +2,6 @@ import dataclasses
 from typing import List, Optional
 
 import pulumi
-import pulumi_gcp
 
 from buildflow.config.cloud_provider_config import GCPOptions
 from buildflow.core import utils
@@ -10,7 +9,10 @@ from buildflow.core.credentials.gcp_credentials import GCPCredentials
 from buildflow.core.types.gcp_types import GCPProjectID, PubSubSubscriptionName
 from buildflow.core.types.portable_types import SubscriptionName
 from buildflow.io.gcp.pubsub_topic import GCPPubSubTopic
-from buildflow.io.gcp.strategies.pubsub_strategies import GCPPubSubSubscriptionSource
+from buildflow.io.gcp.strategies.pubsub_strategies import (
+    GCPPubSubSubscriptionSource,
+    GCPPubSubSubscriptionStreamingSource,
+)
 from buildflow.io.primitive import GCPPrimtive
 
 _DEFAULT_ACK_DEADLINE_SECONDS = 10 * 60
@@ -18,6 +20,11 @@ _DEFAULT_MESSAGE_RETENTION_DURATION = "1200s"
 _DEFAULT_BATCH_SIZE = 1_000
 _DEFAULT_INCLUDE_ATTRIBUTES = False
 _DEFAULT_ENABLE_EXACTLY_ONCE_DELIVERY = False
+_DEFAULT_ENABLE_MESSAGE_ORDERING = False
+_DEFAULT_USE_STREAMING_PULL = False
+_DEFAULT_MAX_OUTSTANDING_MESSAGES = 1_000
+_DEFAULT_MAX_OUTSTANDING_BYTES = 100 * 1024 * 1024
+_DEFAULT_MAX_LEASE_DURATION_SECONDS = 60 * 60
 
 
 # NOTE: A user should use this in the case where they want to connect to an existing
@@ -31,6 +38,22 @@ class GCPPubSubSubscription(GCPPrimtive):
     include_attributes: bool = dataclasses.field(
         default=_DEFAULT_INCLUDE_ATTRIBUTES, init=False
     )
+    ordering_key_attribute: Optional[str] = dataclasses.field(default=None, init=False)
+    # streaming pull options
+    use_streaming_pull: bool = dataclasses.field(
+        default=_DEFAULT_USE_STREAMING_PULL, init=False
+    )
+    max_outstanding_messages: int = dataclasses.field(
+        default=_DEFAULT_MAX_OUTSTANDING_MESSAGES, init=False
+    )
+    max_outstanding_bytes: int = dataclasses.field(
+        default=_DEFAULT_MAX_OUTSTANDING_BYTES, init=False
+    )
+    # Messages have their ack deadline extended until they are acked, for at
+    # most this long.
+    max_lease_duration_seconds: int = dataclasses.field(
+        default=_DEFAULT_MAX_LEASE_DURATION_SECONDS, init=False
+    )
     # pulumi options
     ack_deadline_seconds: bool = dataclasses.field(
         default=_DEFAULT_ACK_DEADLINE_SECONDS, init=False
@@ -42,6 +65,9 @@ class GCPPubSubSubscription(GCPPrimtive):
     enable_exactly_once_delivery: bool = dataclasses.field(
         default=_DEFAULT_ENABLE_EXACTLY_ONCE_DELIVERY, init=False
     )
+    enable_message_ordering: bool = dataclasses.field(
+        default=_DEFAULT_ENABLE_MESSAGE_ORDERING, init=False
+    )
 
     def options(
         self,
@@ -49,17 +75,37 @@ class GCPPubSubSubscription(GCPPrimtive):
         ack_deadline_seconds: bool = _DEFAULT_ACK_DEADLINE_SECONDS,
         message_retention_duration: str = _DEFAULT_MESSAGE_RETENTION_DURATION,
         enable_exactly_once_delivery: bool = _DEFAULT_ENABLE_EXACTLY_ONCE_DELIVERY,
+        # Deliver messages with the same ordering key in the order they were
+        # published.
+        enable_message_ordering: bool = _DEFAULT_ENABLE_MESSAGE_ORDERING,
         topic: Optional[GCPPubSubTopic] = None,
         # Source options
         batch_size: int = _DEFAULT_BATCH_SIZE,
         include_attributes: bool = _DEFAULT_INCLUDE_ATTRIBUTES,
+        # The attribute to use as the ordering key of messages when the consumer
+        # uses ordered processing. Defaults to the message's ordering key.
+        ordering_key_attribute: Optional[str] = None,
+        # The max amount of time a pulled message has its ack deadline extended
+        # for while it is being processed.
+        max_lease_duration_seconds: int = _DEFAULT_MAX_LEASE_DURATION_SECONDS,
+        # Streaming pull options. If `use_streaming_pull` is set messages are
+        # received over a StreamingPull stream instead of unary pull requests.
+        use_streaming_pull: bool = _DEFAULT_USE_STREAMING_PULL,
+        max_outstanding_messages: int = _DEFAULT_MAX_OUTSTANDING_MESSAGES,
+        max_outstanding_bytes: int = _DEFAULT_MAX_OUTSTANDING_BYTES,
     ) -> "GCPPubSubSubscription":
         self.ack_deadline_seconds = ack_deadline_seconds
         self.message_retention_duration = message_retention_duration
         self.topic = topic
         self.batch_size = batch_size
         self.include_attributes = include_attributes
+        self.ordering_key_attribute = ordering_key_attribute
         self.enable_exactly_once_delivery = enable_exactly_once_delivery
+        self.enable_message_ordering = enable_message_ordering
+        self.use_streaming_pull = use_streaming_pull
+        self.max_outstanding_messages = max_outstanding_messages
+        self.max_outstanding_bytes = max_outstanding_bytes
+        self.max_lease_duration_seconds = max_lease_duration_seconds
         return self
 
     def primitive_id(self):
@@ -89,17 +135,36 @@ class GCPPubSubSubscription(GCPPrimtive):
         )
 
     def source(self, credentials: GCPCredentials) -> GCPPubSubSubscriptionSource:
+        if self.use_streaming_pull:
+            return GCPPubSubSubscriptionStreamingSource(
+                credentials=credentials,
+                project_id=self.project_id,
+                subscription_name=self.subscription_name,
+                batch_size=self.batch_size,
+                include_attributes=self.include_attributes,
+                ordering_key_attribute=self.ordering_key_attribute,
+                max_outstanding_messages=self.max_outstanding_messages,
+                max_outstanding_bytes=self.max_outstanding_bytes,
+                max_lease_duration_seconds=self.max_lease_duration_seconds,
+            )
         return GCPPubSubSubscriptionSource(
             credentials=credentials,
             project_id=self.project_id,
             subscription_name=self.subscription_name,
             batch_size=self.batch_size,
             include_attributes=self.include_attributes,
+            ordering_key_attribute=self.ordering_key_attribute,
+            # NOTE: We only know the subscription's ack deadline if we manage
+            # it, otherwise the source assumes the Pub/Sub default.
+            ack_deadline_seconds=self.ack_deadline_seconds if self._managed else None,
+            max_lease_duration_seconds=self.max_lease_duration_seconds,
         )
 
     def pulumi_resources(
         self, credentials: GCPCredentials, opts: pulumi.ResourceOptions
     ) -> List[pulumi.Resource]:
+        import pulumi_gcp
+
         if self.topic is None:
             raise ValueError(
                 "A topic must be provided to the GCPPubSubSubscription. Please provide "
@@ -116,6 +181,7 @@ class GCPPubSubSubscription(GCPPrimtive):
                 ack_deadline_seconds=self.ack_deadline_seconds,
                 message_retention_duration=self.message_retention_duration,
                 enable_exactly_once_delivery=self.enable_exactly_once_delivery,
+                enable_message_ordering=self.enable_message_ordering,
             )
         ]
 
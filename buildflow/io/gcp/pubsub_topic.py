@@ -2,7 +2,6 @@ import dataclasses
 from typing import List, Optional
 
 import pulumi
-import pulumi_gcp
 
 from buildflow.config.cloud_provider_config import GCPOptions
 from buildflow.core import utils
@@ -13,11 +12,35 @@ from buildflow.io.gcp.strategies.pubsub_strategies import GCPPubSubTopicSink
 from buildflow.io.primitive import GCPPrimtive
 from buildflow.io.strategies.sink import SinkStrategy
 
+_DEFAULT_MAX_CONCURRENT_PUBLISHES = 10
+_DEFAULT_MAX_PUBLISH_ATTEMPTS = 5
+
 
 @dataclasses.dataclass
 class GCPPubSubTopic(GCPPrimtive):
     project_id: GCPProjectID
     topic_name: PubSubTopicName
+    # sink options
+    max_concurrent_publishes: int = dataclasses.field(
+        default=_DEFAULT_MAX_CONCURRENT_PUBLISHES, init=False
+    )
+    max_publish_attempts: int = dataclasses.field(
+        default=_DEFAULT_MAX_PUBLISH_ATTEMPTS, init=False
+    )
+
+    def options(
+        self,
+        # Sink options
+        # Batches are split into publish requests, this is how many of them
+        # are sent at the same time.
+        max_concurrent_publishes: int = _DEFAULT_MAX_CONCURRENT_PUBLISHES,
+        # How many times a failed publish request is attempted before the
+        # push fails.
+        max_publish_attempts: int = _DEFAULT_MAX_PUBLISH_ATTEMPTS,
+    ) -> "GCPPubSubTopic":
+        self.max_concurrent_publishes = max_concurrent_publishes
+        self.max_publish_attempts = max_publish_attempts
+        return self
 
     @property
     def topic_id(self) -> PubSubTopicID:
@@ -41,6 +64,8 @@ class GCPPubSubTopic(GCPPrimtive):
             credentials=credentials,
             project_id=self.project_id,
             topic_name=self.topic_name,
+            max_concurrent_publishes=self.max_concurrent_publishes,
+            max_publish_attempts=self.max_publish_attempts,
         )
 
     def primitive_id(self):
@@ -49,6 +74,8 @@ class GCPPubSubTopic(GCPPrimtive):
     def pulumi_resources(
         self, credentials: GCPCredentials, opts: pulumi.ResourceOptions
     ) -> List[pulumi.Resource]:
+        import pulumi_gcp
+
         return [
             pulumi_gcp.pubsub.Topic(
                 resource_name=f"{self.project_id}-{self.topic_name}",
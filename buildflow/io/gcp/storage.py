@@ -1,16 +1,24 @@
 import dataclasses
+import os
 from typing import List, Optional
 
 import pulumi
-import pulumi_gcp
 
 from buildflow.config.cloud_provider_config import GCPOptions
 from buildflow.core import utils
+from buildflow.core.background_tasks.background_task import BackgroundTask
 from buildflow.core.credentials.gcp_credentials import GCPCredentials
 from buildflow.core.types.gcp_types import GCPProjectID, GCPRegion, GCSBucketName
 from buildflow.core.types.portable_types import BucketName
 from buildflow.core.types.shared_types import FilePath
 from buildflow.io.gcp.strategies.storage_strategies import GCSBucketSink
+from buildflow.io.local.strategies.file_strategies import (
+    DEFAULT_COMPACTION_INTERVAL_SECS,
+    DEFAULT_MAX_FILE_AGE_SECS,
+    DEFAULT_MAX_FILE_BYTES,
+    DEFAULT_MAX_OPEN_FILES,
+    PartitionBy,
+)
 from buildflow.io.primitive import GCPPrimtive
 from buildflow.io.strategies.sink import SinkStrategy
 from buildflow.types.portable import FileFormat
@@ -34,6 +42,22 @@ class GCSBucket(GCPPrimtive):
     bucket_region: GCPRegion = dataclasses.field(
         default=_DEFAULT_BUCKET_LOCATION, init=False
     )
+    # sink optional args
+    max_file_bytes: Optional[int] = dataclasses.field(
+        default=DEFAULT_MAX_FILE_BYTES, init=False
+    )
+    max_file_rows: Optional[int] = dataclasses.field(default=None, init=False)
+    max_file_age_secs: Optional[float] = dataclasses.field(
+        default=DEFAULT_MAX_FILE_AGE_SECS, init=False
+    )
+    partition_by: Optional[PartitionBy] = dataclasses.field(default=None, init=False)
+    max_open_files: int = dataclasses.field(default=DEFAULT_MAX_OPEN_FILES, init=False)
+    compaction_target_file_bytes: Optional[int] = dataclasses.field(
+        default=None, init=False
+    )
+    compaction_interval_secs: int = dataclasses.field(
+        default=DEFAULT_COMPACTION_INTERVAL_SECS, init=False
+    )
 
     @property
     def bucket_url(self):
@@ -82,9 +106,32 @@ class GCSBucket(GCPPrimtive):
         *,
         force_destroy: bool = False,
         bucket_region: GCPRegion = _DEFAULT_BUCKET_LOCATION,
+        # Sink options. Each replica writes to its own file which is finalized
+        # once it reaches any of these limits.
+        # NOTE: Rows are acked before their file is finalized, so rows in a
+        # file that is still open are lost if the replica dies (at-most-once).
+        max_file_bytes: Optional[int] = DEFAULT_MAX_FILE_BYTES,
+        max_file_rows: Optional[int] = None,
+        max_file_age_secs: Optional[float] = DEFAULT_MAX_FILE_AGE_SECS,
+        # Write rows under hive style partition directories (key=value/),
+        # either a list of row fields or a function that returns the partition
+        # of a row. At most max_open_files partitions are written at once.
+        partition_by: Optional[PartitionBy] = None,
+        max_open_files: int = DEFAULT_MAX_OPEN_FILES,
+        # If set, small files written by the sink are periodically compacted
+        # into files of about this many bytes.
+        compaction_target_file_bytes: Optional[int] = None,
+        compaction_interval_secs: int = DEFAULT_COMPACTION_INTERVAL_SECS,
     ) -> "GCSBucket":
         self.force_destroy = force_destroy
         self.bucket_region = bucket_region
+        self.max_file_bytes = max_file_bytes
+        self.max_file_rows = max_file_rows
+        self.max_file_age_secs = max_file_age_secs
+        self.partition_by = partition_by
+        self.max_open_files = max_open_files
+        self.compaction_target_file_bytes = compaction_target_file_bytes
+        self.compaction_interval_secs = compaction_interval_secs
         return self
 
     def sink(self, credentials: GCPCredentials) -> SinkStrategy:
@@ -94,14 +141,39 @@ class GCSBucket(GCPPrimtive):
             bucket_name=self.bucket_name,
             file_path=self.file_path,
             file_format=self.file_format,
+            max_file_bytes=self.max_file_bytes,
+            max_file_rows=self.max_file_rows,
+            max_file_age_secs=self.max_file_age_secs,
+            partition_by=self.partition_by,
+            max_open_files=self.max_open_files,
+        )
+
+    def background_tasks(self, credentials: GCPCredentials) -> List[BackgroundTask]:
+        if self.compaction_target_file_bytes is None:
+            return []
+        # NOTE: ray is only needed when compacting files.
+        from buildflow.io.local.background_tasks.file_compaction_background_task import (  # noqa: E501
+            FileCompactionBackgroundTask,
         )
 
+        return [
+            FileCompactionBackgroundTask(
+                credentials=credentials,
+                file_path=os.path.join(self.bucket_name, self.file_path),
+                file_format=self.file_format,
+                target_file_bytes=self.compaction_target_file_bytes,
+                compaction_interval_secs=self.compaction_interval_secs,
+            )
+        ]
+
     def primitive_id(self):
         return self.bucket_url
 
     def pulumi_resources(
         self, credentials: GCPCredentials, opts: pulumi.ResourceOptions
     ) -> List[pulumi.Resource]:
+        import pulumi_gcp
+
         opts = pulumi.ResourceOptions.merge(
             opts,
             pulumi.ResourceOptions(custom_timeouts=pulumi.CustomTimeouts(create="3m")),
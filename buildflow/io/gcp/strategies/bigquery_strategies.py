@@ -1,15 +1,116 @@
 import asyncio
-from typing import Any, Callable, Dict, List, Optional, Type
+import collections
+import concurrent.futures
+import dataclasses
+import datetime
+import json
+import logging
+import posixpath
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Deque,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+    Type,
+)
+
+import fsspec
+from fsspec.implementations.local import LocalFileSystem
 
 from buildflow.core.credentials import GCPCredentials
 from buildflow.core.types.gcp_types import BigQueryTableID, BigQueryTableName
+from buildflow.core.utils import uuid
 from buildflow.io.gcp.bigquery_dataset import BigQueryDataset
+from buildflow.io.local.strategies.file_strategies import FileSink
 from buildflow.io.strategies.sink import SinkStrategy
 from buildflow.io.utils.clients import gcp_clients
-from buildflow.io.utils.schemas import converters
+from buildflow.io.utils.file_systems import get_file_system
+from buildflow.io.utils.schemas import arrow_schemas, converters
+from buildflow.types.portable import FileFormat
+
+# Streaming insert requests can be at most 10MB, we leave room for the request
+# overhead.
+_MAX_INSERT_BYTES = 9 * 1000 * 1000
+# Reasons a row can fail to insert where retrying the row can succeed. Rows are
+# "stopped" when another row in the same request was invalid.
+_RETRYABLE_ROW_ERRORS = {
+    "stopped",
+    "backendError",
+    "internalError",
+    "rateLimitExceeded",
+    "timeout",
+}
+# AppendRows requests can be at most 10MB, we leave room for the request
+# overhead.
+_MAX_APPEND_BYTES = 9 * 1000 * 1000
+# How long we wait for in flight appends when closing a connection.
+_CLOSE_TIMEOUT_SECONDS = 30
+# The google.rpc.Code of AppendRows errors for an offset that was already
+# written and for an offset past the end of the stream.
+_ALREADY_EXISTS = 6
+_OUT_OF_RANGE = 11
+# How many times an append to a committed stream is sent before the stream is
+# replaced, and how long we wait before the first retry (doubled after each).
+_MAX_APPEND_ATTEMPTS = 5
+_APPEND_RETRY_SECONDS = 1
+# The directory batch loaded rows are staged in, under the staging location.
+BASE_LOAD_STAGING_DIR = "buildflow-bigquery-staging"
+
+
+def load_staging_file_system(
+    credentials: GCPCredentials, staging_location: str
+) -> fsspec.AbstractFileSystem:
+    """Returns the file system of a GCS (gs://...) or local staging location."""
+    if staging_location.startswith("gs://"):
+        return get_file_system(credentials)
+    return LocalFileSystem()
+
+
+def load_staging_dir(staging_location: str, table_id: BigQueryTableID) -> str:
+    """Returns the directory rows for a table are staged in."""
+    if staging_location.startswith("gs://"):
+        staging_location = staging_location[len("gs://") :]
+    return posixpath.join(staging_location, BASE_LOAD_STAGING_DIR, table_id)
+
+
+def _insert_chunks(
+    row_sizes: List[int], max_rows: int, max_bytes: int
+) -> List[List[int]]:
+    """Splits rows into chunks (of row indices) that fit in one insert request."""
+    chunks = []
+    chunk = []
+    chunk_bytes = 0
+    for i, row_bytes in enumerate(row_sizes):
+        if chunk and (len(chunk) >= max_rows or chunk_bytes + row_bytes > max_bytes):
+            chunks.append(chunk)
+            chunk = []
+            chunk_bytes = 0
+        # NOTE: A single row that is larger than the limit is still sent on its
+        # own, so the insert error is surfaced.
+        chunk.append(i)
+        chunk_bytes += row_bytes
+    if chunk:
+        chunks.append(chunk)
+    return chunks
 
 
 class StreamingBigQueryTableSink(SinkStrategy):
+    """Writes batches with streaming inserts.
+
+    Batches are split into requests by both row count (`batch_size`) and
+    serialized size, which are inserted concurrently on the sink's own thread
+    pool (at most `max_concurrent_inserts` at a time).
+
+    When only some rows of a request fail, only those rows are retried (with
+    the same insert ids, so BigQuery can dedupe them). Rows that can't be
+    inserted are written to the dead letter table if one is configured,
+    otherwise the push fails.
+    """
+
     def __init__(
         self,
         *,
@@ -17,6 +118,12 @@ class StreamingBigQueryTableSink(SinkStrategy):
         dataset: BigQueryDataset,
         table_name: BigQueryTableName,
         batch_size: int = 10_000,
+        max_request_bytes: int = _MAX_INSERT_BYTES,
+        max_concurrent_inserts: int = 10,
+        max_insert_attempts: int = 3,
+        initial_retry_delay_seconds: float = 0.5,
+        max_retry_delay_seconds: float = 10,
+        dead_letter_table_name: Optional[BigQueryTableName] = None,
     ):
         super().__init__(
             credentials=credentials, strategy_id="streaming-bigquery-table-sink"
@@ -26,31 +133,498 @@ class StreamingBigQueryTableSink(SinkStrategy):
         self.dataset_name = dataset.dataset_name
         self.table_name = table_name
         self.batch_size = batch_size
+        self.max_request_bytes = max_request_bytes
+        self.max_concurrent_inserts = max_concurrent_inserts
+        self.max_insert_attempts = max_insert_attempts
+        self.initial_retry_delay_seconds = initial_retry_delay_seconds
+        self.max_retry_delay_seconds = max_retry_delay_seconds
+        self.dead_letter_table_name = dead_letter_table_name
         # setup
         clients = gcp_clients.GCPClients(
             credentials=credentials,
             quota_project_id=self.project_id,
         )
         self.bq_client = clients.get_bigquery_client()
+        # NOTE: Inserts block, so they run on a pool dedicated to this sink
+        # instead of the default executor shared with everything else.
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_concurrent_inserts,
+            thread_name_prefix="bigquery-insert",
+        )
 
     @property
     def table_id(self) -> BigQueryTableID:
         return f"{self.project_id}.{self.dataset_name}.{self.table_name}"
 
-    def _insert_rows(self, rows: List[Dict[str, Any]]):
-        errors = self.bq_client.insert_rows_json(self.table_id, rows)
+    @property
+    def dead_letter_table_id(self) -> Optional[BigQueryTableID]:
+        if self.dead_letter_table_name is None:
+            return None
+        return f"{self.project_id}.{self.dataset_name}.{self.dead_letter_table_name}"
+
+    def _insert_rows(
+        self, table_id: BigQueryTableID, rows: List[Dict[str, Any]], row_ids: List[str]
+    ) -> List[Dict[str, Any]]:
+        return self.bq_client.insert_rows_json(table_id, rows, row_ids=row_ids)
+
+    async def _insert_chunk(
+        self, rows: List[Dict[str, Any]], row_ids: List[str], indices: List[int]
+    ) -> List[Tuple[int, Any]]:
+        """Inserts the rows at `indices`, returns the rows that failed."""
+        loop = asyncio.get_event_loop()
+        delay = self.initial_retry_delay_seconds
+        failed = []
+        for attempt in range(1, self.max_insert_attempts + 1):
+            errors = await loop.run_in_executor(
+                self._executor,
+                self._insert_rows,
+                self.table_id,
+                [rows[i] for i in indices],
+                [row_ids[i] for i in indices],
+            )
+            if not errors:
+                return failed
+            to_retry = []
+            for error in errors:
+                index = indices[error["index"]]
+                reasons = {e.get("reason") for e in error["errors"]}
+                if attempt < self.max_insert_attempts and reasons.issubset(
+                    _RETRYABLE_ROW_ERRORS
+                ):
+                    to_retry.append(index)
+                else:
+                    failed.append((index, error["errors"]))
+            if not to_retry:
+                return failed
+            logging.warning(
+                "%s rows failed to insert into %s, retrying in %.1f seconds.",
+                len(to_retry),
+                self.table_id,
+                delay,
+            )
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_retry_delay_seconds)
+            indices = to_retry
+        return failed
+
+    async def _dead_letter(self, rows: List[Dict[str, Any]]):
+        failed_at = datetime.datetime.now(datetime.timezone.utc).isoformat()
+        dead_letters = [
+            {
+                "row": json.dumps(row),
+                "errors": json.dumps(errors),
+                "failed_at": failed_at,
+            }
+            for row, errors in rows
+        ]
+        loop = asyncio.get_event_loop()
+        errors = await loop.run_in_executor(
+            self._executor,
+            self._insert_rows,
+            self.dead_letter_table_id,
+            dead_letters,
+            [uuid() for _ in dead_letters],
+        )
         if errors:
-            raise RuntimeError(f"BigQuery streaming insert failed: {errors}")
+            raise RuntimeError(f"BigQuery dead letter insert failed: {errors}")
 
     async def push(self, batch: List[dict]):
-        coros = []
-        loop = asyncio.get_event_loop()
-        for i in range(0, len(batch), self.batch_size):
-            rows = batch[i : i + self.batch_size]
-            coros.append(loop.run_in_executor(None, self._insert_rows, rows))
-        await asyncio.gather(*coros)
+        row_ids = [uuid() for _ in batch]
+        row_sizes = [len(json.dumps(row, default=str)) for row in batch]
+        chunks = _insert_chunks(row_sizes, self.batch_size, self.max_request_bytes)
+        results = await asyncio.gather(
+            *[self._insert_chunk(batch, row_ids, chunk) for chunk in chunks],
+            return_exceptions=True,
+        )
+        failed = []
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+            failed.extend(result)
+        if not failed:
+            return
+        if self.dead_letter_table_id is None:
+            raise RuntimeError(
+                "BigQuery streaming insert failed: "
+                f"{[{'index': i, 'errors': errors} for i, errors in failed]}"
+            )
+        logging.error(
+            "%s rows failed to insert into %s, writing them to %s",
+            len(failed),
+            self.table_id,
+            self.dead_letter_table_id,
+        )
+        await self._dead_letter([(batch[i], errors) for i, errors in failed])
+
+    async def teardown(self):
+        # NOTE: pushes wait for their inserts so nothing is in flight here.
+        self._executor.shutdown(wait=False)
 
     def push_converter(
         self, user_defined_type: Optional[Type]
     ) -> Callable[[Any], Dict[str, Any]]:
         return converters.json_push_converter(user_defined_type)
+
+
+class _AppendRowsError(RuntimeError):
+    """An AppendRows request that BigQuery responded to with an error."""
+
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+
+
+def _append_error_code(error: Exception) -> Optional[int]:
+    """Returns the google.rpc.Code of a failed append, None if it is unknown."""
+    from google.api_core import exceptions
+
+    if isinstance(error, _AppendRowsError):
+        return error.code
+    if isinstance(error, exceptions.AlreadyExists):
+        return _ALREADY_EXISTS
+    if isinstance(error, exceptions.OutOfRange):
+        return _OUT_OF_RANGE
+    return None
+
+
+class _AppendRowsConnection:
+    """A long lived AppendRows connection to a write stream.
+
+    Requests are pipelined over a single bidirectional stream, BigQuery
+    responds to them in the order they were sent. The connection is reopened
+    on the next append if the stream breaks.
+    """
+
+    def __init__(self, write_client, write_stream: str, serialized_schema: bytes):
+        self.write_client = write_client
+        self.write_stream = write_stream
+        self.serialized_schema = serialized_schema
+        self._requests: Optional[asyncio.Queue] = None
+        self._pending: Deque[asyncio.Future] = collections.deque()
+        self._reader_task: Optional[asyncio.Task] = None
+        self._open_lock = asyncio.Lock()
+
+    @staticmethod
+    async def _request_iterator(requests: asyncio.Queue) -> AsyncIterator:
+        while True:
+            request = await requests.get()
+            if request is None:
+                return
+            yield request
+
+    async def _read_responses(self, requests: asyncio.Queue, responses):
+        error = ConnectionError("AppendRows stream was closed.")
+        try:
+            async for response in responses:
+                if self._pending:
+                    self._pending.popleft().set_result(response)
+        except Exception as e:
+            error = e
+        if self._requests is requests:
+            self._requests = None
+        # NOTE: Anything still pending will never get a response.
+        while self._pending:
+            future = self._pending.popleft()
+            if not future.done():
+                future.set_exception(error)
+
+    async def append(self, request):
+        async with self._open_lock:
+            if self._requests is None:
+                requests = asyncio.Queue()
+                responses = await self.write_client.append_rows(
+                    requests=self._request_iterator(requests),
+                    metadata=(
+                        ("x-goog-request-params", f"write_stream={self.write_stream}"),
+                    ),
+                )
+                self._requests = requests
+                self._reader_task = asyncio.create_task(
+                    self._read_responses(requests, responses)
+                )
+                # The first request of a connection says which stream to write
+                # to and the schema of the rows.
+                request.write_stream = self.write_stream
+                request.arrow_rows.writer_schema.serialized_schema = (
+                    self.serialized_schema
+                )
+            future = asyncio.get_running_loop().create_future()
+            self._pending.append(future)
+            self._requests.put_nowait(request)
+        return await future
+
+    async def close(self):
+        if self._requests is not None:
+            self._requests.put_nowait(None)
+            self._requests = None
+        if self._reader_task is not None:
+            reader_task, self._reader_task = self._reader_task, None
+            try:
+                await asyncio.wait_for(reader_task, _CLOSE_TIMEOUT_SECONDS)
+            except asyncio.TimeoutError:
+                logging.warning("timed out waiting for AppendRows to finish.")
+
+
+class StorageWriteBigQueryTableSink(SinkStrategy):
+    """Writes batches through the BigQuery Storage Write API.
+
+    Rows are serialized to Arrow using the table's dataclass schema and
+    appended over a long lived connection. By default rows are appended to the
+    table's default stream (at least once). With `use_committed_stream` each
+    replica creates its own committed stream and appends with offsets, so an
+    append that is retried is not written twice. An append that fails with an
+    unknown outcome (e.g. its response was lost) is resent at the same offset.
+    If the stream can't be recovered it is finalized and the push fails, the
+    following appends go to a new stream.
+    """
+
+    def __init__(
+        self,
+        *,
+        credentials: GCPCredentials,
+        dataset: BigQueryDataset,
+        table_name: BigQueryTableName,
+        schema: Type,
+        use_committed_stream: bool = False,
+    ):
+        super().__init__(
+            credentials=credentials, strategy_id="storage-write-bigquery-table-sink"
+        )
+        # configuration
+        self.project_id = dataset.project_id
+        self.dataset_name = dataset.dataset_name
+        self.table_name = table_name
+        self.use_committed_stream = use_committed_stream
+        self.arrow_schema = arrow_schemas.dataclass_to_arrow_schema(schema)
+        # setup
+        self._clients = gcp_clients.GCPClients(
+            credentials=credentials,
+            quota_project_id=self.project_id,
+        )
+        # NOTE: The write client and connection are created on the first push
+        # since they are bound to the event loop they are created on.
+        self._write_client = None
+        self._write_stream: Optional[str] = None
+        self._connection: Optional[_AppendRowsConnection] = None
+        self._connection_lock: Optional[asyncio.Lock] = None
+        # The offset of the next row appended to a committed stream.
+        self._offset = 0
+
+    @property
+    def table_id(self) -> BigQueryTableID:
+        return f"{self.project_id}.{self.dataset_name}.{self.table_name}"
+
+    @property
+    def table_path(self) -> str:
+        return (
+            f"projects/{self.project_id}/datasets/{self.dataset_name}/"
+            f"tables/{self.table_name}"
+        )
+
+    async def _get_connection(self) -> _AppendRowsConnection:
+        if self._connection_lock is None:
+            self._connection_lock = asyncio.Lock()
+        async with self._connection_lock:
+            if self._connection is None:
+                from google.cloud.bigquery_storage_v1 import types
+
+                self._write_client = self._clients.get_bigquery_write_async_client(
+                    self.project_id
+                )
+                if self.use_committed_stream:
+                    write_stream = await self._write_client.create_write_stream(
+                        parent=self.table_path,
+                        write_stream=types.WriteStream(
+                            type_=types.WriteStream.Type.COMMITTED
+                        ),
+                    )
+                    self._write_stream = write_stream.name
+                else:
+                    self._write_stream = f"{self.table_path}/streams/_default"
+                self._connection = _AppendRowsConnection(
+                    self._write_client,
+                    self._write_stream,
+                    self.arrow_schema.serialize().to_pybytes(),
+                )
+            return self._connection
+
+    async def _close_connection(self, connection: _AppendRowsConnection):
+        await connection.close()
+        if self.use_committed_stream:
+            try:
+                await self._write_client.finalize_write_stream(
+                    name=connection.write_stream
+                )
+            except Exception:
+                logging.exception(
+                    "failed to finalize write stream %s", connection.write_stream
+                )
+
+    async def _replace_stream(self, connection: _AppendRowsConnection):
+        """Finalizes the stream of `connection`, the next append opens a new one."""
+        async with self._connection_lock:
+            if self._connection is not connection:
+                # Another append already replaced the stream.
+                return
+            self._connection = None
+            self._offset = 0
+            await self._close_connection(connection)
+
+    async def _send(
+        self,
+        connection: _AppendRowsConnection,
+        serialized_record_batch: bytes,
+        offset: Optional[int],
+    ):
+        from google.cloud.bigquery_storage_v1 import types
+
+        request = types.AppendRowsRequest(
+            arrow_rows=types.AppendRowsRequest.ArrowData(
+                rows=types.ArrowRecordBatch(
+                    serialized_record_batch=serialized_record_batch
+                )
+            )
+        )
+        if offset is not None:
+            request.offset = offset
+        response = await connection.append(request)
+        if "error" in response:
+            raise _AppendRowsError(
+                response.error.code,
+                "BigQuery storage write failed: "
+                f"{response.error.message} {list(response.row_errors)}",
+            )
+
+    async def _append(self, record_batch):
+        serialized_record_batch = record_batch.serialize().to_pybytes()
+        connection = await self._get_connection()
+        if not self.use_committed_stream:
+            await self._send(connection, serialized_record_batch, None)
+            return
+        offset = self._offset
+        self._offset += record_batch.num_rows
+        attempts = 0
+        while True:
+            attempts += 1
+            try:
+                await self._send(connection, serialized_record_batch, offset)
+                return
+            except Exception as e:
+                error = e
+            code = _append_error_code(error)
+            if code == _ALREADY_EXISTS:
+                # The rows were written by an earlier attempt whose response was
+                # lost.
+                return
+            # NOTE: If we don't know what happened (e.g. the connection broke)
+            # we resend the rows at the same offset. OUT_OF_RANGE means an
+            # earlier append failed, it may still be resent.
+            retryable = code is None or code == _OUT_OF_RANGE
+            if (
+                not retryable
+                or attempts == _MAX_APPEND_ATTEMPTS
+                or self._connection is not connection
+            ):
+                break
+            await asyncio.sleep(_APPEND_RETRY_SECONDS * 2 ** (attempts - 1))
+        # The stream has a gap we can't fill, later appends to it would fail too.
+        # We move to a new stream and fail the push so the rows are retried
+        # there.
+        await self._replace_stream(connection)
+        raise error
+
+    async def push(self, batch: List[Any]):
+        record_batch = arrow_schemas.to_record_batch(batch, self.arrow_schema)
+        slices = arrow_schemas.split_record_batch(record_batch, _MAX_APPEND_BYTES)
+        # NOTE: We wait for all appends to finish before raising so a failed
+        # append doesn't cancel appends that are still in flight.
+        results = await asyncio.gather(
+            *[self._append(s) for s in slices], return_exceptions=True
+        )
+        errors = [result for result in results if isinstance(result, Exception)]
+        if errors:
+            raise errors[0]
+
+    async def teardown(self):
+        if self._connection is None:
+            return
+        connection, self._connection = self._connection, None
+        await self._close_connection(connection)
+
+    def push_converter(self, user_defined_type: Optional[Type]) -> Callable[[Any], Any]:
+        # NOTE: Rows are converted straight from the dataclasses to arrow.
+        if user_defined_type is None or dataclasses.is_dataclass(user_defined_type):
+            return converters.identity()
+        return converters.json_push_converter(user_defined_type)
+
+
+class BatchLoadBigQueryTableSink(SinkStrategy):
+    """Stages batches as Parquet files that are loaded with BigQuery load jobs.
+
+    Pushed rows are appended to a rolling Parquet file in the staging location,
+    which can be a GCS path or a local directory. The file is finalized once it
+    reaches `max_file_bytes` or `max_file_rows`, or has been open for
+    `max_file_age_secs`. `BigQueryLoadBackgroundTask` periodically loads the
+    finalized files into the table. Load jobs are free, so this is much cheaper
+    than streaming for tables that can tolerate the delay.
+
+    Like `FileSink`, delivery is at-most-once: a batch is acked once its rows
+    are in the open file, so rows in a file that wasn't finalized are lost if
+    the replica dies.
+    """
+
+    def __init__(
+        self,
+        *,
+        credentials: GCPCredentials,
+        dataset: BigQueryDataset,
+        table_name: BigQueryTableName,
+        schema: Type,
+        staging_location: str,
+        max_file_bytes: int = 256 * 1024 * 1024,
+        max_file_rows: Optional[int] = None,
+        max_file_age_secs: float = 60,
+    ):
+        super().__init__(
+            credentials=credentials, strategy_id="batch-load-bigquery-table-sink"
+        )
+        # configuration
+        self.project_id = dataset.project_id
+        self.dataset_name = dataset.dataset_name
+        self.table_name = table_name
+        self.max_file_bytes = max_file_bytes
+        self.arrow_schema = arrow_schemas.dataclass_to_arrow_schema(schema)
+        # setup
+        self.file_system = load_staging_file_system(credentials, staging_location)
+        self.staging_dir = load_staging_dir(staging_location, self.table_id)
+        self._file_sink = FileSink(
+            credentials=credentials,
+            file_path=posixpath.join(self.staging_dir, "rows.parquet"),
+            file_format=FileFormat.PARQUET,
+            file_system=self.file_system,
+            max_file_bytes=max_file_bytes,
+            max_file_rows=max_file_rows,
+            max_file_age_secs=max_file_age_secs,
+        )
+
+    @property
+    def table_id(self) -> BigQueryTableID:
+        return f"{self.project_id}.{self.dataset_name}.{self.table_name}"
+
+    async def push(self, batch: List[Any]):
+        import pyarrow as pa
+
+        record_batch = arrow_schemas.to_record_batch(batch, self.arrow_schema)
+        # NOTE: Large batches are written in slices so the file can be rolled
+        # once it reaches `max_file_bytes`.
+        for s in arrow_schemas.split_record_batch(record_batch, self.max_file_bytes):
+            await self._file_sink.push_table(pa.Table.from_batches([s]))
+
+    async def teardown(self):
+        await self._file_sink.teardown()
+
+    def push_converter(self, user_defined_type: Optional[Type]) -> Callable[[Any], Any]:
+        # NOTE: Rows are converted straight from the dataclasses to arrow.
+        if user_defined_type is None or dataclasses.is_dataclass(user_defined_type):
+            return converters.identity()
+        return converters.json_push_converter(user_defined_type)
@@ -0,0 +1,436 @@
+import asyncio
+import dataclasses
+import datetime
+import os
+import shutil
+import tempfile
+import unittest
+from typing import List, Optional
+from unittest import mock
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from google.cloud.bigquery_storage_v1 import types
+from google.rpc import status_pb2
+
+from buildflow.io.gcp.bigquery_dataset import BigQueryDataset
+from buildflow.io.gcp.strategies import bigquery_strategies
+from buildflow.io.gcp.strategies.bigquery_strategies import (
+    BatchLoadBigQueryTableSink,
+    StorageWriteBigQueryTableSink,
+    StreamingBigQueryTableSink,
+)
+
+
+@dataclasses.dataclass
+class Row:
+    value: int
+    name: Optional[str]
+    tags: List[str]
+    timestamp: datetime.datetime
+
+
+class _FakeBigQueryWriteClient:
+    """A fake of the storage write service that records appended rows."""
+
+    def __init__(self):
+        self.rows = []
+        self.requests = []
+        self.connections = 0
+        self.finalized = []
+        self.fail_offsets = set()
+        # Appends at these offsets are written but the connection breaks before
+        # the response is sent.
+        self.lost_response_offsets = set()
+        # The number of rows in each committed stream.
+        self.stream_rows = {}
+
+    async def create_write_stream(self, parent, write_stream):
+        name = f"{parent}/streams/committed-stream-{len(self.stream_rows)}"
+        self.stream_rows[name] = 0
+        return types.WriteStream(name=name, type_=write_stream.type_)
+
+    async def finalize_write_stream(self, name):
+        self.finalized.append(name)
+
+    def _check_offset(self, stream, request) -> Optional[status_pb2.Status]:
+        if "offset" not in request:
+            return None
+        if stream in self.finalized:
+            return status_pb2.Status(code=9, message="stream is finalized")
+        if request.offset < self.stream_rows[stream]:
+            return status_pb2.Status(code=6, message="offset already exists")
+        if request.offset > self.stream_rows[stream]:
+            return status_pb2.Status(code=11, message="offset out of range")
+        return None
+
+    async def append_rows(self, requests, metadata=()):
+        self.connections += 1
+
+        async def responses():
+            schema = None
+            stream = None
+            async for request in requests:
+                self.requests.append(request)
+                stream = stream or request.write_stream
+                arrow_rows = request.arrow_rows
+                if arrow_rows.writer_schema.serialized_schema:
+                    schema = pa.ipc.read_schema(
+                        pa.py_buffer(arrow_rows.writer_schema.serialized_schema)
+                    )
+                if request.offset in self.fail_offsets:
+                    yield types.AppendRowsResponse(
+                        error=status_pb2.Status(code=3, message="bad append")
+                    )
+                    continue
+                error = self._check_offset(stream, request)
+                if error is not None:
+                    yield types.AppendRowsResponse(error=error)
+                    continue
+                record_batch = pa.ipc.read_record_batch(
+                    pa.py_buffer(arrow_rows.rows.serialized_record_batch), schema
+                )
+                self.rows.extend(record_batch.to_pylist())
+                if "offset" in request:
+                    self.stream_rows[stream] += record_batch.num_rows
+                if request.offset in self.lost_response_offsets:
+                    self.lost_response_offsets.remove(request.offset)
+                    raise ConnectionError("connection reset")
+                yield types.AppendRowsResponse(
+                    append_result=types.AppendRowsResponse.AppendResult(
+                        offset=request.offset
+                    )
+                )
+
+        return responses()
+
+
+class StorageWriteBigQueryTableSinkTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.write_client = _FakeBigQueryWriteClient()
+        patcher = mock.patch(
+            "buildflow.io.gcp.strategies.bigquery_strategies.gcp_clients.GCPClients"
+        )
+        gcp_clients_mock = patcher.start()
+        self.addCleanup(patcher.stop)
+        gcp_clients_mock.return_value.get_bigquery_write_async_client.return_value = (
+            self.write_client
+        )
+        self.timestamp = datetime.datetime(2023, 1, 1, tzinfo=datetime.timezone.utc)
+
+    def sink(self, **kwargs) -> StorageWriteBigQueryTableSink:
+        return StorageWriteBigQueryTableSink(
+            credentials=mock.MagicMock(),
+            dataset=BigQueryDataset(project_id="project", dataset_name="dataset"),
+            table_name="table",
+            schema=Row,
+            **kwargs,
+        )
+
+    def rows(self, start: int, end: int) -> List[Row]:
+        return [Row(i, None, ["a"], self.timestamp) for i in range(start, end)]
+
+    async def test_append_to_default_stream(self):
+        sink = self.sink()
+
+        await sink.push(self.rows(0, 3))
+        await sink.push(self.rows(3, 5))
+        await sink.teardown()
+
+        self.assertEqual(
+            list(range(5)), [row["value"] for row in self.write_client.rows]
+        )
+        self.assertEqual(
+            {"value": 0, "name": None, "tags": ["a"], "timestamp": self.timestamp},
+            self.write_client.rows[0],
+        )
+        # Both pushes are sent over the same connection, only the first request
+        # names the stream.
+        self.assertEqual(1, self.write_client.connections)
+        first, second = self.write_client.requests
+        self.assertEqual(
+            "projects/project/datasets/dataset/tables/table/streams/_default",
+            first.write_stream,
+        )
+        self.assertEqual("", second.write_stream)
+        self.assertNotIn("offset", first)
+        self.assertEqual([], self.write_client.finalized)
+
+    async def test_append_to_committed_stream(self):
+        sink = self.sink(use_committed_stream=True)
+
+        await sink.push(self.rows(0, 3))
+        await sink.push(self.rows(3, 5))
+        await sink.teardown()
+
+        self.assertEqual([0, 3], [r.offset for r in self.write_client.requests])
+        self.assertEqual(
+            [
+                "projects/project/datasets/dataset/tables/table/streams/"
+                "committed-stream-0"
+            ],
+            self.write_client.finalized,
+        )
+
+    async def test_lost_response_is_not_written_twice(self):
+        sink = self.sink(use_committed_stream=True)
+        self.write_client.lost_response_offsets = {0}
+
+        with mock.patch.object(bigquery_strategies, "_APPEND_RETRY_SECONDS", 0):
+            await sink.push(self.rows(0, 3))
+        await sink.push(self.rows(3, 5))
+        await sink.teardown()
+
+        # The append is resent at the same offset on a new connection, BigQuery
+        # says the rows already exist.
+        self.assertEqual([0, 0, 3], [r.offset for r in self.write_client.requests])
+        self.assertEqual(2, self.write_client.connections)
+        self.assertEqual(
+            list(range(5)), [row["value"] for row in self.write_client.rows]
+        )
+        self.assertEqual(1, len(self.write_client.finalized))
+
+    async def test_failed_append_moves_to_a_new_stream(self):
+        sink = self.sink(use_committed_stream=True)
+        self.write_client.fail_offsets = {3}
+
+        await sink.push(self.rows(0, 3))
+        with self.assertRaisesRegex(RuntimeError, "bad append"):
+            await sink.push(self.rows(3, 5))
+        # The failed stream was finalized before the push failed.
+        self.assertEqual(
+            [
+                "projects/project/datasets/dataset/tables/table/streams/"
+                "committed-stream-0"
+            ],
+            self.write_client.finalized,
+        )
+        self.write_client.fail_offsets = set()
+        await sink.push(self.rows(3, 5))
+        await sink.teardown()
+
+        self.assertEqual([0, 3, 0], [r.offset for r in self.write_client.requests])
+        self.assertEqual(
+            "projects/project/datasets/dataset/tables/table/streams/"
+            "committed-stream-1",
+            self.write_client.requests[-1].write_stream,
+        )
+        self.assertEqual(
+            list(range(5)), [row["value"] for row in self.write_client.rows]
+        )
+        self.assertEqual(2, len(self.write_client.finalized))
+
+    async def test_gap_in_stream_moves_to_a_new_stream(self):
+        sink = self.sink(use_committed_stream=True)
+        # An append that fails without a response leaves a gap if the
+        # following appends were already reserved.
+        sink._offset = 2
+
+        with mock.patch.object(bigquery_strategies, "_APPEND_RETRY_SECONDS", 0):
+            with self.assertRaisesRegex(RuntimeError, "out of range"):
+                await sink.push(self.rows(0, 3))
+        await sink.push(self.rows(0, 3))
+        await sink.teardown()
+
+        self.assertEqual(
+            bigquery_strategies._MAX_APPEND_ATTEMPTS + 1,
+            len(self.write_client.requests),
+        )
+        self.assertEqual(
+            list(range(3)), [row["value"] for row in self.write_client.rows]
+        )
+
+    async def test_large_batches_are_split(self):
+        sink = self.sink()
+
+        with mock.patch.object(bigquery_strategies, "_MAX_APPEND_BYTES", 100):
+            await sink.push(self.rows(0, 10))
+        await sink.teardown()
+
+        self.assertGreater(len(self.write_client.requests), 1)
+        self.assertEqual(
+            list(range(10)), [row["value"] for row in self.write_client.rows]
+        )
+
+
+class BatchLoadBigQueryTableSinkTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.staging_location = tempfile.mkdtemp()
+        self.timestamp = datetime.datetime(2023, 1, 1, tzinfo=datetime.timezone.utc)
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.staging_location)
+
+    def sink(self, **kwargs) -> BatchLoadBigQueryTableSink:
+        return BatchLoadBigQueryTableSink(
+            credentials=mock.MagicMock(),
+            dataset=BigQueryDataset(project_id="project", dataset_name="dataset"),
+            table_name="table",
+            schema=Row,
+            staging_location=self.staging_location,
+            **kwargs,
+        )
+
+    def staged_tables(
+        self, sink: BatchLoadBigQueryTableSink, allow_open: bool = False
+    ) -> List[pa.Table]:
+        files = sorted(os.listdir(sink.staging_dir))
+        if not allow_open:
+            self.assertTrue(all(f.endswith(".parquet") for f in files))
+        return [
+            pq.read_table(os.path.join(sink.staging_dir, f))
+            for f in files
+            if f.endswith(".parquet")
+        ]
+
+    async def test_push_stages_parquet_files(self):
+        sink = self.sink()
+
+        await sink.push([Row(i, "name", ["a"], self.timestamp) for i in range(3)])
+        await sink.teardown()
+
+        self.assertEqual(
+            os.path.join(
+                self.staging_location, "buildflow-bigquery-staging", sink.table_id
+            ),
+            sink.staging_dir,
+        )
+        (table,) = self.staged_tables(sink)
+        self.assertEqual(sink.arrow_schema, table.schema)
+        self.assertEqual(
+            {"value": 0, "name": "name", "tags": ["a"], "timestamp": self.timestamp},
+            table.to_pylist()[0],
+        )
+
+    async def test_push_splits_large_batches(self):
+        sink = self.sink(max_file_bytes=100)
+
+        await sink.push([Row(i, None, [], self.timestamp) for i in range(10)])
+        await sink.teardown()
+
+        tables = self.staged_tables(sink)
+        self.assertGreater(len(tables), 1)
+        self.assertEqual(10, sum(t.num_rows for t in tables))
+
+    async def test_pushes_are_buffered_in_one_file(self):
+        sink = self.sink()
+
+        await sink.push([Row(0, None, [], self.timestamp)])
+        await sink.push([Row(1, "name", ["a"], self.timestamp)])
+        # The file isn't staged until it is finalized.
+        self.assertTrue(all(f.endswith(".tmp") for f in os.listdir(sink.staging_dir)))
+        await sink.teardown()
+
+        (table,) = self.staged_tables(sink)
+        self.assertEqual(sink.arrow_schema, table.schema)
+        self.assertEqual([0, 1], table.column("value").to_pylist())
+
+    async def test_file_is_staged_after_max_rows(self):
+        sink = self.sink(max_file_rows=2)
+
+        for i in range(5):
+            await sink.push([Row(i, None, [], self.timestamp)])
+
+        self.assertEqual(
+            [2, 2], [t.num_rows for t in self.staged_tables(sink, allow_open=True)]
+        )
+        await sink.teardown()
+        self.assertEqual(
+            [2, 2, 1],
+            sorted((t.num_rows for t in self.staged_tables(sink)), reverse=True),
+        )
+
+    async def test_file_is_staged_after_max_age(self):
+        sink = self.sink(max_file_age_secs=0.1)
+
+        await sink.push([Row(0, None, [], self.timestamp)])
+        await asyncio.sleep(0.5)
+
+        (table,) = self.staged_tables(sink)
+        self.assertEqual(1, table.num_rows)
+        await sink.teardown()
+
+
+class StreamingBigQueryTableSinkTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        patcher = mock.patch("buildflow.io.utils.clients.gcp_clients.GCPClients")
+        gcp_clients_mock = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.insert_rows = (
+            gcp_clients_mock.return_value.get_bigquery_client.return_value.insert_rows_json
+        )
+        self.insert_rows.return_value = []
+
+    def sink(self, **kwargs) -> StreamingBigQueryTableSink:
+        sink = StreamingBigQueryTableSink(
+            credentials=mock.MagicMock(),
+            dataset=BigQueryDataset(project_id="project", dataset_name="dataset"),
+            table_name="table",
+            initial_retry_delay_seconds=0,
+            **kwargs,
+        )
+        self.addAsyncCleanup(sink.teardown)
+        return sink
+
+    async def test_chunks_by_bytes(self):
+        sink = self.sink(max_request_bytes=100)
+        rows = [{"value": "a" * 30} for _ in range(10)]
+
+        await sink.push(rows)
+
+        # Each row is 17 + 30 bytes when serialized so 2 rows fit per request.
+        self.assertEqual(self.insert_rows.call_count, 5)
+        inserted = [r for call in self.insert_rows.call_args_list for r in call[0][1]]
+        self.assertEqual(inserted, rows)
+
+    async def test_retries_only_failed_rows(self):
+        sink = self.sink()
+        rows = [{"value": i} for i in range(4)]
+        self.insert_rows.side_effect = [
+            [
+                {"index": 1, "errors": [{"reason": "stopped"}]},
+                {"index": 3, "errors": [{"reason": "backendError"}]},
+            ],
+            [],
+        ]
+
+        await sink.push(rows)
+
+        self.assertEqual(self.insert_rows.call_count, 2)
+        first, retry = self.insert_rows.call_args_list
+        self.assertEqual(retry[0][1], [rows[1], rows[3]])
+        # The insert ids are reused so BigQuery can dedupe the retried rows.
+        first_ids = first[1]["row_ids"]
+        self.assertEqual(retry[1]["row_ids"], [first_ids[1], first_ids[3]])
+
+    async def test_dead_letters_invalid_rows(self):
+        sink = self.sink(dead_letter_table_name="dead_letters")
+        rows = [{"value": 1}, {"value": "bad"}]
+        self.insert_rows.side_effect = [
+            [{"index": 1, "errors": [{"reason": "invalid", "message": "bad"}]}],
+            [],
+        ]
+
+        await sink.push(rows)
+
+        self.assertEqual(self.insert_rows.call_count, 2)
+        table_id, dead_letters = self.insert_rows.call_args_list[1][0]
+        self.assertEqual(table_id, "project.dataset.dead_letters")
+        self.assertEqual(len(dead_letters), 1)
+        self.assertEqual(dead_letters[0]["row"], '{"value": "bad"}')
+        self.assertIn("invalid", dead_letters[0]["errors"])
+
+    async def test_raises_without_dead_letter_table(self):
+        sink = self.sink(max_insert_attempts=2)
+        self.insert_rows.return_value = [
+            {"index": 0, "errors": [{"reason": "stopped"}]}
+        ]
+
+        with self.assertRaises(RuntimeError):
+            await sink.push([{"value": 1}])
+
+        self.assertEqual(self.insert_rows.call_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
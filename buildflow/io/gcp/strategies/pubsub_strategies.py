@@ -1,9 +1,12 @@
+import asyncio
 import dataclasses
 import datetime
 import logging
-from typing import Any, Callable, Iterable, Optional, Type, Union
+from typing import Any, Callable, Dict, Iterable, List, Optional, Type, Union
 
-from google.cloud.monitoring_v3 import query
+from google.cloud.pubsub_v1.subscriber.futures import StreamingPullFuture
+from google.cloud.pubsub_v1.subscriber.message import Message
+from google.cloud.pubsub_v1.types import FlowControl
 from google.cloud.pubsub_v1.types import PubsubMessage as GCPPubSubMessage
 from google.protobuf.timestamp_pb2 import Timestamp
 
@@ -20,13 +23,30 @@ from buildflow.core.types.gcp_types import (
 from buildflow.io.strategies.sink import Batch, SinkStrategy
 from buildflow.io.strategies.source import AckInfo, PullResponse, SourceStrategy
 from buildflow.io.utils.clients import gcp_clients
+from buildflow.io.utils.lease_manager import LeaseManager
 from buildflow.io.utils.schemas import converters
 from buildflow.types.gcp import PubsubMessage
 
+# The default ack deadline of a subscription, used when we don't know the
+# subscription's actual ack deadline.
+_DEFAULT_ACK_DEADLINE_SECONDS = 10
+# The bounds Pub/Sub puts on ack deadlines.
+_MIN_ACK_DEADLINE_SECONDS = 10
+_MAX_ACK_DEADLINE_SECONDS = 600
+# The max number of ack ids we send in a single modify ack deadline request.
+_MAX_MODIFY_ACK_DEADLINE_IDS = 2500
+# The limits Pub/Sub puts on a single publish request.
+_MAX_PUBLISH_MESSAGES = 1000
+_MAX_PUBLISH_BYTES = 10 * 1000 * 1000
+# A rough upper bound on how much a message's encoding adds to its size.
+_PUBLISH_MESSAGE_OVERHEAD_BYTES = 64
+
 
 @dataclasses.dataclass(frozen=True)
 class _PubsubAckInfo(AckInfo):
     ack_ids: Iterable[str]
+    # The ordering key of each message, used for ordered processing.
+    ordering_keys: List[str] = dataclasses.field(default_factory=list)
 
 
 def _timestamp_to_datetime(timestamp: Union[datetime.datetime, Timestamp]):
@@ -44,6 +64,9 @@ class GCPPubSubSubscriptionSource(SourceStrategy):
         project_id: GCPProjectID,
         batch_size: int = 1000,
         include_attributes: bool = False,
+        ordering_key_attribute: Optional[str] = None,
+        ack_deadline_seconds: Optional[int] = None,
+        max_lease_duration_seconds: int = 60 * 60,
     ):
         super().__init__(
             credentials=credentials,
@@ -54,16 +77,39 @@ class GCPPubSubSubscriptionSource(SourceStrategy):
         self.project_id = project_id
         self.batch_size = batch_size
         self.include_attributes = include_attributes
+        self.ordering_key_attribute = ordering_key_attribute
+        if ack_deadline_seconds is None:
+            ack_deadline_seconds = _DEFAULT_ACK_DEADLINE_SECONDS
+        self.ack_deadline_seconds = ack_deadline_seconds
+        self.max_lease_duration_seconds = max_lease_duration_seconds
         # setup
         self.credentials = credentials
-        clients = gcp_clients.GCPClients(
+        self._clients = gcp_clients.GCPClients(
             credentials=credentials,
             quota_project_id=project_id,
         )
-        self.subscriber_client = clients.get_async_subscriber_client()
-        self.publisher_client = clients.get_async_publisher_client()
-        self.metrics_client = clients.get_metrics_client()
+        self.subscriber_client = self._clients.get_async_subscriber_client()
+        self.publisher_client = self._clients.get_async_publisher_client()
+        # NOTE: The metrics client is only needed to fetch the backlog, which
+        # replicas never do, so we create it on first use.
+        self._metrics_client = None
         # initial state
+        # NOTE: Pulled messages have their ack deadline extended in the
+        # background until they are acked, so slow batches are not redelivered
+        # while they are still being processed.
+        self._lease_manager = LeaseManager(
+            self._extend_ack_deadlines,
+            initial_deadline_seconds=self.ack_deadline_seconds,
+            min_deadline_seconds=_MIN_ACK_DEADLINE_SECONDS,
+            max_deadline_seconds=_MAX_ACK_DEADLINE_SECONDS,
+            max_lease_duration_seconds=self.max_lease_duration_seconds,
+        )
+
+    @property
+    def metrics_client(self):
+        if self._metrics_client is None:
+            self._metrics_client = self._clients.get_metrics_client()
+        return self._metrics_client
 
     @property
     def subscription_id(self) -> PubSubSubscriptionID:
@@ -81,31 +127,65 @@ class GCPPubSubSubscriptionSource(SourceStrategy):
 
         payloads = []
         ack_ids = []
+        ordering_keys = []
         for received_message in response.received_messages:
-            if self.include_attributes:
-                att_dict = {}
-                attributes = received_message.message.attributes
-                for key, value in attributes.items():
-                    att_dict[key] = value
-
-                payload = PubsubMessage(
-                    received_message.message.data, att_dict, received_message.ack_id
+            payloads.append(
+                self._to_payload(
+                    received_message.message.data,
+                    received_message.message.attributes,
+                    received_message.ack_id,
+                    received_message.message.ordering_key,
                 )
-            elif received_message.message.data:
-                payload = received_message.message.data
-            else:
-                logging.error(
-                    "Received empty message from pubsub"
-                    "did you mean to set include attributes?"
-                )
-                payload = None
-            payloads.append(payload)
+            )
             ack_ids.append(received_message.ack_id)
+            ordering_keys.append(self._ordering_key(received_message.message))
 
-        return PullResponse(payloads, _PubsubAckInfo(ack_ids))
+        self._lease_manager.add(ack_ids)
+        return PullResponse(payloads, _PubsubAckInfo(ack_ids, ordering_keys))
+
+    def _ordering_key(self, message: Union[GCPPubSubMessage, Message]) -> str:
+        if self.ordering_key_attribute is not None:
+            return message.attributes.get(self.ordering_key_attribute, "")
+        return message.ordering_key
+
+    async def _extend_ack_deadlines(self, ack_ids: List[str], deadline_seconds: int):
+        await asyncio.gather(
+            *[
+                self.subscriber_client.modify_ack_deadline(
+                    subscription=self.subscription_id,
+                    ack_ids=ack_ids[i : i + _MAX_MODIFY_ACK_DEADLINE_IDS],
+                    ack_deadline_seconds=deadline_seconds,
+                )
+                for i in range(0, len(ack_ids), _MAX_MODIFY_ACK_DEADLINE_IDS)
+            ]
+        )
+
+    def _to_payload(
+        self,
+        data: bytes,
+        attributes: Dict[str, str],
+        ack_id: str,
+        ordering_key: str = "",
+    ):
+        if self.include_attributes:
+            att_dict = {}
+            for key, value in attributes.items():
+                att_dict[key] = value
+            return PubsubMessage(data, att_dict, ack_id, ordering_key)
+        elif data:
+            return data
+        else:
+            logging.error(
+                "Received empty message from pubsub"
+                "did you mean to set include attributes?"
+            )
+            return None
 
     async def ack(self, ack_info: _PubsubAckInfo, success: bool):
         if ack_info.ack_ids:
+            # Stop extending the leases first so we don't extend the deadline
+            # of a message after it has been nacked.
+            self._lease_manager.remove(ack_info.ack_ids)
             if success:
                 await self.subscriber_client.acknowledge(
                     ack_ids=ack_info.ack_ids, subscription=self.subscription_id
@@ -120,11 +200,16 @@ class GCPPubSubSubscriptionSource(SourceStrategy):
                     ack_deadline_seconds=ack_deadline_seconds,
                 )
 
+    async def teardown(self):
+        await self._lease_manager.stop()
+
     async def backlog(self) -> int:
         split_sub = self.subscription_id.split("/")
         project = split_sub[1]
         sub_id = split_sub[3]
         # TODO: Create a gcp metrics utility library
+        from google.cloud.monitoring_v3 import query
+
         backlog_query = query.Query(
             client=self.metrics_client,
             project=project,
@@ -158,6 +243,19 @@ class GCPPubSubSubscriptionSource(SourceStrategy):
     def max_batch_size(self) -> int:
         return self.batch_size
 
+    def ordering_keys(self, response: PullResponse) -> List[Optional[str]]:
+        # Messages without an ordering key can be processed in any order.
+        return [key or None for key in response.ack_info.ordering_keys]
+
+    def split_ack_info(
+        self, ack_info: _PubsubAckInfo, indices: List[int]
+    ) -> _PubsubAckInfo:
+        ack_ids = list(ack_info.ack_ids)
+        return _PubsubAckInfo(
+            [ack_ids[i] for i in indices],
+            [ack_info.ordering_keys[i] for i in indices],
+        )
+
     def pull_converter(self, type_: Optional[Type]) -> Callable[[bytes], Any]:
         if type_ is None or self.include_attributes:
             # If include attributes is true, we always return a PubsubMessage
@@ -179,17 +277,204 @@ class GCPPubSubSubscriptionSource(SourceStrategy):
                 )
 
 
+class GCPPubSubSubscriptionStreamingSource(GCPPubSubSubscriptionSource):
+    """Pulls messages from a subscription over a StreamingPull stream.
+
+    Unlike the unary pull source, this keeps a stream open (per source) that
+    the server pushes messages over as they become available. Messages are
+    buffered until they are pulled, the number of outstanding messages (and
+    bytes) is bounded by flow control. Outstanding messages have their ack
+    deadline extended by the subscriber client until they are acked, up to
+    `max_lease_duration_seconds`.
+    """
+
+    def __init__(
+        self,
+        *,
+        credentials: GCPCredentials,
+        subscription_name: PubSubSubscriptionName,
+        project_id: GCPProjectID,
+        batch_size: int = 1000,
+        include_attributes: bool = False,
+        ordering_key_attribute: Optional[str] = None,
+        max_outstanding_messages: int = 1000,
+        max_outstanding_bytes: int = 100 * 1024 * 1024,
+        max_lease_duration_seconds: int = 60 * 60,
+        pull_wait_seconds: float = 1,
+    ):
+        super().__init__(
+            credentials=credentials,
+            subscription_name=subscription_name,
+            project_id=project_id,
+            batch_size=batch_size,
+            include_attributes=include_attributes,
+            ordering_key_attribute=ordering_key_attribute,
+            max_lease_duration_seconds=max_lease_duration_seconds,
+        )
+        # configuration
+        self.max_outstanding_messages = max_outstanding_messages
+        self.max_outstanding_bytes = max_outstanding_bytes
+        self.pull_wait_seconds = pull_wait_seconds
+        # initial state
+        self._streaming_pull_future: Optional[StreamingPullFuture] = None
+        self._buffer: Optional[asyncio.Queue] = None
+        # Messages that have been pulled but not acked yet, by ack_id.
+        self._leased_messages: Dict[str, Message] = {}
+
+    def _start_streaming_pull(self):
+        loop = asyncio.get_running_loop()
+        buffer = asyncio.Queue()
+
+        def callback(message: Message):
+            # NOTE: This is called from the subscriber client's threads.
+            loop.call_soon_threadsafe(buffer.put_nowait, message)
+
+        self._buffer = buffer
+        self._streaming_pull_future = self._clients.get_subscriber_client().subscribe(
+            self.subscription_id,
+            callback=callback,
+            flow_control=FlowControl(
+                max_messages=self.max_outstanding_messages,
+                max_bytes=self.max_outstanding_bytes,
+                max_lease_duration=self.max_lease_duration_seconds,
+            ),
+        )
+
+    async def pull(self) -> PullResponse:
+        if self._streaming_pull_future is None:
+            self._start_streaming_pull()
+        elif self._streaming_pull_future.done():
+            # The subscriber client retries transient errors itself, so the
+            # stream only ends on errors it can't recover from.
+            logging.error(
+                "pubsub streaming pull ended with: %s, restarting.",
+                self._streaming_pull_future.exception(),
+            )
+            self._start_streaming_pull()
+        try:
+            messages = [
+                await asyncio.wait_for(
+                    self._buffer.get(), timeout=self.pull_wait_seconds
+                )
+            ]
+        except asyncio.TimeoutError:
+            return PullResponse([], _PubsubAckInfo([]))
+        while len(messages) < self.batch_size and not self._buffer.empty():
+            messages.append(self._buffer.get_nowait())
+
+        payloads = []
+        ack_ids = []
+        ordering_keys = []
+        for message in messages:
+            self._leased_messages[message.ack_id] = message
+            payloads.append(
+                self._to_payload(
+                    message.data,
+                    message.attributes,
+                    message.ack_id,
+                    message.ordering_key,
+                )
+            )
+            ack_ids.append(message.ack_id)
+            ordering_keys.append(self._ordering_key(message))
+        return PullResponse(payloads, _PubsubAckInfo(ack_ids, ordering_keys))
+
+    async def ack(self, ack_info: _PubsubAckInfo, success: bool):
+        # NOTE: Acks and nacks are sent over the stream by the subscriber
+        # client, this also stops it from extending the message's lease.
+        for ack_id in ack_info.ack_ids:
+            message = self._leased_messages.pop(ack_id, None)
+            if message is None:
+                continue
+            if success:
+                message.ack()
+            else:
+                message.nack()
+
+    async def teardown(self):
+        if self._streaming_pull_future is None:
+            return
+        # Nack everything we are holding so it is redelivered right away
+        # instead of after the ack deadline expires.
+        while not self._buffer.empty():
+            self._buffer.get_nowait().nack()
+        for message in self._leased_messages.values():
+            message.nack()
+        self._leased_messages = {}
+        self._streaming_pull_future.cancel()
+        try:
+            await asyncio.get_running_loop().run_in_executor(
+                None, self._streaming_pull_future.result
+            )
+        except Exception:
+            logging.debug("pubsub streaming pull closed with an error")
+        self._streaming_pull_future = None
+
+
+def _message_size(message: GCPPubSubMessage) -> int:
+    size = len(message.data) + len(message.ordering_key)
+    for key, value in message.attributes.items():
+        size += len(key) + len(value)
+    return size + _PUBLISH_MESSAGE_OVERHEAD_BYTES
+
+
+def _publish_chunks(
+    messages: List[GCPPubSubMessage],
+    max_messages: int = _MAX_PUBLISH_MESSAGES,
+    max_bytes: int = _MAX_PUBLISH_BYTES,
+) -> List[List[GCPPubSubMessage]]:
+    """Splits messages into chunks that fit in a single publish request."""
+    chunks = []
+    chunk = []
+    chunk_bytes = 0
+    for message in messages:
+        message_bytes = _message_size(message)
+        if chunk and (
+            len(chunk) >= max_messages or chunk_bytes + message_bytes > max_bytes
+        ):
+            chunks.append(chunk)
+            chunk = []
+            chunk_bytes = 0
+        # NOTE: A single message that is larger than the limit is still sent
+        # on its own, so the publish error is surfaced to the user.
+        chunk.append(message)
+        chunk_bytes += message_bytes
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
 class GCPPubSubTopicSink(SinkStrategy):
+    """Publishes batches to a topic.
+
+    Batches are split into chunks that fit the publish request limits, which
+    are published concurrently (at most `max_concurrent_publishes` at a time).
+    Chunks that fail are retried with exponential backoff, without
+    republishing the chunks that succeeded.
+
+    Elements that are `PubsubMessage`s are published with their attributes and
+    ordering key. Chunks of messages with the same ordering key are published
+    one after another so they keep their order.
+    """
+
     def __init__(
         self,
         *,
         credentials: GCPCredentials,
         project_id: GCPProjectID,
         topic_name: PubSubTopicName,
+        max_concurrent_publishes: int = 10,
+        max_publish_attempts: int = 5,
+        initial_retry_delay_seconds: float = 0.1,
+        max_retry_delay_seconds: float = 10,
     ):
         super().__init__(credentials=credentials, strategy_id="gcp-pubsub-topic-sink")
         self.project_id = project_id
         self.topic_name = topic_name
+        self.max_concurrent_publishes = max_concurrent_publishes
+        self.max_publish_attempts = max_publish_attempts
+        self.initial_retry_delay_seconds = initial_retry_delay_seconds
+        self.max_retry_delay_seconds = max_retry_delay_seconds
         clients = gcp_clients.GCPClients(
             credentials=credentials,
             quota_project_id=project_id,
@@ -200,12 +485,67 @@ class GCPPubSubTopicSink(SinkStrategy):
     def topic_id(self) -> PubSubTopicID:
         return f"projects/{self.project_id}/topics/{self.topic_name}"
 
+    async def _publish_chunk(
+        self, chunk: List[GCPPubSubMessage], semaphore: asyncio.Semaphore
+    ):
+        delay = self.initial_retry_delay_seconds
+        for attempt in range(1, self.max_publish_attempts + 1):
+            try:
+                async with semaphore:
+                    await self.publisher_client.publish(
+                        topic=self.topic_id, messages=chunk
+                    )
+                return
+            except Exception as e:
+                if attempt == self.max_publish_attempts:
+                    raise
+                logging.warning(
+                    "publishing %s messages to %s failed with: %s, retrying in "
+                    "%.1f seconds.",
+                    len(chunk),
+                    self.topic_id,
+                    e,
+                    delay,
+                )
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.max_retry_delay_seconds)
+
+    async def _publish_in_order(
+        self, chunks: List[List[GCPPubSubMessage]], semaphore: asyncio.Semaphore
+    ):
+        for chunk in chunks:
+            await self._publish_chunk(chunk, semaphore)
+
     @utils.log_errors(endpoint="apis.buildflow.dev/...")
     async def push(self, batch: Batch):
-        pubsub_messages = [GCPPubSubMessage(data=elem) for elem in batch]
-        await self.publisher_client.publish(
-            topic=self.topic_id, messages=pubsub_messages
-        )
+        messages_by_key: Dict[str, List[GCPPubSubMessage]] = {}
+        for elem in batch:
+            if isinstance(elem, PubsubMessage):
+                message = GCPPubSubMessage(
+                    data=elem.data,
+                    attributes={k: str(v) for k, v in elem.attributes.items()},
+                    ordering_key=elem.ordering_key,
+                )
+            else:
+                message = GCPPubSubMessage(data=elem)
+            messages_by_key.setdefault(message.ordering_key, []).append(message)
+
+        semaphore = asyncio.Semaphore(self.max_concurrent_publishes)
+        coros = []
+        for ordering_key, messages in messages_by_key.items():
+            chunks = _publish_chunks(messages)
+            if ordering_key:
+                coros.append(self._publish_in_order(chunks, semaphore))
+            else:
+                coros.extend(self._publish_chunk(chunk, semaphore) for chunk in chunks)
+        # NOTE: We wait for all chunks to finish before raising so a failed
+        # chunk doesn't cancel publishes that are still in flight.
+        results = await asyncio.gather(*coros, return_exceptions=True)
+        errors = [result for result in results if isinstance(result, Exception)]
+        if errors:
+            raise errors[0]
 
     def push_converter(self, user_defined_type: Type) -> Callable[[Any], bytes]:
+        if user_defined_type is PubsubMessage:
+            return converters.identity()
         return converters.bytes_push_converter(user_defined_type)
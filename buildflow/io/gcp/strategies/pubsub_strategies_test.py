@@ -0,0 +1,285 @@
+import asyncio
+import unittest
+from concurrent.futures import Future
+from unittest import mock
+
+from buildflow.io.gcp.strategies.pubsub_strategies import (
+    GCPPubSubSubscriptionSource,
+    GCPPubSubSubscriptionStreamingSource,
+    GCPPubSubTopicSink,
+    _publish_chunks,
+)
+from buildflow.types.gcp import PubsubMessage
+
+
+class _FakeStreamingPullFuture(Future):
+    def cancel(self):
+        # The real future closes the stream and then resolves.
+        self.set_result(None)
+        return True
+
+
+class _FakeSubscriberClient:
+    def __init__(self) -> None:
+        self.callback = None
+        self.flow_control = None
+        self.future = _FakeStreamingPullFuture()
+
+    def subscribe(self, subscription, callback, flow_control):
+        self.subscription = subscription
+        self.callback = callback
+        self.flow_control = flow_control
+        return self.future
+
+
+def _message(ack_id: str, data: bytes = b"data"):
+    message = mock.MagicMock()
+    message.ack_id = ack_id
+    message.data = data
+    message.attributes = {"key": "value"}
+    return message
+
+
+class GCPPubSubSubscriptionSourceTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        with mock.patch(
+            "buildflow.io.gcp.strategies.pubsub_strategies.gcp_clients.GCPClients"
+        ):
+            self.source = GCPPubSubSubscriptionSource(
+                credentials=mock.MagicMock(),
+                subscription_name="sub",
+                project_id="project",
+                ack_deadline_seconds=30,
+            )
+        self.subscriber_client = mock.AsyncMock()
+        self.source.subscriber_client = self.subscriber_client
+
+    async def test_leases_pulled_messages_until_acked(self):
+        received = mock.MagicMock()
+        received.ack_id = "1"
+        received.message.data = b"data"
+        self.subscriber_client.pull.return_value.received_messages = [received]
+
+        response = await self.source.pull()
+        self.assertEqual(1, len(self.source._lease_manager))
+        self.assertEqual(30, self.source._lease_manager.initial_deadline_seconds)
+
+        await self.source._extend_ack_deadlines(["1"], 20)
+        self.subscriber_client.modify_ack_deadline.assert_awaited_once_with(
+            subscription="projects/project/subscriptions/sub",
+            ack_ids=["1"],
+            ack_deadline_seconds=20,
+        )
+
+        await self.source.ack(response.ack_info, True)
+        self.assertEqual(0, len(self.source._lease_manager))
+        await self.source.teardown()
+
+    async def test_ordering_keys(self):
+        messages = []
+        for ack_id, ordering_key in [("1", "a"), ("2", ""), ("3", "a")]:
+            received = mock.MagicMock()
+            received.ack_id = ack_id
+            received.message.data = b"data"
+            received.message.ordering_key = ordering_key
+            messages.append(received)
+        self.subscriber_client.pull.return_value.received_messages = messages
+
+        response = await self.source.pull()
+
+        self.assertEqual(["a", None, "a"], self.source.ordering_keys(response))
+        split = self.source.split_ack_info(response.ack_info, [0, 2])
+        self.assertEqual(["1", "3"], split.ack_ids)
+        self.assertEqual(["a", "a"], split.ordering_keys)
+        await self.source.teardown()
+
+    async def test_ordering_key_attribute(self):
+        self.source.ordering_key_attribute = "user_id"
+        received = mock.MagicMock()
+        received.ack_id = "1"
+        received.message.data = b"data"
+        received.message.attributes = {"user_id": "user-1"}
+        self.subscriber_client.pull.return_value.received_messages = [received]
+
+        response = await self.source.pull()
+
+        self.assertEqual(["user-1"], self.source.ordering_keys(response))
+        await self.source.teardown()
+
+
+class GCPPubSubSubscriptionStreamingSourceTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.subscriber_client = _FakeSubscriberClient()
+        self.source = GCPPubSubSubscriptionStreamingSource(
+            credentials=mock.MagicMock(),
+            subscription_name="sub",
+            project_id="project",
+            batch_size=2,
+            max_outstanding_messages=10,
+            max_outstanding_bytes=1024,
+            pull_wait_seconds=0.1,
+        )
+        self.source._clients = mock.MagicMock()
+        self.source._clients.get_subscriber_client.return_value = self.subscriber_client
+
+    async def deliver(self, *messages):
+        for message in messages:
+            self.subscriber_client.callback(message)
+        # Let the loop process the thread safe callbacks.
+        await asyncio.sleep(0)
+
+    async def test_pull_drains_buffer(self):
+        response = await self.source.pull()
+        self.assertEqual([], response.payload)
+        self.assertEqual(
+            "projects/project/subscriptions/sub", self.subscriber_client.subscription
+        )
+        self.assertEqual(10, self.subscriber_client.flow_control.max_messages)
+        self.assertEqual(1024, self.subscriber_client.flow_control.max_bytes)
+
+        await self.deliver(_message("1", b"a"), _message("2", b"b"), _message("3"))
+
+        response = await self.source.pull()
+        self.assertEqual([b"a", b"b"], response.payload)
+        self.assertEqual(["1", "2"], response.ack_info.ack_ids)
+        response = await self.source.pull()
+        self.assertEqual(["3"], response.ack_info.ack_ids)
+
+    async def test_ack_and_nack(self):
+        await self.source.pull()
+        first, second = _message("1"), _message("2")
+        await self.deliver(first)
+        await self.source.ack((await self.source.pull()).ack_info, True)
+        await self.deliver(second)
+        await self.source.ack((await self.source.pull()).ack_info, False)
+
+        first.ack.assert_called_once()
+        first.nack.assert_not_called()
+        second.nack.assert_called_once()
+        second.ack.assert_not_called()
+        self.assertEqual({}, self.source._leased_messages)
+
+    async def test_teardown_nacks_outstanding_messages(self):
+        await self.source.pull()
+        leased, buffered = _message("1"), _message("2")
+        await self.deliver(leased)
+        self.source.batch_size = 1
+        await self.source.pull()
+        await self.deliver(buffered)
+
+        await self.source.teardown()
+
+        leased.nack.assert_called_once()
+        buffered.nack.assert_called_once()
+        self.assertTrue(self.subscriber_client.future.done())
+        self.assertIsNone(self.source._streaming_pull_future)
+
+    async def test_pull_restarts_ended_stream(self):
+        await self.source.pull()
+        self.subscriber_client.future.set_exception(RuntimeError("stream failed"))
+        self.subscriber_client.future = _FakeStreamingPullFuture()
+
+        await self.source.pull()
+
+        self.assertIs(self.subscriber_client.future, self.source._streaming_pull_future)
+
+
+class _FakePublisherClient:
+    def __init__(self, failures: int = 0) -> None:
+        self.failures = failures
+        self.published = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def publish(self, topic, messages):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0.01)
+            if self.failures:
+                self.failures -= 1
+                raise RuntimeError("publish failed")
+            self.published.append([m.data for m in messages])
+        finally:
+            self.in_flight -= 1
+
+
+class GCPPubSubTopicSinkTest(unittest.IsolatedAsyncioTestCase):
+    def sink(self, publisher_client, **kwargs) -> GCPPubSubTopicSink:
+        with mock.patch(
+            "buildflow.io.gcp.strategies.pubsub_strategies.gcp_clients.GCPClients"
+        ):
+            sink = GCPPubSubTopicSink(
+                credentials=mock.MagicMock(),
+                project_id="project",
+                topic_name="topic",
+                initial_retry_delay_seconds=0,
+                **kwargs,
+            )
+        sink.publisher_client = publisher_client
+        return sink
+
+    def test_publish_chunks_by_count_and_bytes(self):
+        from google.cloud.pubsub_v1.types import PubsubMessage as GCPPubSubMessage
+
+        small = [GCPPubSubMessage(data=b"a") for _ in range(2500)]
+        self.assertEqual(
+            [1000, 1000, 500], [len(chunk) for chunk in _publish_chunks(small)]
+        )
+
+        large = [GCPPubSubMessage(data=b"a" * 4_000_000) for _ in range(5)]
+        self.assertEqual([2, 2, 1], [len(chunk) for chunk in _publish_chunks(large)])
+
+    async def test_push_publishes_chunks_concurrently(self):
+        publisher_client = _FakePublisherClient()
+        sink = self.sink(publisher_client, max_concurrent_publishes=2)
+
+        await sink.push([b"a"] * 4500)
+
+        self.assertEqual(5, len(publisher_client.published))
+        self.assertEqual(4500, sum(len(chunk) for chunk in publisher_client.published))
+        self.assertEqual(2, publisher_client.max_in_flight)
+
+    async def test_push_retries_failed_chunks(self):
+        publisher_client = _FakePublisherClient(failures=1)
+        sink = self.sink(publisher_client)
+
+        await sink.push([b"a"] * 1500)
+
+        # Only the failed chunk is published again.
+        self.assertEqual(2, len(publisher_client.published))
+        self.assertEqual(1500, sum(len(chunk) for chunk in publisher_client.published))
+
+    async def test_push_raises_after_max_attempts(self):
+        publisher_client = _FakePublisherClient(failures=3)
+        sink = self.sink(publisher_client, max_publish_attempts=3)
+
+        with self.assertRaises(RuntimeError):
+            await sink.push([b"a"])
+
+    async def test_push_ordering_keys(self):
+        publisher_client = mock.AsyncMock()
+        sink = self.sink(publisher_client)
+        batch = [
+            PubsubMessage(b"1", {"attr": 1}, ordering_key="a"),
+            PubsubMessage(b"2", ordering_key="b"),
+            PubsubMessage(b"3", ordering_key="a"),
+        ]
+
+        await sink.push(batch)
+
+        published = [
+            [(m.data, m.ordering_key, dict(m.attributes)) for m in c.kwargs["messages"]]
+            for c in publisher_client.publish.await_args_list
+        ]
+        self.assertEqual(
+            [
+                [(b"1", "a", {"attr": "1"}), (b"3", "a", {})],
+                [(b"2", "b", {})],
+            ],
+            published,
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
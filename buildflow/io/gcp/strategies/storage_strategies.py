@@ -1,9 +1,16 @@
 import os
+from typing import Optional
 
 from buildflow.core.credentials import GCPCredentials
 from buildflow.core.types.gcp_types import GCPProjectID, GCSBucketName
 from buildflow.core.types.shared_types import FilePath
-from buildflow.io.local.strategies.file_strategies import FileSink
+from buildflow.io.local.strategies.file_strategies import (
+    DEFAULT_MAX_FILE_AGE_SECS,
+    DEFAULT_MAX_FILE_BYTES,
+    DEFAULT_MAX_OPEN_FILES,
+    FileSink,
+    PartitionBy,
+)
 from buildflow.io.utils.file_systems import get_file_system
 from buildflow.types.portable import FileFormat
 
@@ -17,12 +24,22 @@ class GCSBucketSink(FileSink):
         bucket_name: GCSBucketName,
         file_path: FilePath,
         file_format: FileFormat,
+        max_file_bytes: Optional[int] = DEFAULT_MAX_FILE_BYTES,
+        max_file_rows: Optional[int] = None,
+        max_file_age_secs: Optional[float] = DEFAULT_MAX_FILE_AGE_SECS,
+        partition_by: Optional[PartitionBy] = None,
+        max_open_files: int = DEFAULT_MAX_OPEN_FILES,
     ):
         super().__init__(
             credentials=credentials,
             file_path=os.path.join(bucket_name, file_path),
             file_format=file_format,
             file_system=get_file_system(credentials),
+            max_file_bytes=max_file_bytes,
+            max_file_rows=max_file_rows,
+            max_file_age_secs=max_file_age_secs,
+            partition_by=partition_by,
+            max_open_files=max_open_files,
         )
         self.strategy_id = "gcs-bucket-sink"
         self.bucket_name = bucket_name
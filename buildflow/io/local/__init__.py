@@ -1,4 +1,19 @@
 # ruff: noqa
-from .file import File
-from .file_change_stream import LocalFileChangeStream
-from .pulse import Pulse
+from typing import TYPE_CHECKING
+
+from buildflow.core.utils import lazy_module_getattr
+
+_LAZY_ATTRIBUTES = {
+    "File": ".file",
+    "LocalFileChangeStream": ".file_change_stream",
+    "Pulse": ".pulse",
+}
+__all__ = list(_LAZY_ATTRIBUTES)
+# NOTE: Modules are imported on first use so importing one primitive doesn't
+# import the SDKs of every other primitive.
+__getattr__ = lazy_module_getattr(__name__, _LAZY_ATTRIBUTES)
+
+if TYPE_CHECKING:
+    from .file import File
+    from .file_change_stream import LocalFileChangeStream
+    from .pulse import Pulse
@@ -0,0 +1,134 @@
+import asyncio
+import logging
+import posixpath
+from typing import Dict, Union
+
+import ray
+
+from buildflow.core.background_tasks.background_task import BackgroundTask
+from buildflow.core.credentials.aws_credentials import AWSCredentials
+from buildflow.core.credentials.empty_credentials import EmptyCredentials
+from buildflow.core.credentials.gcp_credentials import GCPCredentials
+from buildflow.core.types.shared_types import FilePath
+from buildflow.io.utils.file_compaction import FileCompactor
+from buildflow.io.utils.file_systems import get_file_system
+from buildflow.io.utils.file_writers import SchemaMismatchError
+from buildflow.types.portable import FileFormat
+
+# Where compactions are journaled, relative to the directory being compacted.
+# NOTE: Hive style readers ignore directories starting with an underscore.
+BASE_COMPACTION_DIR = "_buildflow_compaction"
+
+
+class FileCompactionBackgroundTask(BackgroundTask):
+    """Periodically compacts the small files written by a `FileSink`.
+
+    Files written for `file_path` (in any partition directory below it) that are
+    smaller than `target_file_bytes` are merged into files of about that size.
+    """
+
+    def __init__(
+        self,
+        credentials: Union[AWSCredentials, GCPCredentials, EmptyCredentials],
+        file_path: FilePath,
+        file_format: FileFormat,
+        target_file_bytes: int,
+        compaction_interval_secs: int,
+    ):
+        self.file_system = get_file_system(credentials)
+        self.file_path = file_path
+        self.file_format = file_format
+        self.target_file_bytes = target_file_bytes
+        self.compaction_interval_secs = compaction_interval_secs
+        self.compaction_actor = None
+        self.compaction_loop = None
+
+    async def start(self):
+        self.compaction_actor = _FileCompactionActor.options(
+            name=f"FileCompactionActor-{self.file_path}"
+        ).remote(
+            file_system=self.file_system,
+            file_path=self.file_path,
+            file_format=self.file_format,
+            target_file_bytes=self.target_file_bytes,
+            compaction_interval_secs=self.compaction_interval_secs,
+        )
+        self.compaction_loop = self.compaction_actor.compact_loop.remote()
+
+    async def shutdown(self):
+        if self.compaction_actor is not None:
+            logging.info(
+                "Shutting down FileCompactionActor will stop after next compaction"
+            )
+            await self.compaction_actor.shutdown.remote()
+            await self.compaction_loop
+
+
+@ray.remote(max_restarts=-1, num_cpus=0.1)
+class _FileCompactionActor:
+    def __init__(
+        self,
+        file_system,
+        file_path: FilePath,
+        file_format: FileFormat,
+        target_file_bytes: int,
+        compaction_interval_secs: int,
+    ):
+        self.file_system = file_system
+        self.output_dir, _, file_name = file_path.rpartition("/")
+        # FileSink names files: {base_name}-{suffix}.{extension}
+        self.file_prefix = f"{file_name.rpartition('.')[0] or file_name}-"
+        self.extension = f".{file_format.value}"
+        self.compactor = FileCompactor(
+            file_system=file_system,
+            file_format=file_format,
+            target_file_bytes=target_file_bytes,
+            work_dir=posixpath.join(self.output_dir, BASE_COMPACTION_DIR),
+        )
+        self.compaction_interval_secs = compaction_interval_secs
+        self.running = True
+
+    def sink_files(self) -> Dict[str, int]:
+        try:
+            # NOTE: We include refresh=True here to ensure we are always
+            # getting the latest files from the bucket.
+            files = self.file_system.find(self.output_dir, detail=True, refresh=True)
+        except FileNotFoundError:
+            return {}
+        return {
+            path: info["size"]
+            for path, info in files.items()
+            if f"/{BASE_COMPACTION_DIR}/" not in path
+            and posixpath.basename(path).startswith(self.file_prefix)
+            and path.endswith(self.extension)
+        }
+
+    def compact(self):
+        self.compactor.recover()
+        for group in self.compactor.plan(self.sink_files()):
+            target_path = self.compactor.compacted_file_path(
+                posixpath.dirname(group[0]), self.file_prefix, group
+            )
+            try:
+                self.compactor.compact(group, target_path)
+            except SchemaMismatchError:
+                logging.warning(
+                    "Files with different schemas can't be compacted, skipping: %s",
+                    group,
+                )
+            except Exception:
+                logging.exception("Failed to compact files: %s", group)
+            else:
+                logging.info("compacted %s files into %s", len(group), target_path)
+
+    async def compact_loop(self):
+        loop = asyncio.get_event_loop()
+        while self.running:
+            await asyncio.sleep(self.compaction_interval_secs)
+            try:
+                await loop.run_in_executor(None, self.compact)
+            except Exception:
+                logging.exception("Failed to compact files")
+
+    async def shutdown(self):
+        self.running = False
@@ -0,0 +1,69 @@
+import asyncio
+import os
+import shutil
+import tempfile
+import unittest
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from buildflow.core.credentials.empty_credentials import EmptyCredentials
+from buildflow.io.local.background_tasks.file_compaction_background_task import (
+    FileCompactionBackgroundTask,
+)
+from buildflow.types.portable import FileFormat
+
+
+@pytest.mark.usefixtures("ray")
+class FileCompactionBackgroundTaskTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.output_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.output_dir)
+
+    def write_parquet(self, path: str, rows):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        pq.write_table(pa.Table.from_pylist(rows), path)
+
+    async def test_compacts_sink_files(self):
+        for i in range(3):
+            self.write_parquet(
+                os.path.join(self.output_dir, "date=1", f"output-{i}.parquet"),
+                [{"value": i}],
+            )
+        self.write_parquet(
+            os.path.join(self.output_dir, "date=2", "output-0.parquet"),
+            [{"value": 3}],
+        )
+        # Files that weren't written by the sink are left alone.
+        self.write_parquet(
+            os.path.join(self.output_dir, "date=2", "other.parquet"), [{"value": 4}]
+        )
+        background_task = FileCompactionBackgroundTask(
+            credentials=EmptyCredentials(),
+            file_path=os.path.join(self.output_dir, "output.parquet"),
+            file_format=FileFormat.PARQUET,
+            target_file_bytes=10 * 1024 * 1024,
+            compaction_interval_secs=1,
+        )
+
+        await background_task.start()
+        await asyncio.sleep(5)
+        await background_task.shutdown()
+
+        (compacted,) = os.listdir(os.path.join(self.output_dir, "date=1"))
+        self.assertTrue(compacted.startswith("output-compacted-"))
+        self.assertCountEqual(
+            pq.read_table(
+                os.path.join(self.output_dir, "date=1", compacted)
+            ).to_pylist(),
+            [{"value": 0}, {"value": 1}, {"value": 2}],
+        )
+        self.assertCountEqual(
+            os.listdir(os.path.join(self.output_dir, "date=2")),
+            ["output-0.parquet", "other.parquet"],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
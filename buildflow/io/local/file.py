@@ -1,11 +1,20 @@
 import dataclasses
 import os
+from typing import List, Optional
 
 from buildflow.config.cloud_provider_config import LocalOptions
+from buildflow.core.background_tasks.background_task import BackgroundTask
 from buildflow.core.credentials.empty_credentials import EmptyCredentials
 from buildflow.core.types.shared_types import FilePath
 from buildflow.core.utils import uuid
-from buildflow.io.local.strategies.file_strategies import FileSink
+from buildflow.io.local.strategies.file_strategies import (
+    DEFAULT_COMPACTION_INTERVAL_SECS,
+    DEFAULT_MAX_FILE_AGE_SECS,
+    DEFAULT_MAX_FILE_BYTES,
+    DEFAULT_MAX_OPEN_FILES,
+    FileSink,
+    PartitionBy,
+)
 from buildflow.io.primitive import LocalPrimtive
 from buildflow.io.strategies.sink import SinkStrategy
 from buildflow.types.portable import FileFormat
@@ -16,6 +25,23 @@ class File(LocalPrimtive):
     file_path: FilePath
     file_format: FileFormat
 
+    # sink optional args
+    max_file_bytes: Optional[int] = dataclasses.field(
+        default=DEFAULT_MAX_FILE_BYTES, init=False
+    )
+    max_file_rows: Optional[int] = dataclasses.field(default=None, init=False)
+    max_file_age_secs: Optional[float] = dataclasses.field(
+        default=DEFAULT_MAX_FILE_AGE_SECS, init=False
+    )
+    partition_by: Optional[PartitionBy] = dataclasses.field(default=None, init=False)
+    max_open_files: int = dataclasses.field(default=DEFAULT_MAX_OPEN_FILES, init=False)
+    compaction_target_file_bytes: Optional[int] = dataclasses.field(
+        default=None, init=False
+    )
+    compaction_interval_secs: int = dataclasses.field(
+        default=DEFAULT_COMPACTION_INTERVAL_SECS, init=False
+    )
+
     def __post_init__(self):
         if not self.file_path.startswith("/"):
             self.file_path = os.path.join(os.getcwd(), self.file_path)
@@ -27,6 +53,35 @@ class File(LocalPrimtive):
     def primitive_id(self):
         return self._primitive_id
 
+    def options(
+        self,
+        *,
+        # Sink options. Each replica writes to its own file which is finalized
+        # once it reaches any of these limits.
+        # NOTE: Rows are acked before their file is finalized, so rows in a
+        # file that is still open are lost if the replica dies (at-most-once).
+        max_file_bytes: Optional[int] = DEFAULT_MAX_FILE_BYTES,
+        max_file_rows: Optional[int] = None,
+        max_file_age_secs: Optional[float] = DEFAULT_MAX_FILE_AGE_SECS,
+        # Write rows under hive style partition directories (key=value/),
+        # either a list of row fields or a function that returns the partition
+        # of a row. At most max_open_files partitions are written at once.
+        partition_by: Optional[PartitionBy] = None,
+        max_open_files: int = DEFAULT_MAX_OPEN_FILES,
+        # If set, small files written by the sink are periodically compacted
+        # into files of about this many bytes.
+        compaction_target_file_bytes: Optional[int] = None,
+        compaction_interval_secs: int = DEFAULT_COMPACTION_INTERVAL_SECS,
+    ) -> "File":
+        self.max_file_bytes = max_file_bytes
+        self.max_file_rows = max_file_rows
+        self.max_file_age_secs = max_file_age_secs
+        self.partition_by = partition_by
+        self.max_open_files = max_open_files
+        self.compaction_target_file_bytes = compaction_target_file_bytes
+        self.compaction_interval_secs = compaction_interval_secs
+        return self
+
     @classmethod
     def from_local_options(
         cls,
@@ -45,4 +100,27 @@ class File(LocalPrimtive):
             file_path=self.file_path,
             file_format=self.file_format,
             credentials=credentials,
+            max_file_bytes=self.max_file_bytes,
+            max_file_rows=self.max_file_rows,
+            max_file_age_secs=self.max_file_age_secs,
+            partition_by=self.partition_by,
+            max_open_files=self.max_open_files,
         )
+
+    def background_tasks(self, credentials: EmptyCredentials) -> List[BackgroundTask]:
+        if self.compaction_target_file_bytes is None:
+            return []
+        # NOTE: ray is only needed when compacting files.
+        from buildflow.io.local.background_tasks.file_compaction_background_task import (  # noqa: E501
+            FileCompactionBackgroundTask,
+        )
+
+        return [
+            FileCompactionBackgroundTask(
+                credentials=credentials,
+                file_path=self.file_path,
+                file_format=self.file_format,
+                target_file_bytes=self.compaction_target_file_bytes,
+                compaction_interval_secs=self.compaction_interval_secs,
+            )
+        ]
@@ -30,6 +30,7 @@ class FilePrimitiveTest(unittest.IsolatedAsyncioTestCase):
 
         file_sink = local_file.sink(mock.MagicMock())
         await file_sink.push([{"field": 1}, {"field": 2}])
+        await file_sink.teardown()
 
         file_path = self.get_output_file()
         table = pcsv.read_csv(Path(file_path))
@@ -44,6 +45,7 @@ class FilePrimitiveTest(unittest.IsolatedAsyncioTestCase):
 
         file_sink = local_file.sink(mock.MagicMock())
         await file_sink.push([{"field": 1}, {"field": 2}])
+        await file_sink.teardown()
 
         file_path = self.get_output_file()
         with open(Path(file_path), "r") as read_file:
@@ -60,6 +62,7 @@ class FilePrimitiveTest(unittest.IsolatedAsyncioTestCase):
 
         file_sink = local_file.sink(mock.MagicMock())
         await file_sink.push([{"field": 1}, {"field": 2}])
+        await file_sink.teardown()
         file_path = self.get_output_file()
         table = pq.read_table(file_path)
         self.assertEqual([{"field": 1}, {"field": 2}], table.to_pylist())
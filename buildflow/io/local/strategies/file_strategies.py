@@ -1,22 +1,86 @@
-import json
-from typing import Any, Callable, Dict, Iterable, Type
+import asyncio
+import collections
+import logging
+import os
+import time
+import urllib.parse
+from typing import IO, Any, Callable, Dict, List, Optional, Tuple, Type, Union
 
-import fastparquet
 import fsspec
-import pandas as pd
 import pyarrow as pa
-import pyarrow.csv as pcsv
 from fsspec.implementations.local import LocalFileSystem
 
 from buildflow.core.credentials import EmptyCredentials
 from buildflow.core.types.shared_types import FilePath
 from buildflow.core.utils import uuid
 from buildflow.io.strategies.sink import SinkStrategy
+from buildflow.io.utils import file_writers
 from buildflow.io.utils.schemas import converters
 from buildflow.types.portable import FileFormat
 
+DEFAULT_MAX_FILE_BYTES = 128 * 1024 * 1024
+DEFAULT_MAX_FILE_AGE_SECS = 5 * 60
+DEFAULT_MAX_OPEN_FILES = 100
+DEFAULT_COMPACTION_INTERVAL_SECS = 10 * 60
+
+# How rows are partitioned, either a list of row fields or a function that
+# returns the partition keys and values of a row (e.g. {"date": "2023-01-01"}).
+PartitionBy = Union[List[str], Callable[[Dict[str, Any]], Dict[str, Any]]]
+
+# Rows written to a file, either rows of a batch or an arrow table.
+_Rows = Union[List[Dict[str, Any]], pa.Table]
+
+# The directory name hive uses for null partition values.
+_HIVE_DEFAULT_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+
+
+def _partition_dir(partition: Dict[str, Any]) -> str:
+    parts = []
+    for key, value in partition.items():
+        if value is None:
+            value = _HIVE_DEFAULT_PARTITION
+        else:
+            value = urllib.parse.quote(str(value), safe="")
+        parts.append(f"{key}={value}")
+    return "/".join(parts)
+
+
+class _OpenFile:
+    def __init__(self, file_path: str, file: IO[bytes], file_format: FileFormat):
+        self.file_path = file_path
+        self.file = file
+        self.writer = file_writers.file_writer(file_format, file)
+        self.open_time = time.monotonic()
+
+    def age(self) -> float:
+        return time.monotonic() - self.open_time
+
 
 class FileSink(SinkStrategy):
+    """Writes batches to rolling files per replica.
+
+    The sink keeps a file open and appends each batch to it. The file is
+    finalized, and a new one is started on the next push, once it reaches
+    `max_file_bytes` or `max_file_rows`, has been open for `max_file_age_secs`,
+    or the sink is torn down.
+
+    If `partition_by` is set rows are written under hive style partition
+    directories (e.g. `date=2023-01-01/hour=13/`) next to `file_path`, with a
+    file open per partition. At most `max_open_files` are kept open, the least
+    recently written one is finalized to make room for a new partition. Like
+    hive, partition fields are not written to the files.
+
+    Files only appear at their final path once they are finalized. Local files
+    are written under a temporary name and renamed, object stores only create
+    the object when the upload is completed.
+
+    Delivery is at-most-once: `push` returns (and the batch is acked) once its
+    rows are written to the open file, not once the file is finalized. If the
+    replica dies before the file is finalized the rows in it are lost. Callers
+    that need at-least-once delivery can `roll` after each push (as the
+    Snowflake sink does) at the cost of one file per push.
+    """
+
     def __init__(
         self,
         *,
@@ -24,45 +88,205 @@ class FileSink(SinkStrategy):
         file_path: FilePath,
         file_format: FileFormat,
         file_system: fsspec.AbstractFileSystem = LocalFileSystem(),
+        max_file_bytes: Optional[int] = DEFAULT_MAX_FILE_BYTES,
+        max_file_rows: Optional[int] = None,
+        max_file_age_secs: Optional[float] = DEFAULT_MAX_FILE_AGE_SECS,
+        partition_by: Optional[PartitionBy] = None,
+        max_open_files: int = DEFAULT_MAX_OPEN_FILES,
     ):
         super().__init__(credentials=credentials, strategy_id="local-file-sink")
-        split_path = file_path.split(".")
-        if len(split_path) > 1:
-            extension = split_path[-1]
-            base_file_path = ".".join(split_path[:-1])
-        else:
-            base_file_path = file_path
-            extension = ""
-        # This ensures each replica is writing to a unique file
-        self.file_path = f"{base_file_path}-{uuid(8)}.{extension}"
+        # The path files are named after, each file gets a unique suffix.
+        self.file_path = file_path
         self.file_format = file_format
         self.file_system = file_system
+        self.max_file_bytes = max_file_bytes
+        self.max_file_rows = max_file_rows
+        self.max_file_age_secs = max_file_age_secs
+        self.partition_by = partition_by
+        self.max_open_files = max_open_files
+        # The open files keyed by partition directory, in least recently
+        # written order. Unpartitioned files use the "" partition.
+        self._open_files: "collections.OrderedDict[str, _OpenFile]" = (
+            collections.OrderedDict()
+        )
+        self._roll_task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    def _new_file_path(self, partition_dir: str) -> str:
+        directory, _, file_name = self.file_path.rpartition("/")
+        base_name, dot, extension = file_name.rpartition(".")
+        if not dot:
+            base_name, extension = file_name, ""
+        # This ensures each file (and so each replica) is unique
+        file_name = f"{base_name}-{uuid(8)}.{extension}"
+        return "/".join(p for p in (directory, partition_dir, file_name) if p)
+
+    def _is_local(self) -> bool:
+        return isinstance(self.file_system, LocalFileSystem)
+
+    def _write_path(self, file_path: str) -> str:
+        if self._is_local():
+            return f"{file_path}.tmp"
+        return file_path
+
+    def _partition(self, row: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+        if self.partition_by is None:
+            return "", row
+        if callable(self.partition_by):
+            partition = self.partition_by(row)
+        else:
+            partition = {key: row.get(key) for key in self.partition_by}
+        row = {k: v for k, v in row.items() if k not in partition}
+        return _partition_dir(partition), row
+
+    def _open(self, partition_dir: str) -> _OpenFile:
+        if len(self._open_files) >= self.max_open_files:
+            lru_partition_dir = next(iter(self._open_files))
+            self._finalize(lru_partition_dir)
+        file_path = self._new_file_path(partition_dir)
+        if self._is_local():
+            directory = os.path.dirname(file_path)
+            if directory:
+                self.file_system.makedirs(directory, exist_ok=True)
+        open_file = _OpenFile(
+            file_path,
+            self.file_system.open(self._write_path(file_path), "wb"),
+            self.file_format,
+        )
+        self._open_files[partition_dir] = open_file
+        return open_file
+
+    def _finalize(self, partition_dir: str):
+        open_file = self._open_files.pop(partition_dir)
+        try:
+            open_file.writer.close()
+        finally:
+            open_file.file.close()
+        if self._is_local():
+            self.file_system.mv(
+                self._write_path(open_file.file_path), open_file.file_path
+            )
+
+    def _finalize_all(self):
+        for partition_dir in list(self._open_files):
+            self._finalize(partition_dir)
+
+    def _should_roll(self, open_file: _OpenFile) -> bool:
+        if self.max_file_bytes is not None:
+            if open_file.writer.num_bytes >= self.max_file_bytes:
+                return True
+        if self.max_file_rows is not None:
+            if open_file.writer.num_rows >= self.max_file_rows:
+                return True
+        return False
+
+    @staticmethod
+    def _write_rows(open_file: _OpenFile, rows: _Rows):
+        if isinstance(rows, pa.Table):
+            open_file.writer.write_table(rows)
+        else:
+            open_file.writer.write(rows)
+
+    def _write_partition(self, partition_dir: str, rows: _Rows):
+        open_file = self._open_files.get(partition_dir)
+        if open_file is None:
+            open_file = self._open(partition_dir)
+        else:
+            self._open_files.move_to_end(partition_dir)
+        try:
+            self._write_rows(open_file, rows)
+        except file_writers.SchemaMismatchError:
+            if open_file.writer.num_rows == 0:
+                raise
+            # The schema is inferred per file, so start a new file for rows
+            # with a different schema.
+            logging.warning(
+                "batch does not match the schema of %s, starting a new file.",
+                open_file.file_path,
+            )
+            self._finalize(partition_dir)
+            open_file = self._open(partition_dir)
+            self._write_rows(open_file, rows)
+        if self._should_roll(open_file):
+            self._finalize(partition_dir)
+        else:
+            # NOTE: We flush after each write so the rows of a local file that
+            # is still open can be read (e.g. while testing). Object store files
+            # only upload a part once their buffer is full.
+            open_file.file.flush()
+
+    def _write(self, batch: List[Dict[str, Any]]):
+        partitions: Dict[str, List[Dict[str, Any]]] = collections.defaultdict(list)
+        for row in batch:
+            partition_dir, row = self._partition(row)
+            partitions[partition_dir].append(row)
+        for partition_dir, rows in partitions.items():
+            self._write_partition(partition_dir, rows)
+
+    def _finalize_old_files(self):
+        for partition_dir, open_file in list(self._open_files.items()):
+            if open_file.age() >= self.max_file_age_secs:
+                self._finalize(partition_dir)
+
+    async def _roll_when_old(self):
+        loop = asyncio.get_event_loop()
+        while True:
+            async with self._lock:
+                if not self._open_files:
+                    return
+                oldest_age = max(f.age() for f in self._open_files.values())
+            await asyncio.sleep(max(0, self.max_file_age_secs - oldest_age))
+            async with self._lock:
+                # NOTE: Files may have been rolled (and new ones opened) while
+                # we were sleeping, so we only finalize the files that are old.
+                try:
+                    await loop.run_in_executor(None, self._finalize_old_files)
+                except Exception:
+                    logging.exception("failed to finalize file")
+
+    def _schedule_roll(self):
+        if not self._open_files or self.max_file_age_secs is None:
+            return
+        if self._roll_task is None or self._roll_task.done():
+            self._roll_task = asyncio.create_task(self._roll_when_old())
+
+    async def roll(self):
+        """Finalizes the open files, the next push starts new files."""
+        async with self._lock:
+            if self._open_files:
+                loop = asyncio.get_event_loop()
+                await loop.run_in_executor(None, self._finalize_all)
 
     def push_converter(
         self, user_defined_type: Type
     ) -> Callable[[Any], Dict[str, Any]]:
         return converters.json_push_converter(user_defined_type)
 
-    async def push(self, batch: Iterable[Dict[str, Any]]):
-        exists = self.file_system.exists(self.file_path)
-        if self.file_format == FileFormat.PARQUET:
-            fastparquet.write(
-                self.file_path,
-                pd.DataFrame.from_records(batch),
-                append=exists,
-                open_with=self.file_system.open,
-            )
-        elif self.file_format == FileFormat.CSV:
-            if batch:
-                table = pa.Table.from_pylist(batch)
-                if exists and self.file_system.size(self.file_path) > 0:
-                    with self.file_system.open(self.file_path, "rb") as source:
-                        table = pa.concat_tables([table, pcsv.read_csv(source)])
-                with self.file_system.open(self.file_path, "wb") as output:
-                    pcsv.write_csv(table, output)
-        elif self.file_format == FileFormat.JSON:
-            if batch:
-                with self.file_system.open(self.file_path, "a") as output_file:
-                    json.dump(batch, output_file)
-        else:
-            raise ValueError(f"Unknown file format: {self.file_format}")
+    async def push(self, batch: List[Dict[str, Any]]):
+        if not batch:
+            return
+        async with self._lock:
+            loop = asyncio.get_event_loop()
+            await loop.run_in_executor(None, self._write, batch)
+            self._schedule_roll()
+
+    async def push_table(self, table: pa.Table):
+        """Appends an arrow table, keeping its schema.
+
+        Tables can't be pushed to a partitioned sink.
+        """
+        if self.partition_by is not None:
+            raise ValueError("tables can't be pushed to a partitioned FileSink.")
+        if table.num_rows == 0:
+            return
+        async with self._lock:
+            loop = asyncio.get_event_loop()
+            await loop.run_in_executor(None, self._write_partition, "", table)
+            self._schedule_roll()
+
+    async def teardown(self):
+        # NOTE: We roll before cancelling the age check so we never cancel it
+        # half way through finalizing a file.
+        await self.roll()
+        if self._roll_task is not None:
+            self._roll_task.cancel()
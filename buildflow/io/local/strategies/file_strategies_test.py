@@ -0,0 +1,209 @@
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import pyarrow as pa
+import pyarrow.csv as pcsv
+import pyarrow.parquet as pq
+
+from buildflow.io.local.strategies.file_strategies import FileSink
+from buildflow.types.portable import FileFormat
+
+
+class FileSinkTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.output_path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.output_path)
+
+    def sink(self, file_format: FileFormat, **kwargs) -> FileSink:
+        return FileSink(
+            credentials=mock.MagicMock(),
+            file_path=os.path.join(self.output_path, f"output.{file_format.value}"),
+            file_format=file_format,
+            **kwargs,
+        )
+
+    def output_files(self):
+        return sorted(
+            os.path.join(self.output_path, f) for f in os.listdir(self.output_path)
+        )
+
+    async def test_appends_to_open_file(self):
+        sink = self.sink(FileFormat.PARQUET)
+
+        await sink.push([{"field": 1}])
+        await sink.push([{"field": 2}])
+        # The file isn't finalized until the sink rolls it.
+        self.assertTrue(all(f.endswith(".tmp") for f in self.output_files()))
+        await sink.teardown()
+
+        files = self.output_files()
+        self.assertEqual(len(files), 1)
+        parquet_file = pq.ParquetFile(files[0])
+        self.assertEqual(parquet_file.num_row_groups, 2)
+        self.assertEqual(parquet_file.read().to_pylist(), [{"field": 1}, {"field": 2}])
+
+    async def test_open_file_is_flushed(self):
+        sink = self.sink(FileFormat.CSV)
+
+        await sink.push([{"field": 1}])
+
+        # The rows can be read before the file is finalized.
+        (open_file,) = self.output_files()
+        self.assertTrue(open_file.endswith(".tmp"))
+        self.assertEqual(pcsv.read_csv(open_file).to_pylist(), [{"field": 1}])
+        await sink.teardown()
+
+    async def test_rolls_on_row_count(self):
+        sink = self.sink(FileFormat.NDJSON, max_file_rows=2)
+
+        for i in range(5):
+            await sink.push([{"field": i}])
+        await sink.teardown()
+
+        files = self.output_files()
+        self.assertEqual(len(files), 3)
+        rows = []
+        for file in files:
+            with open(file) as f:
+                rows.extend(json.loads(line) for line in f)
+        self.assertCountEqual(rows, [{"field": i} for i in range(5)])
+
+    async def test_rolls_on_size(self):
+        sink = self.sink(FileFormat.NDJSON, max_file_bytes=1)
+
+        await sink.push([{"field": 1}])
+        await sink.push([{"field": 2}])
+
+        self.assertEqual(len(self.output_files()), 2)
+        self.assertFalse(any(f.endswith(".tmp") for f in self.output_files()))
+
+    async def test_rolls_on_age(self):
+        sink = self.sink(FileFormat.JSON, max_file_age_secs=0.1)
+
+        await sink.push([{"field": 1}])
+        await asyncio.sleep(0.5)
+
+        files = self.output_files()
+        self.assertEqual(len(files), 1)
+        with open(files[0]) as f:
+            self.assertEqual(json.load(f), [{"field": 1}])
+        await sink.teardown()
+
+    async def test_new_file_on_schema_change(self):
+        sink = self.sink(FileFormat.PARQUET)
+
+        await sink.push([{"field": 1}])
+        await sink.push([{"field": "one"}])
+        await sink.teardown()
+
+        files = self.output_files()
+        self.assertEqual(len(files), 2)
+        rows = [row for f in files for row in pq.read_table(f).to_pylist()]
+        self.assertCountEqual(rows, [{"field": 1}, {"field": "one"}])
+
+    async def test_new_file_on_new_field(self):
+        sink = self.sink(FileFormat.PARQUET)
+
+        await sink.push([{"field": 1}])
+        await sink.push([{"field": 2, "other": "a"}])
+        await sink.teardown()
+
+        files = self.output_files()
+        self.assertEqual(len(files), 2)
+        rows = [row for f in files for row in pq.read_table(f).to_pylist()]
+        self.assertCountEqual(rows, [{"field": 1}, {"field": 2, "other": "a"}])
+
+    async def test_push_table_keeps_schema(self):
+        sink = self.sink(FileFormat.PARQUET)
+        schema = pa.schema([pa.field("field", pa.int32(), nullable=False)])
+
+        await sink.push_table(pa.table({"field": [1]}, schema=schema))
+        await sink.push_table(pa.table({"field": [2]}, schema=schema))
+        await sink.teardown()
+
+        (file,) = self.output_files()
+        table = pq.read_table(file)
+        self.assertEqual(schema, table.schema)
+        self.assertEqual(table.to_pylist(), [{"field": 1}, {"field": 2}])
+
+    def partition_files(self):
+        files = []
+        for root, _, names in os.walk(self.output_path):
+            files.extend(
+                os.path.relpath(os.path.join(root, name), self.output_path)
+                for name in names
+            )
+        return sorted(files)
+
+    def read_ndjson(self, path: str):
+        with open(os.path.join(self.output_path, path)) as f:
+            return [json.loads(line) for line in f]
+
+    async def test_partition_by_fields(self):
+        sink = self.sink(FileFormat.NDJSON, partition_by=["date", "hour"])
+
+        await sink.push(
+            [
+                {"date": "2023-01-01", "hour": 1, "value": 1},
+                {"date": "2023-01-02", "hour": 1, "value": 2},
+                {"date": "2023-01-01", "hour": 1, "value": 3},
+            ]
+        )
+        await sink.teardown()
+
+        files = self.partition_files()
+        self.assertEqual(len(files), 2)
+        self.assertTrue(files[0].startswith("date=2023-01-01/hour=1/output-"))
+        self.assertTrue(files[1].startswith("date=2023-01-02/hour=1/output-"))
+        # Partition fields are only stored in the path.
+        self.assertEqual(self.read_ndjson(files[0]), [{"value": 1}, {"value": 3}])
+        self.assertEqual(self.read_ndjson(files[1]), [{"value": 2}])
+
+    async def test_partition_by_function(self):
+        sink = self.sink(
+            FileFormat.NDJSON,
+            partition_by=lambda row: {"day": row["timestamp"][:10], "region": None},
+        )
+
+        await sink.push([{"timestamp": "2023-01-01T10:00:00", "value": 1}])
+        await sink.teardown()
+
+        (file,) = self.partition_files()
+        self.assertTrue(
+            file.startswith("day=2023-01-01/region=__HIVE_DEFAULT_PARTITION__/")
+        )
+        self.assertEqual(
+            self.read_ndjson(file), [{"timestamp": "2023-01-01T10:00:00", "value": 1}]
+        )
+
+    async def test_partition_values_are_escaped(self):
+        sink = self.sink(FileFormat.NDJSON, partition_by=["path"])
+
+        await sink.push([{"path": "a/b=c", "value": 1}])
+        await sink.teardown()
+
+        (file,) = self.partition_files()
+        self.assertTrue(file.startswith("path=a%2Fb%3Dc/"))
+
+    async def test_max_open_files(self):
+        sink = self.sink(FileFormat.NDJSON, partition_by=["key"], max_open_files=2)
+
+        await sink.push([{"key": "a", "value": 1}, {"key": "b", "value": 2}])
+        await sink.push([{"key": "a", "value": 3}])
+        # "b" is the least recently written partition so it is finalized.
+        await sink.push([{"key": "c", "value": 4}])
+
+        finalized = [f for f in self.partition_files() if not f.endswith(".tmp")]
+        self.assertEqual(len(finalized), 1)
+        self.assertTrue(finalized[0].startswith("key=b/"))
+        await sink.teardown()
+        self.assertEqual(len(self.partition_files()), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
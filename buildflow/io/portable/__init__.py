@@ -1,7 +1,22 @@
 # ruff: noqa
-from .bucket import Bucket
+from typing import TYPE_CHECKING
+
+from buildflow.core.utils import lazy_module_getattr
 
 # from .file_change_stream import FileChangeStream
-from .queue import Queue
-from .table import AnalysisTable
-from .topic import Topic
+_LAZY_ATTRIBUTES = {
+    "Bucket": ".bucket",
+    "Queue": ".queue",
+    "AnalysisTable": ".table",
+    "Topic": ".topic",
+}
+__all__ = list(_LAZY_ATTRIBUTES)
+# NOTE: Modules are imported on first use so importing one primitive doesn't
+# import the SDKs of every other primitive.
+__getattr__ = lazy_module_getattr(__name__, _LAZY_ATTRIBUTES)
+
+if TYPE_CHECKING:
+    from .bucket import Bucket
+    from .queue import Queue
+    from .table import AnalysisTable
+    from .topic import Topic
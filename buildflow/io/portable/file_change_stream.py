@@ -1,14 +1,12 @@
 """Allows listening to file changes."""
+
 import dataclasses
 from typing import Iterable
 
 from buildflow.config.cloud_provider_config import CloudProvider, CloudProviderConfig
 from buildflow.core.types.shared_types import FilePath
-from buildflow.io.gcp.gcs_file_change_stream import GCSFileChangeStream
-from buildflow.io.local.file_change_stream import LocalFileChangeStream
 from buildflow.io.primitive import PortablePrimtive, Primitive
 from buildflow.io.strategies._strategy import StategyType
-from buildflow.types.gcp import GCSChangeStreamEventType
 from buildflow.types.local import FileChangeStreamEventType, PortableFileChangeEventType
 
 
@@ -28,6 +26,9 @@ class FileChangeStream(PortablePrimtive):
             )
         # GCP Implementations
         if cloud_provider_config.default_cloud_provider == CloudProvider.GCP:
+            from buildflow.io.gcp.gcs_file_change_stream import GCSFileChangeStream
+            from buildflow.types.gcp import GCSChangeStreamEventType
+
             event_types = [
                 GCSChangeStreamEventType.from_portable_type(et)
                 for et in self.event_types
@@ -45,6 +46,8 @@ class FileChangeStream(PortablePrimtive):
             raise NotImplementedError("Azure is not implemented for FileStream.")
         # Local Implementations
         elif cloud_provider_config.default_cloud_provider == CloudProvider.LOCAL:
+            from buildflow.io.local.file_change_stream import LocalFileChangeStream
+
             event_types = [
                 FileChangeStreamEventType.from_portable_type(et)
                 for et in self.event_types
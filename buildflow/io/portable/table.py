@@ -4,8 +4,6 @@ from typing import Optional
 
 from buildflow.config.cloud_provider_config import CloudProvider, CloudProviderConfig
 from buildflow.core.types.portable_types import TableName
-from buildflow.io.duckdb.duckdb import DuckDBTable
-from buildflow.io.gcp.bigquery_table import BigQueryTable
 from buildflow.io.primitive import PortablePrimtive, Primitive
 from buildflow.io.strategies._strategy import StategyType
 
@@ -23,6 +21,8 @@ class AnalysisTable(PortablePrimtive):
             )
         # GCP Implementations
         if cloud_provider_config.default_cloud_provider == CloudProvider.GCP:
+            from buildflow.io.gcp.bigquery_table import BigQueryTable
+
             return BigQueryTable.from_gcp_options(
                 gcp_options=cloud_provider_config.gcp_options,
                 table_name=self.table_name,
@@ -35,6 +35,8 @@ class AnalysisTable(PortablePrimtive):
             raise NotImplementedError("Azure is not implemented for Table.")
         # Local Implementations
         elif cloud_provider_config.default_cloud_provider == CloudProvider.LOCAL:
+            from buildflow.io.duckdb.duckdb import DuckDBTable
+
             database = os.path.join(os.getcwd(), "buildflow_managed.duckdb")
             return DuckDBTable(database=database, table=self.table_name)
         # Sanity check
@@ -2,8 +2,6 @@ import dataclasses
 
 from buildflow.config.cloud_provider_config import CloudProvider, CloudProviderConfig
 from buildflow.core.types.portable_types import TopicID
-from buildflow.io.gcp.pubsub_subscription import GCPPubSubSubscription
-from buildflow.io.gcp.pubsub_topic import GCPPubSubTopic
 from buildflow.io.primitive import PortablePrimtive, Primitive
 from buildflow.io.strategies._strategy import StategyType
 
@@ -18,11 +16,15 @@ class Topic(PortablePrimtive):
         # GCP Implementations
         if cloud_provider_config.default_cloud_provider == CloudProvider.GCP:
             if strategy_type == StategyType.SOURCE:
+                from buildflow.io.gcp.pubsub_subscription import GCPPubSubSubscription
+
                 return GCPPubSubSubscription.from_gcp_options(
                     gcp_options=cloud_provider_config.gcp_options,
                     topic_id=self.topic_id,
                 )
             elif strategy_type == StategyType.SINK:
+                from buildflow.io.gcp.pubsub_topic import GCPPubSubTopic
+
                 return GCPPubSubTopic.from_gcp_options(
                     gcp_options=cloud_provider_config.gcp_options
                 )
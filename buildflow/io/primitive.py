@@ -1,7 +1,6 @@
 import enum
-from typing import Any, Callable, Dict, List, Optional, Type
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Type
 
-import pulumi
 from starlette.requests import Request
 
 from buildflow.config.cloud_provider_config import (
@@ -18,6 +17,9 @@ from buildflow.io.strategies._strategy import StategyType
 from buildflow.io.strategies.sink import SinkStrategy
 from buildflow.io.strategies.source import SourceStrategy
 
+if TYPE_CHECKING:
+    import pulumi
+
 
 class PrimitiveType(enum.Enum):
     PORTABLE = "portable"
@@ -47,7 +49,7 @@ class Primitive:
     def pulumi_resources_if_managed(
         self,
         credentials: CredentialType,
-        opts: pulumi.ResourceOptions,
+        opts: "pulumi.ResourceOptions",
     ):
         if not self._managed:
             return None
@@ -56,8 +58,8 @@ class Primitive:
     def pulumi_resources(
         self,
         credentials: CredentialType,
-        opts: pulumi.ResourceOptions,
-    ) -> List[pulumi.Resource]:
+        opts: "pulumi.ResourceOptions",
+    ) -> List["pulumi.Resource"]:
         raise NotImplementedError(
             f"Primitive.pulumi_resources() is not implemented for type: {type(self)}."
         )
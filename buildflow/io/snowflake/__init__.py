@@ -1,3 +1,18 @@
 # ruff: noqa
-from .snowflake_table import SnowflakeTable
-from .utils import read_private_key_file, read_private_key_file_bytes
+from typing import TYPE_CHECKING
+
+from buildflow.core.utils import lazy_module_getattr
+
+_LAZY_ATTRIBUTES = {
+    "SnowflakeTable": ".snowflake_table",
+    "read_private_key_file": ".utils",
+    "read_private_key_file_bytes": ".utils",
+}
+__all__ = list(_LAZY_ATTRIBUTES)
+# NOTE: Modules are imported on first use so importing one primitive doesn't
+# import the SDKs of every other primitive.
+__getattr__ = lazy_module_getattr(__name__, _LAZY_ATTRIBUTES)
+
+if TYPE_CHECKING:
+    from .snowflake_table import SnowflakeTable
+    from .utils import read_private_key_file, read_private_key_file_bytes
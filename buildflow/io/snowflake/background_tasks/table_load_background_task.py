@@ -1,24 +1,106 @@
 import asyncio
 import datetime
+import functools
 import logging
 import os
-from typing import Any, Dict, Optional, Union
+import time
+from typing import Any, Dict, Iterable, List, Optional, Union
 
 import fsspec
 import ray
 from snowflake.ingest import SimpleIngestManager, StagedFile
 
+from buildflow.core.app.runtime.metrics import (
+    CompositeRateCounterMetric,
+    SimpleGaugeMetric,
+)
+from buildflow.core.app.runtime.metrics.common import current_job_id
 from buildflow.core.background_tasks.background_task import BackgroundTask
 from buildflow.core.credentials.aws_credentials import AWSCredentials
 from buildflow.core.credentials.gcp_credentials import GCPCredentials
 from buildflow.io.snowflake.constants import (
+    BASE_COMPACTION_DIR,
     BASE_STAGING_DIR,
     BASE_UPLOAD_DIR,
     UPLOAD_ACTOR_NAME,
 )
+from buildflow.io.utils.file_compaction import FileCompactor
 from buildflow.io.utils.file_systems import get_file_system
+from buildflow.types.portable import FileFormat
+
+# How long we wait for snowpipe to report a file as loaded before giving up.
+_DEFAULT_LOAD_TIMEOUT_SECS = 10 * 60
+# Flushes are skipped while this many files are waiting to be confirmed.
+_DEFAULT_MAX_PENDING_FILES = 10_000
+# The load history is polled with exponential backoff between these delays.
+_MIN_HISTORY_POLL_SECS = 1
+_MAX_HISTORY_POLL_SECS = 30
+
+
+def _utc_now_isoformat() -> str:
+    return datetime.datetime.utcnow().replace(tzinfo=datetime.timezone.utc).isoformat()
+
+
+class _LoadTracker:
+    """Tracks ingested files until snowpipe's load history reports on them.
+
+    Files are pending from when they are ingested until the history shows them
+    loaded or failed, or `timeout_secs` passes (in which case they are counted
+    as failed).
+    """
+
+    def __init__(self, timeout_secs: float, max_pending_files: int):
+        self.timeout_secs = timeout_secs
+        self.max_pending_files = max_pending_files
+        # Maps the path of each pending file to when we stop waiting for it.
+        self.pending: Dict[str, float] = {}
+        # Where the next history request starts from, None if nothing is pending.
+        self.history_start: Optional[str] = None
+        self.num_loaded = 0
+        self.num_failed = 0
+
+    def is_full(self) -> bool:
+        return len(self.pending) >= self.max_pending_files
+
+    def add(self, paths: Iterable[str], ingest_start: str):
+        deadline = time.monotonic() + self.timeout_secs
+        for path in paths:
+            self.pending[path] = deadline
+        if self.history_start is None:
+            self.history_start = ingest_start
+
+    def update(self, history_resp: Dict[str, Any]) -> int:
+        """Updates the pending files from a `get_history_range` response.
+
+        Returns the number of pending files that finished loading (or failed).
+        """
+        self.history_start = history_resp["rangeEndTime"]
+        num_finished = 0
+        for file in history_resp.get("files", []):
+            path = file.get("path")
+            if path not in self.pending or file["status"] == "LOAD_IN_PROGRESS":
+                continue
+            del self.pending[path]
+            num_finished += 1
+            if file["errorsSeen"] > 0 or file["status"] == "LOAD_FAILED":
+                self.num_failed += 1
+                logging.error("Failed to load file to Snowflake: %s", file)
+            else:
+                self.num_loaded += 1
+        if not self.pending:
+            self.history_start = None
+        return num_finished
 
-_MAX_HISTORY_CHECK_TIME_SECS = 120
+    def expire(self) -> List[str]:
+        """Stops waiting for the files whose timeout passed and returns them."""
+        now = time.monotonic()
+        expired = [path for path, deadline in self.pending.items() if deadline <= now]
+        for path in expired:
+            del self.pending[path]
+        self.num_failed += len(expired)
+        if not self.pending:
+            self.history_start = None
+        return expired
 
 
 class SnowflakeUploadBackgroundTask(BackgroundTask):
@@ -33,10 +115,16 @@ class SnowflakeUploadBackgroundTask(BackgroundTask):
         pipe: str,
         private_key: str,
         flush_time_secs: int,
+        staging_file_format: FileFormat = FileFormat.PARQUET,
+        compaction_target_file_bytes: Optional[int] = None,
+        load_timeout_secs: float = _DEFAULT_LOAD_TIMEOUT_SECS,
+        max_pending_files: int = _DEFAULT_MAX_PENDING_FILES,
         test_ingest_manager: Optional[Any] = None,
     ):
         self.bucket_name = bucket_name
         self.file_system = get_file_system(credentials)
+        self.staging_file_format = staging_file_format
+        self.compaction_target_file_bytes = compaction_target_file_bytes
         self.flush_actor = None
         self.flush_loop = None
         self.account = account
@@ -46,6 +134,8 @@ class SnowflakeUploadBackgroundTask(BackgroundTask):
         self.pipe = pipe
         self.private_key = private_key
         self.flush_time_secs = flush_time_secs
+        self.load_timeout_secs = load_timeout_secs
+        self.max_pending_files = max_pending_files
         self.test_ingest_manager = test_ingest_manager
 
     async def start(self):
@@ -59,6 +149,10 @@ class SnowflakeUploadBackgroundTask(BackgroundTask):
             pipe=self.pipe,
             private_key=self.private_key,
             flush_time_secs=self.flush_time_secs,
+            staging_file_format=self.staging_file_format,
+            compaction_target_file_bytes=self.compaction_target_file_bytes,
+            load_timeout_secs=self.load_timeout_secs,
+            max_pending_files=self.max_pending_files,
             test_ingest_manager=self.test_ingest_manager,
         )
         self.flush_loop = self.flush_actor.flush.remote()
@@ -85,13 +179,28 @@ class _SnowflakeUploadActor:
         pipe: str,
         private_key: str,
         flush_time_secs: int,
+        staging_file_format: FileFormat,
+        compaction_target_file_bytes: Optional[int],
+        load_timeout_secs: float,
+        max_pending_files: int,
         test_ingest_manager: Optional[Any] = None,
     ):
         self.bucket_name = bucket_name
         self.file_system = file_system
         self.staging_dir = os.path.join(self.bucket_name, BASE_STAGING_DIR)
         self.upload_dir = os.path.join(self.bucket_name, BASE_UPLOAD_DIR)
+        self.staging_extension = f".{staging_file_format.value}"
+        self.compactor = None
+        if compaction_target_file_bytes is not None:
+            self.compactor = FileCompactor(
+                file_system=file_system,
+                file_format=staging_file_format,
+                target_file_bytes=compaction_target_file_bytes,
+                work_dir=os.path.join(self.bucket_name, BASE_COMPACTION_DIR),
+            )
         self.running = True
+        self.load_tracker = _LoadTracker(load_timeout_secs, max_pending_files)
+        self.track_loads_task: Optional[asyncio.Task] = None
         pipe = f'"{database}"."{schema}"."{pipe}"'
         if test_ingest_manager is not None:
             self.ingest_manager = test_ingest_manager
@@ -100,7 +209,40 @@ class _SnowflakeUploadActor:
                 account=account, user=user, pipe=pipe, private_key=private_key
             )
         self.flush_time_secs = flush_time_secs
-        self.staged_files = []
+        # metrics
+        tags = {"pipe": pipe, "JobId": current_job_id()}
+        self.pending_files_gauge = SimpleGaugeMetric(
+            "snowflake_pending_files",
+            description="Files ingested to Snowflake that are not loaded yet.",
+            default_tags=tags,
+        )
+        self.loaded_files_counter = CompositeRateCounterMetric(
+            "snowflake_loaded_files",
+            description="Files loaded to Snowflake. Only increments.",
+            default_tags=tags,
+        )
+        self.failed_files_counter = CompositeRateCounterMetric(
+            "snowflake_failed_files",
+            description="Files that failed or timed out loading to Snowflake. "
+            "Only increments.",
+            default_tags=tags,
+        )
+        self._num_loaded_reported = 0
+        self._num_failed_reported = 0
+
+    def _update_metrics(self):
+        tracker = self.load_tracker
+        self.pending_files_gauge.set(len(tracker.pending))
+        if tracker.num_loaded > self._num_loaded_reported:
+            self.loaded_files_counter.inc(
+                tracker.num_loaded - self._num_loaded_reported
+            )
+            self._num_loaded_reported = tracker.num_loaded
+        if tracker.num_failed > self._num_failed_reported:
+            self.failed_files_counter.inc(
+                tracker.num_failed - self._num_failed_reported
+            )
+            self._num_failed_reported = tracker.num_failed
 
     def mv_file(self, src_path: str, dest_path: str) -> str:
         self.file_system.mv(src_path, dest_path)
@@ -111,8 +253,55 @@ class _SnowflakeUploadActor:
         # getting the latest files from the bucket.
         return self.file_system.ls(src_path, True, refresh=True)
 
+    def compact_files(self, file_sizes: Dict[str, int]) -> Dict[str, int]:
+        """Compacts small staged files into the upload dir.
+
+        Returns the compacted files (path to size), the files they replaced are
+        removed from `file_sizes`.
+        """
+        compacted = {}
+        staged = {
+            path: size
+            for path, size in file_sizes.items()
+            if path.endswith(self.staging_extension)
+        }
+        for group in self.compactor.plan(staged):
+            upload_file_path = self.compactor.compacted_file_path(
+                self.upload_dir, "", group
+            )
+            try:
+                self.compactor.compact(group, upload_file_path)
+            except Exception:
+                logging.exception(
+                    "Failed to compact staged files will upload them as is."
+                )
+                continue
+            compacted[upload_file_path] = self.file_system.size(upload_file_path)
+            for path in group:
+                file_sizes.pop(path)
+        return compacted
+
     async def mv_files(self):
+        if self.load_tracker.is_full():
+            logging.warning(
+                "%s files are waiting to be loaded to Snowflake, will not upload "
+                "more files until they are.",
+                len(self.load_tracker.pending),
+            )
+            return
         loop = asyncio.get_event_loop()
+        upload_files: Dict[str, int] = {}
+        if self.compactor is not None:
+            try:
+                # NOTE: A compaction that was interrupted after its file was
+                # moved to the upload dir may or may not have been ingested.
+                # We ingest it again, snowpipe skips files it already loaded.
+                recovered = await loop.run_in_executor(None, self.compactor.recover)
+                for path in recovered:
+                    upload_files[path] = self.file_system.size(path)
+            except Exception:
+                logging.exception("Failed to recover interrupted compactions")
+                return
         files = []
         try:
             files: Dict[str, Any] = await loop.run_in_executor(
@@ -121,101 +310,112 @@ class _SnowflakeUploadActor:
         except FileNotFoundError:
             # This happens when the staging dir doesn't exist yet.
             # Meaning there are no files to upload
-            return
+            files = []
         except Exception:
             logging.exception("Failed to list files in staging dir")
             return
-        coros = []
-        staged_files = []
-        for file in files:
-            src_file_path = file["name"]
-            src_file_size = file["size"]
-            upload_file_path = os.path.join(
-                self.upload_dir, os.path.basename(src_file_path)
+        file_sizes = {file["name"]: file["size"] for file in files}
+        if self.compactor is not None and file_sizes:
+            upload_files.update(
+                await loop.run_in_executor(None, self.compact_files, file_sizes)
             )
 
-            def mv_file():
-                self.file_system.mv(src_file_path, upload_file_path)
-                return upload_file_path, src_file_size
-
-            coros.append(loop.run_in_executor(None, mv_file))
-        if coros:
-            done, _ = await asyncio.wait(coros)
-            for completed in done:
-                try:
-                    file_path, file_size = completed.result()
-                    # Trim the bucket name from the file path since the file system
-                    # expects
-                    # it but snowflake wants it relative to the URL.
-                    staged_files.append(
-                        StagedFile(
-                            file_path.removeprefix(f"{self.bucket_name}/"), file_size
-                        )
-                    )
-                except Exception:
-                    logging.exception(
-                        "Failed to move file will keep in staging dir and retry on next"
-                        " flush."
-                    )
-        try:
-            if staged_files:
-                ingest_start = (
-                    datetime.datetime.utcnow()
-                    .replace(tzinfo=datetime.timezone.utc)
-                    .isoformat()
+        staged_paths = list(file_sizes)
+        results = await asyncio.gather(
+            *[
+                loop.run_in_executor(
+                    None,
+                    self.mv_file,
+                    path,
+                    os.path.join(self.upload_dir, os.path.basename(path)),
+                )
+                for path in staged_paths
+            ],
+            return_exceptions=True,
+        )
+        for path, result in zip(staged_paths, results):
+            if isinstance(result, Exception):
+                logging.error(
+                    "Failed to move file will keep in staging dir and retry on next "
+                    "flush.",
+                    exc_info=result,
                 )
-                response = self.ingest_manager.ingest_files(staged_files)
-                if response["responseCode"] != "SUCCESS":
-                    logging.error(
-                        "Failed to ingest files to Snowflake: %s", response["message"]
-                    )
-                    return
-
-        except Exception:
-            logging.exception("Failed to upload files to Snowflake")
-            return
-        history_loop_start = datetime.datetime.utcnow()
-        staged_file_paths = {file.path for file in staged_files}
-        while True:
-            if not staged_file_paths:
-                break
-            if (
-                history_loop_start - datetime.datetime.utcnow()
-            ).total_seconds() > _MAX_HISTORY_CHECK_TIME_SECS:
-                break
-            history_resp = self.ingest_manager.get_history_range(
-                start_time_inclusive=ingest_start
-            )
-            ingest_start = history_resp["rangeEndTime"]
-            if len(history_resp.get("files", [])) <= 0:
-                # wait ten seconds and search for more
-                await asyncio.sleep(10)
                 continue
-            for file in history_resp["files"]:
-                if "path" not in file or file["status"] == "LOAD_IN_PROGRESS":
-                    continue
-                path = file["path"]
-                if path in staged_file_paths:
-                    staged_file_paths.remove(path)
-                    if file["errorsSeen"] > 0:
-                        logging.error("failed to load file to snowflake: ", file)
-
-        if staged_file_paths:
+            upload_files[result] = file_sizes[path]
+        # Trim the bucket name from the file path since the file system expects
+        # it but snowflake wants it relative to the URL.
+        staged_files = [
+            StagedFile(file_path.removeprefix(f"{self.bucket_name}/"), file_size)
+            for file_path, file_size in upload_files.items()
+        ]
+        if not staged_files:
+            return
+        ingest_start = _utc_now_isoformat()
+        response = await loop.run_in_executor(
+            None, self.ingest_manager.ingest_files, staged_files
+        )
+        if response["responseCode"] != "SUCCESS":
             logging.error(
-                "Failed to find all files in Snowflake history after %s seconds. "
-                "Files: %s",
-                _MAX_HISTORY_CHECK_TIME_SECS,
-                staged_file_paths,
+                "Failed to ingest files to Snowflake: %s", response["message"]
             )
             return
+        self.load_tracker.add([file.path for file in staged_files], ingest_start)
+        self._update_metrics()
+
+    async def track_loads(self):
+        """Polls snowpipe's load history until the pending files are loaded.
+
+        This runs separately from `flush` so files keep being uploaded while
+        earlier loads are confirmed.
+        """
+        loop = asyncio.get_event_loop()
+        poll_secs = _MIN_HISTORY_POLL_SECS
+        while True:
+            await asyncio.sleep(poll_secs)
+            tracker = self.load_tracker
+            if not tracker.pending:
+                poll_secs = _MIN_HISTORY_POLL_SECS
+                continue
+            num_finished = 0
+            try:
+                history_resp = await loop.run_in_executor(
+                    None,
+                    functools.partial(
+                        self.ingest_manager.get_history_range,
+                        start_time_inclusive=tracker.history_start,
+                    ),
+                )
+                num_finished = tracker.update(history_resp)
+            except Exception:
+                logging.exception("Failed to get Snowflake load history")
+            expired = tracker.expire()
+            if expired:
+                logging.error(
+                    "Failed to find files in Snowflake load history after %s "
+                    "seconds. Files: %s",
+                    tracker.timeout_secs,
+                    expired,
+                )
+            self._update_metrics()
+            if num_finished:
+                poll_secs = _MIN_HISTORY_POLL_SECS
+            else:
+                poll_secs = min(poll_secs * 2, _MAX_HISTORY_POLL_SECS)
 
     async def flush(self):
+        self.track_loads_task = asyncio.create_task(self.track_loads())
         while self.running:
             await asyncio.sleep(self.flush_time_secs)
             try:
                 await self.mv_files()
             except Exception:
                 logging.exception("Failed to flush files to Snowflake")
+        self.track_loads_task.cancel()
+        if self.load_tracker.pending:
+            logging.warning(
+                "Shutting down before %s files were confirmed loaded to Snowflake.",
+                len(self.load_tracker.pending),
+            )
 
     async def shutdown(self):
         self.running = False
@@ -6,11 +6,14 @@ import tempfile
 import unittest
 from unittest import mock
 
+import pyarrow as pa
+import pyarrow.parquet as pq
 import pytest
 
 from buildflow.core.credentials.empty_credentials import EmptyCredentials
 from buildflow.io.snowflake.background_tasks.table_load_background_task import (
     SnowflakeUploadBackgroundTask,
+    _LoadTracker,
 )
 from buildflow.io.snowflake.constants import BASE_STAGING_DIR, BASE_UPLOAD_DIR
 
@@ -18,8 +21,9 @@ from buildflow.io.snowflake.constants import BASE_STAGING_DIR, BASE_UPLOAD_DIR
 @pytest.mark.usefixtures("ray")
 class TableLoadBackgroundTaskTest(unittest.IsolatedAsyncioTestCase):
     async def run_for_time(self, coro, time: int = 5):
+        # NOTE: asyncio.wait only accepts futures and tasks on newer pythons.
         completed, pending = await asyncio.wait(
-            [coro], timeout=time, return_when="FIRST_EXCEPTION"
+            [asyncio.ensure_future(coro)], timeout=time, return_when="FIRST_EXCEPTION"
         )
         if completed:
             # This general should only happen when there was an exception so
@@ -45,6 +49,7 @@ class TableLoadBackgroundTaskTest(unittest.IsolatedAsyncioTestCase):
             pipe="pipe",
             private_key="pk",
             flush_time_secs=1,
+            compaction_target_file_bytes=10 * 1024 * 1024,
             test_ingest_manager=mock.MagicMock(),
         )
 
@@ -64,6 +69,104 @@ class TableLoadBackgroundTaskTest(unittest.IsolatedAsyncioTestCase):
         # check that the file was uploaded
         self.assertIn("file1.json", os.listdir(self.upload_dir))
 
+    async def test_upload_compacted(self):
+        for i in range(3):
+            pq.write_table(
+                pa.Table.from_pylist([{"value": i}]),
+                os.path.join(self.staging_dir, f"file{i}.parquet"),
+            )
+
+        await self.background_task.start()
+        await self.run_for_time(self.background_task.flush_loop, time=10)
+
+        # The staged files are compacted into one file before they are uploaded.
+        self.assertEqual(os.listdir(self.staging_dir), [])
+        (uploaded,) = os.listdir(self.upload_dir)
+        self.assertTrue(uploaded.startswith("compacted-"))
+        self.assertCountEqual(
+            pq.read_table(os.path.join(self.upload_dir, uploaded)).to_pylist(),
+            [{"value": 0}, {"value": 1}, {"value": 2}],
+        )
+
+    async def test_upload_while_loads_pending(self):
+        ingest_manager = mock.MagicMock()
+        ingest_manager.ingest_files.return_value = {"responseCode": "SUCCESS"}
+        # Snowpipe never reports the files so they stay pending.
+        ingest_manager.get_history_range.return_value = {
+            "rangeEndTime": "2023-01-01T00:00:00+00:00",
+            "files": [],
+        }
+        self.background_task.test_ingest_manager = ingest_manager
+        self.background_task.compaction_target_file_bytes = None
+
+        await self.background_task.start()
+        with open(os.path.join(self.staging_dir, "file1.json"), "w") as f:
+            json.dump({"test": "data"}, f)
+        await asyncio.sleep(3)
+        with open(os.path.join(self.staging_dir, "file2.json"), "w") as f:
+            json.dump({"test": "data"}, f)
+        await self.run_for_time(self.background_task.flush_loop, time=3)
+
+        self.assertCountEqual(os.listdir(self.upload_dir), ["file1.json", "file2.json"])
+
+
+class LoadTrackerTest(unittest.TestCase):
+    def test_loaded_and_failed(self):
+        tracker = _LoadTracker(timeout_secs=60, max_pending_files=10)
+        tracker.add(["a", "b", "c"], "start")
+        self.assertEqual(tracker.history_start, "start")
+
+        num_finished = tracker.update(
+            {
+                "rangeEndTime": "end",
+                "files": [
+                    {"path": "a", "status": "LOADED", "errorsSeen": 0},
+                    {"path": "b", "status": "LOAD_FAILED", "errorsSeen": 1},
+                    {"path": "c", "status": "LOAD_IN_PROGRESS", "errorsSeen": 0},
+                    {"path": "other", "status": "LOADED", "errorsSeen": 0},
+                ],
+            }
+        )
+
+        self.assertEqual(num_finished, 2)
+        self.assertEqual(list(tracker.pending), ["c"])
+        self.assertEqual(tracker.num_loaded, 1)
+        self.assertEqual(tracker.num_failed, 1)
+        self.assertEqual(tracker.history_start, "end")
+
+    def test_history_start_resets_when_nothing_pending(self):
+        tracker = _LoadTracker(timeout_secs=60, max_pending_files=10)
+        tracker.add(["a"], "start")
+        tracker.update(
+            {
+                "rangeEndTime": "end",
+                "files": [{"path": "a", "status": "LOADED", "errorsSeen": 0}],
+            }
+        )
+
+        self.assertIsNone(tracker.history_start)
+        tracker.add(["b"], "later")
+        self.assertEqual(tracker.history_start, "later")
+
+    def test_expire(self):
+        tracker = _LoadTracker(timeout_secs=60, max_pending_files=10)
+        with mock.patch("time.monotonic", return_value=0):
+            tracker.add(["a"], "start")
+        with mock.patch("time.monotonic", return_value=30):
+            tracker.add(["b"], "start")
+
+        with mock.patch("time.monotonic", return_value=61):
+            self.assertEqual(tracker.expire(), ["a"])
+        self.assertEqual(list(tracker.pending), ["b"])
+        self.assertEqual(tracker.num_failed, 1)
+
+    def test_is_full(self):
+        tracker = _LoadTracker(timeout_secs=60, max_pending_files=2)
+        tracker.add(["a"], "start")
+        self.assertFalse(tracker.is_full())
+        tracker.add(["b"], "start")
+        self.assertTrue(tracker.is_full())
+
 
 if __name__ == "__main__":
     unittest.main()
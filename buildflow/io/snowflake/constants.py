@@ -1,3 +1,4 @@
 BASE_STAGING_DIR = "buildflow-staging"
 BASE_UPLOAD_DIR = "buildflow-upload"
+BASE_COMPACTION_DIR = "buildflow-compaction"
 UPLOAD_ACTOR_NAME = "SnowflakeUploadActor"
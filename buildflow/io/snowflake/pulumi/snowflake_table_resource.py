@@ -29,6 +29,8 @@ class SnowflakeTableSinkResource(pulumi.ComponentResource):
         # pulumi_resource options (buildflow internal concept)
         credentials: AWSCredentials,
         opts: pulumi.ResourceOptions,
+        # The snowflake file format of the staged files.
+        file_format: str = "TYPE = PARQUET",
     ):
         super().__init__(
             "buildflow:snowflake:Table",
@@ -119,7 +121,7 @@ class SnowflakeTableSinkResource(pulumi.ComponentResource):
                 database=database,
                 schema=schema,
                 copy_options="MATCH_BY_COLUMN_NAME = CASE_SENSITIVE",
-                file_format="TYPE = PARQUET",
+                file_format=file_format,
                 url=bucket.bucket_url,
                 credentials=stage_credentials,
             )
@@ -13,9 +13,6 @@ from buildflow.io.primitive import Primitive, PrimitiveType
 from buildflow.io.snowflake.background_tasks.table_load_background_task import (
     SnowflakeUploadBackgroundTask,
 )
-from buildflow.io.snowflake.pulumi.snowflake_table_resource import (
-    SnowflakeTableSinkResource,
-)
 from buildflow.io.snowflake.strategies.table_sink_startegy import SnowflakeTableSink
 from buildflow.types.portable import FileFormat
 
@@ -24,6 +21,14 @@ _DEFAULT_SCHEMA_MANAGED = True
 _DEFAULT_SNOW_PIPE_MANAGED = True
 _DEFAULT_STAGE_MANAGED = True
 _DEFAULT_FLUSH_TIME_LIMIT_SECS = 60
+_DEFAULT_STAGING_FILE_FORMAT = FileFormat.PARQUET
+_DEFAULT_STAGED_FILE_BYTES = 128 * 1024 * 1024
+# The file formats snowflake can load, and the snowflake file format for each.
+SNOWFLAKE_FILE_FORMATS = {
+    FileFormat.PARQUET: "TYPE = PARQUET",
+    FileFormat.AVRO: "TYPE = AVRO",
+    FileFormat.NDJSON: "TYPE = JSON",
+}
 
 
 @dataclasses.dataclass
@@ -54,6 +59,15 @@ class SnowflakeTable(Primitive):
     flush_time_limit_secs: int = dataclasses.field(
         default=_DEFAULT_FLUSH_TIME_LIMIT_SECS, init=False
     )
+    # The format data is staged in before it is loaded into snowflake.
+    staging_file_format: FileFormat = dataclasses.field(
+        default=_DEFAULT_STAGING_FILE_FORMAT, init=False
+    )
+    # Small staged files are compacted into files of about this size before
+    # they are loaded, disabled if None.
+    staging_compaction_target_bytes: Optional[int] = dataclasses.field(
+        default=_DEFAULT_STAGED_FILE_BYTES, init=False
+    )
 
     # Optional arguments to configure pulumi. These can be set with the:
     # .options(...) method
@@ -79,8 +93,7 @@ class SnowflakeTable(Primitive):
                 "Bucket must be of type S3Bucket or GCSBucket. Got: "
                 f"{type(self.bucket)}"
             )
-        self.bucket.file_format = FileFormat.PARQUET
-        self.bucket.file_path = f"{uuid()}.parquet"
+        self._set_bucket_file_format()
         self.snow_pipe_managed = self.snow_pipe is None
         if self.snow_pipe is None:
             self.snow_pipe = "buildflow_managed_snow_pipe"
@@ -88,6 +101,11 @@ class SnowflakeTable(Primitive):
         if self.snowflake_stage is None:
             self.snowflake_stage = "buildflow_managed_snowflake_stage"
 
+    def _set_bucket_file_format(self):
+        file_format = self.staging_file_format
+        self.bucket.file_format = file_format
+        self.bucket.file_path = f"{uuid()}.{file_format.value}"
+
     def options(
         self,
         # Pulumi management options
@@ -96,11 +114,26 @@ class SnowflakeTable(Primitive):
         table_schema: Optional[Type] = None,
         # Sink options
         flush_time_limit_secs: int = _DEFAULT_FLUSH_TIME_LIMIT_SECS,
+        # One of PARQUET, AVRO or NDJSON.
+        staging_file_format: FileFormat = _DEFAULT_STAGING_FILE_FORMAT,
+        # Small staged files are compacted into files of about this size before
+        # they are loaded. Set to None to load each staged file as is.
+        staging_compaction_target_bytes: Optional[int] = _DEFAULT_STAGED_FILE_BYTES,
     ) -> "SnowflakeTable":
+        if isinstance(staging_file_format, str):
+            staging_file_format = FileFormat(staging_file_format)
+        if staging_file_format not in SNOWFLAKE_FILE_FORMATS:
+            raise ValueError(
+                f"Snowflake can't load {staging_file_format} files. Use one of: "
+                f"{[f.name for f in SNOWFLAKE_FILE_FORMATS]}"
+            )
         self.database_managed = database_managed
         self.schema_managed = schema_managed
         self.table_schema = table_schema
         self.flush_time_limit_secs = flush_time_limit_secs
+        self.staging_file_format = staging_file_format
+        self.staging_compaction_target_bytes = staging_compaction_target_bytes
+        self._set_bucket_file_format()
         return self
 
     def background_tasks(
@@ -116,7 +149,9 @@ class SnowflakeTable(Primitive):
                 schema=self.schema,
                 private_key=self.private_key,
                 pipe=self.snow_pipe,
-                flush_time_secs=self.flush_time_secs,
+                flush_time_secs=self.flush_time_limit_secs,
+                staging_file_format=self.staging_file_format,
+                compaction_target_file_bytes=self.staging_compaction_target_bytes,
             )
         ]
 
@@ -128,6 +163,10 @@ class SnowflakeTable(Primitive):
         credentials: Union[AWSCredentials, GCPCredentials],
         opts: pulumi.ResourceOptions,
     ) -> List[pulumi.Resource]:
+        from buildflow.io.snowflake.pulumi.snowflake_table_resource import (
+            SnowflakeTableSinkResource,
+        )
+
         return [
             SnowflakeTableSinkResource(
                 table=self.table,
@@ -144,6 +183,7 @@ class SnowflakeTable(Primitive):
                 user=self.user,
                 private_key=self.private_key,
                 table_schema=self.table_schema,
+                file_format=SNOWFLAKE_FILE_FORMATS[self.staging_file_format],
                 credentials=credentials,
                 opts=opts,
             )
@@ -26,13 +26,20 @@ class SnowflakeTableSink(SinkStrategy):
         bucket_sink: Union[S3BucketSink, GCSBucketSink],
     ):
         super().__init__(credentials, "snowflake-table-sink")
+        if bucket_sink.partition_by is not None:
+            raise ValueError(
+                "Snowflake staging buckets can't be partitioned, remove "
+                "`partition_by` from the bucket options."
+            )
         self.credentials = credentials
         self.bucket_sink = bucket_sink
         self.bucket_sink.file_path = self._get_new_file_path()
 
     def _get_new_file_path(self) -> str:
         return os.path.join(
-            self.bucket_sink.bucket_name, _BASE_STAGING_DIR, f"{uuid()}.parquet"
+            self.bucket_sink.bucket_name,
+            _BASE_STAGING_DIR,
+            f"{uuid()}.{self.bucket_sink.file_format.value}",
         )
 
     def push_converter(
@@ -42,4 +49,9 @@ class SnowflakeTableSink(SinkStrategy):
 
     async def push(self, batch: Batch):
         await self.bucket_sink.push(batch)
-        self.bucket_sink.file_path = self._get_new_file_path()
+        # NOTE: Each batch is staged as its own file, so it can be uploaded to
+        # snowflake on the next flush.
+        await self.bucket_sink.roll()
+
+    async def teardown(self):
+        await self.bucket_sink.teardown()
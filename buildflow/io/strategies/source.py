@@ -1,5 +1,5 @@
 import dataclasses
-from typing import Any, Callable, Iterable, Type
+from typing import Any, Callable, Hashable, Iterable, List, Optional, Type
 
 from buildflow.core.credentials import CredentialType
 from buildflow.io.strategies._strategy import StategyType, Strategy, StrategyID
@@ -40,6 +40,24 @@ class SourceStrategy(Strategy):
     def pull_converter(self, user_defined_type: Type) -> Callable[[Any], Any]:
         raise NotImplementedError("pull_converter not implemented")
 
+    def ordering_keys(self, response: PullResponse) -> Optional[List[Hashable]]:
+        """Returns the ordering key of each element in a pulled batch.
+
+        This is only used for ordered processing. Elements with the same key are
+        processed one after another in the order they were pulled, elements
+        with a None key can be processed in any order. Returning None (the
+        default) means the whole batch is processed in order.
+        """
+        return None
+
+    def split_ack_info(self, ack_info: AckInfo, indices: List[int]) -> AckInfo:
+        """Returns the ack info for the elements at `indices` of a pulled batch.
+
+        This allows part of a batch to be acked (and the rest nacked), it is
+        used by ordered processing.
+        """
+        raise NotImplementedError("split_ack_info not implemented")
+
     async def teardown(self):
         """Teardown is called when the source is no longer needed.
 
@@ -1,5 +1,8 @@
+import asyncio
+import dataclasses
 import logging
-from typing import Optional
+import threading
+from typing import Any, Dict, Optional, Tuple
 
 import boto3
 import botocore.exceptions
@@ -9,6 +12,47 @@ from botocore.client import Config
 from buildflow.core.credentials import AWSCredentials
 from buildflow.core.types.aws_types import AWSRegion
 
+# The default max number of pooled HTTP connections of an async client.
+DEFAULT_MAX_POOL_CONNECTIONS = 50
+
+
+@dataclasses.dataclass
+class _SharedAsyncClient:
+    client: Any
+    ref_count: int
+
+
+# Async clients are shared by all strategies running on the same event loop
+# (i.e. all the threads of a replica), so they share a connection pool.
+_async_clients: Dict[Tuple, _SharedAsyncClient] = {}
+_async_client_locks: Dict[Tuple, asyncio.Lock] = {}
+
+# NOTE: boto3 sessions and clients are cached for the whole process so
+# strategies and dependencies using the same credentials don't each pay for
+# resolving credentials, verifying them and loading the service models.
+# boto3 clients are thread safe but creating them is not, so creation happens
+# under the lock.
+_cache_lock = threading.Lock()
+_session: Optional[boto3.Session] = None
+_anonymous_creds: Dict[Tuple, bool] = {}
+_clients: Dict[Tuple, Any] = {}
+
+
+def clear_cache():
+    """Clears the cached sessions and clients, e.g. after credentials change."""
+    global _session
+    with _cache_lock:
+        _session = None
+        _anonymous_creds.clear()
+        _clients.clear()
+
+
+def _get_session() -> boto3.Session:
+    global _session
+    if _session is None:
+        _session = boto3.Session()
+    return _session
+
 
 class AWSClients:
     def __init__(
@@ -16,9 +60,23 @@ class AWSClients:
         credentials: AWSCredentials,
         region: Optional[AWSRegion],
     ) -> None:
-        # TODO: add some caching for clients
         self.creds = credentials
         self.region = region
+        self._creds_key = (
+            credentials.access_key_id,
+            credentials.secret_access_key,
+            credentials.session_token,
+        )
+        with _cache_lock:
+            use_anonymous_creds = _anonymous_creds.get((self._creds_key, region))
+        if use_anonymous_creds is None:
+            use_anonymous_creds = self._verify_credentials()
+            with _cache_lock:
+                _anonymous_creds[(self._creds_key, region)] = use_anonymous_creds
+        self.use_anonymous_creds = use_anonymous_creds
+
+    def _verify_credentials(self) -> bool:
+        """Returns whether we need to fall back to anonymous credentials."""
         self.use_anonymous_creds = False
         sts_client = self._get_boto_client("sts")
         try:
@@ -28,28 +86,34 @@ class AWSClients:
             logging.warning(
                 "no credentials in environment found, using anonymous credentials"
             )
-            self.use_anonymous_creds = True
+            return True
+        return False
 
-    def _get_boto_client(self, service_name: str):
+    def _create_boto_client(self, service_name: str):
+        session = _get_session()
         if self.use_anonymous_creds:
-            return boto3.client(
+            return session.client(
                 service_name=service_name,
                 region_name=self.region,
                 config=Config(signature_version=UNSIGNED),
             )
-        if self.creds.session_token:
-            return boto3.client(
-                service_name=service_name,
-                region_name=self.region,
-                aws_session_token=self.creds.session_token,
-            )
-        return boto3.client(
+        return session.client(
             service_name=service_name,
             region_name=self.region,
             aws_access_key_id=self.creds.access_key_id,
             aws_secret_access_key=self.creds.secret_access_key,
+            aws_session_token=self.creds.session_token,
         )
 
+    def _get_boto_client(self, service_name: str):
+        key = (self._creds_key, self.region, self.use_anonymous_creds, service_name)
+        with _cache_lock:
+            client = _clients.get(key)
+            if client is None:
+                client = self._create_boto_client(service_name)
+                _clients[key] = client
+            return client
+
     def sqs_client(self):
         return self._get_boto_client("sqs")
 
@@ -57,22 +121,135 @@ class AWSClients:
         return self._get_boto_client("s3")
 
     def s3_resource(self):
-        if self.use_anonymous_creds:
-            return boto3.resource(
+        # NOTE: Resources are not thread safe so each caller gets their own,
+        # they still share the cached session.
+        with _cache_lock:
+            session = _get_session()
+            if self.use_anonymous_creds:
+                return session.resource(
+                    service_name="s3",
+                    region_name=self.region,
+                    config=Config(signature_version=UNSIGNED),
+                )
+            return session.resource(
                 service_name="s3",
                 region_name=self.region,
-                config=Config(signature_version=UNSIGNED),
+                aws_access_key_id=self.creds.access_key_id,
+                aws_secret_access_key=self.creds.secret_access_key,
+                aws_session_token=self.creds.session_token,
             )
 
-        if self.creds.session_token:
-            return boto3.resource(
-                service_name="s3",
+    def _async_client_key(self, service_name: str, max_pool_connections: int):
+        return (
+            id(asyncio.get_running_loop()),
+            service_name,
+            self.region,
+            self.use_anonymous_creds,
+            self._creds_key,
+            max_pool_connections,
+        )
+
+    def _create_async_client(self, service_name: str, max_pool_connections: int):
+        # NOTE: aiobotocore is only needed by the strategies that use it.
+        from aiobotocore.config import AioConfig
+        from aiobotocore.session import get_session
+
+        if self.use_anonymous_creds:
+            return get_session().create_client(
+                service_name,
                 region_name=self.region,
-                aws_session_token=self.creds.session_token,
+                config=AioConfig(
+                    signature_version=UNSIGNED,
+                    max_pool_connections=max_pool_connections,
+                ),
             )
-        return boto3.resource(
-            service_name="s3",
+        return get_session().create_client(
+            service_name,
             region_name=self.region,
             aws_access_key_id=self.creds.access_key_id,
             aws_secret_access_key=self.creds.secret_access_key,
+            aws_session_token=self.creds.session_token,
+            config=AioConfig(max_pool_connections=max_pool_connections),
         )
+
+    async def async_client(
+        self,
+        service_name: str,
+        max_pool_connections: int = DEFAULT_MAX_POOL_CONNECTIONS,
+    ):
+        """Returns an asyncio client for the service.
+
+        Clients are shared by everything running on the current event loop with
+        the same credentials and region. Each call must be paired with a call
+        to `release_async_client` once the client is no longer needed.
+        """
+        key = self._async_client_key(service_name, max_pool_connections)
+        lock = _async_client_locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            shared = _async_clients.get(key)
+            if shared is None:
+                client_context = self._create_async_client(
+                    service_name, max_pool_connections
+                )
+                shared = _SharedAsyncClient(await client_context.__aenter__(), 0)
+                _async_clients[key] = shared
+            shared.ref_count += 1
+            return shared.client
+
+    async def release_async_client(self, client):
+        """Releases a client, it is closed once it has no more users."""
+        for key, shared in list(_async_clients.items()):
+            if shared.client is not client:
+                continue
+            shared.ref_count -= 1
+            if shared.ref_count <= 0:
+                del _async_clients[key]
+                _async_client_locks.pop(key, None)
+                await client.close()
+            return
+
+    async def async_sqs_client(
+        self, max_pool_connections: int = DEFAULT_MAX_POOL_CONNECTIONS
+    ):
+        return await self.async_client("sqs", max_pool_connections)
+
+    async def async_s3_client(
+        self, max_pool_connections: int = DEFAULT_MAX_POOL_CONNECTIONS
+    ):
+        return await self.async_client("s3", max_pool_connections)
+
+
+class AsyncClientRef:
+    """A strategy's reference to a shared async client.
+
+    The client is acquired on first use (it must be created on the event loop
+    it is used from) and released when the reference is closed.
+    """
+
+    def __init__(
+        self,
+        aws_clients: AWSClients,
+        service_name: str,
+        max_pool_connections: int = DEFAULT_MAX_POOL_CONNECTIONS,
+    ) -> None:
+        self.aws_clients = aws_clients
+        self.service_name = service_name
+        self.max_pool_connections = max_pool_connections
+        self._client = None
+
+    async def get(self):
+        if self._client is None:
+            client = await self.aws_clients.async_client(
+                self.service_name, self.max_pool_connections
+            )
+            if self._client is None:
+                self._client = client
+            else:
+                # Another caller acquired the client while we were waiting.
+                await self.aws_clients.release_async_client(client)
+        return self._client
+
+    async def close(self):
+        if self._client is not None:
+            client, self._client = self._client, None
+            await self.aws_clients.release_async_client(client)
@@ -0,0 +1,54 @@
+import unittest
+from unittest import mock
+
+import pytest
+
+from buildflow.core.credentials.aws_credentials import AWSCredentials
+from buildflow.core.options.credentials_options import CredentialsOptions
+from buildflow.io.utils.clients import aws_clients
+from buildflow.io.utils.clients.aws_clients import AWSClients
+
+
+@pytest.mark.usefixtures("moto_server")
+class AWSClientsTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.creds = AWSCredentials(CredentialsOptions.default())
+
+    def test_credentials_are_verified_once(self):
+        with mock.patch.object(
+            AWSClients, "_verify_credentials", return_value=False
+        ) as verify:
+            AWSClients(self.creds, "us-east-1")
+            AWSClients(self.creds, "us-east-1")
+            self.assertEqual(1, verify.call_count)
+
+            AWSClients(self.creds, "us-west-2")
+            self.assertEqual(2, verify.call_count)
+
+    def test_clients_are_shared(self):
+        sqs_client = AWSClients(self.creds, "us-east-1").sqs_client()
+
+        self.assertIs(sqs_client, AWSClients(self.creds, "us-east-1").sqs_client())
+        self.assertIsNot(sqs_client, AWSClients(self.creds, "us-west-2").sqs_client())
+        self.assertIsNot(sqs_client, AWSClients(self.creds, "us-east-1").s3_client())
+
+    def test_clients_are_keyed_by_credentials(self):
+        other_options = CredentialsOptions.default()
+        other_options.aws_credentials_options.access_key_id = "other"
+        other_options.aws_credentials_options.secret_access_key = "other"
+        other_creds = AWSCredentials(other_options)
+
+        sqs_client = AWSClients(self.creds, "us-east-1").sqs_client()
+
+        self.assertIsNot(sqs_client, AWSClients(other_creds, "us-east-1").sqs_client())
+
+    def test_clear_cache(self):
+        sqs_client = AWSClients(self.creds, "us-east-1").sqs_client()
+
+        aws_clients.clear_cache()
+
+        self.assertIsNot(sqs_client, AWSClients(self.creds, "us-east-1").sqs_client())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,15 +1,29 @@
-from typing import Optional
-
-from google.api_core import client_options
-from google.cloud import bigquery, bigquery_storage_v1, monitoring_v3, pubsub, storage
-from google.cloud.bigquery_storage_v1.services.big_query_write.async_client import (
-    BigQueryWriteAsyncClient,
-)
-from google.pubsub_v1.services.publisher import PublisherAsyncClient
-from google.pubsub_v1.services.subscriber import SubscriberAsyncClient
+import threading
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional, Tuple
 
 from buildflow.core.credentials import GCPCredentials
 
+# NOTE: The google cloud SDKs are slow to import so we only import the SDK for a
+# client when that client is first requested.
+if TYPE_CHECKING:
+    from google.cloud import bigquery, bigquery_storage_v1, storage
+
+# NOTE: Credentials and sync clients are cached for the whole process, keyed by
+# the credentials and quota project, so strategies and dependencies share them
+# instead of each re-resolving credentials and opening new connections. The
+# async clients are not cached since they are bound to the event loop they are
+# first used on.
+_cache_lock = threading.Lock()
+_creds: Dict[Tuple, Any] = {}
+_clients: Dict[Tuple, Any] = {}
+
+
+def clear_cache():
+    """Clears the cached credentials and clients, e.g. after credentials change."""
+    with _cache_lock:
+        _creds.clear()
+        _clients.clear()
+
 
 class GCPClients:
     def __init__(
@@ -18,38 +32,102 @@ class GCPClients:
         credentials: Optional[GCPCredentials] = None,
         quota_project_id: Optional[str] = None,
     ):
-        # TODO: we should probably cache the credentials per quota project id.
-        self.creds = credentials.get_creds(quota_project_id)
+        self._creds_key = (credentials.service_account_info, quota_project_id)
+        with _cache_lock:
+            creds = _creds.get(self._creds_key)
+        if creds is None:
+            creds = credentials.get_creds(quota_project_id)
+            with _cache_lock:
+                creds = _creds.setdefault(self._creds_key, creds)
+        self.creds = creds
+
+    def _get_cached_client(
+        self, client_name: str, project: Optional[str], create: Callable[[], Any]
+    ):
+        key = (self._creds_key, client_name, project)
+        with _cache_lock:
+            client = _clients.get(key)
+            if client is None:
+                client = create()
+                _clients[key] = client
+            return client
+
+    def get_storage_client(self, project: str = None) -> "storage.Client":
+        from google.cloud import storage
+
+        return self._get_cached_client(
+            "storage",
+            project,
+            lambda: storage.Client(credentials=self.creds, project=project),
+        )
 
-    def get_storage_client(self, project: str = None) -> storage.Client:
-        return storage.Client(credentials=self.creds, project=project)
+    def get_bigquery_client(self, project: str = None) -> "bigquery.Client":
+        from google.cloud import bigquery
 
-    def get_bigquery_client(self, project: str = None) -> bigquery.Client:
-        return bigquery.Client(credentials=self.creds, project=project)
+        return self._get_cached_client(
+            "bigquery",
+            project,
+            lambda: bigquery.Client(credentials=self.creds, project=project),
+        )
 
     def get_bigquery_write_async_client(
         self,
         project: str = None,
-    ) -> bigquery_storage_v1.BigQueryWriteClient:
+    ) -> "bigquery_storage_v1.BigQueryWriteClient":
+        from google.api_core import client_options
+        from google.cloud.bigquery_storage_v1.services.big_query_write.async_client import (  # noqa: E501
+            BigQueryWriteAsyncClient,
+        )
+
         return BigQueryWriteAsyncClient(
             credentials=self.creds,
             client_options=client_options.ClientOptions(quota_project_id=project),
         )
 
-    def get_bigquery_storage_client(self) -> bigquery_storage_v1.BigQueryReadClient:
-        return bigquery_storage_v1.BigQueryReadClient(credentials=self.creds)
+    def get_bigquery_storage_client(
+        self,
+    ) -> "bigquery_storage_v1.BigQueryReadClient":
+        from google.cloud import bigquery_storage_v1
+
+        return self._get_cached_client(
+            "bigquery_storage",
+            None,
+            lambda: bigquery_storage_v1.BigQueryReadClient(credentials=self.creds),
+        )
 
     def get_metrics_client(self):
-        return monitoring_v3.MetricServiceClient(credentials=self.creds)
+        from google.cloud import monitoring_v3
+
+        return self._get_cached_client(
+            "metrics",
+            None,
+            lambda: monitoring_v3.MetricServiceClient(credentials=self.creds),
+        )
 
     def get_async_subscriber_client(self):
+        from google.pubsub_v1.services.subscriber import SubscriberAsyncClient
+
         return SubscriberAsyncClient(credentials=self.creds)
 
     def get_async_publisher_client(self):
+        from google.pubsub_v1.services.publisher import PublisherAsyncClient
+
         return PublisherAsyncClient(credentials=self.creds)
 
     def get_publisher_client(self):
-        return pubsub.PublisherClient(credentials=self.creds)
+        from google.cloud import pubsub
+
+        return self._get_cached_client(
+            "publisher",
+            None,
+            lambda: pubsub.PublisherClient(credentials=self.creds),
+        )
 
     def get_subscriber_client(self):
-        return pubsub.SubscriberClient(credentials=self.creds)
+        from google.cloud import pubsub
+
+        return self._get_cached_client(
+            "subscriber",
+            None,
+            lambda: pubsub.SubscriberClient(credentials=self.creds),
+        )
@@ -0,0 +1,48 @@
+import unittest
+from unittest import mock
+
+from buildflow.io.utils.clients import gcp_clients
+from buildflow.io.utils.clients.gcp_clients import GCPClients
+
+
+class GCPClientsTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.creds = mock.MagicMock(service_account_info=None)
+        self.creds.get_creds.side_effect = lambda quota_project_id: mock.MagicMock()
+
+    def test_credentials_are_cached_per_quota_project(self):
+        clients = GCPClients(credentials=self.creds, quota_project_id="project")
+        same_clients = GCPClients(credentials=self.creds, quota_project_id="project")
+        other_clients = GCPClients(credentials=self.creds, quota_project_id="other")
+
+        self.assertIs(clients.creds, same_clients.creds)
+        self.assertIsNot(clients.creds, other_clients.creds)
+        self.assertEqual(2, self.creds.get_creds.call_count)
+
+    @mock.patch("google.cloud.storage.Client")
+    def test_clients_are_shared(self, storage_client_mock: mock.MagicMock):
+        storage_client_mock.side_effect = lambda **kwargs: mock.MagicMock()
+        clients = GCPClients(credentials=self.creds, quota_project_id="project")
+
+        storage_client = clients.get_storage_client("project")
+
+        self.assertIs(
+            storage_client,
+            GCPClients(
+                credentials=self.creds, quota_project_id="project"
+            ).get_storage_client("project"),
+        )
+        self.assertIsNot(storage_client, clients.get_storage_client("other"))
+        self.assertEqual(2, storage_client_mock.call_count)
+
+    def test_clear_cache(self):
+        GCPClients(credentials=self.creds, quota_project_id="project")
+
+        gcp_clients.clear_cache()
+        GCPClients(credentials=self.creds, quota_project_id="project")
+
+        self.assertEqual(2, self.creds.get_creds.call_count)
+
+
+if __name__ == "__main__":
+    unittest.main()
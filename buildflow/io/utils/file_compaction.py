@@ -0,0 +1,195 @@
+"""Compacts small files into larger ones."""
+
+import json
+import logging
+import posixpath
+from typing import IO, Dict, Iterator, List
+
+import fsspec
+import pyarrow as pa
+
+from buildflow.core.utils import stable_hash
+from buildflow.io.utils import file_readers, file_writers
+from buildflow.types.portable import FileFormat
+
+# Formats that are compacted as arrow record batches instead of rows.
+_ARROW_FORMATS = {FileFormat.PARQUET, FileFormat.ARROW}
+
+
+def _read_schema(file_format: FileFormat, file: IO[bytes]) -> pa.Schema:
+    if file_format == FileFormat.PARQUET:
+        import pyarrow.parquet as pq
+
+        return pq.ParquetFile(file).schema_arrow
+    return pa.ipc.open_file(file).schema
+
+
+def _read_tables(file_format: FileFormat, file: IO[bytes]) -> Iterator[pa.Table]:
+    if file_format == FileFormat.PARQUET:
+        import pyarrow.parquet as pq
+
+        for record_batch in pq.ParquetFile(file).iter_batches():
+            yield pa.Table.from_batches([record_batch])
+    else:
+        reader = pa.ipc.open_file(file)
+        for i in range(reader.num_record_batches):
+            yield pa.Table.from_batches([reader.get_batch(i)])
+
+
+def _conform(table: pa.Table, schema: pa.Schema) -> pa.Table:
+    """Casts `table` to `schema`, filling in missing columns with nulls."""
+    columns = []
+    for field in schema:
+        if field.name in table.column_names:
+            columns.append(table.column(field.name).cast(field.type))
+        else:
+            columns.append(pa.nulls(table.num_rows, field.type))
+    return pa.Table.from_arrays(columns, schema=schema)
+
+
+class FileCompactor:
+    """Merges small files into files of about `target_file_bytes`.
+
+    A compaction is swapped in with a journal kept in `work_dir`: the merged
+    file is written to `work_dir`, a manifest of the swap is written, the
+    merged file is moved into place and then the small files are deleted. If
+    we fail part way through `recover` either finishes the swap (if the merged
+    file was moved into place) or undoes it, so rows are never lost or
+    duplicated.
+    """
+
+    def __init__(
+        self,
+        file_system: fsspec.AbstractFileSystem,
+        file_format: FileFormat,
+        target_file_bytes: int,
+        work_dir: str,
+    ):
+        self.file_system = file_system
+        self.file_format = file_format
+        self.target_file_bytes = target_file_bytes
+        self.work_dir = work_dir
+
+    def plan(self, file_sizes: Dict[str, int]) -> List[List[str]]:
+        """Groups the small files in `file_sizes` (path to size) to compact.
+
+        Files are only grouped with files in the same directory, and each group
+        has at least two files.
+        """
+        by_dir: Dict[str, List[str]] = {}
+        for path in sorted(file_sizes):
+            if file_sizes[path] < self.target_file_bytes:
+                by_dir.setdefault(posixpath.dirname(path), []).append(path)
+        groups = []
+        for paths in by_dir.values():
+            group = []
+            group_bytes = 0
+            for path in paths:
+                group.append(path)
+                group_bytes += file_sizes[path]
+                if group_bytes >= self.target_file_bytes:
+                    groups.append(group)
+                    group = []
+                    group_bytes = 0
+            groups.append(group)
+        return [group for group in groups if len(group) > 1]
+
+    def compacted_file_path(self, directory: str, prefix: str, sources: List[str]):
+        """Returns a stable path for the compaction of `sources`.
+
+        A compaction that is retried overwrites its own output.
+        """
+        name = f"{prefix}compacted-{stable_hash(sorted(sources))[:16]}"
+        return posixpath.join(directory, f"{name}.{self.file_format.value}")
+
+    def _job_paths(self, target_path: str):
+        job_id = stable_hash(target_path)[:16]
+        return (
+            posixpath.join(self.work_dir, f"{job_id}.json"),
+            posixpath.join(self.work_dir, f"{job_id}.{self.file_format.value}"),
+        )
+
+    def _merge(self, sources: List[str], output: IO[bytes]):
+        writer = file_writers.file_writer(self.file_format, output)
+        if self.file_format in _ARROW_FORMATS:
+            schemas = []
+            for source in sources:
+                with self.file_system.open(source, "rb") as f:
+                    schemas.append(_read_schema(self.file_format, f))
+            try:
+                schema = pa.unify_schemas(schemas)
+            except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+                raise file_writers.SchemaMismatchError(str(e)) from e
+            for source in sources:
+                with self.file_system.open(source, "rb") as f:
+                    for table in _read_tables(self.file_format, f):
+                        writer.write_table(_conform(table, schema))
+        else:
+            for source in sources:
+                with self.file_system.open(source, "rb") as f:
+                    for rows in file_readers.read_rows(self.file_format, f):
+                        writer.write(rows)
+        writer.close()
+
+    def _rm_if_exists(self, paths: List[str]):
+        existing = [p for p in paths if self.file_system.exists(p)]
+        if existing:
+            self.file_system.rm(existing)
+
+    def compact(self, sources: List[str], target_path: str):
+        """Merges `sources` into `target_path` and deletes them.
+
+        Raises SchemaMismatchError if the sources can't be merged, in which case
+        nothing is changed.
+        """
+        manifest_path, temp_path = self._job_paths(target_path)
+        self.file_system.makedirs(self.work_dir, exist_ok=True)
+        try:
+            with self.file_system.open(temp_path, "wb") as output:
+                self._merge(sources, output)
+        except Exception:
+            self._rm_if_exists([temp_path])
+            raise
+        with self.file_system.open(manifest_path, "w") as f:
+            json.dump({"sources": sources, "target": target_path}, f)
+        self.file_system.mv(temp_path, target_path)
+        self.file_system.rm(sources)
+        self.file_system.rm(manifest_path)
+
+    def recover(self) -> List[str]:
+        """Finishes or undoes any compaction that was interrupted.
+
+        Returns:
+            The paths of the compacted files whose swap was finished.
+        """
+        try:
+            manifests = self.file_system.ls(self.work_dir, detail=False, refresh=True)
+        except FileNotFoundError:
+            return []
+        recovered = []
+        for manifest_path in manifests:
+            if not manifest_path.endswith(".json"):
+                continue
+            with self.file_system.open(manifest_path, "r") as f:
+                manifest = json.load(f)
+            target_path = manifest["target"]
+            _, temp_path = self._job_paths(target_path)
+            if self.file_system.exists(target_path):
+                logging.warning("finishing interrupted compaction of %s", target_path)
+                self._rm_if_exists(manifest["sources"] + [temp_path])
+                recovered.append(target_path)
+            else:
+                logging.warning("undoing interrupted compaction of %s", target_path)
+                self._rm_if_exists([temp_path])
+            self.file_system.rm(manifest_path)
+        # Merged files that never got a manifest.
+        self._rm_if_exists(
+            [
+                path
+                for path in self.file_system.ls(
+                    self.work_dir, detail=False, refresh=True
+                )
+                if not path.endswith(".json")
+            ]
+        )
+        return recovered
@@ -0,0 +1,152 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from fsspec.implementations.local import LocalFileSystem
+
+from buildflow.io.utils.file_compaction import FileCompactor
+from buildflow.io.utils.file_writers import SchemaMismatchError
+from buildflow.types.portable import FileFormat
+
+
+class FileCompactorTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.output_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.output_dir)
+        self.work_dir = os.path.join(self.output_dir, "_work")
+        self.file_system = LocalFileSystem()
+
+    def compactor(self, file_format: FileFormat, target_file_bytes: int = 1000):
+        return FileCompactor(
+            file_system=self.file_system,
+            file_format=file_format,
+            target_file_bytes=target_file_bytes,
+            work_dir=self.work_dir,
+        )
+
+    def path(self, *parts: str) -> str:
+        return os.path.join(self.output_dir, *parts)
+
+    def write_parquet(self, name: str, rows):
+        pq.write_table(pa.Table.from_pylist(rows), self.path(name))
+        return self.path(name)
+
+    def write_ndjson(self, name: str, rows):
+        with open(self.path(name), "w") as f:
+            f.writelines(json.dumps(row) + "\n" for row in rows)
+        return self.path(name)
+
+    def test_plan(self):
+        compactor = self.compactor(FileFormat.PARQUET, target_file_bytes=100)
+
+        groups = compactor.plan(
+            {
+                "a/1": 40,
+                "a/2": 40,
+                "a/3": 40,
+                "a/4": 10,
+                "a/big": 500,
+                "b/1": 10,
+                "c/1": 10,
+                "c/2": 10,
+            }
+        )
+
+        # Files are grouped per directory until they reach the target size,
+        # big files and groups of one are left alone.
+        self.assertEqual(groups, [["a/1", "a/2", "a/3"], ["c/1", "c/2"]])
+
+    def test_compact_parquet(self):
+        compactor = self.compactor(FileFormat.PARQUET)
+        sources = [
+            self.write_parquet("1.parquet", [{"a": 1, "b": None}]),
+            self.write_parquet("2.parquet", [{"a": 2, "b": "two"}]),
+            self.write_parquet("3.parquet", [{"a": 3}]),
+        ]
+        target = compactor.compacted_file_path(self.output_dir, "out-", sources)
+
+        compactor.compact(sources, target)
+
+        self.assertEqual(
+            sorted(os.listdir(self.output_dir)), ["_work", os.path.basename(target)]
+        )
+        self.assertEqual(
+            pq.read_table(target).to_pylist(),
+            [{"a": 1, "b": None}, {"a": 2, "b": "two"}, {"a": 3, "b": None}],
+        )
+
+    def test_compact_ndjson(self):
+        compactor = self.compactor(FileFormat.NDJSON)
+        sources = [
+            self.write_ndjson("1.ndjson", [{"a": 1}]),
+            self.write_ndjson("2.ndjson", [{"a": 2}, {"a": 3}]),
+        ]
+        target = self.path("compacted.ndjson")
+
+        compactor.compact(sources, target)
+
+        with open(target) as f:
+            rows = [json.loads(line) for line in f]
+        self.assertEqual(rows, [{"a": 1}, {"a": 2}, {"a": 3}])
+        self.assertFalse(any(os.path.exists(s) for s in sources))
+
+    def test_compact_schema_mismatch_changes_nothing(self):
+        compactor = self.compactor(FileFormat.PARQUET)
+        sources = [
+            self.write_parquet("1.parquet", [{"a": 1}]),
+            self.write_parquet("2.parquet", [{"a": "one"}]),
+        ]
+
+        with self.assertRaises(SchemaMismatchError):
+            compactor.compact(sources, self.path("compacted.parquet"))
+
+        self.assertEqual(
+            sorted(os.listdir(self.output_dir)), ["1.parquet", "2.parquet", "_work"]
+        )
+        self.assertEqual(os.listdir(self.work_dir), [])
+
+    def test_recover_finishes_moved_compaction(self):
+        compactor = self.compactor(FileFormat.NDJSON)
+        sources = [
+            self.write_ndjson("1.ndjson", [{"a": 1}]),
+            self.write_ndjson("2.ndjson", [{"a": 2}]),
+        ]
+        target = self.path("compacted.ndjson")
+        # Simulate failing after the compacted file was moved into place.
+        compactor.compact(sources, target)
+        self.write_ndjson("1.ndjson", [{"a": 1}])
+        manifest_path, _ = compactor._job_paths(target)
+        with open(manifest_path, "w") as f:
+            json.dump({"sources": sources, "target": target}, f)
+
+        self.assertEqual(compactor.recover(), [target])
+
+        self.assertEqual(
+            sorted(os.listdir(self.output_dir)), ["_work", "compacted.ndjson"]
+        )
+        self.assertEqual(os.listdir(self.work_dir), [])
+
+    def test_recover_undoes_unfinished_compaction(self):
+        compactor = self.compactor(FileFormat.NDJSON)
+        sources = [self.write_ndjson("1.ndjson", [{"a": 1}])]
+        target = self.path("compacted.ndjson")
+        # Simulate failing before the compacted file was moved into place.
+        manifest_path, temp_path = compactor._job_paths(target)
+        os.makedirs(self.work_dir)
+        with open(manifest_path, "w") as f:
+            json.dump({"sources": sources, "target": target}, f)
+        with open(temp_path, "w") as f:
+            f.write("partial")
+
+        self.assertEqual(compactor.recover(), [])
+
+        self.assertEqual(sorted(os.listdir(self.output_dir)), ["1.ndjson", "_work"])
+        self.assertEqual(os.listdir(self.work_dir), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+"""Streaming readers for the files written by `file_writers`."""
+
+import itertools
+import json
+from typing import IO, Any, Callable, Dict, Iterable, Iterator, List
+
+import pyarrow as pa
+import pyarrow.csv as pcsv
+
+from buildflow.types.portable import FileFormat
+
+_DEFAULT_BATCH_SIZE = 10_000
+
+_Rows = Iterator[List[Dict[str, Any]]]
+
+
+def _batched(rows: Iterable[Dict[str, Any]], batch_size: int) -> _Rows:
+    rows = iter(rows)
+    while True:
+        batch = list(itertools.islice(rows, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def _read_parquet(file: IO[bytes], batch_size: int) -> _Rows:
+    # NOTE: pyarrow.parquet is slow to import so we only import it when a
+    # parquet file is read.
+    import pyarrow.parquet as pq
+
+    for record_batch in pq.ParquetFile(file).iter_batches(batch_size=batch_size):
+        yield record_batch.to_pylist()
+
+
+def _read_csv(file: IO[bytes], batch_size: int) -> _Rows:
+    for record_batch in pcsv.open_csv(file):
+        yield from _batched(record_batch.to_pylist(), batch_size)
+
+
+def _read_json(file: IO[bytes], batch_size: int) -> _Rows:
+    # NOTE: A JSON array can't be streamed, use NDJSON for large files.
+    yield from _batched(json.load(file), batch_size)
+
+
+def _read_ndjson(file: IO[bytes], batch_size: int) -> _Rows:
+    yield from _batched((json.loads(line) for line in file if line.strip()), batch_size)
+
+
+def _read_arrow(file: IO[bytes], batch_size: int) -> _Rows:
+    # NOTE: If `file` is a `pyarrow.memory_map` the batches are read without
+    # copying them.
+    reader = pa.ipc.open_file(file)
+    for i in range(reader.num_record_batches):
+        yield from _batched(reader.get_batch(i).to_pylist(), batch_size)
+
+
+def _read_avro(file: IO[bytes], batch_size: int) -> _Rows:
+    # NOTE: fastavro is only imported if an avro file is actually read.
+    import fastavro
+
+    yield from _batched(fastavro.reader(file), batch_size)
+
+
+_READERS: Dict[FileFormat, Callable[[IO[bytes], int], _Rows]] = {
+    FileFormat.PARQUET: _read_parquet,
+    FileFormat.CSV: _read_csv,
+    FileFormat.JSON: _read_json,
+    FileFormat.NDJSON: _read_ndjson,
+    FileFormat.ARROW: _read_arrow,
+    FileFormat.AVRO: _read_avro,
+}
+
+
+def read_rows(
+    file_format: FileFormat, file: IO[bytes], batch_size: int = _DEFAULT_BATCH_SIZE
+) -> _Rows:
+    """Reads the rows in `file` in batches of at most `batch_size` rows.
+
+    Args:
+        file_format: The format of the file.
+        file: A binary file object opened for reading.
+        batch_size: The max number of rows in each batch.
+
+    Returns:
+        An iterator over batches of rows, each row is a dict.
+    """
+    if file_format not in _READERS:
+        raise ValueError(f"Unknown file format: {file_format}")
+    return _READERS[file_format](file, batch_size)
@@ -0,0 +1,49 @@
+import io
+import os
+import tempfile
+import unittest
+
+import pyarrow as pa
+
+from buildflow.io.utils import file_readers, file_writers
+from buildflow.types.portable import FileFormat
+
+_ROWS = [{"a": i, "b": f"row-{i}"} for i in range(5)]
+
+
+class FileReadersTest(unittest.TestCase):
+    def write(self, file_format: FileFormat) -> io.BytesIO:
+        f = io.BytesIO()
+        writer = file_writers.file_writer(file_format, f)
+        writer.write(_ROWS[:3])
+        writer.write(_ROWS[3:])
+        writer.close()
+        f.seek(0)
+        return f
+
+    def test_round_trip(self):
+        for file_format in FileFormat:
+            with self.subTest(file_format=file_format):
+                batches = list(
+                    file_readers.read_rows(
+                        file_format, self.write(file_format), batch_size=2
+                    )
+                )
+
+                self.assertTrue(all(len(batch) <= 2 for batch in batches))
+                self.assertEqual([row for b in batches for row in b], _ROWS)
+
+    def test_arrow_memory_map(self):
+        with tempfile.TemporaryDirectory() as output_dir:
+            path = os.path.join(output_dir, "output.arrow")
+            with open(path, "wb") as f:
+                f.write(self.write(FileFormat.ARROW).getvalue())
+
+            with pa.memory_map(path) as source:
+                batches = list(file_readers.read_rows(FileFormat.ARROW, source))
+
+        self.assertEqual(batches, [_ROWS[:3], _ROWS[3:]])
+
+
+if __name__ == "__main__":
+    unittest.main()
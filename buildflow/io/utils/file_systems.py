@@ -2,8 +2,6 @@ import json
 from typing import Union
 
 import fsspec
-import gcsfs
-import s3fs
 from fsspec.implementations.local import LocalFileSystem
 
 from buildflow.core.credentials.aws_credentials import AWSCredentials
@@ -12,14 +10,19 @@ from buildflow.core.credentials.gcp_credentials import GCPCredentials
 
 
 def get_file_system(
-    credentials: Union[AWSCredentials, GCPCredentials]
+    credentials: Union[AWSCredentials, GCPCredentials],
 ) -> fsspec.AbstractFileSystem:
+    # NOTE: gcsfs and s3fs are slow to import so we only import the one we need.
     if isinstance(credentials, AWSCredentials):
+        import s3fs
+
         return s3fs.S3FileSystem(
             key=credentials.access_key_id,
             secret=credentials.secret_access_key,
         )
     elif isinstance(credentials, GCPCredentials):
+        import gcsfs
+
         if credentials.service_account_info is not None:
             token = json.dumps(credentials.service_account_info)
         else:
@@ -0,0 +1,223 @@
+"""Streaming writers that append batches of rows to an open file."""
+
+import json
+from typing import IO, Any, Dict, Iterable, List, Optional
+
+import pyarrow as pa
+import pyarrow.csv as pcsv
+
+from buildflow.io.utils.schemas import avro_schemas
+from buildflow.types.portable import FileFormat
+
+
+class SchemaMismatchError(ValueError):
+    """Raised when rows don't match the schema of the file being written."""
+
+
+def _check_fields(rows: List[Dict[str, Any]], field_names: Iterable[str]):
+    """Raises if a row has a field the file's schema doesn't.
+
+    Writers would otherwise drop the field, so the rows go to a new file.
+    """
+    field_names = set(field_names)
+    for row in rows:
+        unknown_fields = row.keys() - field_names
+        if unknown_fields:
+            raise SchemaMismatchError(
+                f"fields: {sorted(unknown_fields)} are not in the file's schema"
+            )
+
+
+def _infer_table(rows: List[Dict[str, Any]]) -> pa.Table:
+    """Converts rows to a table with the fields of all rows.
+
+    `pa.Table.from_pylist` only uses the fields of the first row.
+    """
+    field_names = {}
+    for row in rows:
+        field_names.update(dict.fromkeys(row))
+    return pa.table({name: [row.get(name) for row in rows] for name in field_names})
+
+
+class FileWriter:
+    """Writes batches of rows to an open file.
+
+    The file is only complete once `close` is called, the writer does not close
+    the underlying file.
+    """
+
+    def __init__(self, file: IO[bytes]):
+        self.file = file
+        self.num_rows = 0
+
+    @property
+    def num_bytes(self) -> int:
+        return self.file.tell()
+
+    def write(self, rows: List[Dict[str, Any]]):
+        if not rows:
+            return
+        self._write(rows)
+        self.num_rows += len(rows)
+
+    def write_table(self, table: pa.Table):
+        """Writes an arrow table.
+
+        Formats built on arrow write the table without converting it to rows.
+        """
+        self.write(table.to_pylist())
+
+    def _write(self, rows: List[Dict[str, Any]]):
+        raise NotImplementedError("_write not implemented")
+
+    def close(self):
+        pass
+
+
+class _ArrowFileWriter(FileWriter):
+    """Writer for formats with a fixed schema, inferred from the first batch."""
+
+    def __init__(self, file: IO[bytes]):
+        super().__init__(file)
+        self.schema: Optional[pa.Schema] = None
+        self.writer = None
+
+    def _to_table(self, rows: List[Dict[str, Any]]) -> pa.Table:
+        if self.schema is None:
+            return _infer_table(rows)
+        # NOTE: from_pylist drops keys that aren't in the schema.
+        _check_fields(rows, self.schema.names)
+        try:
+            return pa.Table.from_pylist(rows, schema=self.schema)
+        except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+            raise SchemaMismatchError(str(e)) from e
+
+    def _open_writer(self, schema: pa.Schema):
+        raise NotImplementedError("_open_writer not implemented")
+
+    def _write(self, rows: List[Dict[str, Any]]):
+        self._write_table(self._to_table(rows))
+
+    def _write_table(self, table: pa.Table):
+        if self.writer is None:
+            self.schema = table.schema
+            self.writer = self._open_writer(self.schema)
+        self.writer.write_table(table)
+
+    def write_table(self, table: pa.Table):
+        if table.num_rows == 0:
+            return
+        if self.schema is not None and not table.schema.equals(self.schema):
+            raise SchemaMismatchError(
+                f"table schema: {table.schema} does not match: {self.schema}"
+            )
+        self._write_table(table)
+        self.num_rows += table.num_rows
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+class ParquetFileWriter(_ArrowFileWriter):
+    """Writes each batch as a new row group."""
+
+    def _open_writer(self, schema: pa.Schema):
+        # NOTE: pyarrow.parquet is slow to import so we only import it when a
+        # parquet file is written.
+        import pyarrow.parquet as pq
+
+        return pq.ParquetWriter(self.file, schema)
+
+
+class CSVFileWriter(_ArrowFileWriter):
+    """Writes the header once and then appends each batch."""
+
+    def _open_writer(self, schema: pa.Schema):
+        return pcsv.CSVWriter(self.file, schema)
+
+
+class ArrowFileWriter(_ArrowFileWriter):
+    """Writes the Arrow IPC file format (i.e. Feather V2), a batch per write.
+
+    The files can be memory-mapped by readers without copying.
+    """
+
+    def _open_writer(self, schema: pa.Schema):
+        return pa.ipc.new_file(self.file, schema)
+
+
+class AvroFileWriter(FileWriter):
+    """Writes each batch as an Avro block.
+
+    The schema is inferred from the first batch.
+    """
+
+    def __init__(self, file: IO[bytes]):
+        super().__init__(file)
+        self.schema = None
+        self.writer = None
+
+    def _write(self, rows: List[Dict[str, Any]]):
+        # NOTE: fastavro is only imported if an avro file is actually written.
+        import fastavro
+        from fastavro.validation import ValidationError, validate_many
+        from fastavro.write import Writer
+
+        if self.writer is None:
+            self.schema = fastavro.parse_schema(
+                avro_schemas.arrow_to_avro_schema(_infer_table(rows).schema)
+            )
+            self.writer = Writer(self.file, self.schema)
+        # NOTE: We validate the whole batch before writing any of it, so a bad
+        # row never leaves part of the batch in the file. Fields that aren't in
+        # the schema would be dropped by the writer.
+        _check_fields(rows, (field["name"] for field in self.schema["fields"]))
+        try:
+            validate_many(rows, self.schema, raise_errors=True)
+        except ValidationError as e:
+            raise SchemaMismatchError(str(e)) from e
+        for row in rows:
+            self.writer.write(row)
+        self.writer.flush()
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.flush()
+
+
+class JSONFileWriter(FileWriter):
+    """Writes a single JSON array, which is closed by `close`."""
+
+    def _write(self, rows: List[Dict[str, Any]]):
+        separator = "[" if self.num_rows == 0 else ", "
+        self.file.write(
+            (separator + ", ".join(json.dumps(row) for row in rows)).encode()
+        )
+
+    def close(self):
+        self.file.write(b"[]" if self.num_rows == 0 else b"]")
+
+
+class NDJSONFileWriter(FileWriter):
+    """Writes one JSON object per line."""
+
+    def _write(self, rows: List[Dict[str, Any]]):
+        self.file.write("".join(json.dumps(row) + "\n" for row in rows).encode())
+
+
+_WRITERS = {
+    FileFormat.PARQUET: ParquetFileWriter,
+    FileFormat.CSV: CSVFileWriter,
+    FileFormat.JSON: JSONFileWriter,
+    FileFormat.NDJSON: NDJSONFileWriter,
+    FileFormat.ARROW: ArrowFileWriter,
+    FileFormat.AVRO: AvroFileWriter,
+}
+
+
+def file_writer(file_format: FileFormat, file: IO[bytes]) -> FileWriter:
+    """Returns a writer for `file_format` that writes to `file`."""
+    if file_format not in _WRITERS:
+        raise ValueError(f"Unknown file format: {file_format}")
+    return _WRITERS[file_format](file)
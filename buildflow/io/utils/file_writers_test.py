@@ -0,0 +1,111 @@
+import io
+import json
+import unittest
+
+import fastavro
+import pyarrow as pa
+import pyarrow.csv as pcsv
+import pyarrow.parquet as pq
+
+from buildflow.io.utils import file_writers
+from buildflow.types.portable import FileFormat
+
+
+class FileWritersTest(unittest.TestCase):
+    def write(self, file_format: FileFormat, *batches) -> bytes:
+        f = io.BytesIO()
+        writer = file_writers.file_writer(file_format, f)
+        for batch in batches:
+            writer.write(batch)
+        writer.close()
+        self.assertEqual(writer.num_rows, sum(len(b) for b in batches))
+        return f.getvalue()
+
+    def test_parquet_row_group_per_batch(self):
+        data = self.write(FileFormat.PARQUET, [{"a": 1}, {"a": 2}], [{"a": 3}])
+
+        parquet_file = pq.ParquetFile(pa.BufferReader(data))
+        self.assertEqual(parquet_file.num_row_groups, 2)
+        self.assertEqual(
+            parquet_file.read().to_pylist(), [{"a": 1}, {"a": 2}, {"a": 3}]
+        )
+
+    def test_csv_writes_header_once(self):
+        data = self.write(FileFormat.CSV, [{"a": 1}], [{"a": 2}])
+
+        table = pcsv.read_csv(pa.BufferReader(data))
+        self.assertEqual(table.to_pylist(), [{"a": 1}, {"a": 2}])
+
+    def test_json_array(self):
+        data = self.write(FileFormat.JSON, [{"a": 1}], [{"a": 2}, {"a": 3}])
+
+        self.assertEqual(json.loads(data), [{"a": 1}, {"a": 2}, {"a": 3}])
+
+    def test_json_empty(self):
+        self.assertEqual(json.loads(self.write(FileFormat.JSON)), [])
+
+    def test_ndjson(self):
+        data = self.write(FileFormat.NDJSON, [{"a": 1}], [{"a": 2}])
+
+        self.assertEqual(
+            [json.loads(line) for line in data.splitlines()], [{"a": 1}, {"a": 2}]
+        )
+
+    def test_arrow_batch_per_write(self):
+        data = self.write(FileFormat.ARROW, [{"a": 1}], [{"a": 2}])
+
+        reader = pa.ipc.open_file(pa.BufferReader(data))
+        self.assertEqual(reader.num_record_batches, 2)
+        self.assertEqual(reader.read_all().to_pylist(), [{"a": 1}, {"a": 2}])
+
+    def test_avro(self):
+        data = self.write(
+            FileFormat.AVRO,
+            [{"a": 1, "b": {"c": ["x"]}}],
+            [{"a": None, "b": {"c": []}}],
+        )
+
+        self.assertEqual(
+            list(fastavro.reader(io.BytesIO(data))),
+            [{"a": 1, "b": {"c": ["x"]}}, {"a": None, "b": {"c": []}}],
+        )
+
+    def test_avro_schema_mismatch_writes_nothing(self):
+        f = io.BytesIO()
+        writer = file_writers.file_writer(FileFormat.AVRO, f)
+        writer.write([{"a": 1}])
+        size = writer.num_bytes
+
+        with self.assertRaises(file_writers.SchemaMismatchError):
+            writer.write([{"a": 2}, {"a": "not an int"}])
+        self.assertEqual(writer.num_bytes, size)
+
+    def test_schema_mismatch(self):
+        writer = file_writers.file_writer(FileFormat.PARQUET, io.BytesIO())
+        writer.write([{"a": 1}])
+
+        with self.assertRaises(file_writers.SchemaMismatchError):
+            writer.write([{"a": "not an int"}])
+
+    def test_new_field_is_a_schema_mismatch(self):
+        for file_format in (FileFormat.PARQUET, FileFormat.CSV, FileFormat.AVRO):
+            with self.subTest(file_format=file_format):
+                writer = file_writers.file_writer(file_format, io.BytesIO())
+                writer.write([{"a": 1}])
+
+                # The writer would otherwise drop "b".
+                with self.assertRaises(file_writers.SchemaMismatchError):
+                    writer.write([{"a": 2}, {"a": 3, "b": 4}])
+                self.assertEqual(writer.num_rows, 1)
+
+    def test_schema_has_fields_of_all_rows(self):
+        data = self.write(FileFormat.PARQUET, [{"a": 1}, {"a": 2, "b": "x"}])
+
+        self.assertEqual(
+            pq.read_table(pa.BufferReader(data)).to_pylist(),
+            [{"a": 1, "b": None}, {"a": 2, "b": "x"}],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,140 @@
+import asyncio
+import collections
+import dataclasses
+import logging
+import math
+import time
+from typing import Awaitable, Callable, Dict, Hashable, Iterable, List, Optional
+
+# The number of processing times we keep to compute the lease deadline from.
+_MAX_PROCESSING_TIME_SAMPLES = 1000
+
+
+@dataclasses.dataclass
+class _Lease:
+    start_time: float
+    next_extension_time: float
+
+
+def _extension_margin_seconds(deadline_seconds: float) -> float:
+    # Leases are extended a little before they expire to account for the time
+    # it takes for the extension to reach the service.
+    return max(2, deadline_seconds * 0.2)
+
+
+class LeaseManager:
+    """Extends the leases (i.e. ack deadlines) of messages that are in flight.
+
+    Leases are added when messages are pulled and removed when they are acked.
+    A background task extends any lease that is about to expire by the
+    `percentile` of the observed processing times (clamped between the min and
+    max deadline), until the lease has been held for
+    `max_lease_duration_seconds`.
+
+    The background task is started when the first lease is added, so this must
+    be used from within a running event loop.
+    """
+
+    def __init__(
+        self,
+        extend_leases: Callable[[List[Hashable], int], Awaitable[None]],
+        *,
+        initial_deadline_seconds: float,
+        min_deadline_seconds: int,
+        max_deadline_seconds: int,
+        max_lease_duration_seconds: int = 60 * 60,
+        percentile: float = 99,
+        check_frequency_secs: float = 1,
+    ) -> None:
+        if min_deadline_seconds > max_deadline_seconds:
+            raise ValueError(
+                "min_deadline_seconds must be less than or equal to "
+                "max_deadline_seconds"
+            )
+        # configuration
+        self.extend_leases = extend_leases
+        self.initial_deadline_seconds = initial_deadline_seconds
+        self.min_deadline_seconds = min_deadline_seconds
+        self.max_deadline_seconds = max_deadline_seconds
+        self.max_lease_duration_seconds = max_lease_duration_seconds
+        self.percentile = percentile
+        self.check_frequency_secs = check_frequency_secs
+        # initial state
+        self._leases: Dict[Hashable, _Lease] = {}
+        self._processing_times = collections.deque(maxlen=_MAX_PROCESSING_TIME_SAMPLES)
+        self._lease_task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._leases)
+
+    def deadline_seconds(self) -> int:
+        """Returns the deadline to extend leases by."""
+        if not self._processing_times:
+            return self.min_deadline_seconds
+        processing_times = sorted(self._processing_times)
+        index = math.ceil(len(processing_times) * self.percentile / 100) - 1
+        deadline = math.ceil(processing_times[max(index, 0)])
+        return min(max(deadline, self.min_deadline_seconds), self.max_deadline_seconds)
+
+    def add(self, leases: Iterable[Hashable]):
+        now = time.monotonic()
+        first_extension_time = (
+            now
+            + self.initial_deadline_seconds
+            - _extension_margin_seconds(self.initial_deadline_seconds)
+        )
+        for lease in leases:
+            self._leases[lease] = _Lease(now, first_extension_time)
+        if self._lease_task is None or self._lease_task.done():
+            self._lease_task = asyncio.create_task(self._lease_loop())
+
+    def remove(self, leases: Iterable[Hashable]):
+        now = time.monotonic()
+        for lease in leases:
+            lease_info = self._leases.pop(lease, None)
+            if lease_info is not None:
+                self._processing_times.append(now - lease_info.start_time)
+
+    async def extend_due_leases(self):
+        now = time.monotonic()
+        due = []
+        for lease, lease_info in list(self._leases.items()):
+            if now - lease_info.start_time >= self.max_lease_duration_seconds:
+                logging.warning(
+                    "lease has been held for more than %s seconds, it will no "
+                    "longer be extended.",
+                    self.max_lease_duration_seconds,
+                )
+                del self._leases[lease]
+            elif lease_info.next_extension_time <= now:
+                due.append(lease)
+        if not due:
+            return
+        deadline_seconds = self.deadline_seconds()
+        try:
+            await self.extend_leases(due, deadline_seconds)
+        except Exception:
+            logging.exception("failed to extend leases, will retry.")
+            return
+        next_extension_time = (
+            now + deadline_seconds - _extension_margin_seconds(deadline_seconds)
+        )
+        for lease in due:
+            # The lease may have been removed while we were extending it.
+            if lease in self._leases:
+                self._leases[lease].next_extension_time = next_extension_time
+
+    async def _lease_loop(self):
+        while self._leases:
+            await asyncio.sleep(self.check_frequency_secs)
+            await self.extend_due_leases()
+
+    async def stop(self):
+        self._leases = {}
+        if self._lease_task is not None:
+            self._lease_task.cancel()
+            try:
+                await self._lease_task
+            except asyncio.CancelledError:
+                pass
+            self._lease_task = None
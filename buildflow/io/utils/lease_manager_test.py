@@ -0,0 +1,125 @@
+import asyncio
+import unittest
+from unittest import mock
+
+from buildflow.io.utils.lease_manager import LeaseManager
+
+
+class LeaseManagerTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.extended = []
+        self.time = 100.0
+        # NOTE: We only patch the time module seen by the lease manager, the
+        # event loop uses time.monotonic as well.
+        fake_time = mock.MagicMock()
+        fake_time.monotonic.side_effect = lambda: self.time
+        patcher = mock.patch("buildflow.io.utils.lease_manager.time", fake_time)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def extend_leases(self, leases, deadline_seconds):
+        self.extended.append((sorted(leases), deadline_seconds))
+
+    def lease_manager(self, **kwargs) -> LeaseManager:
+        options = dict(
+            initial_deadline_seconds=10,
+            min_deadline_seconds=10,
+            max_deadline_seconds=600,
+            max_lease_duration_seconds=3600,
+            # Tests drive the extensions directly.
+            check_frequency_secs=3600,
+        )
+        options.update(kwargs)
+        return LeaseManager(self.extend_leases, **options)
+
+    async def asyncTearDown(self) -> None:
+        # Let any cancelled lease loops finish.
+        await asyncio.sleep(0)
+
+    async def test_extends_leases_before_they_expire(self):
+        manager = self.lease_manager()
+        manager.add(["a", "b"])
+
+        self.time += 5
+        await manager.extend_due_leases()
+        self.assertEqual([], self.extended)
+
+        # Leases are extended 2 seconds before they expire.
+        self.time += 3
+        await manager.extend_due_leases()
+        self.assertEqual([(["a", "b"], 10)], self.extended)
+
+        # The next extension is based on the extended deadline.
+        self.time += 5
+        await manager.extend_due_leases()
+        self.assertEqual(1, len(self.extended))
+        await manager.stop()
+
+    async def test_removed_leases_are_not_extended(self):
+        manager = self.lease_manager()
+        manager.add(["a", "b"])
+        manager.remove(["a"])
+
+        self.time += 8
+        await manager.extend_due_leases()
+
+        self.assertEqual([(["b"], 10)], self.extended)
+        self.assertEqual(1, len(manager))
+        await manager.stop()
+
+    async def test_deadline_from_processing_times(self):
+        manager = self.lease_manager(percentile=50)
+        self.assertEqual(10, manager.deadline_seconds())
+        for processing_time in [20, 30, 40, 2000]:
+            manager.add([processing_time])
+            self.time += processing_time
+            manager.remove([processing_time])
+
+        self.assertEqual(30, manager.deadline_seconds())
+        manager.percentile = 99
+        # Clamped to the max deadline.
+        self.assertEqual(600, manager.deadline_seconds())
+        await manager.stop()
+
+    async def test_stops_extending_after_max_lease_duration(self):
+        manager = self.lease_manager(max_lease_duration_seconds=30)
+        manager.add(["a"])
+
+        self.time += 30
+        with self.assertLogs(level="WARNING"):
+            await manager.extend_due_leases()
+
+        self.assertEqual([], self.extended)
+        self.assertEqual(0, len(manager))
+        await manager.stop()
+
+    async def test_failed_extension_is_retried(self):
+        manager = self.lease_manager()
+        manager.add(["a"])
+        failing = mock.AsyncMock(side_effect=RuntimeError("extend failed"))
+        manager.extend_leases = failing
+
+        self.time += 8
+        with self.assertLogs(level="ERROR"):
+            await manager.extend_due_leases()
+        manager.extend_leases = self.extend_leases
+        await manager.extend_due_leases()
+
+        failing.assert_awaited_once()
+        self.assertEqual([(["a"], 10)], self.extended)
+        await manager.stop()
+
+    async def test_background_loop_extends_leases(self):
+        manager = self.lease_manager(check_frequency_secs=0.01)
+        manager.add(["a"])
+        self.time += 8
+
+        await asyncio.sleep(0.05)
+
+        self.assertEqual([(["a"], 10)], self.extended)
+        await manager.stop()
+        self.assertIsNone(manager._lease_task)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,181 @@
+"""Utilities for working with Arrow schemas."""
+
+import dataclasses
+import datetime
+from typing import Any, Iterable, List, Optional, Type
+
+import pyarrow as pa
+
+# TODO: there are some other types that aren't as common:
+#   decimals, intervals, maps
+_PY_TYPE_TO_ARROW_TYPE = {
+    int: pa.int64(),
+    str: pa.string(),
+    float: pa.float64(),
+    datetime.datetime: pa.timestamp("us", tz="UTC"),
+    bytes: pa.binary(),
+    bool: pa.bool_(),
+    datetime.date: pa.date32(),
+    datetime.time: pa.time64("us"),
+}
+
+
+def _dataclass_fields(type_: Type):
+    # NOTE: We read the fields directly instead of using dataclasses.fields
+    # since that doesn't work for dataclasses that have been pickled. See
+    # bigquery_schemas._dataclass_fields.
+    fields = getattr(type_, dataclasses._FIELDS)
+    return [
+        f for f in fields.values() if f._field_type.__class__.__name__ == "_FIELD_BASE"
+    ]
+
+
+def _is_optional(field_type) -> bool:
+    return (
+        hasattr(field_type, "__args__")
+        and len(field_type.__args__) == 2
+        and field_type.__args__[-1] is type(None)
+    )
+
+
+def _to_arrow_field(name: str, field_type: Any) -> pa.Field:
+    nullable = False
+    if _is_optional(field_type):
+        nullable = True
+        field_type = field_type.__args__[0]
+    if getattr(field_type, "__origin__", None) is list:
+        value_field = _to_arrow_field("item", field_type.__args__[0])
+        return pa.field(name, pa.list_(value_field), nullable=nullable)
+    if dataclasses.is_dataclass(field_type):
+        return pa.field(
+            name, pa.struct(list(dataclass_to_arrow_schema(field_type))), nullable
+        )
+    if field_type in _PY_TYPE_TO_ARROW_TYPE:
+        return pa.field(name, _PY_TYPE_TO_ARROW_TYPE[field_type], nullable=nullable)
+    raise ValueError(f"Can't convert type: {field_type} to an arrow schema")
+
+
+def dataclass_to_arrow_schema(type_: Type) -> pa.Schema:
+    """Convert a dataclass to an arrow schema.
+
+    Args:
+        type_: The dataclass type to convert.
+
+    Returns:
+        The arrow schema, fields are only nullable if they are Optional.
+    """
+    return pa.schema(
+        [_to_arrow_field(field.name, field.type) for field in _dataclass_fields(type_)]
+    )
+
+
+def _has_struct(arrow_type: pa.DataType) -> bool:
+    if pa.types.is_struct(arrow_type):
+        return True
+    if pa.types.is_list(arrow_type):
+        return _has_struct(arrow_type.value_type)
+    return False
+
+
+def _to_arrow_value(value: Any) -> Any:
+    if dataclasses.is_dataclass(value):
+        return {
+            k: _to_arrow_value(getattr(value, k)) for k in value.__dataclass_fields__
+        }
+    if isinstance(value, list):
+        return [_to_arrow_value(v) for v in value]
+    return value
+
+
+def _column(rows: List[Any], name: str) -> List[Any]:
+    if rows and isinstance(rows[0], dict):
+        return [row.get(name) for row in rows]
+    return [getattr(row, name) for row in rows]
+
+
+def to_record_batch(rows: Iterable[Any], schema: pa.Schema) -> pa.RecordBatch:
+    """Builds a record batch from dataclass instances or dicts.
+
+    The rows are converted column by column, with native python values (e.g.
+    datetimes, not their ISO strings).
+    """
+    rows = list(rows)
+    arrays = []
+    for field in schema:
+        values = _column(rows, field.name)
+        if _has_struct(field.type):
+            values = [_to_arrow_value(v) for v in values]
+        arrays.append(pa.array(values, type=field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def to_table(rows: Iterable[Any], schema: Optional[pa.Schema] = None) -> pa.Table:
+    """Builds a table from dataclass instances or dicts.
+
+    If `schema` is None the schema is inferred from the rows.
+    """
+    if schema is None:
+        rows = [_to_arrow_value(row) for row in rows]
+        # NOTE: pa.Table.from_pylist only uses the keys of the first row.
+        names = {}
+        for row in rows:
+            names.update(dict.fromkeys(row))
+        return pa.table({name: [row.get(name) for row in rows] for name in names})
+    return pa.Table.from_batches([to_record_batch(rows, schema)])
+
+
+class ArrowTableBuilder:
+    """Builds tables from batches of rows with a schema that is reused.
+
+    The schema is the one of the rows' dataclass if it is known, otherwise it is
+    inferred from the first batch (that has a value for every column) and used
+    for the batches that follow until a batch doesn't match it.
+    """
+
+    def __init__(self, schema: Optional[pa.Schema] = None):
+        self.schema = schema
+        self._inferred = False
+
+    def set_dataclass(self, type_: Type):
+        self.schema = dataclass_to_arrow_schema(type_)
+        self._inferred = False
+
+    def _infer(self, rows: List[Any]) -> pa.Table:
+        table = to_table(rows)
+        if any(pa.types.is_null(field.type) for field in table.schema):
+            # We can't tell the type of a column that only had nulls.
+            self.schema = None
+        else:
+            self.schema = table.schema
+            self._inferred = True
+        return table
+
+    def build(self, rows: Iterable[Any]) -> pa.Table:
+        rows = list(rows)
+        if self.schema is None:
+            return self._infer(rows)
+        if not self._inferred:
+            return to_table(rows, self.schema)
+        # NOTE: Converting with the schema drops keys that aren't in it, so
+        # every row has to have the schema's keys.
+        names = set(self.schema.names)
+        if any(isinstance(row, dict) and row.keys() != names for row in rows):
+            return self._infer(rows)
+        try:
+            return to_table(rows, self.schema)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            return self._infer(rows)
+
+
+def split_record_batch(
+    record_batch: pa.RecordBatch, max_bytes: int
+) -> List[pa.RecordBatch]:
+    """Splits a record batch into slices of roughly at most `max_bytes`."""
+    if record_batch.num_rows == 0:
+        return []
+    num_slices = -(-record_batch.nbytes // max_bytes)
+    rows_per_slice = max(1, -(-record_batch.num_rows // num_slices))
+    return [
+        record_batch.slice(offset, rows_per_slice)
+        for offset in range(0, record_batch.num_rows, rows_per_slice)
+    ]
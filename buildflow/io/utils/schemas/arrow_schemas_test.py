@@ -0,0 +1,191 @@
+import unittest
+from dataclasses import dataclass
+from datetime import date, datetime, time, timezone
+from typing import List, Optional
+
+import pyarrow as pa
+
+from buildflow.io.utils.schemas import arrow_schemas
+
+
+@dataclass
+class Nested:
+    a: int
+    b: Optional[str]
+
+
+@dataclass
+class Row:
+    int_field: int
+    optional_field: Optional[float]
+    list_field: List[str]
+    nested_field: Nested
+    nested_list_field: List[Nested]
+    timestamp: datetime
+
+
+class ArrowSchemasTest(unittest.TestCase):
+    def test_primitive_types(self):
+        @dataclass
+        class Schema:
+            int_field: int
+            str_field: str
+            float_field: float
+            timestamp: datetime
+            bytes_field: bytes
+            bool_field: bool
+            date_field: date
+            time_field: time
+
+        schema = arrow_schemas.dataclass_to_arrow_schema(Schema)
+
+        self.assertEqual(
+            pa.schema(
+                [
+                    pa.field("int_field", pa.int64(), nullable=False),
+                    pa.field("str_field", pa.string(), nullable=False),
+                    pa.field("float_field", pa.float64(), nullable=False),
+                    pa.field("timestamp", pa.timestamp("us", tz="UTC"), nullable=False),
+                    pa.field("bytes_field", pa.binary(), nullable=False),
+                    pa.field("bool_field", pa.bool_(), nullable=False),
+                    pa.field("date_field", pa.date32(), nullable=False),
+                    pa.field("time_field", pa.time64("us"), nullable=False),
+                ]
+            ),
+            schema,
+        )
+
+    def test_nested_types(self):
+        schema = arrow_schemas.dataclass_to_arrow_schema(Row)
+
+        nested = pa.struct(
+            [
+                pa.field("a", pa.int64(), nullable=False),
+                pa.field("b", pa.string(), nullable=True),
+            ]
+        )
+        self.assertTrue(schema.field("optional_field").nullable)
+        self.assertEqual(
+            pa.list_(pa.field("item", pa.string(), nullable=False)),
+            schema.field("list_field").type,
+        )
+        self.assertEqual(nested, schema.field("nested_field").type)
+        self.assertEqual(
+            pa.list_(pa.field("item", nested, nullable=False)),
+            schema.field("nested_list_field").type,
+        )
+
+    def test_unsupported_type(self):
+        @dataclass
+        class Schema:
+            field: dict
+
+        with self.assertRaises(ValueError):
+            arrow_schemas.dataclass_to_arrow_schema(Schema)
+
+    def test_to_record_batch(self):
+        schema = arrow_schemas.dataclass_to_arrow_schema(Row)
+        timestamp = datetime(2023, 1, 1, tzinfo=timezone.utc)
+        rows = [
+            Row(1, None, ["a"], Nested(1, "b"), [Nested(2, None)], timestamp),
+            Row(2, 1.5, [], Nested(3, None), [], timestamp),
+        ]
+
+        record_batch = arrow_schemas.to_record_batch(rows, schema)
+
+        self.assertEqual(
+            [
+                {
+                    "int_field": 1,
+                    "optional_field": None,
+                    "list_field": ["a"],
+                    "nested_field": {"a": 1, "b": "b"},
+                    "nested_list_field": [{"a": 2, "b": None}],
+                    "timestamp": timestamp,
+                },
+                {
+                    "int_field": 2,
+                    "optional_field": 1.5,
+                    "list_field": [],
+                    "nested_field": {"a": 3, "b": None},
+                    "nested_list_field": [],
+                    "timestamp": timestamp,
+                },
+            ],
+            record_batch.to_pylist(),
+        )
+        # Dicts are converted the same way.
+        self.assertEqual(
+            record_batch,
+            arrow_schemas.to_record_batch(record_batch.to_pylist(), schema),
+        )
+
+    def test_split_record_batch(self):
+        record_batch = pa.RecordBatch.from_pydict({"a": list(range(100))})
+
+        slices = arrow_schemas.split_record_batch(record_batch, max_bytes=200)
+
+        self.assertEqual(4, len(slices))
+        self.assertEqual(
+            list(range(100)), [v for s in slices for v in s["a"].to_pylist()]
+        )
+        self.assertEqual([], arrow_schemas.split_record_batch(record_batch[:0], 200))
+
+    def test_to_table(self):
+        rows = [Nested(a=1, b="b"), Nested(a=2, b=None)]
+
+        table = arrow_schemas.to_table(
+            rows, arrow_schemas.dataclass_to_arrow_schema(Nested)
+        )
+
+        self.assertEqual([{"a": 1, "b": "b"}, {"a": 2, "b": None}], table.to_pylist())
+        # Without a schema it is inferred.
+        self.assertEqual(
+            table.to_pylist(), arrow_schemas.to_table(table.to_pylist()).to_pylist()
+        )
+
+    def test_table_builder_dataclass(self):
+        builder = arrow_schemas.ArrowTableBuilder()
+        builder.set_dataclass(Nested)
+
+        table = builder.build([Nested(a=1, b=None)])
+
+        self.assertEqual(arrow_schemas.dataclass_to_arrow_schema(Nested), table.schema)
+
+    def test_table_builder_infers_schema(self):
+        builder = arrow_schemas.ArrowTableBuilder()
+
+        # A column with only nulls doesn't have a type so it isn't cached.
+        builder.build([{"a": 1, "b": None}])
+        self.assertIsNone(builder.schema)
+
+        builder.build([{"a": 1, "b": "b"}])
+        schema = builder.schema
+        self.assertEqual(pa.schema({"a": pa.int64(), "b": pa.string()}), schema)
+        self.assertEqual(
+            [{"a": 2, "b": None}], builder.build([{"a": 2, "b": None}]).to_pylist()
+        )
+        self.assertIs(schema, builder.schema)
+
+        # Rows that don't match the cached schema are inferred again.
+        table = builder.build([{"a": "not an int", "b": "b"}])
+        self.assertEqual(pa.schema({"a": pa.string(), "b": pa.string()}), table.schema)
+        table = builder.build([{"a": 1, "b": "b", "c": 1.5}])
+        self.assertEqual(["a", "b", "c"], table.column_names)
+
+    def test_table_builder_keeps_keys_of_later_rows(self):
+        builder = arrow_schemas.ArrowTableBuilder()
+        builder.build([{"a": 1}])
+
+        table = builder.build([{"a": 2}, {"a": 3, "b": 4}])
+
+        self.assertEqual([{"a": 2, "b": None}, {"a": 3, "b": 4}], table.to_pylist())
+        # Inferring a schema also uses the keys of every row.
+        self.assertEqual(
+            [{"a": 1, "b": None}, {"a": 2, "b": 3}],
+            arrow_schemas.to_table([{"a": 1}, {"a": 2, "b": 3}]).to_pylist(),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+"""Utilities for working with Avro schemas."""
+
+import itertools
+from typing import Any, Dict, Iterator
+
+import pyarrow as pa
+
+
+def _to_avro_type(arrow_type: pa.DataType, names: Iterator[str]) -> Any:
+    if pa.types.is_null(arrow_type):
+        return "null"
+    if pa.types.is_boolean(arrow_type):
+        return "boolean"
+    if pa.types.is_integer(arrow_type):
+        return "long"
+    if pa.types.is_floating(arrow_type):
+        return "double"
+    if pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type):
+        return "string"
+    if pa.types.is_binary(arrow_type) or pa.types.is_large_binary(arrow_type):
+        return "bytes"
+    if pa.types.is_timestamp(arrow_type):
+        return {"type": "long", "logicalType": "timestamp-micros"}
+    if pa.types.is_date(arrow_type):
+        return {"type": "int", "logicalType": "date"}
+    if pa.types.is_time(arrow_type):
+        return {"type": "long", "logicalType": "time-micros"}
+    if pa.types.is_list(arrow_type) or pa.types.is_large_list(arrow_type):
+        return {
+            "type": "array",
+            "items": _to_nullable_avro_type(arrow_type.value_type, names),
+        }
+    if pa.types.is_struct(arrow_type):
+        return _to_avro_record(list(arrow_type), next(names), names)
+    raise ValueError(f"Can't convert type: {arrow_type} to an avro schema")
+
+
+def _to_nullable_avro_type(arrow_type: pa.DataType, names: Iterator[str]) -> Any:
+    avro_type = _to_avro_type(arrow_type, names)
+    if avro_type == "null":
+        return avro_type
+    return ["null", avro_type]
+
+
+def _to_avro_record(fields, name: str, names: Iterator[str]) -> Dict[str, Any]:
+    return {
+        "type": "record",
+        "name": name,
+        "fields": [
+            {
+                "name": field.name,
+                "type": _to_nullable_avro_type(field.type, names),
+                "default": None,
+            }
+            for field in fields
+        ],
+    }
+
+
+def arrow_to_avro_schema(schema: pa.Schema, name: str = "Row") -> Dict[str, Any]:
+    """Convert an arrow schema to an avro record schema.
+
+    Args:
+        schema: The arrow schema to convert.
+        name: The name of the avro record.
+
+    Returns:
+        The avro schema as a dict, all fields are nullable since rows are
+        written as dicts which may leave out fields.
+    """
+    # NOTE: Avro requires every nested record to have a unique name.
+    names = (f"{name}_{i}" for i in itertools.count(1))
+    return _to_avro_record(list(schema), name, names)
@@ -18,7 +18,6 @@ import json
 from dataclasses import _FIELDS, is_dataclass
 from typing import Any, Callable, Dict, MutableMapping, Optional, Type, get_type_hints
 
-import pandas as pd
 from dacite import Config
 from dacite.cache import cache
 from dacite.core import _build_value
@@ -40,6 +39,9 @@ from buildflow import exceptions
 
 
 def str_to_datetime(s: str) -> datetime.datetime:
+    # NOTE: pandas is slow to import so we only import it when it's needed.
+    import pandas as pd
+
     return pd.Timestamp(s).to_pydatetime()
 
 
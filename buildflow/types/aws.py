@@ -1,6 +1,6 @@
 import dataclasses
 import enum
-from typing import Any
+from typing import Any, Optional
 from urllib.parse import unquote_plus
 
 from buildflow.core.types.aws_types import S3BucketName
@@ -61,6 +61,8 @@ class S3FileChangeEvent(FileChangeEvent):
     event_type: S3ChangeStreamEventType
     bucket_name: S3BucketName
     s3_client: Any
+    # An asyncio S3 client, used by `read_blob`.
+    async_s3_client: Any = None
 
     @property
     def blob(self) -> bytes:
@@ -69,3 +71,27 @@ class S3FileChangeEvent(FileChangeEvent):
         file_path = unquote_plus(self.file_path)
         data = self.s3_client.get_object(Bucket=self.bucket_name, Key=file_path)
         return data["Body"].read()
+
+    async def read_blob(self) -> bytes:
+        """Reads the blob without blocking the event loop.
+
+        Prefer this over `blob` in async processors.
+        """
+        if self.async_s3_client is None:
+            raise ValueError("read_blob requires an async S3 client.")
+        file_path = unquote_plus(self.file_path)
+        data = await self.async_s3_client.get_object(
+            Bucket=self.bucket_name, Key=file_path
+        )
+        async with data["Body"] as stream:
+            return await stream.read()
+
+
+@dataclasses.dataclass
+class SQSMessage:
+    body: str
+    # Messages in the same group are delivered in order. Only used for FIFO
+    # queues, defaults to the sink's message group id.
+    message_group_id: Optional[str] = None
+    # Only used for FIFO queues, defaults to a hash of the body.
+    deduplication_id: Optional[str] = None
@@ -1,14 +1,35 @@
 import dataclasses
 import enum
-from typing import Any, Dict
-
-from google.cloud import storage
-from pulumi_gcp.sql import (  # noqa
-    DatabaseInstanceSettingsArgs as CloudSQLInstanceSettings,
-)
+from typing import TYPE_CHECKING, Any, Dict
 
 from buildflow.types.portable import FileChangeEvent, PortableFileChangeEventType
 
+if TYPE_CHECKING:
+    from google.cloud import storage
+    from pulumi_gcp.sql import (  # noqa
+        DatabaseInstanceSettingsArgs as CloudSQLInstanceSettings,
+    )
+
+
+# NOTE: pulumi_gcp is slow to import so we only import it when the settings
+# type is used.
+def __getattr__(name: str) -> Any:
+    if name == "CloudSQLInstanceSettings":
+        from pulumi_gcp.sql import DatabaseInstanceSettingsArgs
+
+        globals()[name] = DatabaseInstanceSettingsArgs
+        return DatabaseInstanceSettingsArgs
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class BigQueryWriteMethod(enum.Enum):
+    # Legacy streaming inserts (tabledata.insertAll).
+    STREAMING_INSERTS = "streaming_inserts"
+    # Appends through the BigQuery Storage Write API.
+    STORAGE_WRITE_API = "storage_write_api"
+    # Stages rows as Parquet files that are periodically loaded with load jobs.
+    BATCH_LOAD = "batch_load"
+
 
 class GCSChangeStreamEventType(enum.Enum):
     OBJECT_FINALIZE = "created"
@@ -30,7 +51,7 @@ class GCSChangeStreamEventType(enum.Enum):
 @dataclasses.dataclass
 class GCSFileChangeEvent(FileChangeEvent):
     event_type: GCSChangeStreamEventType
-    storage_client: storage.Client
+    storage_client: "storage.Client"
 
     @property
     def blob(self) -> bytes:
@@ -54,5 +75,8 @@ class CloudSQLDatabaseVersion:
 @dataclasses.dataclass
 class PubsubMessage:
     data: bytes
-    attributes: Dict[str, Any]
-    ack_id: str
+    attributes: Dict[str, Any] = dataclasses.field(default_factory=dict)
+    ack_id: str = ""
+    # Messages with the same ordering key are delivered in the order they were
+    # published, if the subscription has message ordering enabled.
+    ordering_key: str = ""
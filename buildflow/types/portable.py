@@ -6,10 +6,14 @@ from buildflow.core.types.shared_types import FilePath
 
 
 class FileFormat(enum.Enum):
-    # TODO: Support additional file formats (Arrow, Avro, etc..)
     PARQUET = "parquet"
     CSV = "csv"
     JSON = "json"
+    # Newline delimited JSON, one object per line.
+    NDJSON = "ndjson"
+    # The Arrow IPC file format, also known as Feather V2.
+    ARROW = "arrow"
+    AVRO = "avro"
 
 
 class PortableFileChangeEventType(enum.Enum):
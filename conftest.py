@@ -19,6 +19,45 @@ def ray_fix():
     ray.shutdown()
 
 
+@pytest.fixture(autouse=True)
+def _clear_client_caches():
+    """Keeps clients cached by one test (e.g. pointed at moto) out of others."""
+    from buildflow.io.utils.clients import aws_clients, gcp_clients
+
+    aws_clients.clear_cache()
+    gcp_clients.clear_cache()
+    yield
+    aws_clients.clear_cache()
+    gcp_clients.clear_cache()
+
+
+@pytest.fixture(scope="session")
+def _moto_server_endpoint():
+    from moto.server import ThreadedMotoServer
+
+    server = ThreadedMotoServer(ip_address="127.0.0.1", port=0)
+    server.start()
+    host, port = server._server.server_address
+    yield f"http://{host}:{port}"
+    server.stop()
+
+
+@pytest.fixture(scope="function", name="moto_server")
+def moto_server_fix(_moto_server_endpoint):
+    """Points all AWS clients (including async ones) at a local moto server.
+
+    Unlike moto's mock decorators this works with aiobotocore clients.
+    """
+    import requests
+
+    requests.post(f"{_moto_server_endpoint}/moto-api/reset")
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setenv("AWS_ENDPOINT_URL", _moto_server_endpoint)
+        monkeypatch.setenv("AWS_ACCESS_KEY_ID", "dummy")
+        monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "dummy")
+        yield _moto_server_endpoint
+
+
 def pytest_collection_modifyitems(items):
     for item in items:
         if "ray" in getattr(item, "fixturenames", ()):
@@ -39,6 +78,8 @@ class MockAWSResponse(aiobotocore.awsrequest.AioAWSResponse):
     def __init__(self, response: botocore.awsrequest.AWSResponse):
         self._moto_response = response
         self.status_code = response.status_code
+        self.headers = response.headers
+        self.url = response.url
         self.raw = MockHttpClientResponse(response)
 
     # adapt async methods to use moto's response
@@ -96,6 +137,9 @@ def patch_aiobotocore() -> None:
             http_response: botocore.awsrequest.AWSResponse,
             operation_model: botocore.model.OperationModel,
         ) -> Any:
+            if isinstance(http_response, aiobotocore.awsrequest.AioAWSResponse):
+                # A real response (e.g. from a moto server), not a moto mock.
+                return original(http_response, operation_model)
             return original(MockAWSResponse(http_response), operation_model)
 
         return patched_convert_to_response_dict